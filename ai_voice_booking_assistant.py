@@ -7,13 +7,18 @@ import os
 import json
 import uuid
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
 import asyncio
 from flask import Flask, request, Response
 from twilio.twiml import VoiceResponse
 from twilio.rest import Client
+from salon_catalog import SALON_INFO, SERVICES, get_service_info
+from booking_dialog import (
+    ASK, CLOSED, COMPLETE, CONFIRM, CONFIRM_AGAIN, GREET, REPROMPT, RESTART, DialogTurn, default_engine
+)
+from slot_extractor import extract_date, extract_slots, extract_time, identify_service
+from session_records import BookingData, ConversationState
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -28,58 +33,24 @@ WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL', 'https://your-domain.com')
 # Initialize Twilio client
 client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 
-# Salon Information
-SALON_INFO = {
-    "name": "Goodness Glamour Salon",
-    "phone": "9036626642",
-    "email": "2akonsultant@gmail.com",
-    "hours": "Monday - Sunday, 9:00 AM - 8:00 PM",
-    "service_type": "Doorstep beauty services"
+# Questions asked when moving on to a step
+STEP_QUESTIONS = {
+    "get_name": "What's your name?",
+    "get_service": "Which service would you like? We do haircuts, coloring, treatments, and bridal styling.",
+    "get_date": "What date works for you?",
+    "get_time": "What time would work? We're available 9 AM to 8 PM.",
+    "get_address": "What's your address for our doorstep service?"
 }
 
-# Services and Pricing
-SERVICES = {
-    "women": {
-        "haircut": {"name": "Women's Haircut & Styling", "price": "₹400-1,200", "duration": "60 minutes"},
-        "coloring": {"name": "Hair Coloring & Highlights", "price": "₹1,200-3,500", "duration": "120 minutes"},
-        "treatment": {"name": "Hair Treatment & Spa", "price": "₹600-2,000", "duration": "90 minutes"},
-        "bridal": {"name": "Bridal & Party Styling", "price": "₹800-2,500", "duration": "90 minutes"},
-        "blowdry": {"name": "Professional Blowdry", "price": "₹250-600", "duration": "45 minutes"},
-        "hairwash": {"name": "Hair Wash & Styling", "price": "₹200-450", "duration": "30 minutes"},
-        "consultation": {"name": "Hair Consultation", "price": "₹150-300", "duration": "30 minutes"}
-    },
-    "kids": {
-        "haircut": {"name": "Kids Haircuts", "price": "₹150-500", "duration": "30 minutes"},
-        "party": {"name": "Party Styling", "price": "₹200-600", "duration": "45 minutes"},
-        "hairwash": {"name": "Kids Hair Wash", "price": "₹100-300", "duration": "20 minutes"},
-        "braiding": {"name": "Creative Braiding", "price": "₹150-400", "duration": "30 minutes"}
-    }
+# Re-prompts when the caller's answer didn't contain the slot we asked for
+STEP_REPROMPTS = {
+    "get_name": "I didn't catch your name. Could you please tell me your name?",
+    "get_service": "Which service interests you? We do haircuts, coloring, treatments, and bridal styling.",
+    "get_date": "What date would you like? You can say tomorrow, or a specific date.",
+    "get_time": "What time works for you? We're available 9 AM to 8 PM.",
+    "get_address": "Could you please provide your complete address for our doorstep service?"
 }
 
-@dataclass
-class BookingData:
-    customer_name: str = ""
-    phone: str = ""
-    service: str = ""
-    date: str = ""
-    time: str = ""
-    address: str = ""
-    notes: str = ""
-
-@dataclass
-class ConversationState:
-    session_id: str
-    customer_name: Optional[str] = None
-    phone: Optional[str] = None
-    current_step: str = "greeting"
-    booking_data: BookingData = None
-    conversation_history: List[Dict] = None
-    
-    def __post_init__(self):
-        if self.booking_data is None:
-            self.booking_data = BookingData()
-        if self.conversation_history is None:
-            self.conversation_history = []
 
 class AIVoiceBookingAssistant:
     """
@@ -147,141 +118,100 @@ Remember: Keep responses SHORT, FRIENDLY, and CONVERSATIONAL. Always confirm det
         if not session:
             return "I'm sorry, I'm having trouble with this call. Please try calling again."
         
-        # Simple rule-based responses for voice calls (can be enhanced with OpenAI/Gemini)
-        current_step = session.current_step
-        user_input_lower = user_input.lower().strip()
-        
-        if current_step == "greeting":
-            if any(word in user_input_lower for word in ["book", "appointment", "schedule", "service"]):
-                session.current_step = "get_name"
-                return "Great! I'd love to help you book an appointment. What's your name?"
-            else:
-                return "Hello! Welcome to Goodness Glamour Salon. I'm your AI assistant. How can I help you today?"
-        
-        elif current_step == "get_name":
-            # Extract name from input
-            name = self._extract_name(user_input)
-            if name:
-                session.customer_name = name
-                session.current_step = "get_service"
-                return f"Nice to meet you, {name}! Which service would you like? We do haircuts, coloring, treatments, and bridal styling."
-            else:
-                return "I didn't catch your name. Could you please tell me your name?"
-        
-        elif current_step == "get_service":
-            service = self._identify_service(user_input)
-            if service:
-                session.booking_data.service = service
-                session.current_step = "get_date"
-                service_info = self._get_service_info(service)
-                return f"Perfect! {service_info['name']} is {service_info['price']}. What date works for you?"
-            else:
-                return "Which service interests you? We do haircuts, coloring, treatments, and bridal styling."
-        
-        elif current_step == "get_date":
-            date = self._parse_date(user_input)
-            if date:
-                session.booking_data.date = date
-                session.current_step = "get_time"
-                return f"Great! For {date}, what time would work? We're available 9 AM to 8 PM."
-            else:
-                return "What date would you like? You can say tomorrow, or a specific date."
-        
-        elif current_step == "get_time":
-            time = self._parse_time(user_input)
-            if time:
-                session.booking_data.time = time
-                session.current_step = "get_address"
-                return "Perfect! What's your address for our doorstep service?"
-            else:
-                return "What time works for you? We're available 9 AM to 8 PM."
-        
-        elif current_step == "get_address":
-            address = user_input.strip()
-            if len(address) > 10:  # Basic validation
-                session.booking_data.address = address
-                session.current_step = "confirm_booking"
-                return self._generate_confirmation_message(session)
-            else:
-                return "Could you please provide your complete address for our doorstep service?"
-        
-        elif current_step == "confirm_booking":
-            if any(word in user_input_lower for word in ["yes", "confirm", "correct", "book"]):
-                session.current_step = "booking_complete"
-                return self._complete_booking(session)
-            elif any(word in user_input_lower for word in ["no", "change", "wrong"]):
-                session.current_step = "get_name"  # Restart
-                return "No problem! Let's start over. What's your name?"
-            else:
-                return "Please say 'yes' to confirm or 'no' to make changes."
-        
-        elif current_step == "booking_complete":
+        # Rule-based dialog for voice calls (can be enhanced with OpenAI/Gemini)
+        turn = default_engine.turn(session.current_step, self._filled_slots(session), user_input)
+        
+        if turn.event == GREET:
+            return "Hello! Welcome to Goodness Glamour Salon. I'm your AI assistant. How can I help you today?"
+        
+        elif turn.event in (ASK, REPROMPT, CONFIRM):
+            # Fill every slot mentioned, then jump to the first one still missing
+            opener = "Great! I'd love to help you book an appointment." if turn.previous_step == "greeting" else "Perfect!"
+            return self._fill_slots(session, turn, opener)
+        
+        elif turn.event == COMPLETE:
+            session.current_step = turn.step
+            return self._complete_booking(session)
+        
+        elif turn.event == RESTART:
+            session.customer_name = None
+            session.booking_data = BookingData()
+            session.current_step = turn.step  # Restart
+            return "No problem! Let's start over. What's your name?"
+        
+        elif turn.event == CONFIRM_AGAIN:
+            return "Please say 'yes' to confirm or 'no' to make changes."
+        
+        elif turn.event == CLOSED:
             return "Thank you for choosing Goodness Glamour! Have a wonderful day!"
         
         return "I'm not sure how to help with that. Could you please repeat?"
 
+    def _filled_slots(self, session: ConversationState) -> Dict[str, str]:
+        """Slots collected so far, keyed like the dialog engine expects"""
+        booking = session.booking_data
+        return {
+            "customer_name": session.customer_name,
+            "service": booking.service,
+            "date": booking.date,
+            "time": booking.time,
+            "address": booking.address
+        }
+
+    def _fill_slots(self, session: ConversationState, turn: DialogTurn, opener: str = "Perfect!") -> str:
+        """Store the slots from a turn and ask for the first missing one"""
+        slots = turn.slots
+        if "customer_name" in slots:
+            session.customer_name = slots["customer_name"]
+        for slot in ("service", "date", "time", "address"):
+            if slot in slots:
+                setattr(session.booking_data, slot, slots[slot])
+        
+        session.current_step = turn.step
+        if turn.event == CONFIRM:
+            return self._generate_confirmation_message(session)
+        
+        parts = self._acknowledge_slots(slots)
+        if turn.event == REPROMPT:
+            parts.append(STEP_REPROMPTS[turn.step])
+        else:
+            if not parts or "customer_name" not in slots:
+                parts.insert(0, opener)
+            parts.append(STEP_QUESTIONS[turn.step])
+        return " ".join(parts)
+
+    def _acknowledge_slots(self, slots: Dict[str, str]) -> List[str]:
+        """Short acknowledgement of the slots just filled"""
+        parts = []
+        if "customer_name" in slots:
+            parts.append(f"Nice to meet you, {slots['customer_name']}!")
+        if "service" in slots:
+            service_info = self._get_service_info(slots["service"])
+            parts.append(f"{service_info['name']} is {service_info['price']}.")
+        when = " at ".join(slots[slot] for slot in ("date", "time") if slot in slots)
+        if when:
+            parts.append(f"Noted, {when}.")
+        return parts
+
     def _extract_name(self, text: str) -> Optional[str]:
         """Extract name from user input"""
-        # Simple name extraction - can be enhanced with NLP
-        words = text.split()
-        if len(words) >= 1:
-            return words[0].capitalize()
-        return None
+        return extract_slots(text, "get_name").get("customer_name")
 
     def _identify_service(self, text: str) -> Optional[str]:
         """Identify service from user input"""
-        text_lower = text.lower()
-        
-        service_mapping = {
-            "haircut": ["haircut", "cut", "trim"],
-            "coloring": ["color", "coloring", "highlight", "dye"],
-            "treatment": ["treatment", "spa", "keratin", "therapy"],
-            "bridal": ["bridal", "wedding", "party", "styling"],
-            "blowdry": ["blowdry", "blow dry", "style"],
-            "hairwash": ["wash", "shampoo", "clean"],
-            "consultation": ["consultation", "advice", "consult"]
-        }
-        
-        for service, keywords in service_mapping.items():
-            if any(keyword in text_lower for keyword in keywords):
-                return service
-        
-        return None
+        return identify_service(text)
 
     def _get_service_info(self, service: str) -> Dict:
         """Get service information"""
-        for category in SERVICES.values():
-            if service in category:
-                return category[service]
-        return {"name": "Service", "price": "Contact us", "duration": "Varies"}
+        return get_service_info(service)
 
     def _parse_date(self, text: str) -> Optional[str]:
-        """Parse date from user input"""
-        text_lower = text.lower()
-        
-        if "tomorrow" in text_lower:
-            tomorrow = datetime.now() + timedelta(days=1)
-            return tomorrow.strftime("%A, %B %d")
-        elif "today" in text_lower:
-            return datetime.now().strftime("%A, %B %d")
-        else:
-            # For now, return as-is for specific dates
-            return text.strip()
+        """Parse date from user input, None if unclear or already past"""
+        return extract_date(text)
 
     def _parse_time(self, text: str) -> Optional[str]:
-        """Parse time from user input"""
-        text_lower = text.lower()
-        
-        # Simple time parsing
-        if any(word in text_lower for word in ["morning", "am"]):
-            return "10 AM"
-        elif any(word in text_lower for word in ["afternoon", "pm"]):
-            return "2 PM"
-        elif any(word in text_lower for word in ["evening"]):
-            return "6 PM"
-        else:
-            # Return as-is for specific times
-            return text.strip()
+        """Parse time from user input, None if unclear or outside salon hours"""
+        return extract_time(text, bare_hour=True)
 
     def _generate_confirmation_message(self, session: ConversationState) -> str:
         """Generate booking confirmation message"""
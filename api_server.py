@@ -4,9 +4,10 @@ Handles QR code scanning, voice calls, and webhook endpoints
 """
 
 from fastapi import FastAPI, HTTPException, Request, Form
-from fastapi.responses import HTMLResponse, Response
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
 import logging
 from typing import Optional, Dict, Any
@@ -15,6 +16,14 @@ from datetime import datetime
 
 # Import our AI system
 from voice_agent import AgenticSalonAI, TWILIO_AVAILABLE, WEBHOOK_URL
+from turn_deadline import DONE, EXPIRED, PENDING, TurnDeadlineRunner
+from llm_async import close_shared_http_client
+from llm_telemetry import default_telemetry
+from speech_hints import default_reprompts
+from webhook_idempotency import IDEMPOTENCY_HEADER, SPEECH_FIELDS, default_idempotency, form_params, request_key
+from audio_prompts import AUDIO_CACHE_CONTROL, AUDIO_ROUTE, audio_mimetype
+from call_admission import DUPLICATE, LIMITED, client_ip, default_admission, normalize_phone
+from outbound_dialer import FAILED
 try:
     from config import config
     WEBHOOK_URL = config.WEBHOOK_URL
@@ -68,6 +77,15 @@ app.add_middleware(
 # Initialize AI system
 salon_ai = AgenticSalonAI()
 
+# Per-turn latency budget for voice webhooks
+turn_runner = TurnDeadlineRunner()
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    """Release pooled LLM connections and write today's LLM usage rollup"""
+    await close_shared_http_client()
+    default_telemetry.flush()
+
 # Store active sessions
 active_sessions: Dict[str, AgenticSalonAI] = {}
 
@@ -210,6 +228,9 @@ async def home():
                     
                     if (result.success) {
                         status.innerHTML = '<p style="color: #4CAF50;">✅ AI call initiated! You should receive a call shortly.</p>';
+                        if (result.status_url) {
+                            pollCallStatus(result.status_url);
+                        }
                     } else {
                         status.innerHTML = '<p style="color: #f44336;">❌ ' + result.message + '</p>';
                     }
@@ -217,50 +238,116 @@ async def home():
                     status.innerHTML = '<p style="color: #f44336;">❌ Error: ' + error.message + '</p>';
                 }
             });
+            
+            const CALL_MESSAGES = {
+                queued: '⏳ You are in line - we will call you shortly.',
+                dialing: '📞 Calling you now...',
+                in_call: '📞 Calling you now - please pick up!',
+                retrying: '🔁 We could not reach you and will try again soon.',
+                completed: '✅ Thanks for talking to us!',
+                failed: '❌ We could not reach you. Please try again.'
+            };
+            
+            async function pollCallStatus(url) {
+                const status = document.getElementById('status');
+                try {
+                    const call = await (await fetch(url)).json();
+                    if (CALL_MESSAGES[call.status]) {
+                        const color = call.status === 'failed' ? '#f44336' : '#4CAF50';
+                        status.innerHTML = '<p style="color: ' + color + ';">' + CALL_MESSAGES[call.status] + '</p>';
+                    }
+                    if (call.status === 'completed' || call.status === 'failed') {
+                        return;
+                    }
+                } catch (error) {
+                    // Keep polling through network blips
+                }
+                setTimeout(() => pollCallStatus(url), 3000);
+            }
         </script>
     </body>
     </html>
     """
 
 @app.post("/trigger-call")
-async def trigger_call(request: Dict[str, str]):
+async def trigger_call(request: Dict[str, str], http_request: Request):
     """Trigger a voice call to customer"""
-    try:
-        phone = request.get("phone")
-        if not phone:
-            raise HTTPException(status_code=400, detail="Phone number is required")
-        
-        # Clean phone number
-        phone = phone.replace(" ", "").replace("-", "").replace("(", "").replace(")", "")
-        if not phone.startswith("+"):
-            phone = "+91" + phone.lstrip("0")
-        
-        # Prefer Vonage if configured with hosted answer_url (no repo webhook needed)
-        vonage_client = get_vonage_client()
-        if vonage_client and VONAGE_PHONE_NUMBER and VONAGE_ANSWER_URL:
-            try:
-                response = vonage_client.voice.create_call({
-                    'to': [{'type': 'phone', 'number': phone}],
-                    'from': {'type': 'phone', 'number': VONAGE_PHONE_NUMBER},
-                    'answer_url': [VONAGE_ANSWER_URL]
-                })
-                call_id = response.get('uuid') if isinstance(response, dict) else None
-                return {"success": True, "provider": "vonage", "message": f"AI call initiated to {phone}", "call_id": call_id}
-            except Exception as e:
-                logger.error(f"Vonage call failed, falling back to Twilio: {e}")
-                # Fall through to Twilio below
-        
-        # Twilio fallback using our existing handler (requires WEBHOOK_URL and webhook route)
-        webhook_url = f"{WEBHOOK_URL}/voice/webhook"
-        success = salon_ai.trigger_voice_call(phone, webhook_url)
-        if success:
-            return {"success": True, "provider": "twilio", "message": f"AI call initiated to {phone}"}
-        else:
-            return {"success": False, "message": "Failed to initiate call. Configure Vonage (VONAGE_API_KEY/SECRET/PHONE/ANSWER_URL) or Twilio (SID/TOKEN/PHONE/WEBHOOK_URL)."}
+    phone = request.get("phone")
+    if not phone:
+        raise HTTPException(status_code=400, detail="Phone number is required")
+    phone = normalize_phone(phone)
+    if not phone:
+        raise HTTPException(status_code=400, detail="Please enter a valid phone number")
+    
+    # Repeat taps get the call already requested; floods get a 429
+    dialer = salon_ai.twilio_handler.dialer
+    ip = client_ip(http_request.client.host if http_request.client else None,
+                   http_request.headers.get("X-Forwarded-For"))
+    admission = default_admission.admit(phone, ip)
+    if admission.decision == DUPLICATE and admission.existing and "request_id" in admission.existing:
+        status = dialer.status(admission.existing["request_id"])
+        if status and status["status"] == FAILED:
+            # The earlier call gave up, so the caller may ask again
+            default_admission.release(phone)
+            admission = default_admission.admit(phone, ip)
+    if admission.decision == LIMITED:
+        retry_after = max(1, int(admission.retry_after + 0.999))
+        return JSONResponse({"success": False, "message": admission.reason, "retry_after": retry_after},
+                            status_code=429, headers={"Retry-After": str(retry_after)})
+    if admission.decision == DUPLICATE:
+        reply = dict(admission.existing or {"success": True}, duplicate=True, message="Call already requested")
+        status = dialer.status(reply["request_id"]) if "request_id" in reply else None
+        if status:
+            reply.update(status=status["status"], call_sid=status.get("call_sid"))
+        return reply
     
+    try:
+        result = await _place_call(phone)
     except Exception as e:
+        default_admission.release(phone)
         logger.error(f"Error triggering call: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    if result["success"]:
+        default_admission.attach(phone, result)
+    else:
+        default_admission.release(phone)
+    return result
+
+async def _place_call(phone: str) -> Dict[str, Any]:
+    """Place the call through Vonage when configured, otherwise queue it with the Twilio dialer"""
+    # Prefer Vonage if configured with hosted answer_url (no repo webhook needed)
+    vonage_client = get_vonage_client()
+    if vonage_client and VONAGE_PHONE_NUMBER and VONAGE_ANSWER_URL:
+        try:
+            response = vonage_client.voice.create_call({
+                'to': [{'type': 'phone', 'number': phone}],
+                'from': {'type': 'phone', 'number': VONAGE_PHONE_NUMBER},
+                'answer_url': [VONAGE_ANSWER_URL]
+            })
+            call_id = response.get('uuid') if isinstance(response, dict) else None
+            return {"success": True, "provider": "vonage", "message": f"AI call initiated to {phone}", "call_id": call_id}
+        except Exception as e:
+            logger.error(f"Vonage call failed, falling back to Twilio: {e}")
+            # Fall through to Twilio below
+    
+    # Twilio fallback using our existing handler (requires WEBHOOK_URL and webhook route);
+    # the call is queued and placed by the dialer, and the page polls status_url
+    webhook_url = f"{WEBHOOK_URL}/voice/webhook"
+    queued = salon_ai.trigger_voice_call(phone, webhook_url)
+    if queued:
+        return {"success": True, "provider": "twilio", "message": f"AI call queued for {phone}",
+                "request_id": queued.request_id, "status": queued.status,
+                "status_url": f"/trigger-call/{queued.request_id}"}
+    else:
+        return {"success": False, "message": "Failed to initiate call. Configure Vonage (VONAGE_API_KEY/SECRET/PHONE/ANSWER_URL) or Twilio (SID/TOKEN/PHONE/WEBHOOK_URL)."}
+
+@app.get("/trigger-call/{request_id}")
+def trigger_call_status(request_id: str):
+    """Where a queued call has got to, for the landing page to poll"""
+    status = salon_ai.twilio_handler.dialer.status(request_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown call request")
+    return dict(status, success=True)
 
 @app.post("/voice/webhook")
 async def voice_webhook(request: Request):
@@ -276,9 +363,25 @@ async def voice_webhook(request: Request):
             # Initial call - greet the customer
             greeting = "Hello! Welcome to Goodness Glamour Salon. I'm your AI assistant. How can I help you today?"
             twiml_response = salon_ai.twilio_handler.generate_twiml_response(greeting)
+        elif call_sid:
+            # Speak the first sentence of the reply as soon as it is generated; a turn
+            # that misses its deadline is held with a filler and served on /voice/poll.
+            # A Twilio retry of this request replays the original's reply instead
+            key = request_key(call_sid, request.url.path, request.headers.get(IDEMPOTENCY_HEADER),
+                              form_params(form_data, SPEECH_FIELDS))
+            twiml_response, _ = await run_in_threadpool(
+                default_idempotency.run, key, lambda: turn_runner.run(
+                    call_sid, salon_ai.process_voice_call_streaming,
+                    speech_result, call_sid, f"{WEBHOOK_URL}/voice/continue/{call_sid}"
+                )
+            )
+            if twiml_response is None:
+                twiml_response = salon_ai.twilio_handler.generate_stream_twiml(
+                    turn_runner.filler(call_sid), f"{WEBHOOK_URL}/voice/poll/{call_sid}"
+                )
         else:
             # Process the speech input
-            twiml_response = salon_ai.process_voice_call(speech_result)
+            twiml_response = await salon_ai.process_voice_call_async(speech_result)
         
         return Response(content=twiml_response, media_type="application/xml")
     
@@ -289,6 +392,44 @@ async def voice_webhook(request: Request):
         )
         return Response(content=error_response, media_type="application/xml")
 
+@app.post("/voice/poll/{call_sid}")
+def voice_poll(call_sid: str, request: Request):
+    """Serve a turn that missed its deadline, or hold the caller a little longer"""
+    key = request_key(call_sid, request.url.path, request.headers.get(IDEMPOTENCY_HEADER))
+    twiml_response, _ = default_idempotency.run(key, lambda: _poll_twiml(call_sid))
+    return Response(content=twiml_response, media_type="application/xml")
+
+def _poll_twiml(call_sid: str) -> str:
+    try:
+        status, twiml_response = turn_runner.poll(call_sid)
+    except Exception as e:
+        logger.error(f"Error finishing turn for {call_sid}: {e}")
+        status, twiml_response = DONE, salon_ai.twilio_handler.generate_twiml_response(
+            "I'm sorry, I'm having trouble. Please try again."
+        )
+    
+    if status == PENDING:
+        twiml_response = salon_ai.twilio_handler.generate_stream_twiml(
+            turn_runner.filler(call_sid), f"{WEBHOOK_URL}/voice/poll/{call_sid}"
+        )
+    elif status == EXPIRED:
+        twiml_response = salon_ai.twilio_handler.generate_twiml_response(
+            "I'm sorry, that's taking too long. Could you say that again?"
+        )
+    elif status != DONE:
+        twiml_response = salon_ai.twilio_handler.generate_twiml_response("How else can I help you?")
+    return twiml_response
+
+@app.post("/voice/continue/{call_sid}")
+def voice_continue(call_sid: str, request: Request):
+    """Speak the next sentences of a streamed reply (sync: runs in the threadpool while it waits)"""
+    # Continuations carry identical forms, so only Twilio's token tells a retry apart
+    key = request_key(call_sid, request.url.path, request.headers.get(IDEMPOTENCY_HEADER))
+    twiml_response, _ = default_idempotency.run(
+        key, lambda: salon_ai.continue_voice_stream(call_sid, f"{WEBHOOK_URL}/voice/continue/{call_sid}")
+    )
+    return Response(content=twiml_response, media_type="application/xml")
+
 @app.get("/voice/process")
 async def voice_process(request: Request):
     """Handle voice call processing"""
@@ -300,7 +441,9 @@ async def voice_process(request: Request):
             return Response(content=salon_ai.twilio_handler.generate_twiml_response(greeting), media_type="application/xml")
         
         # Process the speech input
-        twiml_response = salon_ai.process_voice_call(speech_result)
+        twiml_response = await salon_ai.process_voice_call_async(
+            speech_result, call_sid=request.query_params.get("CallSid")
+        )
         return Response(content=twiml_response, media_type="application/xml")
     
     except Exception as e:
@@ -329,7 +472,7 @@ async def create_booking(booking_data: Dict[str, Any]):
     """Create a new booking"""
     try:
         # Process booking through AI system
-        response = salon_ai.process_user_input(f"Book appointment: {booking_data}")
+        response = await salon_ai.process_user_input_async(f"Book appointment: {booking_data}")
         return {"success": True, "message": response}
     except Exception as e:
         logger.error(f"Error creating booking: {e}")
@@ -342,15 +485,56 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "twilio_available": TWILIO_AVAILABLE,
-        "ai_system": "operational"
+        "ai_system": "operational",
+        "turns": turn_runner.metrics(),
+        "llm": salon_ai.llm_gateway.stats(),
+        "llm_async": salon_ai.async_llm_gateway.stats(),
+        "prompts": salon_ai.prompts.stats(),
+        "audio_prompts": salon_ai.twilio_handler.audio.stats(),
+        "speech_steps": default_reprompts.snapshot(),
+        "webhook_retries": default_idempotency.stats(),
+        "outbound_calls": salon_ai.twilio_handler.dialer.stats(),
+        "call_admission": default_admission.stats(),
+        "coalescing": {
+            "rag": salon_ai.rag_agent.flights.stats(),
+            "llm": salon_ai.llm_flights.stats(),
+            "llm_async": salon_ai.async_llm_flights.stats()
+        }
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """LLM calls, tokens, cost and latency histograms in Prometheus text format"""
+    return PlainTextResponse(default_telemetry.prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/llm")
+async def llm_usage(call_sid: Optional[str] = None):
+    """LLM usage by provider, model and booking step, today's rollup, or one call's totals"""
+    if call_sid:
+        summary = default_telemetry.call_summary(call_sid)
+        if summary is None:
+            raise HTTPException(status_code=404, detail="No LLM usage recorded for this call")
+        return {"call_sid": call_sid, **summary}
+    return default_telemetry.snapshot()
+
+@app.get(AUDIO_ROUTE + "/{name}")
+async def audio_prompt(name: str):
+    """Serve a pre-rendered prompt; names are content hashes, so caches may keep them forever"""
+    audio = salon_ai.twilio_handler.audio
+    if not audio.has_file(name):
+        raise HTTPException(status_code=404, detail="Unknown audio prompt")
+    return FileResponse(
+        os.path.join(audio.directory, name),
+        media_type=audio_mimetype(name),
+        headers={"Cache-Control": AUDIO_CACHE_CONTROL}
+    )
+
 @app.get("/test-ai")
 async def test_ai():
     """Test AI system with sample query"""
     try:
         test_query = "What services do you offer?"
-        response = salon_ai.process_user_input(test_query)
+        response = await salon_ai.process_user_input_async(test_query)
         return {
             "query": test_query,
             "response": response,
@@ -0,0 +1,294 @@
+"""
+Pre-rendered Audio Prompt Cache
+Renders the fixed prompts (greetings, step questions, re-prompts, fillers,
+goodbyes) and catalog-derived phrases to audio offline with the local
+pyttsx3 engine, stores them content-addressed with a text manifest, and lets
+the TwiML builders answer with <Play> instead of <Say> whenever every
+sentence of a reply has a cached recording. Run this module to render
+whatever is missing
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from speech_stream import split_sentences
+from twiml_cache import TwiMLTemplate
+
+# Optional local text-to-speech engine
+try:
+    import pyttsx3
+    PYTTSX3_AVAILABLE = True
+except ImportError:
+    PYTTSX3_AVAILABLE = False
+    pyttsx3 = None
+
+logger = logging.getLogger(__name__)
+
+AUDIO_DIR = os.getenv('AUDIO_PROMPT_DIR', 'data/audio_prompts')
+MANIFEST_NAME = "manifest.json"
+
+# Path the apps serve the files on; names are content hashes, so they never change
+AUDIO_ROUTE = "/audio/prompts"
+AUDIO_MAX_AGE = 365 * 24 * 3600
+AUDIO_CACHE_CONTROL = f"public, max-age={AUDIO_MAX_AGE}, immutable"
+
+# pyttsx3 writes AIFF through NSSpeechSynthesizer on macOS and WAV elsewhere
+AUDIO_EXTENSION = ".aiff" if sys.platform == "darwin" else ".wav"
+AUDIO_MIMETYPES = {".wav": "audio/wav", ".aiff": "audio/aiff"}
+
+# Same voice settings as VoiceAgent._setup_voice
+TTS_VOICE_INDEX = 1
+TTS_RATE = 150
+
+# Prompts the webhooks speak word for word
+FIXED_PROMPTS = (
+    "Hello! Welcome to Goodness Glamour Salon. I'm your AI assistant. How can I help you today?",
+    "Hello! Welcome to Goodness Glamour Salon. How can I help you today?",
+    "I didn't hear anything. Please speak after the tone.",
+    "I didn't hear anything. Please speak clearly.",
+    "I didn't hear anything. Please try again.",
+    "I'm listening.",
+    "How else can I help you?",
+    "Sorry, could you say that again?",
+    "I'm sorry, that's taking too long. Could you say that again?",
+    "I'm sorry, I'm having trouble understanding. Please try again.",
+    "I'm sorry, I'm having trouble with this call. Please try calling again.",
+    "I'm sorry, there was a technical issue. Please try again later.",
+    "Thank you for calling Goodness Glamour Salon. Have a great day!",
+    "Perfect!",
+    "Great!",
+    "Thank you!",
+    "No problem! Let's start over. What's your name?",
+    "Please say 'yes' to confirm or 'no' to make changes.",
+    "Thank you for choosing Goodness Glamour! Have a wonderful day!",
+)
+
+_registered: List[str] = []
+
+
+def register_prompts(*texts: str):
+    """Add an app's fixed wording (step questions, re-prompts) to what the pipeline renders"""
+    _registered.extend(texts)
+
+
+def normalize_prompt(text: str) -> str:
+    return " ".join(text.split())
+
+
+def prompt_sentences(text: str) -> List[str]:
+    """The units audio is cached in: single sentences, whitespace-normalized"""
+    sentences = split_sentences([normalize_prompt(text)], min_chars=0)
+    return [sentence.strip() for sentence in sentences if sentence.strip()]
+
+
+def collect_prompts(extra: Iterable[str] = ()) -> List[str]:
+    """Every distinct sentence of the fixed, registered, filler and catalog prompts"""
+    from salon_faq import catalog_phrases
+    from turn_deadline import FILLERS
+
+    seen: Dict[str, None] = {}
+    for text in list(FIXED_PROMPTS) + _registered + list(FILLERS) + catalog_phrases() + list(extra):
+        for sentence in prompt_sentences(text):
+            seen.setdefault(sentence, None)
+    return list(seen)
+
+
+class Pyttsx3Renderer:
+    """Renders text to an audio file with the local pyttsx3 engine"""
+
+    def __init__(self, voice_index: int = TTS_VOICE_INDEX, rate: int = TTS_RATE):
+        if not PYTTSX3_AVAILABLE:
+            raise RuntimeError("pyttsx3 is not installed")
+        self.engine = pyttsx3.init()
+        voices = self.engine.getProperty('voices')
+        voice_id = ""
+        if voices and len(voices) > voice_index:
+            voice_id = voices[voice_index].id
+            self.engine.setProperty('voice', voice_id)
+        self.engine.setProperty('rate', rate)
+        self.profile = f"pyttsx3:{voice_id or 'default'}:{rate}"
+
+    def render(self, text: str, path: str):
+        self.engine.save_to_file(text, path)
+        self.engine.runAndWait()
+
+
+class AudioPromptCache:
+    """
+    Content-addressed store of rendered sentences.
+
+    Files are named by the hash of their audio, and ``manifest.json`` maps
+    each normalized sentence to its file plus the voice profile that made
+    it. ``play_urls`` returns one URL per sentence of a reply, or None when
+    any sentence is missing, so a reply is never read in two voices.
+    """
+
+    def __init__(self, directory: str = AUDIO_DIR, base_url: str = ""):
+        self.directory = directory
+        self.base_url = base_url.rstrip("/")
+        self.profile = ""
+        self._files: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._counts = {"played": 0, "spoken": 0}
+        self.load()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    def load(self):
+        """Read the manifest; files it lists that are gone are left out"""
+        try:
+            with open(self.manifest_path, encoding="utf-8") as handle:
+                manifest = json.load(handle)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read audio prompt manifest {self.manifest_path}: {e}")
+            return
+        self.profile = manifest.get("profile", "")
+        files = {
+            text: name for text, name in manifest.get("prompts", {}).items()
+            if os.path.exists(os.path.join(self.directory, name))
+        }
+        with self._lock:
+            self._files = files
+        logger.info(f"Loaded {len(files)} pre-rendered audio prompts from {self.directory}")
+
+    def _save(self):
+        manifest = {"profile": self.profile, "prompts": dict(sorted(self._files.items()))}
+        partial = self.manifest_path + ".tmp"
+        with open(partial, "w", encoding="utf-8") as handle:
+            json.dump(manifest, handle, indent=2, ensure_ascii=False)
+        os.replace(partial, self.manifest_path)
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def filename(self, sentence: str) -> Optional[str]:
+        return self._files.get(normalize_prompt(sentence))
+
+    def has_file(self, name: str) -> bool:
+        with self._lock:
+            return name in self._files.values()
+
+    def play_urls(self, text: str) -> Optional[List[str]]:
+        """URLs of the recordings for every sentence of ``text``, or None if any is missing"""
+        sentences = prompt_sentences(text)
+        names = [self._files.get(sentence) for sentence in sentences]
+        if not names or None in names:
+            self._count("spoken")
+            return None
+        self._count("played")
+        return [f"{self.base_url}/{name}" for name in names]
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def add(self, sentence: str, audio_path: str) -> str:
+        """Store a rendered file under the hash of its content and map the sentence to it"""
+        digest = hashlib.blake2b(digest_size=16)
+        with open(audio_path, "rb") as handle:
+            for block in iter(lambda: handle.read(65536), b""):
+                digest.update(block)
+        name = digest.hexdigest() + os.path.splitext(audio_path)[1]
+        target = os.path.join(self.directory, name)
+        os.makedirs(self.directory, exist_ok=True)
+        if not os.path.exists(target):
+            shutil.copyfile(audio_path, target)
+        with self._lock:
+            self._files[normalize_prompt(sentence)] = name
+        return name
+
+    def render(self, texts: Iterable[str], renderer, force: bool = False) -> Dict[str, int]:
+        """Render every sentence not cached yet (all of them with ``force`` or a new voice)"""
+        if renderer.profile != self.profile:
+            force = True
+        rendered = skipped = failed = 0
+        with tempfile.TemporaryDirectory() as scratch:
+            for index, sentence in enumerate(dict.fromkeys(s for text in texts for s in prompt_sentences(text))):
+                if not force and sentence in self._files:
+                    skipped += 1
+                    continue
+                path = os.path.join(scratch, f"{index}{AUDIO_EXTENSION}")
+                try:
+                    renderer.render(sentence, path)
+                    self.add(sentence, path)
+                    rendered += 1
+                except Exception as e:
+                    logger.error(f"Could not render audio prompt {sentence!r}: {e}")
+                    failed += 1
+        self.profile = renderer.profile
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self._save()
+        removed = self.prune()
+        return {"rendered": rendered, "skipped": skipped, "failed": failed, "removed": removed}
+
+    def prune(self) -> int:
+        """Delete audio files no sentence maps to any more"""
+        with self._lock:
+            referenced = set(self._files.values())
+        removed = 0
+        for name in os.listdir(self.directory):
+            if os.path.splitext(name)[1] in AUDIO_MIMETYPES and name not in referenced:
+                os.remove(os.path.join(self.directory, name))
+                removed += 1
+        return removed
+
+    def speak(self, response, text: str, **say_options):
+        """Builder helper: <Play> the cached recordings of ``text``, else <Say> it"""
+        urls = self.play_urls(text)
+        if urls is None:
+            response.say(text, **say_options)
+            return
+        for url in urls:
+            response.play(url)
+
+    def spoken(self, text: str, say: TwiMLTemplate) -> str:
+        """TwiML body for ``text``: <Play> verbs when all of it is cached, else the ``say`` template"""
+        urls = self.play_urls(text)
+        if urls is None:
+            return say.body(text=text)
+        return "".join(_play_template().body(url=url) for url in urls)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts, prompts=len(self._files))
+
+
+_PLAY = None
+
+
+def _play_template() -> TwiMLTemplate:
+    global _PLAY
+    if _PLAY is None:
+        _PLAY = TwiMLTemplate(lambda response, url: response.play(url), "url")
+    return _PLAY
+
+
+def audio_mimetype(name: str) -> str:
+    return AUDIO_MIMETYPES.get(os.path.splitext(name)[1], "application/octet-stream")
+
+
+if __name__ == '__main__':
+    import importlib
+
+    logging.basicConfig(level=logging.INFO)
+    # Importing the assistants registers their step questions and re-prompts
+    for module in sys.argv[1:] or ("voice_booking_simple", "voice_agent"):
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            logger.warning(f"Skipping prompts from {module}: {e}")
+    cache = AudioPromptCache()
+    result = cache.render(collect_prompts(), Pyttsx3Renderer())
+    print(f"Audio prompts in {cache.directory}: {len(cache)} cached, {result}")
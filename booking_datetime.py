@@ -0,0 +1,350 @@
+"""
+Booking Date & Time Parser
+Deterministic local grammar for spoken appointment dates and times
+(weekdays, "next Friday", "day after tomorrow", ordinals, "half past four",
+Indian-English phrasings such as "kal", "parso" and "evening 5") that runs
+on every turn without calling an LLM
+"""
+
+import re
+from datetime import date, datetime, time, timedelta
+from typing import Optional, Union
+
+# Salon hours: Monday - Sunday, 9:00 AM - 8:00 PM
+SALON_OPEN = time(9, 0)
+SALON_CLOSE = time(20, 0)
+
+# Default times when the caller only gives a part of the day
+PART_OF_DAY_DEFAULTS = {
+    "morning": time(10, 0),
+    "afternoon": time(14, 0),
+    "evening": time(18, 0)
+}
+
+_UNITS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13,
+    "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18,
+    "nineteen": 19
+}
+_ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6,
+    "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10, "eleventh": 11, "twelfth": 12,
+    "thirteenth": 13, "fourteenth": 14, "fifteenth": 15, "sixteenth": 16,
+    "seventeenth": 17, "eighteenth": 18, "nineteenth": 19, "twentieth": 20,
+    "thirtieth": 30
+}
+_TENS = {"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50}
+
+_MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12
+}
+_WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+_MONTH_RE = (r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|"
+             r"sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)")
+_ORD_SUFFIX = r"(?:st|nd|rd|th)"
+
+_COMPOUND_NUMBER_RE = re.compile(
+    r"\b(" + "|".join(_TENS) + r")(?:[\s-]+(" + "|".join(list(_ORDINALS)[:9] + list(_UNITS)[:9]) + r"))?\b"
+)
+_WORD_NUMBER_RE = re.compile(r"\b(" + "|".join(list(_ORDINALS) + list(_UNITS)) + r")\b")
+
+# --- date grammar -----------------------------------------------------------
+_ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+# Not door and flat numbers ("flat 12/4", "no. 3/2"), which are written the same way
+_NUMERIC_DATE_RE = re.compile(
+    r"(?<!flat )(?<!house )(?<!door )(?<!plot )(?<!no\. )(?<!no )(?<!#)(?<!# )"
+    r"\b(\d{1,2})[/-](\d{1,2})(?:[/-](\d{2}|\d{4}))?\b(?!\s*[ap]\.?\s?m)"
+)
+_DAY_MONTH_RE = re.compile(
+    r"\b(\d{1,2})" + _ORD_SUFFIX + r"?\s+(?:of\s+)?" + _MONTH_RE + r"\b(?:,?\s+(\d{4}))?"
+)
+_MONTH_DAY_RE = re.compile(
+    r"\b" + _MONTH_RE + r"\s+(?:the\s+)?(\d{1,2})" + _ORD_SUFFIX + r"?\b(?:,?\s+(\d{4}))?"
+)
+_RELATIVE_RE = re.compile(
+    r"\b(?:(day after tomorrow|day after tmrw|parso|parson|overmorrow)|"
+    r"(today|tonight|aaj)|(tomorrow|tomorow|tommorow|tommorrow|tmrw|kal))\b"
+)
+_IN_DAYS_RE = re.compile(r"\b(?:in|after)\s+(\d{1,2})\s+days?\b")
+_WEEKDAY_RE = re.compile(
+    r"\b(?:(this|coming|upcoming|next)\s+(?:week\s+)?)?(" + "|".join(_WEEKDAYS) + r")(?:\s+(next|this)\s+week)?\b"
+)
+_WEEKEND_RE = re.compile(r"\b(this|coming|next)\s+weekend\b")
+_DAY_ONLY_RE = re.compile(
+    r"\b(?:on\s+)?(?:the\s+)?(\d{1,2})" + _ORD_SUFFIX
+    + r"\b(?!\s+(?:cross|main|block|floor|stage|phase|sector|street|road|avenue|lane))"
+)
+
+# --- time grammar -----------------------------------------------------------
+_MERIDIEM = r"(a\.?\s?m\.?|p\.?\s?m\.?)(?![a-z])"
+_RELATIVE_CLOCK_RE = re.compile(r"\b(?:(half|quarter)\s+past|(quarter)\s+to)\s+(\d{1,2})\b")
+_HALF_HOUR_RE = re.compile(r"\b(?:half\s+(\d{1,2})|(\d{1,2})\s+and\s+a\s+half)\b")
+_CLOCK_MERIDIEM_RE = re.compile(r"\b(\d{1,2})(?:(?:[:.]|\s)([0-5]\d))?\s*" + _MERIDIEM)
+_CLOCK_24H_RE = re.compile(r"\b([01]?\d|2[0-3])[:.]([0-5]\d)\b(?:\s*(?:hrs|hours))?")
+_OCLOCK_RE = re.compile(r"\b(\d{1,2})\s*o'?\s?clock\b")
+# "at 4" only counts when nothing address-like follows ("at 12 MG Road")
+_PREPOSITION_HOUR_RE = re.compile(
+    r"\b(?:at|by|around|about|before|after)\s+(\d{1,2})(?:\s+([0-5]\d))?"
+    r"(?=\s*(?:$|[,.?!]|sharp|today|tonight|tomorrow|on\b|this\b|next\b|in\b|or\b|if\b|and\b|please|itself|then|[a-z]+day\b))"
+)
+_BARE_HOUR_RE = re.compile(r"^\s*(\d{1,2})(?:(?:[:.]|\s)([0-5]\d))?\s*(?:sharp)?\s*$")
+_NOON_RE = re.compile(r"\b(?:12\s+)?(noon|midday)\b")
+_PART_OF_DAY_RE = re.compile(r"\b(morning|afternoon|evening|night|tonight)\b")
+
+DateLike = Union[date, datetime]
+
+
+def normalize_spoken_numbers(text: str) -> str:
+    """Lowercase and turn number words ("twenty first", "four") into digits"""
+    text = text.lower()
+
+    def compound(match):
+        value = _TENS[match.group(1)]
+        tail = match.group(2)
+        if not tail:
+            return str(value)
+        if tail in _ORDINALS:
+            return f"{value + _ORDINALS[tail]}th"
+        return str(value + _UNITS[tail])
+
+    def single(match):
+        word = match.group(1)
+        if word in _ORDINALS:
+            return f"{_ORDINALS[word]}th"
+        return str(_UNITS[word])
+
+    text = _COMPOUND_NUMBER_RE.sub(compound, text)
+    return _WORD_NUMBER_RE.sub(single, text)
+
+
+def _as_date(today: Optional[DateLike]) -> date:
+    if today is None:
+        return date.today()
+    if isinstance(today, datetime):
+        return today.date()
+    return today
+
+
+def _safe_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _upcoming(month: int, day: int, year: Optional[str], today: date) -> Optional[date]:
+    """Month/day with the year inferred as the next occurrence"""
+    if year:
+        return _safe_date(int(year), month, day)
+    candidate = _safe_date(today.year, month, day)
+    if candidate and candidate < today:
+        candidate = _safe_date(today.year + 1, month, day)
+    return candidate
+
+
+def parse_date(text: str, today: Optional[DateLike] = None) -> Optional[date]:
+    """
+    Resolve a spoken date to a calendar date.
+
+    Explicit calendar dates win over relative ones, so a stored label such as
+    "Monday, October 20" parses back to the same day. Bare and "this"/"coming"
+    weekdays mean the next occurrence after today; "next <weekday>" skips to
+    the following week when the day still falls in the current week.
+    """
+    today = _as_date(today)
+    text = normalize_spoken_numbers(text)
+
+    match = _ISO_DATE_RE.search(text)
+    if match:
+        return _safe_date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+    match = _DAY_MONTH_RE.search(text)
+    if match:
+        return _upcoming(_MONTHS[match.group(2)[:3]], int(match.group(1)), match.group(3), today)
+
+    match = _MONTH_DAY_RE.search(text)
+    if match:
+        return _upcoming(_MONTHS[match.group(1)[:3]], int(match.group(2)), match.group(3), today)
+
+    match = _NUMERIC_DATE_RE.search(text)
+    if match:
+        # Day first, as written in India (20/10 is 20 October)
+        day, month, year = int(match.group(1)), int(match.group(2)), match.group(3)
+        if year and len(year) == 2:
+            year = f"20{year}"
+        return _upcoming(month, day, year, today)
+
+    match = _RELATIVE_RE.search(text)
+    if match:
+        day_after, same_day, next_day = match.groups()
+        if day_after:
+            return today + timedelta(days=2)
+        if same_day:
+            return today
+        return today + timedelta(days=1)
+
+    match = _IN_DAYS_RE.search(text)
+    if match:
+        return today + timedelta(days=int(match.group(1)))
+
+    match = _WEEKDAY_RE.search(text)
+    if match:
+        modifier, weekday, week = match.groups()
+        days_ahead = (_WEEKDAYS.index(weekday) - today.weekday()) % 7 or 7
+        if (modifier == "next" or week == "next") and days_ahead < 7 - today.weekday():
+            days_ahead += 7
+        return today + timedelta(days=days_ahead)
+
+    match = _WEEKEND_RE.search(text)
+    if match:
+        days_ahead = (5 - today.weekday()) % 7
+        if match.group(1) == "next" and days_ahead < 7 - today.weekday():
+            days_ahead += 7
+        return today + timedelta(days=days_ahead)
+
+    match = _DAY_ONLY_RE.search(text)
+    if match:
+        day = int(match.group(1))
+        candidate = _safe_date(today.year, today.month, day)
+        if candidate is None or candidate < today:
+            next_month = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+            candidate = _safe_date(next_month.year, next_month.month, day)
+        return candidate
+
+    return None
+
+
+def _part_of_day(text: str) -> Optional[str]:
+    match = _PART_OF_DAY_RE.search(text)
+    if not match:
+        return None
+    word = match.group(1)
+    return "evening" if word in ("night", "tonight") else word
+
+
+def _with_part_of_day(hour: int, minute: int, part: Optional[str]) -> Optional[time]:
+    """Apply AM/PM from the part of the day, or the salon-hours heuristic"""
+    if not 0 <= minute <= 59:
+        return None
+    if hour > 12:
+        return time(hour, minute) if hour <= 23 else None
+    if hour == 0:
+        return None
+    if part == "morning":
+        hour = 0 if hour == 12 else hour
+    elif part in ("afternoon", "evening"):
+        hour = hour if hour == 12 else hour + 12
+    elif hour <= 8:
+        # Salon hours are 9 AM - 8 PM, so a bare 1-8 means afternoon/evening
+        hour += 12
+    return time(hour, minute)
+
+
+def parse_time(text: str, bare_hour: bool = False) -> Optional[time]:
+    """
+    Resolve a spoken time to a clock time.
+
+    Handles "4 pm", "4:30 p.m.", "16:00", "half past four", "quarter to five",
+    "4 and a half", "evening 5", "5 o'clock", "at 4" and "noon"; a part of
+    the day on its own maps to a default slot. With ``bare_hour`` a lone number
+    ("four", "4 30") is accepted as an answer to "what time?".
+    """
+    text = normalize_spoken_numbers(text)
+    part = _part_of_day(text)
+
+    match = _CLOCK_MERIDIEM_RE.search(text)
+    if match:
+        hour, minute = int(match.group(1)), int(match.group(2) or 0)
+        if not 1 <= hour <= 12:
+            return None
+        is_pm = match.group(3).startswith("p")
+        hour = hour % 12 + (12 if is_pm else 0)
+        return time(hour, minute)
+
+    match = _RELATIVE_CLOCK_RE.search(text)
+    if match:
+        past, to, hour = match.group(1), match.group(2), int(match.group(3))
+        if to:
+            return _with_part_of_day(hour - 1 or 12, 45, part)
+        return _with_part_of_day(hour, 30 if past == "half" else 15, part)
+
+    match = _HALF_HOUR_RE.search(text)
+    if match:
+        return _with_part_of_day(int(match.group(1) or match.group(2)), 30, part)
+
+    match = _CLOCK_24H_RE.search(text)
+    if match:
+        return _with_part_of_day(int(match.group(1)), int(match.group(2)), part)
+
+    match = _NOON_RE.search(text)
+    if match:
+        return time(12, 0)
+
+    match = _OCLOCK_RE.search(text) or _PREPOSITION_HOUR_RE.search(text)
+    if match:
+        minute = match.group(2) if match.re is _PREPOSITION_HOUR_RE else None
+        return _with_part_of_day(int(match.group(1)), int(minute or 0), part)
+
+    if part:
+        # "evening 5" / "5 in the evening"
+        match = re.search(r"\b(\d{1,2})(?:[:.\s]([0-5]\d))?\b(?!" + _ORD_SUFFIX + ")", text)
+        if match:
+            return _with_part_of_day(int(match.group(1)), int(match.group(2) or 0), part)
+        return PART_OF_DAY_DEFAULTS[part]
+
+    if bare_hour:
+        match = _BARE_HOUR_RE.search(text)
+        if match:
+            return _with_part_of_day(int(match.group(1)), int(match.group(2) or 0), None)
+
+    return None
+
+
+def format_date(value: date, today: Optional[DateLike] = None) -> str:
+    """Spoken-style date label, e.g. "Monday, October 20", with the year when it isn't this year's"""
+    label = value.strftime("%A, %B %d").replace(" 0", " ")
+    if value.year != _as_date(today).year:
+        label += f", {value.year}"
+    return label
+
+
+def format_time(value: time) -> str:
+    """Spoken-style time label, e.g. "4 PM" or "4:30 PM" """
+    hour = value.hour % 12 or 12
+    meridiem = "AM" if value.hour < 12 else "PM"
+    if value.minute:
+        return f"{hour}:{value.minute:02d} {meridiem}"
+    return f"{hour} {meridiem}"
+
+
+def is_within_salon_hours(start: time, duration_minutes: int = 0) -> bool:
+    """Whether an appointment starting at ``start`` fits inside salon hours"""
+    if start < SALON_OPEN:
+        return False
+    end = datetime.combine(date.min, start) + timedelta(minutes=duration_minutes)
+    return end.time() <= SALON_CLOSE and end.date() == date.min and start < SALON_CLOSE
+
+
+def resolve_appointment(date_text: str, time_text: str, duration_minutes: int = 0,
+                        now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Combine spoken date and time into an appointment start.
+
+    Returns None when either part can't be parsed, the slot falls outside
+    salon hours, or it is already in the past. Use ``.isoformat()`` for the
+    ISO string.
+    """
+    now = now or datetime.now()
+    appointment_date = parse_date(date_text, now)
+    appointment_time = parse_time(time_text, bare_hour=True)
+    if appointment_date is None or appointment_time is None:
+        return None
+    if not is_within_salon_hours(appointment_time, duration_minutes):
+        return None
+    start = datetime.combine(appointment_date, appointment_time)
+    if start < now:
+        return None
+    return start
@@ -0,0 +1,175 @@
+"""
+Booking Dialog Engine
+Table-driven booking state machine shared by every assistant variant. Steps,
+slot validators and transitions are compiled once into a dispatch table, so a
+turn costs one dict lookup plus the slot extractor; each assistant keeps its
+own wording and decides what to say for the event a turn produces
+"""
+
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+from slot_extractor import SLOT_ORDER, SLOT_STEPS, STEP_SLOTS, extract_slots, has_booking_intent, next_missing_step
+
+# Turn events
+GREET = "greet"                  # Small talk at the greeting, nothing to book yet
+ASK = "ask"                      # Moved on to a new slot step
+REPROMPT = "reprompt"            # Still missing the slot that was asked for
+CONFIRM = "confirm"              # Every slot filled, read the booking back
+COMPLETE = "complete"            # Caller confirmed the booking
+RESTART = "restart"              # Caller rejected the booking
+CONFIRM_AGAIN = "confirm_again"  # Unclear answer to the confirmation
+CLOSED = "closed"                # Booking already complete
+UNKNOWN = "unknown"              # Step the engine doesn't know
+
+_CONFIRM_RE = re.compile(r"\b(?:yes|yeah|yep|yup|haan|sure|confirm|correct|book|okay|ok)\b")
+_DENY_RE = re.compile(r"\b(?:no|nope|nahi|change|wrong|cancel)\b")
+# "not sure", "don't book it": a confirmation word that doesn't confirm
+_NEGATION_RE = re.compile(r"\b(?:not|don'?t|do not|never|no)\b")
+# "no problem, go ahead": a "no" that says yes
+_AGREEMENT_RE = re.compile(r"\b(?:no problem|no worries|no issues?|not a problem)\b")
+
+# Turns the raw answer to the asked step into a slot value, or None to re-ask
+SlotValidator = Callable[[str], Optional[str]]
+
+
+@dataclass(frozen=True)
+class DialogSpec:
+    """Declarative description of one assistant's booking dialog"""
+    slot_order: Tuple[str, ...] = SLOT_ORDER
+    validators: Mapping[str, SlotValidator] = field(default_factory=dict)
+    # Step after the caller rejects the booking; clear_on_deny starts over from scratch
+    deny_step: str = SLOT_STEPS["customer_name"]
+    clear_on_deny: bool = True
+    # Treat anything other than a clear "yes" at confirmation as a rejection
+    strict_confirm: bool = False
+
+
+class DialogState:
+    """Compact per-call dialog state"""
+    __slots__ = ("step", "slots")
+
+    def __init__(self, step: str = "greeting", slots: Optional[Dict[str, str]] = None):
+        self.step = step
+        self.slots = slots if slots is not None else {}
+
+    def __repr__(self) -> str:
+        return f"DialogState(step={self.step!r}, slots={self.slots!r})"
+
+
+class DialogTurn:
+    """Outcome of one turn: the new step, what happened and the slots just filled"""
+    __slots__ = ("step", "event", "slots", "previous_step")
+
+    def __init__(self, step: str, event: str, slots: Dict[str, str], previous_step: str):
+        self.step = step
+        self.event = event
+        self.slots = slots
+        self.previous_step = previous_step
+
+    def __repr__(self) -> str:
+        return f"DialogTurn(step={self.step!r}, event={self.event!r}, slots={self.slots!r})"
+
+
+class DialogEngine:
+    """Runs turns of a DialogSpec through a precompiled step dispatch table"""
+
+    def __init__(self, spec: Optional[DialogSpec] = None):
+        self.spec = spec or DialogSpec()
+        self._handlers: Dict[str, Callable[[str, Mapping[str, str], str], DialogTurn]] = {
+            "greeting": self._greeting,
+            "confirm_booking": self._confirm,
+            "booking_complete": self._closed
+        }
+        for slot in self.spec.slot_order:
+            self._handlers[SLOT_STEPS[slot]] = self._collect
+        self.slot_steps = tuple(SLOT_STEPS[slot] for slot in self.spec.slot_order)
+
+    def turn(self, step: str, filled: Mapping[str, str], text: str) -> DialogTurn:
+        """
+        Decide the next step for ``text`` said at ``step``.
+
+        ``filled`` holds the slots collected so far and is not modified; the
+        caller stores ``turn.slots`` and ``turn.step`` in its own session.
+        """
+        handler = self._handlers.get(step)
+        if handler is None:
+            return DialogTurn(step, UNKNOWN, {}, step)
+        return handler(step, filled, text)
+
+    def advance(self, state: DialogState, text: str) -> DialogTurn:
+        """Run a turn against a DialogState and apply it"""
+        result = self.turn(state.step, state.slots, text)
+        if result.event == RESTART and self.spec.clear_on_deny:
+            state.slots.clear()
+        state.slots.update(result.slots)
+        state.step = result.step
+        return result
+
+    def next_step(self, filled: Mapping[str, str]) -> str:
+        return next_missing_step(filled, self.spec.slot_order)
+
+    def _extract(self, step: str, filled: Mapping[str, str], text: str) -> Dict[str, str]:
+        slots = extract_slots(text, step)
+        if "customer_name" in slots and filled.get("customer_name") and step != SLOT_STEPS["customer_name"]:
+            # A cue name in a later answer ("I'm thinking next friday") never renames the caller
+            del slots["customer_name"]
+        asked_slot = STEP_SLOTS.get(step)
+        validator = self.spec.validators.get(asked_slot) if asked_slot else None
+        if validator and asked_slot not in slots:
+            value = validator(text)
+            if value:
+                slots[asked_slot] = value
+        return {slot: value for slot, value in slots.items() if slot in self.spec.slot_order}
+
+    def _advance_slots(self, step: str, filled: Mapping[str, str], slots: Dict[str, str]) -> DialogTurn:
+        next_step = self.next_step({**filled, **slots})
+        if next_step == "confirm_booking":
+            event = CONFIRM
+        elif next_step == step:
+            event = REPROMPT
+        else:
+            event = ASK
+        return DialogTurn(next_step, event, slots, step)
+
+    def _greeting(self, step: str, filled: Mapping[str, str], text: str) -> DialogTurn:
+        slots = self._extract(step, filled, text)
+        if slots or has_booking_intent(text):
+            return self._advance_slots(step, filled, slots)
+        return DialogTurn(step, GREET, slots, step)
+
+    def _collect(self, step: str, filled: Mapping[str, str], text: str) -> DialogTurn:
+        return self._advance_slots(step, filled, self._extract(step, filled, text))
+
+    def _confirm(self, step: str, filled: Mapping[str, str], text: str) -> DialogTurn:
+        text = _AGREEMENT_RE.sub("yes", text.lower())
+        if _CONFIRM_RE.search(text) and not _DENY_RE.search(text) and not _NEGATION_RE.search(text):
+            return DialogTurn("booking_complete", COMPLETE, {}, step)
+        if self.spec.strict_confirm or _DENY_RE.search(text):
+            return DialogTurn(self.spec.deny_step, RESTART, {}, step)
+        return DialogTurn(step, CONFIRM_AGAIN, {}, step)
+
+    def _closed(self, step: str, filled: Mapping[str, str], text: str) -> DialogTurn:
+        return DialogTurn(step, CLOSED, {}, step)
+
+
+# Default five-slot dialog used by the Flask assistants
+default_engine = DialogEngine()
+
+
+def benchmark(turns: int = 5000) -> float:
+    """Mean microseconds per turn for a full booking conversation"""
+    engine = DialogEngine()
+    script = ["hi, I'd like to book", "I'm Priya", "haircut", "tomorrow", "4 pm", "12 MG Road, Indiranagar", "yes"]
+    started = time.perf_counter()
+    for i in range(turns):
+        if i % len(script) == 0:
+            state = DialogState()
+        engine.advance(state, script[i % len(script)])
+    return (time.perf_counter() - started) / turns * 1e6
+
+
+if __name__ == "__main__":
+    print(f"{benchmark():.1f} µs per turn")
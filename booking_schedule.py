@@ -0,0 +1,171 @@
+"""
+Booking Schedule Columns
+Normalized appointment_start / appointment_end columns for the booking tables,
+so day schedules come from an index range scan instead of re-parsing the
+free-text date and time of every row
+"""
+
+import logging
+import re
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from booking_datetime import parse_date, parse_time
+from salon_catalog import SERVICES
+from slot_extractor import identify_service
+
+logger = logging.getLogger(__name__)
+
+# Tables that carry the schedule columns
+SCHEDULE_TABLES = ("voice_bookings", "bookings")
+
+# Used when a service has no catalog duration
+DEFAULT_DURATION_MINUTES = 60
+
+# Rows updated per transaction while backfilling
+BACKFILL_BATCH_SIZE = 500
+
+_DURATION_RE = re.compile(r"(\d+)\s*min")
+
+
+def _check_table(table: str) -> str:
+    if table not in SCHEDULE_TABLES:
+        raise ValueError(f"Unknown booking table: {table}")
+    return table
+
+
+def service_duration_minutes(service: str) -> int:
+    """Catalog duration for a service key ("haircut", "kids-haircut"), catalog name or spoken alias"""
+    name = (service or "").strip().lower()
+    category = "kids" if name.startswith("kids") else "women"
+    entry = (
+        SERVICES[category].get(name.replace("kids-", ""))
+        or next((e for c in SERVICES.values() for e in c.values() if e["name"].lower() == name), None)
+        or SERVICES["women"].get(identify_service(name) or "")
+    )
+    match = _DURATION_RE.search(entry["duration"]) if entry else None
+    return int(match.group(1)) if match else DEFAULT_DURATION_MINUTES
+
+
+def appointment_window(date_text: str, time_text: str, service: str,
+                       reference: Optional[datetime] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    ISO start and end of an appointment, or (None, None) if unparseable.
+
+    Relative dates ("tomorrow", "Monday, October 20") are resolved against
+    ``reference``, normally the row's created_at. Unlike resolve_appointment,
+    past appointments are kept since stored bookings are historical.
+    """
+    reference = reference or datetime.now()
+    appointment_date = parse_date(date_text or "", reference)
+    appointment_time = parse_time(time_text or "", bare_hour=True)
+    if appointment_date is None or appointment_time is None:
+        return None, None
+    start = datetime.combine(appointment_date, appointment_time)
+    end = start + timedelta(minutes=service_duration_minutes(service))
+    return start.isoformat(), end.isoformat()
+
+
+def ensure_schedule_schema(conn: sqlite3.Connection, table: str):
+    """Add the schedule columns and their indexes to an existing table"""
+    table = _check_table(table)
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for column in ("appointment_start", "appointment_end"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_appointment_start ON {table} (appointment_start)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_status_start ON {table} (status, appointment_start)")
+    conn.commit()
+
+
+def _parse_created_at(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace(" ", "T"))
+    except ValueError:
+        return None
+
+
+def backfill_appointment_windows(conn: sqlite3.Connection, table: str,
+                                 batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """
+    Fill appointment_start/end for rows that predate the columns.
+
+    Walks the table by id in batches of ``batch_size``, committing after
+    each batch so a large table never holds one long write lock. Rows whose
+    date or time can't be parsed stay NULL. Returns the number of rows filled.
+    """
+    table = _check_table(table)
+    filled = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(f'''
+            SELECT id, date, time, service, created_at FROM {table}
+            WHERE appointment_start IS NULL AND id > ?
+            ORDER BY id LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+
+        updates = []
+        for row_id, date_text, time_text, service, created_at in rows:
+            start, end = appointment_window(date_text, time_text, service, _parse_created_at(created_at))
+            if start:
+                updates.append((start, end, row_id))
+        conn.executemany(
+            f"UPDATE {table} SET appointment_start = ?, appointment_end = ? WHERE id = ?", updates
+        )
+        conn.commit()
+
+        filled += len(updates)
+        last_id = rows[-1][0]
+
+    if filled:
+        logger.info(f"Backfilled appointment times for {filled} {table} rows")
+    return filled
+
+
+def bookings_between(conn: sqlite3.Connection, table: str, start: datetime, end: datetime,
+                     status: Optional[str] = None) -> List[Dict]:
+    """Bookings starting in [start, end), ordered by appointment_start"""
+    table = _check_table(table)
+    query = f"SELECT * FROM {table} WHERE "
+    params: list = []
+    if status:
+        query += "status = ? AND "
+        params.append(status)
+    query += "appointment_start >= ? AND appointment_start < ? ORDER BY appointment_start"
+    params.extend([start.isoformat(), end.isoformat()])
+
+    cursor = conn.execute(query, params)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def day_schedule(conn: sqlite3.Connection, table: str, day: date,
+                 status: Optional[str] = None) -> List[Dict]:
+    """All bookings on one day"""
+    start = datetime.combine(day, datetime.min.time())
+    return bookings_between(conn, table, start, start + timedelta(days=1), status)
+
+
+def migrate_schedule(db_path: str, table: str) -> int:
+    """Add the schedule columns to an existing database file and backfill them"""
+    table = _check_table(table)
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+            ).fetchone()
+            if not exists:
+                return 0
+            ensure_schedule_schema(conn, table)
+            return backfill_appointment_windows(conn, table)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.error(f"Error migrating {table} schedule columns: {e}")
+        return 0
@@ -0,0 +1,199 @@
+"""
+Call Request Admission Control
+In-process limits on "call me" requests: sliding-window counters per
+normalized phone number and per client IP, and deduplication of repeat taps
+within a few minutes (they get the call already requested instead of a
+second paid call). Everything lives in small expiring in-memory tables, so
+a check costs microseconds, not a database round trip
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# (requests, seconds) allowed per phone number and per client IP
+PHONE_LIMIT = (int(os.getenv('CALL_LIMIT_PER_PHONE', '3')), 3600.0)
+IP_LIMIT = (int(os.getenv('CALL_LIMIT_PER_IP', '10')), 600.0)
+# Repeat requests for the same number this soon get the existing call
+DEDUP_SECONDS = float(os.getenv('CALL_DEDUP_SECONDS', '180'))
+# Proxies in front of the app (ngrok, Render) that append to X-Forwarded-For
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', '1'))
+
+DEFAULT_COUNTRY_CODE = "91"
+MAX_KEYS = 50000
+# Expired entries are swept every this many checks
+SWEEP_EVERY = 1024
+
+# Decisions
+ADMIT = "admit"
+DUPLICATE = "duplicate"
+LIMITED = "limited"
+
+_NON_DIGIT_RE = re.compile(r"\D")
+
+
+def normalize_phone(text: Optional[str], country_code: str = DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """E.164 form of a number as typed on the landing page (10-digit local numbers get +91); None if too short"""
+    if not text:
+        return None
+    digits = _NON_DIGIT_RE.sub("", text)
+    if text.strip().startswith("+"):
+        return f"+{digits}" if len(digits) >= 11 else None
+    digits = digits.lstrip("0")
+    if len(digits) == 10:
+        digits = country_code + digits
+    return f"+{digits}" if len(digits) >= 11 else None
+
+
+def client_ip(remote_addr: Optional[str], forwarded_for: Optional[str] = None,
+              trusted_hops: int = TRUSTED_PROXY_HOPS) -> str:
+    """
+    The caller's address: the X-Forwarded-For entry added by the outermost
+    trusted proxy (earlier entries are client-supplied and can be forged)
+    """
+    if trusted_hops > 0 and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        if hops:
+            return hops[-min(trusted_hops, len(hops))]
+    return remote_addr or "unknown"
+
+
+class _Window:
+    """Sliding-window counter: this window's count plus the previous window's, weighted by overlap"""
+
+    __slots__ = ("start", "current", "previous")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.current = 0
+        self.previous = 0
+
+    def roll(self, now: float, length: float):
+        elapsed = now - self.start
+        if elapsed >= length:
+            windows = int(elapsed // length)
+            self.previous = self.current if windows == 1 else 0
+            self.current = 0
+            self.start += windows * length
+
+    def estimate(self, now: float, length: float) -> float:
+        return self.previous * (1 - (now - self.start) / length) + self.current
+
+    def retry_after(self, now: float, limit: int, length: float) -> float:
+        """Seconds until one more request fits"""
+        if self.current + 1 > limit or not self.previous:
+            return self.start + length - now
+        # The previous window's weight has to fall until the estimate leaves room for one more
+        needed = length * (1 - (limit - self.current - 1) / self.previous)
+        return max(0.0, self.start + needed - now)
+
+
+class Admission:
+    """Outcome of a check: admit, duplicate (with the earlier request's result) or limited (with retry_after)"""
+
+    __slots__ = ("decision", "phone", "existing", "retry_after", "reason")
+
+    def __init__(self, decision: str, phone: Optional[str], existing: Any = None,
+                 retry_after: float = 0.0, reason: Optional[str] = None):
+        self.decision = decision
+        self.phone = phone
+        self.existing = existing
+        self.retry_after = retry_after
+        self.reason = reason
+
+    @property
+    def admitted(self) -> bool:
+        return self.decision == ADMIT
+
+
+class AdmissionControl:
+    """
+    Thread-safe admission for outbound call requests.
+
+    ``admit`` counts the request against its phone and IP windows and
+    reserves the phone for ``dedup_seconds``; ``attach`` records what the
+    request produced (e.g. the queued call) so repeats get it back, and
+    ``release`` drops the reservation when placing the call failed.
+    """
+
+    def __init__(self, phone_limit: Tuple[int, float] = PHONE_LIMIT, ip_limit: Tuple[int, float] = IP_LIMIT,
+                 dedup_seconds: float = DEDUP_SECONDS, max_keys: int = MAX_KEYS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.phone_limit = phone_limit
+        self.ip_limit = ip_limit
+        self.dedup_seconds = dedup_seconds
+        self.max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._phones: Dict[str, _Window] = {}
+        self._ips: Dict[str, _Window] = {}
+        self._recent: Dict[str, list] = {}   # phone -> [expires, result or None while pending]
+        self._checks = 0
+        self._stats = {"admitted": 0, "duplicates": 0, "limited_phone": 0, "limited_ip": 0}
+
+    def _window(self, table: Dict[str, _Window], key: str, now: float, length: float) -> _Window:
+        window = table.get(key)
+        if window is None:
+            window = table[key] = _Window(now)
+        else:
+            window.roll(now, length)
+        return window
+
+    def _sweep(self, now: float):
+        for table, length in ((self._phones, self.phone_limit[1]), (self._ips, self.ip_limit[1])):
+            for key in [key for key, window in table.items() if now - window.start >= 2 * length]:
+                del table[key]
+        for phone in [phone for phone, (expires, _) in self._recent.items() if expires <= now]:
+            del self._recent[phone]
+
+    def admit(self, phone: str, ip: str) -> Admission:
+        with self._lock:
+            now = self._clock()
+            self._checks += 1
+            if self._checks % SWEEP_EVERY == 0 or len(self._phones) + len(self._ips) > self.max_keys:
+                self._sweep(now)
+
+            recent = self._recent.get(phone)
+            if recent is not None and recent[0] > now:
+                self._stats["duplicates"] += 1
+                return Admission(DUPLICATE, phone, existing=recent[1])
+
+            (phone_max, phone_length), (ip_max, ip_length) = self.phone_limit, self.ip_limit
+            by_phone = self._window(self._phones, phone, now, phone_length)
+            by_ip = self._window(self._ips, ip, now, ip_length)
+            if by_phone.estimate(now, phone_length) + 1 > phone_max:
+                self._stats["limited_phone"] += 1
+                return Admission(LIMITED, phone, retry_after=by_phone.retry_after(now, phone_max, phone_length),
+                                 reason="Too many call requests for this number")
+            if by_ip.estimate(now, ip_length) + 1 > ip_max:
+                self._stats["limited_ip"] += 1
+                return Admission(LIMITED, phone, retry_after=by_ip.retry_after(now, ip_max, ip_length),
+                                 reason="Too many call requests from this network")
+
+            by_phone.current += 1
+            by_ip.current += 1
+            self._recent[phone] = [now + self.dedup_seconds, None]
+            self._stats["admitted"] += 1
+            return Admission(ADMIT, phone)
+
+    def attach(self, phone: str, result: Any):
+        """What the admitted request produced, handed to repeats of it"""
+        with self._lock:
+            recent = self._recent.get(phone)
+            if recent is not None:
+                recent[1] = result
+
+    def release(self, phone: str):
+        """Forget the reservation so the caller can try again at once"""
+        with self._lock:
+            self._recent.pop(phone, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, phones_tracked=len(self._phones), ips_tracked=len(self._ips),
+                        pending_or_recent=len(self._recent))
+
+
+default_admission = AdmissionControl()
@@ -0,0 +1,221 @@
+"""
+Per-Step End-of-Speech Timeouts
+How long a <Gather> waits for the caller to start talking and how much
+silence ends their answer, per booking step: a one-word yes/no is cut off
+after a second while an address gets room for the pauses people leave
+between its parts. Utterance durations and pauses are recorded per step
+from media-stream calls and tuned offline into a small table the webhooks
+load at startup
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from voice_activity import Utterance
+
+logger = logging.getLogger(__name__)
+
+UTTERANCE_LOG = os.getenv('ENDPOINTING_LOG', 'logs/endpointing/utterances.jsonl')
+TUNED_TABLE = os.getenv('ENDPOINTING_TABLE', 'data/endpointing.json')
+
+# step -> (seconds to wait for speech to start, seconds of silence that end it);
+# Twilio takes whole seconds, or "auto" for its own end-of-speech detection
+DEFAULT_ENDPOINTING: Dict[str, Tuple[int, object]] = {
+    "greeting": (5, "auto"),
+    "get_name": (5, 1),
+    "get_phone": (6, 2),
+    "get_service": (5, 2),
+    "get_date": (5, 2),
+    "get_time": (5, 1),
+    "get_address": (7, 3),
+    "confirm_booking": (4, 1),
+}
+
+# Tuning: a step needs this many recorded answers before its table entry changes
+MIN_SAMPLES = 20
+PERCENTILE = 0.9
+# Silence allowed on top of the longest pause most callers leave mid-answer
+PAUSE_MARGIN_MS = 400
+# Answers usually this long or shorter need no more than this much silence
+DURATION_TIERS = ((1500, 1), (4000, 2))
+MIN_SPEECH_TIMEOUT = 1
+MAX_SPEECH_TIMEOUT = 4
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+class UtteranceLog:
+    """Append-only JSON-lines record of answer durations and mid-answer pauses per step"""
+
+    def __init__(self, path: str = UTTERANCE_LOG):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, step: str, duration_ms: int, longest_pause_ms: int = 0):
+        line = json.dumps({"step": step, "duration_ms": duration_ms, "pause_ms": longest_pause_ms})
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as handle:
+                    handle.write(line + "\n")
+            except OSError as e:
+                logger.warning(f"Could not record utterance timing: {e}")
+
+    def records(self) -> Iterator[Dict]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+class _Answer:
+    __slots__ = ("step", "started_ms", "ended_ms", "longest_pause_ms", "reply_played_ms")
+
+    def __init__(self, step: str, utterance: Utterance):
+        self.step = step
+        self.started_ms = utterance.started_ms
+        self.ended_ms = utterance.started_ms + utterance.duration_ms
+        self.longest_pause_ms = utterance.longest_pause_ms
+        self.reply_played_ms: Optional[int] = None
+
+
+class AnswerTimer:
+    """
+    Whole answers out of the stream VAD's utterances, for the log.
+
+    The VAD ends an utterance after well under a second of silence, so an
+    address said with a 900 ms pause arrives as two short utterances and
+    the second is heard at whatever step the first moved the dialog to.
+    Utterances of a call are merged while the caller resumes within
+    ``max_gap_ms`` and before the reply to what they said so far has played
+    out; the merged answer is recorded against the step its first part
+    answered, with the gap counted as a pause.
+    """
+
+    def __init__(self, record: Callable[[str, int, int], None], max_gap_ms: int = MAX_SPEECH_TIMEOUT * 1000):
+        self.record = record
+        self.max_gap_ms = max_gap_ms
+        self._answers: Dict[str, _Answer] = {}
+        self._lock = threading.Lock()
+
+    def heard(self, call_sid: str, step: str, utterance: Utterance):
+        """An utterance ended while the dialog was at ``step``"""
+        finished = None
+        with self._lock:
+            answer = self._answers.get(call_sid)
+            if answer is not None:
+                gap = utterance.started_ms - answer.ended_ms
+                replied = answer.reply_played_ms is not None and answer.reply_played_ms <= utterance.started_ms
+                if gap <= self.max_gap_ms and not replied:
+                    answer.longest_pause_ms = max(answer.longest_pause_ms, gap, utterance.longest_pause_ms)
+                    answer.ended_ms = utterance.started_ms + utterance.duration_ms
+                    answer.reply_played_ms = None
+                    return
+                finished = answer
+            self._answers[call_sid] = _Answer(step, utterance)
+        if finished is not None:
+            self._record(finished)
+
+    def reply_played(self, call_sid: str, at_ms: int):
+        """A reply finished playing at stream time ``at_ms``"""
+        with self._lock:
+            answer = self._answers.get(call_sid)
+            # One cut short by the caller talking over it doesn't end their answer
+            if answer is not None and at_ms >= answer.ended_ms:
+                answer.reply_played_ms = at_ms
+
+    def finish(self, call_sid: str):
+        """The call's stream ended: record its last answer"""
+        with self._lock:
+            answer = self._answers.pop(call_sid, None)
+        if answer is not None:
+            self._record(answer)
+
+    def _record(self, answer: _Answer):
+        self.record(answer.step, answer.ended_ms - answer.started_ms, answer.longest_pause_ms)
+
+
+def tune(records: Iterable[Dict], defaults: Optional[Dict[str, Tuple[int, object]]] = None
+         ) -> Dict[str, Dict[str, object]]:
+    """
+    The tuned table: for every step with enough answers, the silence that
+    ends speech covers both the usual answer length (``DURATION_TIERS``)
+    and the longest pause most callers leave inside one.
+    """
+    defaults = defaults if defaults is not None else DEFAULT_ENDPOINTING
+    by_step: Dict[str, List[Dict]] = {}
+    for record in records:
+        by_step.setdefault(record["step"], []).append(record)
+
+    table = {}
+    for step, (timeout, speech_timeout) in defaults.items():
+        samples = by_step.get(step, [])
+        entry = {"timeout": timeout, "speech_timeout": speech_timeout, "samples": len(samples)}
+        if len(samples) >= MIN_SAMPLES:
+            duration = percentile([s["duration_ms"] for s in samples], PERCENTILE)
+            pause = percentile([s.get("pause_ms", 0) for s in samples], PERCENTILE)
+            by_duration = next((seconds for limit, seconds in DURATION_TIERS if duration <= limit),
+                               DURATION_TIERS[-1][1] + 1)
+            by_pause = math.ceil((pause + PAUSE_MARGIN_MS) / 1000)
+            entry["speech_timeout"] = min(MAX_SPEECH_TIMEOUT, max(MIN_SPEECH_TIMEOUT, by_duration, by_pause))
+            entry["p90_duration_ms"] = duration
+            entry["p90_pause_ms"] = pause
+        table[step] = entry
+    return table
+
+
+def save_table(table: Dict[str, Dict[str, object]], path: str = TUNED_TABLE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    partial = f"{path}.tmp"
+    with open(partial, "w", encoding="utf-8") as handle:
+        json.dump(table, handle, indent=2, sort_keys=True)
+    os.replace(partial, path)
+
+
+def load_table(path: str = TUNED_TABLE) -> Dict[str, Tuple[int, object]]:
+    """step -> (timeout, speech_timeout): the defaults, overridden by the tuned table when there is one"""
+    table = dict(DEFAULT_ENDPOINTING)
+    if not os.path.exists(path):
+        return table
+    try:
+        with open(path, encoding="utf-8") as handle:
+            tuned = json.load(handle)
+        for step, entry in tuned.items():
+            table[step] = (int(entry["timeout"]), entry["speech_timeout"])
+        logger.info(f"Loaded tuned end-of-speech timeouts for {len(tuned)} steps from {path}")
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Ignoring unreadable endpointing table {path}: {e}")
+    return table
+
+
+default_utterance_log = UtteranceLog()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tune per-step Gather timeouts from recorded utterances")
+    parser.add_argument("--log", default=UTTERANCE_LOG)
+    parser.add_argument("--table", default=TUNED_TABLE)
+    parser.add_argument("--dry-run", action="store_true", help="print the table without saving it")
+    args = parser.parse_args()
+
+    tuned = tune(UtteranceLog(args.log).records())
+    for name, entry in tuned.items():
+        print(f"{name:16s} timeout={entry['timeout']}s speech_timeout={entry['speech_timeout']} "
+              f"({entry['samples']} answers)")
+    if not args.dry_run:
+        save_table(tuned, args.table)
+        print(f"Saved {args.table}")
@@ -7,14 +7,28 @@ import os
 import json
 import uuid
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+import time
+from datetime import datetime
+from functools import partial
+from typing import Dict, Iterator, List, Optional, Any
 import asyncio
-from flask import Flask, request, Response
+from flask import Flask, abort, request, Response, send_from_directory
 from twilio.twiml import VoiceResponse
 from twilio.rest import Client
 import openai
+from llm_gateway import GeminiProvider, LLMGateway, OpenAIProvider, openai_usage
+from llm_telemetry import default_telemetry
+from prompt_builder import BuiltPrompt, PromptBuilder, count_tokens
+from booking_dialog import COMPLETE, CONFIRM_AGAIN, REPROMPT, RESTART, DialogTurn, default_engine
+from salon_faq import answer_faq
+from slot_extractor import extract_slots
+from session_records import BookingData, ConversationState, register_prompts
+from speech_stream import FIRST_SENTENCE_TIMEOUT, SpeechStreamRegistry
+from turn_deadline import DONE, EXPIRED, PENDING, TurnDeadlineRunner
+from twiml_cache import TwiMLTemplate, compose
+from speech_hints import StepTemplates, default_reprompts, gather_profile, parse_confidence
+from webhook_idempotency import SPEECH_FIELDS, default_idempotency, idempotent_webhook
+from audio_prompts import AUDIO_CACHE_CONTROL, AUDIO_ROUTE, AudioPromptCache, audio_mimetype
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,63 +40,22 @@ TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN', '815e90983ed99b02e52943cc1460
 TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER', '+917019035686')
 WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL', 'https://your-domain.com')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+
+# Optional second LLM provider for failover and hedging
+try:
+    import google.generativeai as genai
+    GEMINI_AVAILABLE = bool(GEMINI_API_KEY)
+except ImportError:
+    GEMINI_AVAILABLE = False
+    genai = None
 
 # Initialize clients
 client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 openai_client = openai.OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+if GEMINI_AVAILABLE:
+    genai.configure(api_key=GEMINI_API_KEY)
 
-# Salon Information
-SALON_INFO = {
-    "name": "Goodness Glamour Salon",
-    "phone": "9036626642",
-    "email": "2akonsultant@gmail.com",
-    "hours": "Monday - Sunday, 9:00 AM - 8:00 PM",
-    "service_type": "Doorstep beauty services"
-}
-
-# Services and Pricing
-SERVICES = {
-    "women": {
-        "haircut": {"name": "Women's Haircut & Styling", "price": "₹400-1,200", "duration": "60 minutes"},
-        "coloring": {"name": "Hair Coloring & Highlights", "price": "₹1,200-3,500", "duration": "120 minutes"},
-        "treatment": {"name": "Hair Treatment & Spa", "price": "₹600-2,000", "duration": "90 minutes"},
-        "bridal": {"name": "Bridal & Party Styling", "price": "₹800-2,500", "duration": "90 minutes"},
-        "blowdry": {"name": "Professional Blowdry", "price": "₹250-600", "duration": "45 minutes"},
-        "hairwash": {"name": "Hair Wash & Styling", "price": "₹200-450", "duration": "30 minutes"},
-        "consultation": {"name": "Hair Consultation", "price": "₹150-300", "duration": "30 minutes"}
-    },
-    "kids": {
-        "haircut": {"name": "Kids Haircuts", "price": "₹150-500", "duration": "30 minutes"},
-        "party": {"name": "Party Styling", "price": "₹200-600", "duration": "45 minutes"},
-        "hairwash": {"name": "Kids Hair Wash", "price": "₹100-300", "duration": "20 minutes"},
-        "braiding": {"name": "Creative Braiding", "price": "₹150-400", "duration": "30 minutes"}
-    }
-}
-
-@dataclass
-class BookingData:
-    customer_name: str = ""
-    phone: str = ""
-    service: str = ""
-    date: str = ""
-    time: str = ""
-    address: str = ""
-    notes: str = ""
-
-@dataclass
-class ConversationState:
-    session_id: str
-    customer_name: Optional[str] = None
-    phone: Optional[str] = None
-    current_step: str = "greeting"
-    booking_data: BookingData = None
-    conversation_history: List[Dict] = None
-    
-    def __post_init__(self):
-        if self.booking_data is None:
-            self.booking_data = BookingData()
-        if self.conversation_history is None:
-            self.conversation_history = []
 
 class EnhancedVoiceAssistant:
     """
@@ -91,6 +64,17 @@ class EnhancedVoiceAssistant:
     
     def __init__(self):
         self.active_sessions: Dict[str, ConversationState] = {}
+        self.speech_streams = SpeechStreamRegistry()
+        self.turns = TurnDeadlineRunner()
+        self.llm_gateway = LLMGateway(
+            self._llm_providers(),
+            fallback=lambda messages: self._get_fallback_response(messages[-1]["content"], "greeting")
+        )
+        # Fixed step prompts share one copy across calls; LLM replies and read-backs stay per call
+        register_prompts(
+            self._get_fallback_response(text, step)
+            for step in ("greeting", *default_engine.slot_steps, "confirm_booking") for text in ("", "book")
+        )
         
         # Enhanced system prompt for OpenAI
         self.system_prompt = """You are a friendly and professional AI voice assistant for Goodness Glamour Salon, a premium doorstep beauty services company. Your task is to help callers schedule salon appointments by phone.
@@ -146,40 +130,90 @@ RESPONSE STYLE EXAMPLES:
 ✅ "What's your address? We'll come to your home."
 
 Remember: Keep responses SHORT, FRIENDLY, and CONVERSATIONAL. Always confirm details before proceeding. Use natural speech patterns, not robotic responses."""
-
-    def get_ai_response(self, user_input: str, conversation_history: List[Dict], current_step: str) -> str:
-        """Get AI response using OpenAI API"""
-        if not openai_client:
+        self.prompts = PromptBuilder(self.system_prompt)
+        self.telemetry = default_telemetry
+
+    def _llm_providers(self) -> List:
+        """LLM providers in preference order: OpenAI, then Gemini when configured"""
+        providers = []
+        if openai_client:
+            providers.append(OpenAIProvider(
+                openai_client,
+                model="gpt-3.5-turbo",
+                max_tokens=100,
+                temperature=0.7,
+                presence_penalty=0.1,
+                frequency_penalty=0.1
+            ))
+        if GEMINI_AVAILABLE:
+            providers.append(GeminiProvider(genai.GenerativeModel("gemini-2.0-flash-exp")))
+        return providers
+
+    def get_ai_response(self, user_input: str, conversation_history: List[Dict], current_step: str,
+                        call_sid: Optional[str] = None) -> str:
+        """Get AI response through the LLM gateway, degrading to the rule engine"""
+        if not self.llm_gateway.providers:
             return self._get_fallback_response(user_input, current_step)
         
+        built = self._build_prompt(user_input, conversation_history, current_step)
+        result = self.llm_gateway.complete(
+            built.messages, fallback=lambda _: self._get_fallback_response(user_input, current_step)
+        )
+        self.prompts.log_call(built, result.latency, result.provider, call_sid)
+        self.telemetry.record_result(result, built.total_tokens, call_sid=call_sid, step=current_step)
+        return result.text
+
+    def _build_prompt(self, user_input: str, conversation_history: List[Dict], current_step: str) -> BuiltPrompt:
+        """Compact system prompt, current step, last 6 history messages and the caller's turn"""
+        return self.prompts.build(
+            user_input,
+            history=conversation_history[-6:],
+            notes=[f"Current conversation step: {current_step}"]
+        )
+
+    def stream_ai_response(self, user_input: str, conversation_history: List[Dict], current_step: str,
+                           call_sid: Optional[str] = None) -> Iterator[str]:
+        """Like get_ai_response, but yields the reply in chunks as OpenAI generates it"""
+        if not openai_client:
+            yield self._get_fallback_response(user_input, current_step)
+            return
+        
+        built = self._build_prompt(user_input, conversation_history, current_step)
+        started = time.monotonic()
+        streamed = False
+        reply: List[str] = []
+        usage = None
         try:
-            # Prepare messages for OpenAI
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "system", "content": f"Current conversation step: {current_step}"}
-            ]
-            
-            # Add conversation history
-            messages.extend(conversation_history[-6:])  # Last 6 messages for context
-            
-            # Add current user input
-            messages.append({"role": "user", "content": user_input})
-            
-            # Get response from OpenAI
-            response = openai_client.chat.completions.create(
+            stream = openai_client.chat.completions.create(
                 model="gpt-3.5-turbo",
-                messages=messages,
+                messages=built.messages,
                 max_tokens=100,
                 temperature=0.7,
                 presence_penalty=0.1,
-                frequency_penalty=0.1
+                frequency_penalty=0.1,
+                stream=True,
+                stream_options={"include_usage": True}
             )
-            
-            return response.choices[0].message.content.strip()
-            
+            for chunk in stream:
+                # The usage arrives on a final chunk with no choices
+                usage = openai_usage(chunk) or usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    streamed = True
+                    reply.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
         except Exception as e:
             logger.error(f"OpenAI API error: {e}")
-            return self._get_fallback_response(user_input, current_step)
+        latency = time.monotonic() - started
+        self.prompts.log_call(built, latency, "openai" if streamed else "rules", call_sid)
+        self.telemetry.record(
+            "openai", "gpt-3.5-turbo",
+            usage.prompt_tokens if usage else built.total_tokens,
+            usage.completion_tokens if usage else count_tokens("".join(reply)),
+            latency, cached_tokens=usage.cached_tokens if usage else 0, ok=streamed,
+            call_sid=call_sid, step=current_step, estimated=usage is None
+        )
+        if not streamed:
+            yield self._get_fallback_response(user_input, current_step)
 
     def _get_fallback_response(self, user_input: str, current_step: str) -> str:
         """Fallback responses when OpenAI is not available"""
@@ -215,139 +249,102 @@ Remember: Keep responses SHORT, FRIENDLY, and CONVERSATIONAL. Always confirm det
         return "I'm here to help! How can I assist you today?"
 
     def extract_booking_info(self, user_input: str, current_step: str) -> Dict[str, Any]:
-        """Extract structured information from user input"""
-        user_input_lower = user_input.lower().strip()
-        extracted = {}
-        
-        if current_step == "get_name":
-            # Extract name (simple approach)
-            words = user_input.split()
-            if len(words) >= 1:
-                extracted["name"] = words[0].capitalize()
-        
-        elif current_step == "get_service":
-            # Extract service
-            service_mapping = {
-                "haircut": ["haircut", "cut", "trim"],
-                "coloring": ["color", "coloring", "highlight", "dye"],
-                "treatment": ["treatment", "spa", "keratin", "therapy"],
-                "bridal": ["bridal", "wedding", "party", "styling"],
-                "blowdry": ["blowdry", "blow dry", "style"],
-                "hairwash": ["wash", "shampoo", "clean"],
-                "consultation": ["consultation", "advice", "consult"]
-            }
-            
-            for service, keywords in service_mapping.items():
-                if any(keyword in user_input_lower for keyword in keywords):
-                    extracted["service"] = service
-                    break
-        
-        elif current_step == "get_date":
-            # Extract date
-            if "tomorrow" in user_input_lower:
-                tomorrow = datetime.now() + timedelta(days=1)
-                extracted["date"] = tomorrow.strftime("%A, %B %d")
-            elif "today" in user_input_lower:
-                extracted["date"] = datetime.now().strftime("%A, %B %d")
-            else:
-                extracted["date"] = user_input.strip()
-        
-        elif current_step == "get_time":
-            # Extract time
-            if any(word in user_input_lower for word in ["morning", "am"]):
-                extracted["time"] = "10 AM"
-            elif any(word in user_input_lower for word in ["afternoon", "pm"]):
-                extracted["time"] = "2 PM"
-            elif any(word in user_input_lower for word in ["evening"]):
-                extracted["time"] = "6 PM"
-            else:
-                extracted["time"] = user_input.strip()
-        
-        elif current_step == "get_address":
-            # Extract address
-            if len(user_input) > 10:
-                extracted["address"] = user_input.strip()
-        
+        """Extract every booking detail mentioned in the user input, whatever the step"""
+        extracted = extract_slots(user_input, current_step)
+        if "customer_name" in extracted:
+            extracted["name"] = extracted.pop("customer_name")
         return extracted
 
-    def get_conversation_response(self, user_input: str, session_id: str) -> str:
-        """Generate AI response based on conversation state and user input"""
+    def get_conversation_response(self, user_input: str, session_id: str, stream: bool = False,
+                                  confidence: Optional[float] = None) -> str:
+        """
+        Generate AI response based on conversation state and user input.
+
+        With ``stream`` an LLM reply is returned as soon as its first
+        sentence is ready; the rest is left in ``speech_streams`` under the
+        session id and added to the transcript once it has been generated.
+        """
         session = self.active_sessions.get(session_id)
         if not session:
             return "I'm sorry, I'm having trouble with this call. Please try calling again."
         
         # Add user message to history
-        session.conversation_history.append({
-            "role": "user",
-            "content": user_input,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Extract structured information
-        extracted_info = self.extract_booking_info(user_input, session.current_step)
-        
-        # Update session based on extracted information
-        if extracted_info:
-            if "name" in extracted_info:
-                session.customer_name = extracted_info["name"]
-            if "service" in extracted_info:
-                session.booking_data.service = extracted_info["service"]
-            if "date" in extracted_info:
-                session.booking_data.date = extracted_info["date"]
-            if "time" in extracted_info:
-                session.booking_data.time = extracted_info["time"]
-            if "address" in extracted_info:
-                session.booking_data.address = extracted_info["address"]
-        
-        # Determine next step
-        self._update_conversation_step(session, user_input)
-        
-        # Get AI response
-        ai_response = self.get_ai_response(user_input, session.conversation_history, session.current_step)
-        
-        # Handle special cases
+        session.conversation_history.append("user", user_input)
+        
+        # Extract structured information and decide the next step
+        turn = default_engine.turn(session.current_step, self._filled_slots(session), user_input)
+        
+        # Catalog questions are answered directly and leave the booking where it was, but only
+        # at the greeting or when the answer didn't fill the step: "haircut" or "the rate is
+        # fine, book it" is a booking answer, not a price question
+        if session.current_step == "greeting" or turn.event in (REPROMPT, CONFIRM_AGAIN):
+            faq = answer_faq(user_input)
+            if faq:
+                ai_response = faq.text
+                if session.current_step != "greeting":
+                    ai_response = f"{ai_response} {self._get_fallback_response('', session.current_step)}"
+                session.conversation_history.append("assistant", ai_response)
+                return ai_response
+        
+        default_reprompts.record(turn.previous_step, turn.event in (REPROMPT, CONFIRM_AGAIN), confidence)
+        self._apply_turn(session, turn)
+        
+        # Handle special cases before asking the LLM, whose reply they replace
         if session.current_step == "confirm_booking" and not session.booking_data.customer_name:
             ai_response = self._generate_confirmation_message(session)
-        elif session.current_step == "booking_complete":
+        elif turn.event == COMPLETE:
             ai_response = self._complete_booking(session)
+        elif stream and self.llm_gateway.is_healthy("openai"):
+            return self._start_response_stream(session, user_input)
+        else:
+            # Get AI response
+            ai_response = self.get_ai_response(
+                user_input, session.conversation_history.recent(6), session.current_step, call_sid=session_id
+            )
         
         # Add AI response to history
-        session.conversation_history.append({
-            "role": "assistant",
-            "content": ai_response,
-            "timestamp": datetime.now().isoformat()
-        })
+        session.conversation_history.append("assistant", ai_response)
         
         return ai_response
 
-    def _update_conversation_step(self, session: ConversationState, user_input: str):
-        """Update conversation step based on current state and user input"""
-        user_input_lower = user_input.lower().strip()
+    def _start_response_stream(self, session: ConversationState, user_input: str) -> str:
+        """Start streaming the LLM reply and return its first sentences"""
+        def record(text: str):
+            if text:
+                session.conversation_history.append("assistant", text)
         
-        if session.current_step == "greeting":
-            if any(word in user_input_lower for word in ["book", "appointment", "schedule", "service"]):
-                session.current_step = "get_name"
-        
-        elif session.current_step == "get_name" and session.customer_name:
-            session.current_step = "get_service"
-        
-        elif session.current_step == "get_service" and session.booking_data.service:
-            session.current_step = "get_date"
-        
-        elif session.current_step == "get_date" and session.booking_data.date:
-            session.current_step = "get_time"
-        
-        elif session.current_step == "get_time" and session.booking_data.time:
-            session.current_step = "get_address"
-        
-        elif session.current_step == "get_address" and session.booking_data.address:
-            session.current_step = "confirm_booking"
-        
-        elif session.current_step == "confirm_booking":
-            if any(word in user_input_lower for word in ["yes", "confirm", "correct", "book"]):
-                session.current_step = "booking_complete"
-            elif any(word in user_input_lower for word in ["no", "change", "wrong"]):
-                session.current_step = "get_name"  # Restart
+        chunks = self.stream_ai_response(
+            user_input, session.conversation_history.recent(6), session.current_step, call_sid=session.session_id
+        )
+        self.speech_streams.start(session.session_id, chunks, on_complete=record)
+        batch = self.speech_streams.next_batch(session.session_id, FIRST_SENTENCE_TIMEOUT)
+        if not batch:
+            self.speech_streams.discard(session.session_id)
+            return self._get_fallback_response(user_input, session.current_step)
+        return " ".join(batch)
+
+    def _filled_slots(self, session: ConversationState) -> Dict[str, str]:
+        """Slots collected so far, keyed like the dialog engine expects"""
+        booking = session.booking_data
+        return {
+            "customer_name": session.customer_name,
+            "service": booking.service,
+            "date": booking.date,
+            "time": booking.time,
+            "address": booking.address
+        }
+
+    def _apply_turn(self, session: ConversationState, turn: DialogTurn):
+        """Store the slots from a dialog turn and move to its step"""
+        if turn.event == RESTART:
+            session.customer_name = None
+            session.booking_data = BookingData()
+        if "customer_name" in turn.slots:
+            session.customer_name = turn.slots["customer_name"]
+        for slot in ("service", "date", "time", "address"):
+            if slot in turn.slots:
+                setattr(session.booking_data, slot, turn.slots[slot])
+        session.current_step = turn.step
 
     def _generate_confirmation_message(self, session: ConversationState) -> str:
         """Generate booking confirmation message"""
@@ -428,6 +425,14 @@ We'll be at your doorstep at the scheduled time. Thank you!"""
         """End conversation session"""
         if call_sid in self.active_sessions:
             del self.active_sessions[call_sid]
+        self.speech_streams.discard(call_sid)
+        self.turns.discard(call_sid)
+        usage = self.telemetry.call_summary(call_sid)
+        if usage:
+            logger.info(
+                f"Call {call_sid} LLM usage: {usage['calls']} calls, {usage['prompt_tokens']}+"
+                f"{usage['completion_tokens']} tokens, ${usage['cost_usd']:.6f}"
+            )
 
 # Initialize the enhanced assistant
 enhanced_assistant = EnhancedVoiceAssistant()
@@ -435,7 +440,76 @@ enhanced_assistant = EnhancedVoiceAssistant()
 # Flask app for webhooks
 app = Flask(__name__)
 
+# Pre-rendered prompt audio, played instead of <Say> when every sentence is cached
+audio = AudioPromptCache(base_url=f'{WEBHOOK_BASE_URL}{AUDIO_ROUTE}')
+
+# TwiML compiled at startup; webhooks splice in the CallSid and spoken text
+def _build_incoming(response: VoiceResponse, call_sid: str, gather: Dict):
+    # Welcome message
+    audio.speak(
+        response,
+        "Hello! Welcome to Goodness Glamour Salon. I'm your AI assistant. How can I help you today?",
+        voice='Polly.Joanna',
+        language='en-US'
+    )
+    
+    # Gather user input, with the greeting's hints
+    response.gather(
+        input='speech',
+        action=f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}',
+        **gather
+    )
+    
+    # Fallback
+    audio.speak(response, "I didn't hear anything. Please speak after the tone.")
+    response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
+
+def _build_incoming_error(response: VoiceResponse):
+    audio.speak(response, "I'm sorry, there was a technical issue. Please try again later.")
+    response.hangup()
+
+def _build_listen(response: VoiceResponse, call_sid: str, gather: Dict):
+    response.gather(
+        input='speech',
+        action=f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}',
+        **gather
+    )
+    
+    audio.speak(response, "I'm listening.")
+    response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
+
+INCOMING_TWIML = TwiMLTemplate(partial(_build_incoming, gather=gather_profile("greeting").attributes), "call_sid")
+INCOMING_ERROR_TWIML = TwiMLTemplate(_build_incoming_error)
+PLAIN_SAY_TWIML = TwiMLTemplate(lambda response, text: response.say(text), "text")
+REDIRECT_TWIML = TwiMLTemplate(
+    lambda response, call_sid: response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}'), "call_sid"
+)
+SAY_TWIML = TwiMLTemplate(lambda response, text: response.say(text, voice='Polly.Joanna', language='en-US'), "text")
+POLL_TWIML = TwiMLTemplate(
+    lambda response, call_sid: response.redirect(f'{WEBHOOK_BASE_URL}/voice/poll/{call_sid}'), "call_sid"
+)
+CONTINUE_TWIML = TwiMLTemplate(
+    lambda response, call_sid: response.redirect(f'{WEBHOOK_BASE_URL}/voice/continue/{call_sid}'), "call_sid"
+)
+HANGUP_TWIML = TwiMLTemplate(lambda response: response.hangup())
+# One per booking step: each <Gather> carries that step's hints, language and speech model
+LISTEN_TWIML = StepTemplates(_build_listen, "call_sid")
+
+def _retry(text: str, call_sid: str) -> str:
+    """Say ``text`` and send the caller back to the speech webhook"""
+    return compose(audio.spoken(text, PLAIN_SAY_TWIML), REDIRECT_TWIML.body(call_sid=call_sid))
+
+@app.route(f'{AUDIO_ROUTE}/<name>', methods=['GET'])
+def audio_prompt(name):
+    """Serve a pre-rendered prompt; names are content hashes, so caches may keep them forever"""
+    if not audio.has_file(name):
+        abort(404)
+    reply = send_from_directory(os.path.abspath(audio.directory), name, mimetype=audio_mimetype(name))
+    reply.headers['Cache-Control'] = AUDIO_CACHE_CONTROL
+    return reply
+
 @app.route('/voice/incoming', methods=['POST'])
+@idempotent_webhook(fields=("From",))
 def handle_incoming_call():
     """Handle incoming voice call from QR code scan"""
     try:
@@ -447,85 +521,92 @@ def handle_incoming_call():
         # Start new session
         session = enhanced_assistant.start_session(call_sid, from_number)
         
-        # Create TwiML response
-        response = VoiceResponse()
-        
-        # Welcome message
-        response.say(
-            "Hello! Welcome to Goodness Glamour Salon. I'm your AI assistant. How can I help you today?",
-            voice='Polly.Joanna',
-            language='en-US'
-        )
-        
-        # Gather user input
-        gather = response.gather(
-            input='speech',
-            action=f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}',
-            speech_timeout='auto',
-            language='en-US',
-            enhanced=True
-        )
-        
-        # Fallback
-        response.say("I didn't hear anything. Please speak after the tone.")
-        response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
-        
-        return str(response)
+        # Welcome message, then gather user input
+        return INCOMING_TWIML.render(call_sid=call_sid)
         
     except Exception as e:
         logger.error(f"Error handling incoming call: {e}")
-        response = VoiceResponse()
-        response.say("I'm sorry, there was a technical issue. Please try again later.")
-        response.hangup()
-        return str(response)
+        return INCOMING_ERROR_TWIML.render_bytes()
 
 @app.route('/voice/process_speech/<call_sid>', methods=['POST'])
+@idempotent_webhook(fields=SPEECH_FIELDS)
 def process_speech(call_sid):
     """Process speech input from Twilio"""
     try:
         speech_result = request.form.get('SpeechResult', '')
         
         if not speech_result:
-            response = VoiceResponse()
-            response.say("I didn't hear anything. Please speak clearly.")
-            response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
-            return str(response)
+            # Nothing recognized counts as a re-prompt of the step being asked
+            session = enhanced_assistant.active_sessions.get(call_sid)
+            if session:
+                default_reprompts.record(session.current_step, True)
+            return _retry("I didn't hear anything. Please speak clearly.", call_sid)
         
         logger.info(f"Processing speech for call {call_sid}: {speech_result}")
         
-        # Get AI response
-        ai_response = enhanced_assistant.get_conversation_response(speech_result, call_sid)
+        # Get AI response; long LLM replies start playing from their first sentence,
+        # and a turn that misses its deadline is held with a filler and polled
+        ai_response = enhanced_assistant.turns.run(
+            call_sid, enhanced_assistant.get_conversation_response, speech_result, call_sid, stream=True,
+            confidence=parse_confidence(request.form.get('Confidence'))
+        )
         
         # Create TwiML response
-        response = VoiceResponse()
-        response.say(ai_response, voice='Polly.Joanna', language='en-US')
-        
-        # Check if conversation is complete
-        session = enhanced_assistant.active_sessions.get(call_sid)
-        if session and session.current_step == "booking_complete":
-            response.hangup()
-            enhanced_assistant.end_session(call_sid)
-        else:
-            # Continue conversation
-            gather = response.gather(
-                input='speech',
-                action=f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}',
-                speech_timeout='auto',
-                language='en-US',
-                enhanced=True
-            )
-            
-            response.say("I'm listening.")
-            response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
-        
-        return str(response)
+        if ai_response is None:
+            return compose(_hold_call(call_sid))
+        return compose(audio.spoken(ai_response, SAY_TWIML), _continue_call(call_sid))
         
     except Exception as e:
         logger.error(f"Error processing speech: {e}")
-        response = VoiceResponse()
-        response.say("I'm sorry, I'm having trouble understanding. Please try again.")
-        response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
-        return str(response)
+        return _retry("I'm sorry, I'm having trouble understanding. Please try again.", call_sid)
+
+@app.route('/voice/poll/<call_sid>', methods=['POST'])
+@idempotent_webhook()
+def poll_turn(call_sid):
+    """Serve a reply that missed its deadline, or hold the caller a little longer"""
+    try:
+        status, ai_response = enhanced_assistant.turns.poll(call_sid)
+    except Exception as e:
+        logger.error(f"Error finishing turn for {call_sid}: {e}")
+        status, ai_response = DONE, "I'm sorry, I'm having trouble understanding. Please try again."
+    
+    if status == PENDING:
+        return compose(_hold_call(call_sid))
+    said = ""
+    if status == DONE:
+        said = audio.spoken(ai_response, SAY_TWIML)
+    elif status == EXPIRED:
+        said = audio.spoken("I'm sorry, that's taking too long. Could you say that again?", SAY_TWIML)
+    return compose(said, _continue_call(call_sid))
+
+def _hold_call(call_sid: str) -> str:
+    """Short filler while the turn keeps computing, then poll for it"""
+    return audio.spoken(enhanced_assistant.turns.filler(call_sid), SAY_TWIML) + POLL_TWIML.body(call_sid=call_sid)
+
+@app.route('/voice/continue/<call_sid>', methods=['POST'])
+@idempotent_webhook()
+def continue_speech(call_sid):
+    """Speak the next sentences of a streamed reply"""
+    batch = enhanced_assistant.speech_streams.next_batch(call_sid)
+    said = ""
+    if batch:
+        said = audio.spoken(" ".join(batch), SAY_TWIML)
+    else:
+        enhanced_assistant.speech_streams.discard(call_sid)
+    return compose(said, _continue_call(call_sid))
+
+def _continue_call(call_sid: str) -> str:
+    """Fetch the rest of a streamed reply, hang up after a booking, or listen for the caller"""
+    if enhanced_assistant.speech_streams.has_pending(call_sid):
+        return CONTINUE_TWIML.body(call_sid=call_sid)
+    
+    # Check if conversation is complete
+    session = enhanced_assistant.active_sessions.get(call_sid)
+    if session and session.current_step == "booking_complete":
+        enhanced_assistant.end_session(call_sid)
+        return HANGUP_TWIML.body()
+    # Continue conversation
+    return LISTEN_TWIML.body(session.current_step if session else None, call_sid=call_sid)
 
 @app.route('/voice/status/<call_sid>', methods=['POST'])
 def call_status(call_sid):
@@ -590,12 +671,36 @@ def health_check():
             'status': 'healthy',
             'active_sessions': len(enhanced_assistant.active_sessions),
             'openai_available': openai_client is not None,
+            'turns': enhanced_assistant.turns.metrics(),
+            'llm': enhanced_assistant.llm_gateway.stats(),
+            'prompts': enhanced_assistant.prompts.stats(),
+            'speech_steps': default_reprompts.snapshot(),
+            'webhook_retries': default_idempotency.stats(),
             'timestamp': datetime.now().isoformat()
         }),
         status=200,
         mimetype='application/json'
     )
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """LLM calls, tokens, cost and latency histograms in Prometheus text format"""
+    return Response(enhanced_assistant.telemetry.prometheus(), status=200,
+                    mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/llm', methods=['GET'])
+def llm_usage():
+    """LLM usage by provider, model and booking step, today's rollup, or one call's totals"""
+    call_sid = request.args.get('call_sid')
+    if call_sid:
+        summary = enhanced_assistant.telemetry.call_summary(call_sid)
+        if summary is None:
+            return Response("No LLM usage recorded for this call", status=404)
+        body = dict(summary, call_sid=call_sid)
+    else:
+        body = enhanced_assistant.telemetry.snapshot()
+    return Response(json.dumps(body), status=200, mimetype='application/json')
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 7002))
     logger.info(f"Starting Enhanced AI Voice Booking Assistant on port {port}")
@@ -0,0 +1,179 @@
+"""
+Intent Router for Voice and Chat Turns
+Hashed n-gram linear classifier that decides, per turn and aware of the
+booking step, whether input goes to the booking FSM, the catalog FAQ
+answerer or the LLM. Weights ship as a small JSON artifact trained from
+labelled turns (data/intent_examples.jsonl); scoring runs in microseconds
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import sys
+import time
+import zlib
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+ROUTE_FSM = "fsm"
+ROUTE_FAQ = "faq"
+ROUTE_LLM = "llm"
+ROUTES = (ROUTE_FSM, ROUTE_FAQ, ROUTE_LLM)
+
+HASH_BUCKETS = 1 << 14
+TRAINING_EPOCHS = 12
+
+EXAMPLES_PATH = os.getenv('INTENT_EXAMPLES_PATH', 'data/intent_examples.jsonl')
+MODEL_PATH = os.getenv('INTENT_MODEL_PATH', 'data/intent_model.json')
+
+_TOKEN_RE = re.compile(r"[a-z]+|\d+")
+_QUESTION_WORDS = {"what", "when", "where", "which", "who", "how", "do", "does", "is", "are", "can", "could", "should"}
+
+
+def _step_kind(step: str) -> str:
+    if step.startswith("get_"):
+        return "slot"
+    return step or "greeting"
+
+
+def features(text: str, step: str = "greeting") -> List[int]:
+    """Hashed feature ids: word uni/bigrams, utterance shape and the booking step"""
+    lowered = text.lower()
+    tokens = _TOKEN_RE.findall(lowered)
+    kind = _step_kind(step)
+    shape = "len=" + ("1" if len(tokens) <= 1 else "2-3" if len(tokens) <= 3 else "4+")
+    names = ["bias", f"step={step}", f"kind={kind}", shape, f"{kind}|{shape}"]
+    if tokens and tokens[0] in _QUESTION_WORDS:
+        names.append(f"{kind}|question")
+    if "?" in text:
+        names.append("qmark")
+    if any(token.isdigit() for token in tokens):
+        names.append(f"{kind}|digits")
+    names.extend("w=" + ("#" if token.isdigit() else token) for token in tokens)
+    names.extend(f"b={a}_{b}" for a, b in zip(tokens, tokens[1:]))
+    # Unseen single words at a slot step are usually the answer (a name, a street)
+    if kind == "slot" and len(tokens) <= 2:
+        names.append(f"{step}|short")
+    return [zlib.crc32(name.encode()) % HASH_BUCKETS for name in names]
+
+
+class IntentRouter:
+    """Linear model over hashed features, one weight vector per route"""
+
+    def __init__(self, weights: Dict[int, List[float]], routes: Tuple[str, ...] = ROUTES):
+        self.weights = weights
+        self.routes = routes
+        self._zero = [0.0] * len(routes)
+
+    def scores(self, text: str, step: str = "greeting") -> List[float]:
+        totals = [0.0] * len(self.routes)
+        for feature in features(text, step):
+            row = self.weights.get(feature)
+            if row:
+                for i, weight in enumerate(row):
+                    totals[i] += weight
+        return totals
+
+    def route(self, text: str, step: str = "greeting") -> Tuple[str, float]:
+        """Best route and its softmax confidence"""
+        totals = self.scores(text, step)
+        best = max(range(len(totals)), key=totals.__getitem__)
+        top = totals[best]
+        confidence = 1.0 / sum(math.exp(score - top) for score in totals)
+        return self.routes[best], confidence
+
+    def to_json(self) -> Dict:
+        return {
+            "version": 1,
+            "buckets": HASH_BUCKETS,
+            "routes": list(self.routes),
+            "weights": {str(k): [round(w, 4) for w in row] for k, row in self.weights.items()}
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "IntentRouter":
+        if data.get("buckets") != HASH_BUCKETS:
+            raise ValueError("Intent model was trained with a different feature hash size")
+        weights = {int(k): row for k, row in data["weights"].items()}
+        return cls(weights, tuple(data["routes"]))
+
+
+def load_examples(path: str = EXAMPLES_PATH) -> List[Tuple[str, str, str]]:
+    """(step, text, route) triples from a JSON-lines file of labelled turns"""
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                examples.append((record.get("step", "greeting"), record["text"], record["route"]))
+    return examples
+
+
+def train(examples: Iterable[Tuple[str, str, str]], epochs: int = TRAINING_EPOCHS) -> IntentRouter:
+    """Averaged multi-class perceptron; deterministic for a given example order"""
+    examples = [(features(text, step), ROUTES.index(route)) for step, text, route in examples]
+    weights: Dict[int, List[float]] = {}
+    totals: Dict[int, List[float]] = {}
+    stamps: Dict[int, List[int]] = {}
+    clock = 0
+
+    def bump(feature: int, label: int, delta: float):
+        row = weights.setdefault(feature, [0.0] * len(ROUTES))
+        total = totals.setdefault(feature, [0.0] * len(ROUTES))
+        stamp = stamps.setdefault(feature, [0] * len(ROUTES))
+        total[label] += (clock - stamp[label]) * row[label]
+        stamp[label] = clock
+        row[label] += delta
+
+    for _ in range(epochs):
+        for feats, label in examples:
+            clock += 1
+            scores = [0.0] * len(ROUTES)
+            for feature in feats:
+                for i, weight in enumerate(weights.get(feature, ())):
+                    scores[i] += weight
+            guess = max(range(len(ROUTES)), key=scores.__getitem__)
+            if guess != label:
+                for feature in feats:
+                    bump(feature, label, 1.0)
+                    bump(feature, guess, -1.0)
+
+    averaged = {}
+    for feature, row in weights.items():
+        total, stamp = totals[feature], stamps[feature]
+        avg = [(total[i] + (clock - stamp[i]) * row[i]) / clock for i in range(len(ROUTES))]
+        if any(abs(w) > 1e-4 for w in avg):
+            averaged[feature] = avg
+    return IntentRouter(averaged)
+
+
+def save_model(router: IntentRouter, path: str = MODEL_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(router.to_json(), f, separators=(",", ":"))
+
+
+def load_router(model_path: str = MODEL_PATH, examples_path: str = EXAMPLES_PATH) -> IntentRouter:
+    """Shipped model artifact, or one trained on the spot from the labelled examples"""
+    try:
+        with open(model_path, encoding="utf-8") as f:
+            return IntentRouter.from_json(json.load(f))
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Intent model unavailable ({e}); training from {examples_path}")
+    return train(load_examples(examples_path))
+
+
+if __name__ == "__main__":
+    if "--train" in sys.argv:
+        router = train(load_examples())
+        save_model(router)
+        print(f"Saved {len(router.weights)} weights to {MODEL_PATH}")
+    else:
+        router = load_router()
+    turns = [("what time do you open", "get_time"), ("Sarah", "get_name"), ("at 5", "get_time")] * 2000
+    started = time.perf_counter()
+    for text, step in turns:
+        router.route(text, step)
+    print(f"{(time.perf_counter() - started) / len(turns) * 1e6:.1f} µs per route")
@@ -0,0 +1,309 @@
+"""
+Async LLM Client Layer
+Asyncio counterparts of the LLM gateway providers for the FastAPI server:
+every request has a timeout, each provider has a concurrency semaphore, and
+HTTP providers share one pooled keep-alive connection pool, so a slow LLM
+reply never blocks the event loop or stalls unrelated calls
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from llm_gateway import (
+    HEDGE_DEFAULT_DELAY, HEDGE_MIN_SAMPLES, HEDGE_PERCENTILE, REQUEST_TIMEOUT,
+    CircuitBreaker, GatewayResult, LatencyHistogram, Messages, Usage, gemini_model_name, gemini_usage,
+    openai_usage
+)
+
+# Optional imports with fallbacks
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    httpx = None
+
+try:
+    import openai
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+    openai = None
+
+logger = logging.getLogger(__name__)
+
+# Per-call budget of one provider request, and concurrent requests per provider
+PROVIDER_TIMEOUT = float(os.getenv('LLM_TIMEOUT_SECONDS', '6.0'))
+PROVIDER_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+
+# Shared connection pool for HTTP-based providers
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE = 10
+HTTP_KEEPALIVE_EXPIRY = 30.0
+
+_http_client = None
+
+
+def shared_http_client():
+    """Process-wide pooled httpx.AsyncClient, created on first use"""
+    global _http_client
+    if not HTTPX_AVAILABLE:
+        return None
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(PROVIDER_TIMEOUT, connect=3.0)
+        )
+    return _http_client
+
+
+async def close_shared_http_client():
+    """Close the shared pool; call from the server's shutdown hook"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class AsyncLLMProvider:
+    """An async chat completion backend with its own timeout and concurrency cap"""
+    name = "provider"
+    model_name = ""
+
+    def __init__(self, timeout: float = PROVIDER_TIMEOUT, max_concurrency: int = PROVIDER_CONCURRENCY):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+
+    async def complete(self, messages: Messages) -> str:
+        raise NotImplementedError
+
+    async def complete_with_usage(self, messages: Messages) -> Tuple[str, Optional[Usage]]:
+        return await self.complete(messages), None
+
+
+class AsyncGeminiChatProvider(AsyncLLMProvider):
+    """Gemini chat session over the SDK's async transport; only the last message is sent"""
+    name = "gemini"
+
+    def __init__(self, chat, **options):
+        super().__init__(**options)
+        self.chat = chat
+        self.model_name = gemini_model_name(getattr(chat, "model", None))
+
+    async def complete(self, messages: Messages) -> str:
+        return (await self.complete_with_usage(messages))[0]
+
+    async def complete_with_usage(self, messages: Messages) -> Tuple[str, Optional[Usage]]:
+        response = await self.chat.send_message_async(messages[-1]["content"])
+        return response.text, gemini_usage(response)
+
+
+class AsyncOpenAIProvider(AsyncLLMProvider):
+    """OpenAI chat completions on the shared HTTP connection pool"""
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo", client=None, **options):
+        timeout = options.pop("timeout", PROVIDER_TIMEOUT)
+        max_concurrency = options.pop("max_concurrency", PROVIDER_CONCURRENCY)
+        super().__init__(timeout=timeout, max_concurrency=max_concurrency)
+        self.model = model
+        self.model_name = model
+        self.options = options
+        # Retries would eat the timeout budget; the gateway fails over instead
+        self.client = client or openai.AsyncOpenAI(
+            api_key=api_key, http_client=shared_http_client(), timeout=timeout, max_retries=0
+        )
+
+    async def complete(self, messages: Messages) -> str:
+        return (await self.complete_with_usage(messages))[0]
+
+    async def complete_with_usage(self, messages: Messages) -> Tuple[str, Optional[Usage]]:
+        response = await self.client.chat.completions.create(model=self.model, messages=messages, **self.options)
+        return response.choices[0].message.content.strip(), openai_usage(response)
+
+
+class AsyncStubProvider(AsyncLLMProvider):
+    """Offline async provider with injectable latency and failures"""
+
+    def __init__(self, name: str = "stub", reply: str = "Stub reply.", latency: float = 0.0,
+                 fail: bool = False, **options):
+        super().__init__(**options)
+        self.name = name
+        self.reply = reply
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+        self.active = 0
+        self.peak_active = 0
+
+    async def complete(self, messages: Messages) -> str:
+        self.calls += 1
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.active -= 1
+        if self.fail:
+            raise RuntimeError(f"{self.name} unavailable")
+        return self.reply
+
+
+class AsyncLLMGateway:
+    """
+    Event-loop version of ``llm_gateway.LLMGateway``: the same breakers,
+    histograms, failover, hedging and rule-based degradation, with
+    per-provider semaphores and timeouts instead of a thread pool.
+    """
+
+    def __init__(self, providers: Sequence[AsyncLLMProvider], fallback: Callable[[Messages], str],
+                 timeout: float = REQUEST_TIMEOUT, hedge: bool = True,
+                 hedge_percentile: float = HEDGE_PERCENTILE, hedge_delay: float = HEDGE_DEFAULT_DELAY,
+                 breaker_factory: Callable[[], CircuitBreaker] = CircuitBreaker):
+        self.providers = list(providers)
+        self.fallback = fallback
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.breakers: Dict[str, CircuitBreaker] = {p.name: breaker_factory() for p in self.providers}
+        self.histograms: Dict[str, LatencyHistogram] = {p.name: LatencyHistogram() for p in self.providers}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {p.name: 0 for p in self.providers}
+        self._counts = {"requests": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0,
+                        "degraded": 0, "timeouts": 0, "saturated": 0}
+        self._errors: Dict[str, int] = {p.name: 0 for p in self.providers}
+
+    def is_healthy(self, name: str) -> bool:
+        breaker = self.breakers.get(name)
+        return breaker is not None and breaker.available()
+
+    def _semaphore(self, provider: AsyncLLMProvider) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(provider.name)
+        if semaphore is None:
+            semaphore = self._semaphores[provider.name] = asyncio.Semaphore(provider.max_concurrency)
+        return semaphore
+
+    def _record(self, name: str, ok: bool, latency: float):
+        self.histograms[name].observe(latency)
+        if not ok:
+            self._errors[name] += 1
+        self.breakers[name].record(ok, latency)
+
+    async def _call(self, provider: AsyncLLMProvider, messages: Messages,
+                    budget: float) -> Tuple[str, Optional[Usage]]:
+        semaphore = self._semaphore(provider)
+        queued = time.monotonic()
+        try:
+            # Waiting for a slot is not the provider's fault, so it doesn't count against its breaker
+            await asyncio.wait_for(semaphore.acquire(), timeout=budget)
+        except asyncio.TimeoutError:
+            self._counts["saturated"] += 1
+            raise
+        started = time.monotonic()
+        self._in_flight[provider.name] += 1
+        try:
+            timeout = min(provider.timeout, max(0.0, budget - (started - queued)))
+            reply = await asyncio.wait_for(provider.complete_with_usage(messages), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._counts["timeouts"] += 1
+            self._record(provider.name, False, time.monotonic() - started)
+            raise
+        except asyncio.CancelledError:
+            # Lost a hedge race; not a provider failure
+            self.breakers[provider.name].cancel_probe()
+            raise
+        except Exception:
+            self._record(provider.name, False, time.monotonic() - started)
+            raise
+        finally:
+            self._in_flight[provider.name] -= 1
+            semaphore.release()
+        self._record(provider.name, True, time.monotonic() - started)
+        return reply
+
+    def _hedge_after(self, name: str) -> float:
+        histogram = self.histograms[name]
+        if histogram.count >= HEDGE_MIN_SAMPLES:
+            return min(histogram.percentile(self.hedge_percentile), self.timeout)
+        return self.hedge_delay
+
+    async def complete(self, messages: Messages,
+                       fallback: Optional[Callable[[Messages], str]] = None) -> GatewayResult:
+        """Best available reply for a chat, never raising; ``fallback`` overrides the rule engine"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        self._counts["requests"] += 1
+        candidates = [p for p in self.providers if self.breakers[p.name].available()]
+        running: Dict[asyncio.Task, AsyncLLMProvider] = {}
+        hedged = False
+        attempts = 0
+
+        def launch() -> bool:
+            nonlocal attempts
+            while candidates:
+                provider = candidates.pop(0)
+                if self.breakers[provider.name].allow():
+                    budget = deadline - time.monotonic()
+                    running[asyncio.ensure_future(self._call(provider, messages, budget))] = provider
+                    attempts += 1
+                    return True
+            return False
+
+        launch()
+        primary_name = next(iter(running.values())).name if running else None
+        try:
+            while running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                primary = next(iter(running.values()))
+                can_hedge = self.hedge and not hedged and len(running) == 1 and candidates
+                wait_for = min(remaining, self._hedge_after(primary.name)) if can_hedge else remaining
+                done, _ = await asyncio.wait(list(running), timeout=wait_for,
+                                             return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    if can_hedge and launch():
+                        hedged = True
+                        self._counts["hedged"] += 1
+                    continue
+
+                for task in done:
+                    provider = running.pop(task)
+                    if task.exception() is not None:
+                        logger.warning(f"LLM provider {provider.name} failed: {task.exception()!r}")
+                        continue
+                    if hedged and provider.name != primary_name:
+                        self._counts["hedge_wins"] += 1
+                    text, usage = task.result()
+                    return GatewayResult(text, provider.name, time.monotonic() - started, hedged=hedged,
+                                         model=provider.model_name, attempts=attempts, usage=usage)
+
+                # Every finished request failed: fail over to the next provider
+                if not running and launch():
+                    self._counts["failovers"] += 1
+        finally:
+            for task in running:
+                task.cancel()
+
+        self._counts["degraded"] += 1
+        text = (fallback or self.fallback)(messages)
+        return GatewayResult(text, "rules", time.monotonic() - started, hedged=hedged, degraded=True,
+                             attempts=attempts)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Gateway counters and per-provider breaker state, latency and queue use"""
+        providers = {
+            name: dict(self.histograms[name].to_dict(), errors=self._errors[name],
+                       breaker=self.breakers[name].state, in_flight=self._in_flight[name])
+            for name in self.histograms
+        }
+        return {"gateway": dict(self._counts), "providers": providers}
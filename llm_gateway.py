@@ -0,0 +1,482 @@
+"""
+LLM Gateway with Circuit Breakers and Hedging
+Routes completions across LLM providers (Gemini, OpenAI) in preference
+order, tracking per-provider latency histograms and circuit breakers that
+open on error rate or p95 latency. A slow primary can be hedged with a
+second provider, and when no provider is healthy the rule-based reply is
+returned at once instead of after a full timeout
+"""
+
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+Messages = List[Dict[str, str]]
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0)
+
+# Whole-request budget before giving up on every provider
+REQUEST_TIMEOUT = 8.0
+
+# Per-call HTTP timeout for the sync SDK clients, so an abandoned call frees its worker thread
+PROVIDER_TIMEOUT = REQUEST_TIMEOUT
+
+# Breaker defaults: outcomes considered, trip thresholds and cool-down
+BREAKER_WINDOW = 20
+BREAKER_MIN_CALLS = 5
+BREAKER_ERROR_RATE = 0.5
+BREAKER_MAX_P95 = 6.0
+BREAKER_COOLDOWN = 30.0
+
+# Hedge once the primary is slower than this percentile of its own history
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT_DELAY = 2.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; percentiles report the bucket bound"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 1) if self.count else 0.0,
+            "p50_ms": _ms(self.percentile(0.5)),
+            "p95_ms": _ms(self.percentile(0.95))
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    if seconds is None or seconds == float("inf"):
+        return seconds
+    return round(seconds * 1000, 1)
+
+
+class CircuitBreaker:
+    """
+    Closed → open when recent calls fail too often or run too slow; after a
+    cool-down one probe call is let through (half-open) and its outcome
+    closes or re-opens the breaker.
+    """
+
+    def __init__(self, window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 error_rate: float = BREAKER_ERROR_RATE, max_p95: float = BREAKER_MAX_P95,
+                 cooldown: float = BREAKER_COOLDOWN, clock: Callable[[], float] = time.monotonic):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.max_p95 = max_p95
+        self.cooldown = cooldown
+        self._clock = clock
+        self._outcomes: Deque[Tuple[bool, float]] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.cooldown:
+                self._state = HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go to this provider now"""
+        state = self.state
+        with self._lock:
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def available(self) -> bool:
+        """Like allow, without taking the half-open probe slot"""
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and not self._probing)
+
+    def record(self, ok: bool, latency: float):
+        with self._lock:
+            if self._state == HALF_OPEN or self._probing:
+                self._probing = False
+                self._outcomes.clear()
+                if ok and latency <= self.max_p95:
+                    self._state = CLOSED
+                else:
+                    self._trip()
+                self._outcomes.append((ok, latency))
+                return
+
+            self._outcomes.append((ok, latency))
+            if self._state == CLOSED and len(self._outcomes) >= self.min_calls:
+                failures = sum(1 for success, _ in self._outcomes if not success)
+                latencies = sorted(latency for _, latency in self._outcomes)
+                p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+                if failures / len(self._outcomes) >= self.error_rate or p95 > self.max_p95:
+                    self._trip()
+
+    def cancel_probe(self):
+        """Free the half-open probe slot when the probe was cancelled before it finished"""
+        with self._lock:
+            self._probing = False
+
+    def _trip(self):
+        self._state = OPEN
+        self._opened_at = self._clock()
+        logger.warning("LLM circuit breaker opened")
+
+
+class Usage:
+    """Token counts a provider reported for one completion"""
+    __slots__ = ("prompt_tokens", "completion_tokens", "cached_tokens")
+
+    def __init__(self, prompt_tokens: int = 0, completion_tokens: int = 0, cached_tokens: int = 0):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.cached_tokens = cached_tokens
+
+    def __repr__(self) -> str:
+        return (f"Usage(prompt={self.prompt_tokens}, completion={self.completion_tokens}, "
+                f"cached={self.cached_tokens})")
+
+
+def _token_count(value) -> int:
+    return value if isinstance(value, int) and not isinstance(value, bool) else 0
+
+
+def openai_usage(response) -> Optional[Usage]:
+    """Usage of an OpenAI chat completion (or final stream chunk), if reported"""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return Usage(_token_count(getattr(usage, "prompt_tokens", 0)),
+                 _token_count(getattr(usage, "completion_tokens", 0)),
+                 _token_count(getattr(details, "cached_tokens", 0)))
+
+
+def gemini_usage(response) -> Optional[Usage]:
+    """Usage of a Gemini response (or last stream chunk), if reported"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    return Usage(_token_count(getattr(usage, "prompt_token_count", 0)),
+                 _token_count(getattr(usage, "candidates_token_count", 0)),
+                 _token_count(getattr(usage, "cached_content_token_count", 0)))
+
+
+def gemini_model_name(model, default: str = "gemini") -> str:
+    """'gemini-2.0-flash-exp' for a GenerativeModel, ``default`` when it has no name"""
+    name = getattr(model, "model_name", None)
+    return name.split("/")[-1] if isinstance(name, str) and name else default
+
+
+class LLMProvider:
+    """
+    A chat completion backend; subclasses implement ``complete``, or
+    ``complete_with_usage`` when the API reports token usage.
+    """
+    name = "provider"
+    model_name = ""
+
+    def complete(self, messages: Messages) -> str:
+        raise NotImplementedError
+
+    def complete_with_usage(self, messages: Messages) -> Tuple[str, Optional[Usage]]:
+        return self.complete(messages), None
+
+
+class GeminiChatProvider(LLMProvider):
+    """Gemini chat session; the session keeps its own history, so only the last message is sent"""
+    name = "gemini"
+
+    def __init__(self, chat, timeout: float = PROVIDER_TIMEOUT):
+        self.chat = chat
+        self.model_name = gemini_model_name(getattr(chat, "model", None))
+        self.timeout = timeout
+
+    def complete(self, messages: Messages) -> str:
+        return self.complete_with_usage(messages)[0]
+
+    def complete_with_usage(self, messages: Messages) -> Tuple[str, Optional[Usage]]:
+        response = self.chat.send_message(messages[-1]["content"], request_options={"timeout": self.timeout})
+        return response.text, gemini_usage(response)
+
+
+class GeminiProvider(LLMProvider):
+    """Stateless Gemini model; the conversation is flattened into one prompt"""
+    name = "gemini"
+
+    def __init__(self, model, timeout: float = PROVIDER_TIMEOUT):
+        self.model = model
+        self.model_name = gemini_model_name(model)
+        self.timeout = timeout
+
+    def complete(self, messages: Messages) -> str:
+        return self.complete_with_usage(messages)[0]
+
+    def complete_with_usage(self, messages: Messages) -> Tuple[str, Optional[Usage]]:
+        prompt = "\n".join(
+            message["content"] if message["role"] == "system" else f"{message['role'].capitalize()}: {message['content']}"
+            for message in messages
+        )
+        response = self.model.generate_content(prompt, request_options={"timeout": self.timeout})
+        return response.text.strip(), gemini_usage(response)
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions"""
+    name = "openai"
+
+    def __init__(self, client, model: str = "gpt-3.5-turbo", timeout: float = PROVIDER_TIMEOUT, **options):
+        self.client = client
+        self.model = model
+        self.model_name = model
+        self.timeout = timeout
+        self.options = options
+
+    def complete(self, messages: Messages) -> str:
+        return self.complete_with_usage(messages)[0]
+
+    def complete_with_usage(self, messages: Messages) -> Tuple[str, Optional[Usage]]:
+        response = self.client.chat.completions.create(model=self.model, messages=messages, timeout=self.timeout,
+                                                       **self.options)
+        return response.choices[0].message.content.strip(), openai_usage(response)
+
+
+class StubProvider(LLMProvider):
+    """Offline provider with injectable latency and failures, for tests and local runs"""
+
+    def __init__(self, name: str = "stub", reply: Union[str, Callable[[Messages], str]] = "Stub reply.",
+                 latency: Union[float, Callable[[], float]] = 0.0, fail: bool = False):
+        self.name = name
+        self.reply = reply
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+
+    def complete(self, messages: Messages) -> str:
+        self.calls += 1
+        time.sleep(self.latency() if callable(self.latency) else self.latency)
+        if self.fail:
+            raise RuntimeError(f"{self.name} unavailable")
+        return self.reply(messages) if callable(self.reply) else self.reply
+
+
+class GatewayResult:
+    """
+    Reply text and how it was produced: the winning provider and model, the
+    provider requests made for it (failovers and hedges included) and the
+    token usage the provider reported, if any
+    """
+    __slots__ = ("text", "provider", "latency", "hedged", "degraded", "model", "attempts", "usage")
+
+    def __init__(self, text: str, provider: str, latency: float, hedged: bool = False, degraded: bool = False,
+                 model: str = "", attempts: int = 1, usage: Optional[Usage] = None):
+        self.text = text
+        self.provider = provider
+        self.latency = latency
+        self.hedged = hedged
+        self.degraded = degraded
+        self.model = model or provider
+        self.attempts = attempts
+        self.usage = usage
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1)
+
+    def __repr__(self) -> str:
+        return f"GatewayResult(provider={self.provider!r}, latency={self.latency:.3f}, hedged={self.hedged})"
+
+
+class LLMGateway:
+    """
+    Completion requests across providers in preference order.
+
+    Providers whose breaker is open are skipped. The first healthy one is
+    called; if it fails the next is tried, and with hedging enabled a second
+    request is started once the primary runs past its own p95 (or
+    ``hedge_delay`` until enough samples exist). The first success wins.
+    With no healthy provider, or none answering within ``timeout``, the
+    rule-based ``fallback`` is used; calls still running at the deadline
+    count as failures, so a hung provider opens its breaker.
+    """
+
+    def __init__(self, providers: Sequence[LLMProvider], fallback: Callable[[Messages], str],
+                 timeout: float = REQUEST_TIMEOUT, hedge: bool = True,
+                 hedge_percentile: float = HEDGE_PERCENTILE, hedge_delay: float = HEDGE_DEFAULT_DELAY,
+                 breaker_factory: Callable[[], CircuitBreaker] = CircuitBreaker, workers: int = 16):
+        self.providers = list(providers)
+        self.fallback = fallback
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.breakers: Dict[str, CircuitBreaker] = {p.name: breaker_factory() for p in self.providers}
+        self.histograms: Dict[str, LatencyHistogram] = {p.name: LatencyHistogram() for p in self.providers}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0, "degraded": 0, "timeouts": 0}
+        self._errors: Dict[str, int] = {p.name: 0 for p in self.providers}
+
+    def is_healthy(self, name: str) -> bool:
+        breaker = self.breakers.get(name)
+        return breaker is not None and breaker.available()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _submit(self, provider: LLMProvider, messages: Messages) -> Tuple[Future, Callable[[], None]]:
+        """Start a provider call; the returned callable records it as timed out when the request gives up on it"""
+        started = time.monotonic()
+        settled = threading.Lock()
+
+        def settle(ok: bool):
+            # The call's own outcome or its abandonment, whichever comes first, reaches the breaker
+            if settled.acquire(blocking=False):
+                self._record(provider.name, ok, time.monotonic() - started)
+
+        def call():
+            try:
+                text, usage = provider.complete_with_usage(messages)
+            except Exception:
+                settle(False)
+                raise
+            settle(time.monotonic() - started <= self.timeout)
+            return text, usage
+
+        def abandon():
+            self._count("timeouts")
+            settle(False)
+
+        return self._executor.submit(call), abandon
+
+    def _record(self, name: str, ok: bool, latency: float):
+        with self._lock:
+            self.histograms[name].observe(latency)
+            if not ok:
+                self._errors[name] += 1
+        self.breakers[name].record(ok, latency)
+
+    def _hedge_after(self, name: str) -> float:
+        histogram = self.histograms[name]
+        if histogram.count >= HEDGE_MIN_SAMPLES:
+            return min(histogram.percentile(self.hedge_percentile), self.timeout)
+        return self.hedge_delay
+
+    def complete(self, messages: Messages, fallback: Optional[Callable[[Messages], str]] = None) -> GatewayResult:
+        """Best available reply for a chat, never raising; ``fallback`` overrides the rule engine"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        self._count("requests")
+        candidates = [p for p in self.providers if self.breakers[p.name].available()]
+        running: Dict[Future, LLMProvider] = {}
+        abandon: Dict[Future, Callable[[], None]] = {}
+        hedged = False
+        attempts = 0
+
+        def launch() -> bool:
+            nonlocal attempts
+            while candidates:
+                provider = candidates.pop(0)
+                if self.breakers[provider.name].allow():
+                    future, on_timeout = self._submit(provider, messages)
+                    running[future] = provider
+                    abandon[future] = on_timeout
+                    attempts += 1
+                    return True
+            return False
+
+        launch()
+        primary_name = next(iter(running.values())).name if running else None
+        while running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            primary = next(iter(running.values()))
+            can_hedge = self.hedge and not hedged and len(running) == 1 and candidates
+            wait_for = min(remaining, self._hedge_after(primary.name)) if can_hedge else remaining
+            done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            if not done:
+                if can_hedge and launch():
+                    hedged = True
+                    self._count("hedged")
+                continue
+
+            for future in done:
+                provider = running.pop(future)
+                try:
+                    text, usage = future.result()
+                except Exception as e:
+                    logger.warning(f"LLM provider {provider.name} failed: {e}")
+                    continue
+                if hedged and provider.name != primary_name:
+                    self._count("hedge_wins")
+                return GatewayResult(text, provider.name, time.monotonic() - started, hedged=hedged,
+                                     model=provider.model_name, attempts=attempts, usage=usage)
+
+            # Every finished request failed: fail over to the next provider
+            if not running and launch():
+                self._count("failovers")
+
+        for future, provider in running.items():
+            if future.cancel():
+                # Still queued for a worker: the provider was never asked
+                self.breakers[provider.name].cancel_probe()
+            else:
+                abandon[future]()
+        self._count("degraded")
+        text = (fallback or self.fallback)(messages)
+        return GatewayResult(text, "rules", time.monotonic() - started, hedged=hedged, degraded=True,
+                             attempts=attempts)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Gateway counters and per-provider breaker state and latency"""
+        with self._lock:
+            counts = dict(self._counts)
+            providers = {
+                name: dict(self.histograms[name].to_dict(), errors=self._errors[name],
+                           breaker=self.breakers[name].state)
+                for name in self.histograms
+            }
+        return {"gateway": counts, "providers": providers}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,348 @@
+"""
+LLM Usage, Latency and Cost Telemetry
+Records every model invocation (provider, model, prompt and completion
+tokens, wall time, retries, cache hits) tagged with the CallSid and booking
+step, aggregates them in memory into per-model and per-step histograms, and
+exports them as Prometheus text and as daily JSON rollups
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from llm_gateway import GatewayResult, LatencyHistogram
+from prompt_builder import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Daily rollup files: <ROLLUP_DIR>/llm_usage_YYYY-MM-DD.json
+ROLLUP_DIR = os.getenv('LLM_ROLLUP_DIR', 'logs/llm_usage')
+
+# USD per million (prompt, completion) tokens; models match by name prefix
+PRICES_PER_MILLION = {
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-1.5-flash": (0.075, 0.30),
+}
+
+# Share of the prompt price billed for provider-cached prompt tokens
+CACHED_PROMPT_RATE = 0.5
+
+# Calls whose running totals are kept for call_summary
+MAX_TRACKED_CALLS = 500
+
+NO_STEP = "-"
+
+
+def price_for(model: str) -> Tuple[float, float]:
+    """(prompt, completion) USD per million tokens; zero for unpriced models"""
+    for name in sorted(PRICES_PER_MILLION, key=len, reverse=True):
+        if model.startswith(name):
+            return PRICES_PER_MILLION[name]
+    return 0.0, 0.0
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    prompt_price, completion_price = price_for(model)
+    cached = min(cached_tokens, prompt_tokens)
+    billed_prompt = prompt_tokens - cached + cached * CACHED_PROMPT_RATE
+    return (billed_prompt * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+_call_tags: contextvars.ContextVar = contextvars.ContextVar("llm_call_tags", default=(None, None))
+
+
+@contextmanager
+def tag_call(call_sid: Optional[str] = None, step: Optional[str] = None) -> Iterator[None]:
+    """Tag LLM calls made in this context (thread or task) with a CallSid and step"""
+    token = _call_tags.set((call_sid, step))
+    try:
+        yield
+    finally:
+        _call_tags.reset(token)
+
+
+def current_tags() -> Tuple[Optional[str], Optional[str]]:
+    return _call_tags.get()
+
+
+class LLMCallRecord:
+    """One model invocation"""
+    __slots__ = ("timestamp", "call_sid", "step", "provider", "model", "prompt_tokens", "completion_tokens",
+                 "cached_tokens", "latency", "retries", "cache_hit", "ok", "estimated", "cost")
+
+    def __init__(self, timestamp: float, call_sid: Optional[str], step: str, provider: str, model: str,
+                 prompt_tokens: int, completion_tokens: int, cached_tokens: int, latency: float,
+                 retries: int, cache_hit: bool, ok: bool, estimated: bool):
+        self.timestamp = timestamp
+        self.call_sid = call_sid
+        self.step = step
+        self.provider = provider
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.cached_tokens = cached_tokens
+        self.latency = latency
+        self.retries = retries
+        self.cache_hit = cache_hit
+        self.ok = ok
+        self.estimated = estimated
+        self.cost = estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+
+    def __repr__(self) -> str:
+        return (f"LLMCallRecord(provider={self.provider!r}, model={self.model!r}, step={self.step!r}, "
+                f"tokens={self.prompt_tokens}+{self.completion_tokens}, latency={self.latency:.3f})")
+
+
+class _Aggregate:
+    """Counters and a latency histogram over a set of calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.cost = 0.0
+        self.latency = LatencyHistogram()
+
+    def add(self, record: LLMCallRecord):
+        self.calls += 1
+        self.errors += 0 if record.ok else 1
+        self.cache_hits += 1 if record.cache_hit else 0
+        self.retries += record.retries
+        self.prompt_tokens += record.prompt_tokens
+        self.completion_tokens += record.completion_tokens
+        self.cached_tokens += record.cached_tokens
+        self.cost += record.cost
+        self.latency.observe(record.latency)
+
+    def merge(self, other: "_Aggregate"):
+        for name in ("calls", "errors", "cache_hits", "retries", "prompt_tokens", "completion_tokens",
+                     "cached_tokens", "cost"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for bucket, count in enumerate(other.latency.counts):
+            self.latency.counts[bucket] += count
+        self.latency.count += other.latency.count
+        self.latency.total += other.latency.total
+
+    def to_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cache_hits": self.cache_hits,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cost_usd": round(self.cost, 6),
+            "latency": self.latency.to_dict()
+        }
+
+
+def _merged(aggregates: Dict[Tuple[str, str, str], _Aggregate], index: int) -> Dict[str, Dict]:
+    """Aggregates regrouped by one part of the (provider, model, step) key"""
+    merged: Dict[str, _Aggregate] = {}
+    for key, aggregate in aggregates.items():
+        merged.setdefault(key[index], _Aggregate()).merge(aggregate)
+    return {name: aggregate.to_dict() for name, aggregate in sorted(merged.items())}
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class LLMTelemetry:
+    """
+    In-memory LLM usage aggregates.
+
+    Totals are kept per (provider, model, step) since start-up and per day;
+    when the date changes the finished day is written to ``rollup_dir`` and
+    dropped from memory. ``flush`` writes the current day so far.
+    """
+
+    def __init__(self, rollup_dir: Optional[str] = ROLLUP_DIR, max_tracked_calls: int = MAX_TRACKED_CALLS,
+                 clock=time.time):
+        self.rollup_dir = rollup_dir
+        self.max_tracked_calls = max_tracked_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._totals: Dict[Tuple[str, str, str], _Aggregate] = {}
+        self._day: Optional[str] = None
+        self._day_totals: Dict[Tuple[str, str, str], _Aggregate] = {}
+        self._day_calls: set = set()
+        self._calls: "OrderedDict[str, _Aggregate]" = OrderedDict()
+
+    def record(self, provider: str, model: str, prompt_tokens: int, completion_tokens: int, latency: float,
+               cached_tokens: int = 0, retries: int = 0, cache_hit: bool = False, ok: bool = True,
+               call_sid: Optional[str] = None, step: Optional[str] = None,
+               estimated: bool = False) -> LLMCallRecord:
+        """Record one invocation; CallSid and step default to the ``tag_call`` context"""
+        tagged_sid, tagged_step = current_tags()
+        now = self._clock()
+        record = LLMCallRecord(
+            now, call_sid or tagged_sid, step or tagged_step or NO_STEP, provider, model or provider,
+            prompt_tokens, completion_tokens, cached_tokens, latency, retries, cache_hit, ok, estimated
+        )
+        key = (record.provider, record.model, record.step)
+        day = datetime.fromtimestamp(now).strftime("%Y-%m-%d")
+        finished = None
+        with self._lock:
+            if self._day != day:
+                if self._day is not None:
+                    finished = (self._day, self._rollup_locked())
+                self._day, self._day_totals, self._day_calls = day, {}, set()
+            self._totals.setdefault(key, _Aggregate()).add(record)
+            self._day_totals.setdefault(key, _Aggregate()).add(record)
+            if record.call_sid:
+                self._day_calls.add(record.call_sid)
+                call = self._calls.pop(record.call_sid, None) or _Aggregate()
+                call.add(record)
+                self._calls[record.call_sid] = call
+                while len(self._calls) > self.max_tracked_calls:
+                    self._calls.popitem(last=False)
+        if finished:
+            self._write_rollup(*finished)
+
+        logger.info(
+            f"LLM usage call={record.call_sid or '-'} step={record.step} provider={record.provider} "
+            f"model={record.model} prompt_tokens={record.prompt_tokens} completion_tokens={record.completion_tokens}"
+            f"{'~' if estimated else ''} cached_tokens={record.cached_tokens} retries={record.retries} "
+            f"cache_hit={record.cache_hit} latency_ms={record.latency * 1000:.0f} cost_usd={record.cost:.6f}"
+        )
+        return record
+
+    def record_result(self, result: GatewayResult, prompt_tokens: int, cache_hit: bool = False,
+                      call_sid: Optional[str] = None, step: Optional[str] = None) -> LLMCallRecord:
+        """
+        Record a gateway completion. Reported usage is used when the provider
+        gives it, otherwise tokens are estimated from the prompt and reply; a
+        reply shared from another caller's request or produced by the rule
+        engine cost no tokens.
+        """
+        if cache_hit or result.degraded:
+            return self.record(result.provider, result.model, 0, 0, result.latency, retries=result.retries,
+                               cache_hit=cache_hit, ok=not result.degraded or cache_hit,
+                               call_sid=call_sid, step=step)
+        usage = result.usage
+        if usage is not None:
+            return self.record(result.provider, result.model, usage.prompt_tokens, usage.completion_tokens,
+                               result.latency, cached_tokens=usage.cached_tokens, retries=result.retries,
+                               call_sid=call_sid, step=step)
+        return self.record(result.provider, result.model, prompt_tokens, count_tokens(result.text),
+                           result.latency, retries=result.retries, call_sid=call_sid, step=step, estimated=True)
+
+    def call_summary(self, call_sid: str) -> Optional[Dict]:
+        """Totals for one call (e.g. the LLM cost of one booking), if still tracked"""
+        with self._lock:
+            call = self._calls.get(call_sid)
+            return call.to_dict() if call else None
+
+    def snapshot(self) -> Dict:
+        """Totals since start-up, by provider, model and booking step"""
+        with self._lock:
+            return {
+                "by_provider": _merged(self._totals, 0),
+                "by_model": _merged(self._totals, 1),
+                "by_step": _merged(self._totals, 2),
+                "today": self._rollup_locked() if self._day else None
+            }
+
+    def _rollup_locked(self) -> Dict:
+        calls = len(self._day_calls)
+        day = _Aggregate()
+        for aggregate in self._day_totals.values():
+            day.merge(aggregate)
+        totals = day.to_dict()
+        return {
+            "date": self._day,
+            "phone_calls": calls,
+            "cost_per_call_usd": round(totals["cost_usd"] / calls, 6) if calls else 0.0,
+            "totals": totals,
+            "by_model": _merged(self._day_totals, 1),
+            "by_step": _merged(self._day_totals, 2)
+        }
+
+    def daily_rollup(self) -> Optional[Dict]:
+        """Today's rollup so far"""
+        with self._lock:
+            return self._rollup_locked() if self._day else None
+
+    def _write_rollup(self, day: str, rollup: Dict) -> Optional[str]:
+        if not self.rollup_dir:
+            return None
+        path = os.path.join(self.rollup_dir, f"llm_usage_{day}.json")
+        try:
+            os.makedirs(self.rollup_dir, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as handle:
+                json.dump(rollup, handle, indent=2)
+        except OSError as e:
+            logger.error(f"Could not write LLM usage rollup {path}: {e}")
+            return None
+        logger.info(f"Wrote LLM usage rollup for {day} to {path}")
+        return path
+
+    def flush(self) -> Optional[str]:
+        """Write today's rollup so far; returns the file path"""
+        with self._lock:
+            if self._day is None:
+                return None
+            day, rollup = self._day, self._rollup_locked()
+        return self._write_rollup(day, rollup)
+
+    def prometheus(self) -> str:
+        """Totals in the Prometheus text exposition format"""
+        with self._lock:
+            totals = sorted(self._totals.items())
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def labels(key: Tuple[str, str, str], **extra) -> str:
+            pairs = dict(provider=key[0], model=key[1], step=key[2], **extra)
+            return "{" + ",".join(f'{name}="{_label(str(value))}"' for name, value in pairs.items()) + "}"
+
+        for name, attribute, help_text in (
+            ("llm_calls_total", "calls", "LLM invocations"),
+            ("llm_errors_total", "errors", "LLM invocations answered by the rule engine"),
+            ("llm_cache_hits_total", "cache_hits", "LLM replies shared from an identical in-flight request"),
+            ("llm_retries_total", "retries", "Extra provider requests from failovers and hedges"),
+        ):
+            family(name, "counter", help_text)
+            lines.extend(f"{name}{labels(key)} {getattr(agg, attribute)}" for key, agg in totals)
+
+        family("llm_tokens_total", "counter", "LLM tokens by kind")
+        for key, agg in totals:
+            for kind in ("prompt", "completion", "cached"):
+                lines.append(f"llm_tokens_total{labels(key, kind=kind)} {getattr(agg, kind + '_tokens')}")
+
+        family("llm_cost_usd_total", "counter", "Estimated LLM spend in USD")
+        lines.extend(f"llm_cost_usd_total{labels(key)} {agg.cost:.6f}" for key, agg in totals)
+
+        family("llm_latency_seconds", "histogram", "LLM invocation wall time")
+        for key, agg in totals:
+            histogram = agg.latency
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"llm_latency_seconds_bucket{labels(key, le=bound)} {cumulative}")
+            lines.append(f'llm_latency_seconds_bucket{labels(key, le="+Inf")} {histogram.count}')
+            lines.append(f"llm_latency_seconds_sum{labels(key)} {histogram.total:.6f}")
+            lines.append(f"llm_latency_seconds_count{labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide telemetry shared by the assistants and their metrics endpoints
+default_telemetry = LLMTelemetry()
@@ -0,0 +1,418 @@
+"""
+Local Streaming Speech Recognition
+Recognizer interface for the local voice loop and media streams, an offline
+backend on a small Vosk (Kaldi) CPU model that transcribes while the
+customer is still speaking and reports partial results, and microphone
+listeners that keep one open input stream, calibrate the noise floor once
+and keep tracking it; the background listener captures continuously and
+queues utterances so none are lost while a reply is being prepared
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+from voice_activity import FRAME_MS, SPEECH_END, SPEECH_START, EnergyVAD, Utterance
+
+# Optional offline recognizer
+try:
+    from vosk import KaldiRecognizer, Model, SetLogLevel
+    VOSK_AVAILABLE = True
+except ImportError:
+    VOSK_AVAILABLE = False
+    KaldiRecognizer = Model = SetLogLevel = None
+
+# Optional cloud recognizer
+try:
+    import speech_recognition as sr
+    SPEECH_RECOGNITION_AVAILABLE = True
+except ImportError:
+    SPEECH_RECOGNITION_AVAILABLE = False
+    sr = None
+
+# Optional microphone access
+try:
+    import pyaudio
+    PYAUDIO_AVAILABLE = True
+except ImportError:
+    PYAUDIO_AVAILABLE = False
+    pyaudio = None
+
+logger = logging.getLogger(__name__)
+
+ASR_SAMPLE_RATE = 16000
+VOSK_MODEL_PATH = os.getenv('VOSK_MODEL_PATH', 'models/vosk-model-small-en-in-0.4')
+
+# Seconds of audio the listener uses to learn the room's noise floor
+CALIBRATION_SECONDS = 1.0
+
+# Captured audio the background listener holds while recognition catches up
+RING_BUFFER_SECONDS = 10.0
+
+# How often a held listen timeout checks whether the reply has finished
+HOLD_POLL_SECONDS = 0.05
+
+_models: Dict[str, object] = {}
+_models_lock = threading.Lock()
+
+
+def load_vosk_model(path: str = VOSK_MODEL_PATH):
+    """Load a Vosk model once per process; recognizers share it"""
+    if not VOSK_AVAILABLE:
+        raise RuntimeError("vosk is not installed")
+    with _models_lock:
+        if path not in _models:
+            if not os.path.isdir(path):
+                raise FileNotFoundError(f"Vosk model not found at {path}")
+            SetLogLevel(-1)
+            started = time.perf_counter()
+            _models[path] = Model(path)
+            logger.info(f"Loaded Vosk model {path} in {time.perf_counter() - started:.1f}s")
+        return _models[path]
+
+
+class StreamingRecognizer:
+    """
+    Speech to text fed incrementally.
+
+    ``start`` begins an utterance, ``accept`` takes the next 16-bit PCM
+    chunk and returns the partial transcript so far, ``finish`` returns
+    the final text. Calling the recognizer with a whole Utterance does all
+    three, so it also plugs into MediaStreamServer as ``transcribe``.
+    """
+
+    sample_rate = ASR_SAMPLE_RATE
+
+    def start(self):
+        raise NotImplementedError
+
+    def accept(self, pcm: bytes) -> str:
+        raise NotImplementedError
+
+    def finish(self) -> str:
+        raise NotImplementedError
+
+    def __call__(self, utterance: Utterance) -> str:
+        self.start()
+        self.accept(utterance.audio)
+        return self.finish()
+
+
+class VoskRecognizer(StreamingRecognizer):
+    """Offline recognition on a local Vosk model, with partial results while audio arrives"""
+
+    def __init__(self, model_path: str = VOSK_MODEL_PATH, sample_rate: int = ASR_SAMPLE_RATE):
+        self.model = load_vosk_model(model_path)
+        self.sample_rate = sample_rate
+        self._recognizer = KaldiRecognizer(self.model, sample_rate)
+        self._segments: List[str] = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._recognizer.Reset()
+        self._segments = []
+
+    def accept(self, pcm: bytes) -> str:
+        if self._recognizer.AcceptWaveform(pcm):
+            # Vosk found a pause inside the utterance and finalized a segment
+            self._segments.append(json.loads(self._recognizer.Result()).get("text", ""))
+            partial = ""
+        else:
+            partial = json.loads(self._recognizer.PartialResult()).get("partial", "")
+        return " ".join(text for text in self._segments + [partial] if text)
+
+    def finish(self) -> str:
+        self._segments.append(json.loads(self._recognizer.FinalResult()).get("text", ""))
+        text = " ".join(text for text in self._segments if text)
+        self._segments = []
+        return text
+
+    def __call__(self, utterance: Utterance) -> str:
+        # One recognizer per model stream; media stream calls may arrive from several threads
+        with self._lock:
+            return super().__call__(utterance)
+
+
+class GoogleRecognizer(StreamingRecognizer):
+    """SpeechRecognition's Google web recognizer: buffers the utterance, no partial results"""
+
+    def __init__(self, language: str = "en-IN", sample_rate: int = ASR_SAMPLE_RATE):
+        if not SPEECH_RECOGNITION_AVAILABLE:
+            raise RuntimeError("SpeechRecognition is not installed")
+        self.recognizer = sr.Recognizer()
+        self.language = language
+        self.sample_rate = sample_rate
+        self._audio: List[bytes] = []
+
+    def start(self):
+        self._audio = []
+
+    def accept(self, pcm: bytes) -> str:
+        self._audio.append(pcm)
+        return ""
+
+    def finish(self) -> str:
+        audio = sr.AudioData(b"".join(self._audio), self.sample_rate, 2)
+        self._audio = []
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language)
+        except sr.UnknownValueError:
+            return ""
+
+    def __call__(self, utterance: Utterance) -> str:
+        audio = sr.AudioData(utterance.audio, utterance.sample_rate, 2)
+        try:
+            return self.recognizer.recognize_google(audio, language=self.language)
+        except sr.UnknownValueError:
+            return ""
+
+
+class MicrophoneSource:
+    """The default input device as 16-bit mono PCM frames, kept open between utterances"""
+
+    def __init__(self, sample_rate: int = ASR_SAMPLE_RATE, frame_ms: int = FRAME_MS):
+        if not PYAUDIO_AVAILABLE:
+            raise RuntimeError("pyaudio is not installed")
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(format=pyaudio.paInt16, channels=1, rate=sample_rate,
+                                        input=True, frames_per_buffer=self.frame_samples)
+
+    def read(self) -> bytes:
+        return self._stream.read(self.frame_samples, exception_on_overflow=False)
+
+    def close(self):
+        self._stream.stop_stream()
+        self._stream.close()
+        self._audio.terminate()
+
+
+class StreamingListener:
+    """
+    Listens for one utterance at a time on an always-open source.
+
+    The VAD lives as long as the listener, so the noise floor is learned
+    once (``calibrate``) and keeps adapting between utterances instead of
+    a blocking calibration before each one. Audio goes to the recognizer
+    from the first voiced frame on, so only finalization is left when the
+    customer stops talking.
+    """
+
+    def __init__(self, recognizer: StreamingRecognizer, source, vad: Optional[EnergyVAD] = None):
+        self.recognizer = recognizer
+        self.source = source
+        self.vad = vad or EnergyVAD(sample_rate=source.sample_rate, frame_ms=source.frame_ms,
+                                    calibration_ms=int(CALIBRATION_SECONDS * 1000))
+        self.last_finalize_ms = 0.0
+
+    def calibrate(self):
+        """Learn the noise floor from the room's background sound; later calls do nothing"""
+        if self.vad.calibrated:
+            return
+        while not self.vad.calibrated:
+            self.vad.process(self.source.read())
+        logger.info(f"Noise floor calibrated at {self.vad.noise_floor:.0f}")
+
+    def listen(self, timeout: float = 5.0, on_partial: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        """Final text of the next utterance, "" if nothing was recognized, None if no speech within ``timeout``"""
+        self.calibrate()
+        self.vad.reset()
+        waited_ms = 0
+        partial = ""
+        while True:
+            frame = self.source.read()
+            events = self.vad.process(frame)
+            for event in events:
+                if event.kind == SPEECH_START:
+                    self.recognizer.start()
+                    partial = self._partial(self.recognizer.accept(event.utterance.audio), partial, on_partial)
+                elif event.kind == SPEECH_END:
+                    started = time.perf_counter()
+                    text = self.recognizer.finish()
+                    self.last_finalize_ms = (time.perf_counter() - started) * 1000
+                    return text
+            if events:
+                continue
+            if self.vad.in_speech:
+                partial = self._partial(self.recognizer.accept(frame), partial, on_partial)
+            else:
+                waited_ms += self.source.frame_ms
+                if waited_ms >= timeout * 1000:
+                    return None
+
+    @staticmethod
+    def _partial(text: str, previous: str, on_partial: Optional[Callable[[str], None]]) -> str:
+        if text and text != previous and on_partial:
+            on_partial(text)
+        return text or previous
+
+
+class BackgroundListener:
+    """
+    Always-on capture: utterances are heard while the assistant is busy.
+
+    A capture thread only reads the source into a ring buffer, so a slow
+    recognizer never makes the device overflow; a second thread runs the
+    VAD over the buffer, streams voiced audio to the recognizer and queues
+    each finished utterance's text. ``listen`` takes the next one from the
+    queue, so speech that started while a reply was being generated is
+    waiting there instead of lost. The noise floor is tracked continuously.
+    ``muted`` (e.g. "the assistant is talking" without echo cancellation)
+    makes capture discard frames instead of hearing its own voice, and
+    ``hold_timeout`` (the assistant is talking) keeps ``listen``'s timeout
+    from running until the caller has heard the whole reply.
+    """
+
+    def __init__(self, recognizer: StreamingRecognizer, source, vad: Optional[EnergyVAD] = None,
+                 muted: Optional[Callable[[], bool]] = None, ring_seconds: float = RING_BUFFER_SECONDS,
+                 hold_timeout: Optional[Callable[[], bool]] = None):
+        self.recognizer = recognizer
+        self.source = source
+        self.vad = vad or EnergyVAD(sample_rate=source.sample_rate, frame_ms=source.frame_ms,
+                                    calibration_ms=int(CALIBRATION_SECONDS * 1000))
+        self.muted = muted
+        self.hold_timeout = hold_timeout
+        self.on_partial: Optional[Callable[[str], None]] = None
+        self.last_finalize_ms = 0.0
+        self._ring: Deque[bytes] = deque(maxlen=max(1, int(ring_seconds * 1000) // source.frame_ms))
+        self._ready = threading.Condition()
+        self._utterances: "queue.Queue[str]" = queue.Queue()
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._counts = {"frames": 0, "muted": 0, "dropped": 0, "utterances": 0}
+
+    def start(self) -> "BackgroundListener":
+        self._stopped.clear()
+        self._threads = [
+            threading.Thread(target=self._capture, name="asr-capture", daemon=True),
+            threading.Thread(target=self._segment, name="asr-segment", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        with self._ready:
+            self._ready.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=2)
+
+    @property
+    def in_speech(self) -> bool:
+        return self.vad.in_speech
+
+    def listen(self, timeout: float = 5.0, on_partial: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        """
+        Text of the next utterance (maybe one already heard), "" if
+        unrecognized, None if none within ``timeout`` of the reply ending
+        """
+        self.on_partial = on_partial
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            held = self.hold_timeout is not None and self.hold_timeout()
+            if held:
+                # The caller's silence only counts once they have heard the reply out
+                deadline = now + timeout
+            remaining = deadline - now
+            if remaining <= 0 and not self.in_speech:
+                # Nothing started in time; an utterance under way is always waited for
+                try:
+                    return self._utterances.get_nowait()
+                except queue.Empty:
+                    return None
+            wait = remaining if remaining > 0 else 0.05
+            try:
+                return self._utterances.get(timeout=min(wait, HOLD_POLL_SECONDS) if self.hold_timeout else wait)
+            except queue.Empty:
+                continue
+
+    def stats(self) -> Dict[str, int]:
+        with self._ready:
+            return dict(self._counts, buffered=len(self._ring), queued=self._utterances.qsize())
+
+    def _capture(self):
+        while not self._stopped.is_set():
+            try:
+                frame = self.source.read()
+            except Exception as e:
+                logger.error(f"Microphone capture stopped: {e}")
+                self._stopped.set()
+                break
+            with self._ready:
+                self._counts["frames"] += 1
+                if self.muted is not None and self.muted():
+                    self._counts["muted"] += 1
+                    continue
+                if len(self._ring) == self._ring.maxlen:
+                    self._counts["dropped"] += 1
+                self._ring.append(frame)
+                self._ready.notify()
+        with self._ready:
+            self._ready.notify_all()
+
+    def _segment(self):
+        partial = ""
+        while True:
+            with self._ready:
+                while not self._ring and not self._stopped.is_set():
+                    self._ready.wait()
+                if not self._ring:
+                    return
+                frame = self._ring.popleft()
+            try:
+                partial = self._frame(frame, partial)
+            except Exception as e:
+                logger.error(f"Speech recognition error: {e}")
+                self.vad.reset()
+                self._utterances.put("")
+                partial = ""
+
+    def _frame(self, frame: bytes, partial: str) -> str:
+        events = self.vad.process(frame)
+        for event in events:
+            if event.kind == SPEECH_START:
+                self.recognizer.start()
+                partial = StreamingListener._partial(self.recognizer.accept(event.utterance.audio), "", self.on_partial)
+            elif event.kind == SPEECH_END:
+                started = time.perf_counter()
+                text = self.recognizer.finish()
+                self.last_finalize_ms = (time.perf_counter() - started) * 1000
+                with self._ready:
+                    self._counts["utterances"] += 1
+                self._utterances.put(text)
+                partial = ""
+        if not events and self.vad.in_speech:
+            partial = StreamingListener._partial(self.recognizer.accept(frame), partial, self.on_partial)
+        return partial
+
+
+def create_recognizer(sample_rate: int = ASR_SAMPLE_RATE, model_path: str = VOSK_MODEL_PATH) -> StreamingRecognizer:
+    """The offline recognizer when its model is installed, else Google's"""
+    if VOSK_AVAILABLE:
+        try:
+            return VoskRecognizer(model_path, sample_rate)
+        except Exception as e:
+            logger.warning(f"Falling back to Google speech recognition: {e}")
+    return GoogleRecognizer(sample_rate=sample_rate)
+
+
+def create_local_listener(model_path: str = VOSK_MODEL_PATH, muted: Optional[Callable[[], bool]] = None,
+                          hold_timeout: Optional[Callable[[], bool]] = None) -> Optional[BackgroundListener]:
+    """Offline always-on microphone listener, or None when vosk, pyaudio or the model is missing"""
+    if not VOSK_AVAILABLE or not PYAUDIO_AVAILABLE:
+        return None
+    try:
+        return BackgroundListener(VoskRecognizer(model_path), MicrophoneSource(), muted=muted,
+                                  hold_timeout=hold_timeout).start()
+    except Exception as e:
+        logger.warning(f"Local speech recognition unavailable: {e}")
+        return None
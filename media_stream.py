@@ -0,0 +1,444 @@
+"""
+Twilio Media Stream Voice Pipeline
+WebSocket server for Twilio's bidirectional <Connect><Stream> protocol: it
+receives the caller's 8 kHz μ-law audio, cuts it into utterances with the
+VAD, transcribes them, drives the booking dialog and streams synthesized
+replies back sentence by sentence, clearing playback when the caller talks
+over it. Avoids the Gather → webhook → TwiML round trip and its end-of-speech
+dead air. FakeMediaStreamClient replays recorded calls offline
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+
+from speech_stream import split_sentences
+from voice_activity import FRAME_MS, SAMPLE_RATE, SPEECH_END, SPEECH_START, EnergyVAD, Utterance
+from voice_activity import load_wav, ulaw_decode, ulaw_encode
+
+# Optional WebSocket server
+try:
+    import websockets
+    WEBSOCKETS_AVAILABLE = True
+except ImportError:
+    WEBSOCKETS_AVAILABLE = False
+    websockets = None
+
+# Optional local text-to-speech engine
+try:
+    import pyttsx3
+    PYTTSX3_AVAILABLE = True
+except ImportError:
+    PYTTSX3_AVAILABLE = False
+    pyttsx3 = None
+
+logger = logging.getLogger(__name__)
+
+MEDIA_STREAM_HOST = os.getenv('MEDIA_STREAM_HOST', '0.0.0.0')
+MEDIA_STREAM_PORT = int(os.getenv('MEDIA_STREAM_PORT', '7002'))
+MEDIA_STREAM_PATH = "/media"
+
+# μ-law bytes per 20 ms frame, and per outbound media message
+FRAME_BYTES = SAMPLE_RATE * FRAME_MS // 1000
+OUTBOUND_CHUNK_MS = 100
+
+# How long a finished call waits for its last words to play before hanging up
+DRAIN_TIMEOUT = 15.0
+
+END_MARK = "end"
+
+
+class Pyttsx3Synthesizer:
+    """Sentence to 8 kHz μ-law with the local pyttsx3 engine; repeated sentences come from memory"""
+
+    def __init__(self, voice_index: int = 1, rate: int = 150, cache_size: int = 256):
+        if not PYTTSX3_AVAILABLE:
+            raise RuntimeError("pyttsx3 is not installed")
+        self.engine = pyttsx3.init()
+        voices = self.engine.getProperty('voices')
+        if voices and len(voices) > voice_index:
+            self.engine.setProperty('voice', voices[voice_index].id)
+        self.engine.setProperty('rate', rate)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, text: str) -> bytes:
+        with self._lock:
+            if text in self._cache:
+                self._cache.move_to_end(text)
+                return self._cache[text]
+            with tempfile.TemporaryDirectory() as scratch:
+                path = os.path.join(scratch, "reply.wav")
+                self.engine.save_to_file(text, path)
+                self.engine.runAndWait()
+                audio = ulaw_encode(load_wav(path))
+            self._cache[text] = audio
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return audio
+
+
+class MediaStreamSession:
+    """One call's stream: inbound audio → VAD → turns → outbound audio"""
+
+    def __init__(self, server: "MediaStreamServer", websocket):
+        self.server = server
+        self.websocket = websocket
+        self.vad = server.vad_factory()
+        self.stream_sid: Optional[str] = None
+        self.call_sid: Optional[str] = None
+        self._inbound = b""
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._speaking: Optional[asyncio.Task] = None
+        self._marks: List[str] = []
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._turns = 0
+
+    @property
+    def playing(self) -> bool:
+        """Reply audio is being sent or is still queued at Twilio"""
+        return bool(self._marks) or (self._speaking is not None and not self._speaking.done())
+
+    async def run(self):
+        worker = asyncio.create_task(self._work())
+        try:
+            async for raw in self.websocket:
+                message = json.loads(raw)
+                event = message.get("event")
+                if event == "start":
+                    self._start(message["start"])
+                elif event == "media":
+                    self._media(message["media"])
+                elif event == "mark":
+                    self._marked(message["mark"]["name"])
+                elif event == "stop":
+                    break
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+            if self.call_sid and self.server.on_stop:
+                self.server.on_stop(self.call_sid)
+
+    def _start(self, start: Dict):
+        self.stream_sid = start.get("streamSid")
+        self.call_sid = start.get("callSid")
+        self.server._count("calls")
+        logger.info(f"Media stream {self.stream_sid} started for call {self.call_sid}")
+        self._queue.put_nowait(("start", start.get("customParameters", {}), time.monotonic()))
+
+    def _media(self, media: Dict):
+        if media.get("track", "inbound") != "inbound":
+            return
+        self._inbound += base64.b64decode(media["payload"])
+        while len(self._inbound) >= FRAME_BYTES:
+            frame, self._inbound = self._inbound[:FRAME_BYTES], self._inbound[FRAME_BYTES:]
+            for event in self.vad.process(ulaw_decode(frame)):
+                if event.kind == SPEECH_START and self.playing:
+                    self._barge_in()
+                elif event.kind == SPEECH_END:
+                    self.server._count("utterances")
+                    self._queue.put_nowait(("hear", event.utterance, time.monotonic()))
+
+    def _marked(self, name: str):
+        if name.endswith(f":{END_MARK}") and self.server.on_reply_played:
+            self.server.on_reply_played(self.call_sid, self.vad.now_ms)
+        if name in self._marks:
+            self._marks.remove(name)
+        if not self._marks:
+            self._drained.set()
+
+    def _barge_in(self):
+        """The caller started talking over the reply: stop sending it and drop what Twilio has queued"""
+        self.server._count("barge_ins")
+        if self._speaking is not None:
+            self._speaking.cancel()
+        self._marks.clear()
+        self._drained.set()
+        asyncio.ensure_future(self._send({"event": "clear", "streamSid": self.stream_sid}))
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        server = self.server
+        while True:
+            kind, item, queued_at = await self._queue.get()
+            try:
+                if kind == "start":
+                    reply = await loop.run_in_executor(None, server.on_start, self.call_sid, item)
+                else:
+                    if server.on_utterance:
+                        server.on_utterance(self.call_sid, item)
+                    text = await loop.run_in_executor(None, server.transcribe, item)
+                    if not text or not text.strip():
+                        server._count("empty_transcripts")
+                        continue
+                    logger.info(f"Caller on {self.call_sid} said: {text}")
+                    reply = await loop.run_in_executor(None, server.respond, self.call_sid, text)
+            except Exception as e:
+                logger.error(f"Media stream turn failed for {self.call_sid}: {e}")
+                server._count("errors")
+                reply = server.error_reply
+            if not reply:
+                continue
+
+            self._speaking = asyncio.create_task(self._speak(reply, queued_at))
+            await asyncio.wait([self._speaking])
+            if server.is_finished and server.is_finished(self.call_sid):
+                await self._hang_up()
+                return
+
+    async def _speak(self, text: str, queued_at: float):
+        loop = asyncio.get_running_loop()
+        self._turns += 1
+        chunk = SAMPLE_RATE * OUTBOUND_CHUNK_MS // 1000
+        first = True
+        for index, sentence in enumerate(split_sentences([text], min_chars=0)):
+            audio = await loop.run_in_executor(None, self.server.synthesize, sentence.strip())
+            if first:
+                self.server._latency((time.monotonic() - queued_at) * 1000)
+                first = False
+            for offset in range(0, len(audio), chunk):
+                payload = base64.b64encode(audio[offset:offset + chunk]).decode("ascii")
+                await self._send({"event": "media", "streamSid": self.stream_sid, "media": {"payload": payload}})
+            await self._mark(f"{self._turns}:{index}")
+        await self._mark(f"{self._turns}:{END_MARK}")
+        self.server._count("replies")
+
+    async def _mark(self, name: str):
+        self._marks.append(name)
+        self._drained.clear()
+        await self._send({"event": "mark", "streamSid": self.stream_sid, "mark": {"name": name}})
+
+    async def _hang_up(self):
+        """Let the goodbye finish playing, then close; Twilio moves on to the TwiML after <Connect>"""
+        try:
+            await asyncio.wait_for(self._drained.wait(), DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Closing stream for {self.call_sid} before its reply finished playing")
+        await self.websocket.close()
+
+    async def _send(self, message: Dict):
+        await self.websocket.send(json.dumps(message))
+
+
+class MediaStreamServer:
+    """
+    Runs one MediaStreamSession per Twilio stream connection.
+
+    The dialog is plugged in as callables: ``on_start(call_sid, parameters)``
+    returns the greeting, ``respond(call_sid, text)`` the reply to a
+    transcribed utterance, ``is_finished(call_sid)`` ends the stream after a
+    reply and ``on_stop(call_sid)`` cleans up; ``on_utterance(call_sid,
+    utterance)`` sees each utterance before it is transcribed, while the
+    dialog is still at the step it answers, and ``on_reply_played(call_sid,
+    at_ms)`` the stream time each reply finished playing. ``transcribe(utterance)`` and
+    ``synthesize(sentence)`` are the ASR and TTS backends; blocking calls
+    run in the default executor.
+    """
+
+    def __init__(self, on_start: Callable[[str, Dict], str], respond: Callable[[str, str], str],
+                 transcribe: Callable[[Utterance], str], synthesize: Callable[[str], bytes],
+                 is_finished: Optional[Callable[[str], bool]] = None,
+                 on_stop: Optional[Callable[[str], None]] = None,
+                 vad_factory: Callable[[], EnergyVAD] = EnergyVAD,
+                 error_reply: str = "I'm sorry, I'm having trouble understanding. Please try again.",
+                 on_utterance: Optional[Callable[[str, Utterance], None]] = None,
+                 on_reply_played: Optional[Callable[[str, int], None]] = None):
+        self.on_start = on_start
+        self.respond = respond
+        self.transcribe = transcribe
+        self.synthesize = synthesize
+        self.is_finished = is_finished
+        self.on_stop = on_stop
+        self.vad_factory = vad_factory
+        self.error_reply = error_reply
+        self.on_utterance = on_utterance
+        self.on_reply_played = on_reply_played
+        self._counts = {"calls": 0, "utterances": 0, "replies": 0, "barge_ins": 0,
+                        "empty_transcripts": 0, "errors": 0}
+        self._latency_ms = {"count": 0, "total": 0.0, "max": 0.0}
+        self._lock = threading.Lock()
+
+    async def handle(self, websocket, path: str = MEDIA_STREAM_PATH):
+        """WebSocket handler; also accepts anything with async iteration, ``send`` and ``close``"""
+        await MediaStreamSession(self, websocket).run()
+
+    async def serve(self, host: str = MEDIA_STREAM_HOST, port: int = MEDIA_STREAM_PORT):
+        if not WEBSOCKETS_AVAILABLE:
+            raise RuntimeError("websockets is not installed")
+        async with websockets.serve(self.handle, host, port):
+            logger.info(f"Media stream server listening on ws://{host}:{port}{MEDIA_STREAM_PATH}")
+            await asyncio.Future()
+
+    def start_in_thread(self, host: str = MEDIA_STREAM_HOST, port: int = MEDIA_STREAM_PORT) -> threading.Thread:
+        """Serve from a daemon thread next to a Flask app, sharing its sessions"""
+        thread = threading.Thread(target=lambda: asyncio.run(self.serve(host, port)),
+                                  name="media-stream", daemon=True)
+        thread.start()
+        return thread
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _latency(self, ms: float):
+        with self._lock:
+            self._latency_ms["count"] += 1
+            self._latency_ms["total"] += ms
+            self._latency_ms["max"] = max(self._latency_ms["max"], ms)
+
+    def stats(self) -> Dict:
+        """Counters, and end of caller speech → first reply audio in milliseconds"""
+        with self._lock:
+            latency = self._latency_ms
+            return dict(
+                self._counts,
+                first_audio_ms_avg=round(latency["total"] / latency["count"], 1) if latency["count"] else 0.0,
+                first_audio_ms_max=round(latency["max"], 1)
+            )
+
+
+class CallerTurn:
+    """One thing the caller says: 16-bit 8 kHz PCM, optionally said over the bot's reply"""
+
+    __slots__ = ("audio", "barge_in")
+
+    def __init__(self, audio: bytes, barge_in: bool = False):
+        self.audio = audio
+        self.barge_in = barge_in
+
+
+class FakeMediaStreamClient:
+    """
+    Plays Twilio's side of a media stream, in process, for offline tests and replays.
+
+    Sends the connected/start messages, then each caller turn as 20 ms μ-law
+    frames once the bot has finished its reply (or, for a barge-in turn, as
+    soon as it starts one), filling the gaps with silence. Reply audio is
+    "played" at real-time rate against the frames sent, so marks come back
+    when Twilio would send them, and a clear drops what is still queued.
+    """
+
+    def __init__(self, turns: Sequence[CallerTurn], call_sid: str = "CAfake", stream_sid: str = "MZfake",
+                 parameters: Optional[Dict[str, str]] = None, trailing_silence_ms: int = 800,
+                 wait_timeout: float = 10.0, realtime: bool = False):
+        self.turns = list(turns)
+        self.call_sid = call_sid
+        self.stream_sid = stream_sid
+        self.parameters = parameters or {}
+        self.trailing_frames = trailing_silence_ms // FRAME_MS
+        self.wait_timeout = wait_timeout
+        self.realtime = realtime
+        self.sent: List[Dict] = []          # Everything the server sent
+        self.marks_played: List[str] = []
+        self.marks_cleared: List[str] = []  # Echoed by a clear before they played
+        self.cleared = 0
+        self.closed = False
+        self._playback: List[object] = []   # Queued byte counts and mark names
+        self._echo: List[Dict] = []
+        self._chunk = 0
+
+    @classmethod
+    def from_wav(cls, paths: Sequence[str], **kwargs) -> "FakeMediaStreamClient":
+        """Replay a recorded call, one WAV file per caller turn"""
+        return cls([CallerTurn(load_wav(path)) for path in paths], **kwargs)
+
+    @property
+    def reply_audio(self) -> bytes:
+        return b"".join(base64.b64decode(m["media"]["payload"]) for m in self.sent if m["event"] == "media")
+
+    async def send(self, raw: str):
+        message = json.loads(raw)
+        self.sent.append(message)
+        if message["event"] == "media":
+            self._playback.append(len(base64.b64decode(message["media"]["payload"])))
+        elif message["event"] == "mark":
+            self._playback.append(message["mark"]["name"])
+        elif message["event"] == "clear":
+            self.cleared += 1
+            pending = [item for item in self._playback if isinstance(item, str)]
+            self._playback = []
+            self.marks_cleared.extend(pending)
+            self._echo.extend(self._mark_message(name) for name in pending)
+
+    async def close(self):
+        self.closed = True
+
+    def _mark_message(self, name: str) -> Dict:
+        return {"event": "mark", "streamSid": self.stream_sid, "mark": {"name": name}}
+
+    def _play(self, count: int):
+        """Twilio plays ``count`` bytes of queued reply audio"""
+        while self._playback:
+            head = self._playback[0]
+            if isinstance(head, str):
+                self.marks_played.append(head)
+                self._echo.append(self._mark_message(self._playback.pop(0)))
+                continue
+            if count <= 0:
+                break
+            if head > count:
+                self._playback[0] = head - count
+                count = 0
+            else:
+                count -= head
+                self._playback.pop(0)
+
+    def _frame(self, pcm: bytes) -> Dict:
+        self._chunk += 1
+        return {
+            "event": "media", "streamSid": self.stream_sid,
+            "media": {"track": "inbound", "chunk": str(self._chunk),
+                      "timestamp": str(self._chunk * FRAME_MS), "payload": base64.b64encode(ulaw_encode(pcm)).decode()}
+        }
+
+    def _replies_started(self) -> int:
+        return sum(1 for m in self.sent if m["event"] == "media")
+
+    def _replies_played(self) -> int:
+        return sum(1 for name in self.marks_played if name.endswith(f":{END_MARK}"))
+
+    async def _messages(self):
+        yield {"event": "connected", "protocol": "Call", "version": "1.0.0"}
+        yield {"event": "start", "sequenceNumber": "1", "streamSid": self.stream_sid,
+               "start": {"streamSid": self.stream_sid, "callSid": self.call_sid, "tracks": ["inbound"],
+                         "customParameters": self.parameters,
+                         "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": SAMPLE_RATE, "channels": 1}}}
+        silence = bytes(FRAME_BYTES * 2)
+        replies, media = 1, 0  # Waiting for the greeting
+        for turn in self.turns:
+            deadline = time.monotonic() + self.wait_timeout
+            while not self.closed and time.monotonic() < deadline:
+                if self._replies_started() > media if turn.barge_in else self._replies_played() >= replies:
+                    break
+                yield self._frame(silence)
+            if self.closed:
+                return
+            for offset in range(0, len(turn.audio), FRAME_BYTES * 2):
+                yield self._frame(turn.audio[offset:offset + FRAME_BYTES * 2].ljust(FRAME_BYTES * 2, b"\0"))
+            replies, media = self._replies_played() + 1, self._replies_started()
+            for _ in range(self.trailing_frames):
+                yield self._frame(silence)
+        deadline = time.monotonic() + self.wait_timeout
+        while self._replies_played() < replies and not self.closed and time.monotonic() < deadline:
+            yield self._frame(silence)
+        yield {"event": "stop", "streamSid": self.stream_sid, "stop": {"callSid": self.call_sid}}
+
+    async def __aiter__(self):
+        async for message in self._messages():
+            if self.closed:
+                return
+            if message["event"] == "media":
+                self._play(FRAME_BYTES)
+                await asyncio.sleep(FRAME_MS / 1000 if self.realtime else 0.001)
+            while self._echo:
+                yield json.dumps(self._echo.pop(0))
+            yield json.dumps(message)
@@ -0,0 +1,515 @@
+"""
+Outbound Call Dialer
+QR scans and "call me" requests are queued in SQLite and dialed by one
+background worker, so HTTP handlers return at once and a flyer drop cannot
+exceed the carrier's calls-per-second limit: a token bucket paces dialing,
+a cap bounds calls in progress, busy and unanswered calls are retried with
+jittered exponential backoff, and every request has a status the landing
+page can poll. FakeCarrier stands in for Twilio offline
+"""
+
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DB = os.getenv('OUTBOUND_QUEUE_DB', 'data/outbound_calls.db')
+
+# Twilio's default outbound limit is 1 call per second per account; a burst above 1
+# lets up to BURST + CPS calls through in one second after an idle spell
+CALLS_PER_SECOND = float(os.getenv('OUTBOUND_CPS', '1'))
+BURST = int(os.getenv('OUTBOUND_BURST', '1'))
+MAX_CONCURRENT_CALLS = int(os.getenv('OUTBOUND_MAX_CONCURRENT', '5'))
+
+MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 60.0
+RETRY_MAX_SECONDS = 600.0
+RETRY_JITTER = 0.3
+# A call without a final status callback this long after dialing is looked up at the carrier
+STATUS_POLL_SECONDS = 90.0
+IDLE_WAIT_SECONDS = 5.0
+
+# Request states
+QUEUED = "queued"
+DIALING = "dialing"
+IN_CALL = "in_call"
+RETRYING = "retrying"
+COMPLETED = "completed"
+FAILED = "failed"
+
+WAITING = (QUEUED, RETRYING)
+ACTIVE = (DIALING, IN_CALL)
+
+# Twilio's final call statuses, and which of them are worth calling back
+FINAL_CALL_STATUSES = ("completed", "busy", "no-answer", "failed", "canceled")
+RETRY_CALL_STATUSES = ("busy", "no-answer")
+
+
+class CarrierError(Exception):
+    """The carrier refused a call; ``retryable`` for rate limits and outages, not for bad numbers"""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class DialRequest:
+    """One queued outbound call and where it has got to"""
+
+    __slots__ = ("request_id", "phone", "source", "url", "status", "attempts", "call_sid", "call_status",
+                 "last_error", "next_attempt_at", "dialed_at", "created_at", "updated_at")
+
+    def __init__(self, request_id: str, phone: str, source: str = "qr_code", url: Optional[str] = None,
+                 status: str = QUEUED, attempts: int = 0, call_sid: Optional[str] = None,
+                 call_status: Optional[str] = None, last_error: Optional[str] = None,
+                 next_attempt_at: float = 0.0, dialed_at: Optional[float] = None,
+                 created_at: Optional[str] = None, updated_at: Optional[str] = None):
+        self.request_id = request_id
+        self.phone = phone
+        self.source = source
+        self.url = url                          # Answer webhook; None for the carrier's default
+        self.status = status
+        self.attempts = attempts
+        self.call_sid = call_sid
+        self.call_status = call_status          # Carrier's status of the latest attempt
+        self.last_error = last_error
+        self.next_attempt_at = next_attempt_at  # Epoch seconds
+        self.dialed_at = dialed_at
+        self.created_at = created_at or datetime.now().isoformat()
+        self.updated_at = updated_at or self.created_at
+
+    def to_dict(self, now: Optional[float] = None) -> Dict:
+        info = {
+            "request_id": self.request_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "call_sid": self.call_sid,
+            "call_status": self.call_status,
+            "source": self.source,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+        if self.status == RETRYING and now is not None:
+            info["retry_in_seconds"] = max(0, round(self.next_attempt_at - now))
+        if self.last_error:
+            info["last_error"] = self.last_error
+        return info
+
+
+# Queue table columns, in DialRequest argument order
+_COLUMNS = {
+    "request_id": "TEXT PRIMARY KEY",
+    "phone": "TEXT NOT NULL",
+    "source": "TEXT",
+    "url": "TEXT",
+    "status": "TEXT NOT NULL",
+    "attempts": "INTEGER NOT NULL DEFAULT 0",
+    "call_sid": "TEXT",
+    "call_status": "TEXT",
+    "last_error": "TEXT",
+    "next_attempt_at": "REAL NOT NULL",
+    "dialed_at": "REAL",
+    "created_at": "TEXT",
+    "updated_at": "TEXT",
+}
+
+
+class CallQueue:
+    """SQLite-backed dial queue; the file survives restarts and is created on first use"""
+
+    def __init__(self, db_path: str = QUEUE_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        if not self._ready:
+            conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS outbound_calls (
+                    {", ".join(f"{field} {kind}" for field, kind in _COLUMNS.items())}
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_outbound_due ON outbound_calls (status, next_attempt_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_outbound_call_sid ON outbound_calls (call_sid)")
+            self._ready = True
+        return conn
+
+    def _query(self, sql: str, params: tuple = ()) -> List[DialRequest]:
+        with self._lock:
+            if not os.path.exists(self.db_path):
+                return []
+            conn = self._connect()
+            try:
+                rows = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM outbound_calls {sql}", params).fetchall()
+            finally:
+                conn.close()
+        return [DialRequest(*row) for row in rows]
+
+    def _write(self, sql: str, params: tuple = ()) -> int:
+        with self._lock:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = self._connect()
+            try:
+                with conn:
+                    return conn.execute(sql, params).rowcount
+            finally:
+                conn.close()
+
+    def add(self, request: DialRequest):
+        self._write(f"INSERT INTO outbound_calls ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    tuple(getattr(request, field) for field in _COLUMNS))
+
+    def save(self, request: DialRequest):
+        request.updated_at = datetime.now().isoformat()
+        fields = [field for field in _COLUMNS if field != "request_id"]
+        self._write(f"UPDATE outbound_calls SET {', '.join(f'{field} = ?' for field in fields)} WHERE request_id = ?",
+                    tuple(getattr(request, field) for field in fields) + (request.request_id,))
+
+    def get(self, request_id: str) -> Optional[DialRequest]:
+        found = self._query("WHERE request_id = ?", (request_id,))
+        return found[0] if found else None
+
+    def by_call_sid(self, call_sid: str) -> Optional[DialRequest]:
+        found = self._query("WHERE call_sid = ?", (call_sid,))
+        return found[0] if found else None
+
+    def due(self, now: float, limit: int) -> List[DialRequest]:
+        return self._query(f"WHERE status IN (?, ?) AND next_attempt_at <= ? "
+                           f"ORDER BY next_attempt_at, created_at LIMIT {int(limit)}", WAITING + (now,))
+
+    def next_due_at(self) -> Optional[float]:
+        with self._lock:
+            if not os.path.exists(self.db_path):
+                return None
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT MIN(next_attempt_at) FROM outbound_calls WHERE status IN (?, ?)",
+                                   WAITING).fetchone()
+            finally:
+                conn.close()
+        return row[0] if row else None
+
+    def active(self) -> List[DialRequest]:
+        return self._query("WHERE status IN (?, ?) ORDER BY dialed_at", ACTIVE)
+
+    def position(self, request: DialRequest) -> int:
+        """Requests ahead of this one in the queue"""
+        return len(self._query("WHERE status IN (?, ?) AND (next_attempt_at < ? OR "
+                               "(next_attempt_at = ? AND created_at < ?))",
+                               WAITING + (request.next_attempt_at, request.next_attempt_at, request.created_at)))
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            if not os.path.exists(self.db_path):
+                return {}
+            conn = self._connect()
+            try:
+                return dict(conn.execute("SELECT status, COUNT(*) FROM outbound_calls GROUP BY status").fetchall())
+            finally:
+                conn.close()
+
+    def recover(self) -> int:
+        """After a restart: requests caught between claiming and the carrier's answer are dialed again"""
+        if not os.path.exists(self.db_path):
+            return 0
+        return self._write("UPDATE outbound_calls SET status = ? WHERE status = ? AND call_sid IS NULL",
+                           (QUEUED, DIALING))
+
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``capacity``"""
+
+    def __init__(self, rate: float, capacity: int = 1, clock: Callable[[], float] = time.time):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._clock = clock
+        self._tokens = float(self.capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + max(0.0, now - self._updated) * self.rate)
+        self._updated = now
+
+    def take(self) -> bool:
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def wait_time(self) -> float:
+        """Seconds until the next token"""
+        with self._lock:
+            self._refill(self._clock())
+            return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+
+def backoff_seconds(attempt: int, base: float = RETRY_BASE_SECONDS, cap: float = RETRY_MAX_SECONDS,
+                    jitter: float = RETRY_JITTER, rng: Callable[[], float] = random.random) -> float:
+    """Exponential delay after the ``attempt``-th failed try, spread by ±``jitter`` so retries do not bunch up"""
+    delay = min(cap, base * 2 ** max(0, attempt - 1))
+    return delay * (1 - jitter + 2 * jitter * rng())
+
+
+class TwilioCarrier:
+    """Places calls with the Twilio REST client; ``client`` is a callable so tests can patch the module's client"""
+
+    def __init__(self, client: Callable[[], object], from_number: str, url: str,
+                 status_callback: Optional[str] = None):
+        self._client = client
+        self.from_number = from_number
+        self.url = url
+        self.status_callback = status_callback
+
+    def dial(self, request: DialRequest) -> str:
+        client = self._client()
+        if client is None:
+            raise CarrierError("Twilio client not initialized", retryable=False)
+        options = {}
+        if self.status_callback:
+            options = {"status_callback": self.status_callback, "status_callback_method": "POST"}
+        try:
+            call = client.calls.create(url=request.url or self.url, to=request.phone, from_=self.from_number,
+                                       method="POST", **options)
+        except Exception as e:
+            status = getattr(e, "status", None)
+            # 4xx other than rate limiting (bad or unverified number) will not get better by retrying
+            raise CarrierError(str(e), retryable=not (isinstance(status, int) and 400 <= status < 500
+                                                      and status != 429))
+        return call.sid
+
+    def status(self, call_sid: str) -> Optional[str]:
+        client = self._client()
+        return client.calls(call_sid).fetch().status if client is not None else None
+
+
+class FakeCarrier:
+    """
+    Offline stand-in for the carrier.
+
+    Accepts at most ``cps`` calls per second (more raise a retryable
+    ``CarrierError`` like a 429) and ends each call ``ring_seconds`` after
+    it was placed with the next scripted outcome for its number, or
+    ``completed``.
+    """
+
+    def __init__(self, outcomes: Optional[Dict[str, List[str]]] = None, cps: Optional[float] = None,
+                 ring_seconds: float = 0.0, clock: Callable[[], float] = time.time):
+        self.outcomes = {phone: list(results) for phone, results in (outcomes or {}).items()}
+        self.cps = cps
+        self.ring_seconds = ring_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.dials: List[tuple] = []         # (time, phone, call_sid)
+        self.rejected = 0
+        self._calls: Dict[str, tuple] = {}   # call_sid -> (ends at, final status)
+
+    def dial(self, request: DialRequest) -> str:
+        with self._lock:
+            now = self._clock()
+            if self.cps is not None and sum(1 for at, _, _ in self.dials if now - at < 1.0) >= self.cps:
+                self.rejected += 1
+                raise CarrierError("429 Too Many Requests")
+            results = self.outcomes.get(request.phone)
+            outcome = results.pop(0) if results else "completed"
+            if outcome == "invalid":
+                raise CarrierError(f"{request.phone} is not a valid phone number", retryable=False)
+            call_sid = f"CAfake{len(self.dials):06d}{uuid.uuid4().hex[:8]}"
+            self.dials.append((now, request.phone, call_sid))
+            self._calls[call_sid] = (now + self.ring_seconds, outcome)
+            return call_sid
+
+    def status(self, call_sid: str) -> Optional[str]:
+        with self._lock:
+            ends_at, outcome = self._calls.get(call_sid, (0.0, None))
+            return outcome if self._clock() >= ends_at else "in-progress"
+
+
+class OutboundDialer:
+    """
+    Paced, retrying dialer over a persistent queue.
+
+    ``submit`` only writes the request; ``pump`` (run by the background
+    worker, or directly in tests) dials due requests while the token bucket
+    and the concurrency cap allow, and looks up calls whose final status
+    never arrived. ``on_call_status`` takes the carrier's status callback.
+    """
+
+    def __init__(self, carrier, queue: Optional[CallQueue] = None, cps: float = CALLS_PER_SECOND,
+                 burst: int = BURST, max_concurrent: int = MAX_CONCURRENT_CALLS, max_attempts: int = MAX_ATTEMPTS,
+                 backoff: Callable[[int], float] = backoff_seconds, clock: Callable[[], float] = time.time):
+        self.carrier = carrier
+        self.queue = queue if queue is not None else CallQueue()
+        self.bucket = TokenBucket(cps, burst, clock)
+        self.max_concurrent = max_concurrent
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._clock = clock
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._pump_lock = threading.Lock()
+        self._stats = {"submitted": 0, "dialed": 0, "retries": 0, "completed": 0, "failed": 0,
+                       "carrier_errors": 0, "paced": 0}
+
+    # Requests
+
+    def submit(self, phone: str, source: str = "qr_code", url: Optional[str] = None) -> DialRequest:
+        request = DialRequest(uuid.uuid4().hex[:16], phone, source, url, next_attempt_at=self._clock())
+        self.queue.add(request)
+        self._stats["submitted"] += 1
+        logger.info(f"Queued outbound call {request.request_id} ({source})")
+        self._wake.set()
+        return request
+
+    def status(self, request_id: str) -> Optional[Dict]:
+        request = self.queue.get(request_id)
+        if request is None:
+            return None
+        info = request.to_dict(self._clock())
+        if request.status in WAITING:
+            info["queue_position"] = self.queue.position(request)
+        return info
+
+    def on_call_status(self, call_sid: str, call_status: Optional[str]) -> Optional[DialRequest]:
+        """Apply a carrier status update; final ones free a slot and may schedule a retry"""
+        request = self.queue.by_call_sid(call_sid) if call_sid else None
+        if request is None or request.status not in ACTIVE:
+            return request
+        request.call_status = call_status
+        if call_status not in FINAL_CALL_STATUSES:
+            request.status = IN_CALL
+        elif call_status == "completed":
+            request.status = COMPLETED
+            self._stats["completed"] += 1
+        elif call_status in RETRY_CALL_STATUSES:
+            self._retry_or_fail(request, f"call {call_status}")
+        else:
+            request.status = FAILED
+            request.last_error = f"call {call_status}"
+            self._stats["failed"] += 1
+        self.queue.save(request)
+        self._wake.set()
+        return request
+
+    def _retry_or_fail(self, request: DialRequest, reason: str):
+        request.last_error = reason
+        if request.attempts >= self.max_attempts:
+            request.status = FAILED
+            self._stats["failed"] += 1
+            logger.info(f"Giving up on outbound call {request.request_id} after {request.attempts} attempts: {reason}")
+            return
+        request.status = RETRYING
+        request.next_attempt_at = self._clock() + self.backoff(request.attempts)
+        self._stats["retries"] += 1
+
+    # Dialing
+
+    def pump(self) -> int:
+        """Dial whatever is due and allowed right now; returns the number of calls placed"""
+        with self._pump_lock:
+            active = self.queue.active()
+            self._poll_stale(active)
+            free = self.max_concurrent - sum(1 for request in active if request.status in ACTIVE)
+            placed = 0
+            for request in self.queue.due(self._clock(), max(0, free)):
+                if not self.bucket.take():
+                    self._stats["paced"] += 1
+                    break
+                self._dial(request)
+                placed += 1
+            return placed
+
+    def _dial(self, request: DialRequest):
+        request.status = DIALING
+        request.attempts += 1
+        request.call_sid = request.call_status = None
+        self.queue.save(request)
+        try:
+            request.call_sid = self.carrier.dial(request)
+        except CarrierError as e:
+            self._stats["carrier_errors"] += 1
+            logger.warning(f"Carrier refused outbound call {request.request_id}: {e}")
+            if e.retryable:
+                self._retry_or_fail(request, str(e))
+            else:
+                request.status = FAILED
+                request.last_error = str(e)
+                self._stats["failed"] += 1
+        else:
+            request.status = IN_CALL
+            request.dialed_at = self._clock()
+            self._stats["dialed"] += 1
+            logger.info(f"Outbound call {request.request_id} placed, SID: {request.call_sid}")
+        self.queue.save(request)
+
+    def _poll_stale(self, active: List[DialRequest]):
+        now = self._clock()
+        for request in active:
+            if request.status != IN_CALL or now - (request.dialed_at or now) < STATUS_POLL_SECONDS:
+                continue
+            try:
+                call_status = self.carrier.status(request.call_sid)
+            except Exception as e:
+                logger.warning(f"Could not look up call {request.call_sid}: {e}")
+                continue
+            if call_status in FINAL_CALL_STATUSES:
+                self.on_call_status(request.call_sid, call_status)
+                request.status = self.queue.get(request.request_id).status
+            else:
+                request.dialed_at = now
+                self.queue.save(request)
+
+    def _next_wake(self) -> float:
+        waits = [IDLE_WAIT_SECONDS, self.bucket.wait_time()]
+        due = self.queue.next_due_at()
+        if due is not None:
+            waits.append(max(0.0, due - self._clock()))
+        return max(0.05, min(waits))
+
+    # Worker
+
+    def start(self) -> "OutboundDialer":
+        with self._start_lock:
+            if self._thread is None:
+                recovered = self.queue.recover()
+                if recovered:
+                    logger.info(f"Re-queued {recovered} outbound calls interrupted by a restart")
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="outbound-dialer", daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.pump()
+                wait = self._next_wake()
+            except Exception as e:
+                logger.error(f"Outbound dialer error: {e}")
+                wait = IDLE_WAIT_SECONDS
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict:
+        return dict(self._stats, queue=self.queue.counts(), cps=self.bucket.rate,
+                    max_concurrent=self.max_concurrent, running=self._thread is not None)
@@ -0,0 +1,221 @@
+"""
+Prompt Builder with Token Accounting
+Assembles LLM prompts from the system instruction, RAG context, history and
+the caller's turn, counting tokens per component. RAG sentences that only
+restate the system instruction are dropped, instructions are rendered
+compactly once, and the stable system prefix comes first so provider-side
+prefix caching can apply. Per-call token and latency stats are logged
+"""
+
+import logging
+import math
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Optional exact tokenizer
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+    TIKTOKEN_AVAILABLE = True
+except Exception:
+    _ENCODING = None
+    TIKTOKEN_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+COMPONENTS = ("system", "context", "history", "user")
+
+# Format the LLM has always seen for RAG-backed questions
+CONTEXT_TEMPLATE = "{context}\n\nCustomer Question: {user}"
+
+# Share of a number-free sentence's words that must appear in the
+# instruction for it to count as a restatement
+REDUNDANT_WORD_SHARE = 0.75
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_WORD_RE = re.compile(r"[a-z]+")
+_NUMBER_RE = re.compile(r"\b\d[\d,]*(?::\d\d)?\b")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_BULLET_RE = re.compile(r"^\s*[-•*]\s+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "between", "by", "cost", "costs", "for", "from", "in",
+    "is", "of", "on", "or", "our", "the", "to", "us", "we", "with", "you", "your"
+}
+
+
+def count_tokens(text: str) -> int:
+    """Token count: exact with tiktoken, otherwise ~4 characters per word piece"""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return sum(math.ceil(len(piece) / 4) for piece in _TOKEN_RE.findall(text))
+
+
+def compact_instruction(text: str) -> str:
+    """
+    Same instruction in fewer tokens: trimmed lines, no blank lines, and
+    short bullets folded onto their heading ("Kids: a; b; c").
+    """
+    lines: List[str] = []
+    folding = False
+    for raw in text.strip().splitlines():
+        line = " ".join(raw.split())
+        if not line:
+            continue
+        bullet = _BULLET_RE.match(line)
+        if bullet and lines and len(line) <= 60 and (folding or lines[-1].endswith(":")):
+            item = line[bullet.end():]
+            lines[-1] = f"{lines[-1]}; {item}" if folding else f"{lines[-1]} {item}"
+            folding = True
+            continue
+        folding = False
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _normalize_number(number: str) -> str:
+    return re.sub(r"\D", "", number)
+
+
+def _stem(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+
+class BuiltPrompt:
+    """A rendered prompt and its token counts per component"""
+    __slots__ = ("messages", "prompt", "tokens", "dropped_context")
+
+    def __init__(self, messages: List[Dict[str, str]], prompt: str, tokens: Dict[str, int], dropped_context: int):
+        self.messages = messages
+        self.prompt = prompt
+        self.tokens = tokens
+        self.dropped_context = dropped_context
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.tokens.values())
+
+    def __repr__(self) -> str:
+        return f"BuiltPrompt(tokens={self.tokens})"
+
+
+class PromptBuilder:
+    """
+    Builds prompts against one system instruction.
+
+    ``send_system`` controls whether the instruction is part of the messages
+    (OpenAI) or already configured on the model (Gemini system_instruction);
+    its tokens are counted either way, since both providers bill them.
+    """
+
+    def __init__(self, system_instruction: str, send_system: bool = True, compact: bool = True):
+        self.system = compact_instruction(system_instruction) if compact else system_instruction.strip()
+        self.send_system = send_system
+        self.system_tokens = count_tokens(self.system)
+        lowered = self.system.lower()
+        self._system_numbers = {_normalize_number(n) for n in _NUMBER_RE.findall(lowered)}
+        self._system_words = {_stem(w) for w in _WORD_RE.findall(lowered)}
+        self._system_lines = [
+            ({_normalize_number(n) for n in _NUMBER_RE.findall(line)}, {_stem(w) for w in _WORD_RE.findall(line)})
+            for line in lowered.splitlines()
+        ]
+        self._lock = threading.Lock()
+        self._totals = {name: 0 for name in COMPONENTS}
+        self._totals.update(calls=0, saved_context_tokens=0, latency_ms=0.0)
+
+    def is_redundant(self, sentence: str) -> bool:
+        """Whether a context sentence only restates facts from the system instruction"""
+        lowered = sentence.lower()
+        numbers = {_normalize_number(n) for n in _NUMBER_RE.findall(lowered)}
+        words = {_stem(w) for w in _WORD_RE.findall(lowered)} - _STOPWORDS
+        if numbers:
+            # Every figure must appear on one instruction line that shares a term with the sentence
+            return any(
+                numbers <= line_numbers and words & line_words
+                for line_numbers, line_words in self._system_lines
+            ) or (numbers <= self._system_numbers and self._word_share(words) >= REDUNDANT_WORD_SHARE)
+        return bool(words) and self._word_share(words) >= REDUNDANT_WORD_SHARE
+
+    def _word_share(self, words: set) -> float:
+        return len(words & self._system_words) / len(words) if words else 1.0
+
+    def dedupe_context(self, context: str) -> Tuple[str, int]:
+        """Context with restated sentences removed, and how many were removed"""
+        if not context:
+            return "", 0
+        kept_lines: List[str] = []
+        dropped = 0
+        for line in context.splitlines():
+            bullet = _BULLET_RE.match(line)
+            body = line[bullet.end():] if bullet else line
+            if not body.strip() or body.rstrip().endswith(":"):
+                kept_lines.append(line)
+                continue
+            sentences = [s for s in _SENTENCE_RE.split(body.strip()) if s]
+            kept = [s for s in sentences if not self.is_redundant(s)]
+            dropped += len(sentences) - len(kept)
+            if kept:
+                kept_lines.append((bullet.group(0) if bullet else "") + " ".join(kept))
+        # A heading with nothing under it is dropped too
+        if not any(l.strip() and not l.rstrip().endswith(":") for l in kept_lines):
+            return "", dropped
+        return "\n".join(kept_lines), dropped
+
+    def build(self, user: str, context: str = "", history: Sequence[Dict[str, str]] = (),
+              notes: Sequence[str] = ()) -> BuiltPrompt:
+        """Messages for one turn; ``notes`` are extra system lines such as the current step"""
+        deduped, dropped = self.dedupe_context(context)
+        prompt = CONTEXT_TEMPLATE.format(context=deduped, user=user) if deduped else user
+
+        # The caller's turn is often already the last history entry
+        history = list(history)
+        if history and history[-1].get("role") == "user" and history[-1].get("content") == user:
+            history.pop()
+
+        messages: List[Dict[str, str]] = []
+        if self.send_system:
+            messages.append({"role": "system", "content": self.system})
+        messages.extend({"role": "system", "content": note} for note in notes)
+        messages.extend(history)
+        messages.append({"role": "user", "content": prompt})
+
+        tokens = {
+            "system": self.system_tokens + sum(count_tokens(note) for note in notes),
+            "context": count_tokens(deduped),
+            "history": sum(count_tokens(message["content"]) for message in history),
+            "user": count_tokens(user)
+        }
+        built = BuiltPrompt(messages, prompt, tokens, dropped)
+        if dropped:
+            with self._lock:
+                self._totals["saved_context_tokens"] += count_tokens(context) - tokens["context"]
+        return built
+
+    def log_call(self, built: BuiltPrompt, latency: float, provider: str = "llm", call_sid: Optional[str] = None):
+        """Log one model call's prompt tokens and latency and add them to the totals"""
+        with self._lock:
+            self._totals["calls"] += 1
+            self._totals["latency_ms"] += latency * 1000
+            for name in COMPONENTS:
+                self._totals[name] += built.tokens[name]
+        logger.info(
+            f"LLM call provider={provider} call={call_sid or '-'} prompt_tokens={built.total_tokens} "
+            + " ".join(f"{name}={built.tokens[name]}" for name in COMPONENTS)
+            + f" dropped_context={built.dropped_context} latency_ms={latency * 1000:.0f}"
+        )
+
+    def stats(self) -> Dict[str, float]:
+        """Mean prompt tokens per component and latency per call"""
+        with self._lock:
+            totals = dict(self._totals)
+        calls = totals["calls"] or 1
+        stats = {f"mean_{name}_tokens": round(totals[name] / calls, 1) for name in COMPONENTS}
+        stats.update(
+            calls=totals["calls"],
+            mean_prompt_tokens=round(sum(totals[name] for name in COMPONENTS) / calls, 1),
+            saved_context_tokens=totals["saved_context_tokens"],
+            mean_latency_ms=round(totals["latency_ms"] / calls, 1)
+        )
+        return stats
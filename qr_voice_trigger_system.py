@@ -13,6 +13,9 @@ from flask import Flask, request, Response, jsonify, render_template_string
 from twilio.rest import Client
 import requests
 from datetime import datetime
+from typing import Optional
+from outbound_dialer import FAILED, CallQueue, OutboundDialer, TwilioCarrier
+from call_admission import DUPLICATE, LIMITED, AdmissionControl, client_ip, normalize_phone
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -24,6 +27,7 @@ TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN', '815e90983ed99b02e52943cc1460
 TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER', '+917019035686')
 WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL', 'https://your-domain.com')
 VOICE_ASSISTANT_URL = os.getenv('VOICE_ASSISTANT_URL', 'https://virtualaisalon.onrender.com/')
+QR_OUTBOUND_QUEUE_DB = os.getenv('QR_OUTBOUND_QUEUE_DB', 'data/qr_outbound_calls.db')
 
 # Initialize Twilio client
 client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
@@ -213,8 +217,11 @@ QR_LANDING_PAGE_TEMPLATE = """
                 if (result.success) {
                     showStatus('Call initiated! We\'ll be calling you shortly...', 'success');
                     callButton.textContent = 'Call Initiated ✓';
+                    if (result.status_url) {
+                        pollCallStatus(result.status_url);
+                    }
                 } else {
-                    showStatus('Failed to initiate call. Please try again.', 'error');
+                    showStatus(result.message || 'Failed to initiate call. Please try again.', 'error');
                     callButton.disabled = false;
                     callButton.textContent = '📞 Call Me Now';
                 }
@@ -226,6 +233,26 @@ QR_LANDING_PAGE_TEMPLATE = """
             }
         });
         
+        async function pollCallStatus(url) {
+            try {
+                const call = await (await fetch(url)).json();
+                if (call.status === 'retrying') {
+                    showStatus("We couldn't reach you. We'll try again in " + call.retry_in_seconds + " seconds.", 'success');
+                } else if (call.status === 'failed') {
+                    showStatus("We couldn't reach you. Please try again.", 'error');
+                    const callButton = document.getElementById('callButton');
+                    callButton.disabled = false;
+                    callButton.textContent = '📞 Call Me Now';
+                    return;
+                }
+                if (call.status !== 'completed') {
+                    setTimeout(() => pollCallStatus(url), 3000);
+                }
+            } catch (error) {
+                setTimeout(() => pollCallStatus(url), 3000);
+            }
+        }
+        
         function showStatus(message, type) {
             const status = document.getElementById('status');
             status.textContent = message;
@@ -250,6 +277,14 @@ class QRVoiceTriggerSystem:
     
     def __init__(self):
         self.qr_codes_generated = {}
+        # Status callbacks go to the voice assistant, so this dialer looks up call outcomes itself
+        self.dialer = OutboundDialer(
+            TwilioCarrier(lambda: client, TWILIO_PHONE_NUMBER, f'{VOICE_ASSISTANT_URL}/voice/incoming',
+                          status_callback=f'{VOICE_ASSISTANT_URL}/voice/status'),
+            CallQueue(QR_OUTBOUND_QUEUE_DB)
+        )
+        # Per-phone and per-IP limits on "Call Me Now", and repeat taps answered with the call already queued
+        self.admission = AdmissionControl()
     
     def generate_qr_code(self, service_id: str = None, source: str = "website") -> dict:
         """Generate QR code data and image"""
@@ -299,22 +334,17 @@ class QRVoiceTriggerSystem:
     def trigger_voice_call(self, phone_number: str, source: str = "qr_code") -> dict:
         """Trigger voice call to customer"""
         try:
-            # Make outbound call to customer
-            call = client.calls.create(
-                url=f'{VOICE_ASSISTANT_URL}/voice/incoming',
-                to=phone_number,
-                from_=TWILIO_PHONE_NUMBER,
-                method='POST',
-                status_callback=f'{VOICE_ASSISTANT_URL}/voice/status',
-                status_callback_method='POST'
-            )
+            # Queue the call; the dialer places it as the carrier's rate limit allows
+            queued = self.dialer.start().submit(phone_number, source)
             
-            logger.info(f"Voice call triggered to {phone_number} from {source}, SID: {call.sid}")
+            logger.info(f"Voice call to {phone_number} from {source} queued as {queued.request_id}")
             
             return {
                 "success": True,
-                "call_sid": call.sid,
-                "message": "Voice call initiated successfully",
+                "request_id": queued.request_id,
+                "status": queued.status,
+                "status_url": f"/trigger-voice-call/{queued.request_id}",
+                "message": "Voice call queued",
                 "phone_number": phone_number,
                 "source": source
             }
@@ -350,12 +380,37 @@ def trigger_voice_call():
                 "message": "Phone number is required"
             }), 400
         
+        phone_number = normalize_phone(phone_number)
+        if not phone_number:
+            return jsonify({
+                "success": False,
+                "message": "Please enter a valid phone number"
+            }), 400
+        
+        # Repeat taps get the call already queued; floods get a 429
+        ip = client_ip(request.remote_addr, request.headers.get('X-Forwarded-For'))
+        admission = qr_system.admission.admit(phone_number, ip)
+        if admission.decision == DUPLICATE and _call_failed(admission.existing):
+            # The earlier call gave up, so the caller may ask again
+            qr_system.admission.release(phone_number)
+            admission = qr_system.admission.admit(phone_number, ip)
+        if admission.decision == LIMITED:
+            retry_after = max(1, int(admission.retry_after + 0.999))
+            reply = jsonify({"success": False, "message": admission.reason, "retry_after": retry_after})
+            reply.headers['Retry-After'] = str(retry_after)
+            return reply, 429
+        if admission.decision == DUPLICATE:
+            return jsonify(_existing_call(admission.existing)), 202
+        
         # Trigger voice call
         result = qr_system.trigger_voice_call(phone_number, source)
         
         if result["success"]:
-            return jsonify(result), 200
+            qr_system.admission.attach(phone_number, result)
+            # Queued, not yet placed; the page polls status_url
+            return jsonify(result), 202
         else:
+            qr_system.admission.release(phone_number)
             return jsonify(result), 500
             
     except Exception as e:
@@ -365,6 +420,29 @@ def trigger_voice_call():
             "message": "Internal server error"
         }), 500
 
+def _call_failed(existing: Optional[dict]) -> bool:
+    status = qr_system.dialer.status(existing["request_id"]) if existing else None
+    return bool(status) and status["status"] == FAILED
+
+def _existing_call(existing: Optional[dict]) -> dict:
+    """Reply for a repeat request: the earlier call, with where it has got to since"""
+    if existing is None:
+        # The first request is still being queued
+        return {"success": True, "duplicate": True, "message": "Call already requested"}
+    reply = dict(existing, duplicate=True, message="Call already requested")
+    status = qr_system.dialer.status(existing["request_id"])
+    if status:
+        reply.update(status=status["status"], call_sid=status.get("call_sid"))
+    return reply
+
+@app.route('/trigger-voice-call/<request_id>', methods=['GET'])
+def voice_call_status(request_id):
+    """Where a queued call has got to, for the landing page to poll"""
+    status = qr_system.dialer.status(request_id)
+    if status is None:
+        return jsonify({"success": False, "message": "Unknown call request"}), 404
+    return jsonify(dict(status, success=True)), 200
+
 @app.route('/api/qr/generate', methods=['GET'])
 def generate_qr_code():
     """Generate QR code for voice booking"""
@@ -404,7 +482,7 @@ def api_trigger_voice_call():
         # Trigger voice call
         result = qr_system.trigger_voice_call(phone_number, source)
         
-        return jsonify(result), 200 if result["success"] else 500
+        return jsonify(result), 202 if result["success"] else 500
         
     except Exception as e:
         logger.error(f"Error in API trigger voice call: {e}")
@@ -438,7 +516,9 @@ def health_check():
         "status": "healthy",
         "service": "QR Voice Trigger System",
         "timestamp": datetime.now().isoformat(),
-        "qr_codes_generated": len(qr_system.qr_codes_generated)
+        "qr_codes_generated": len(qr_system.qr_codes_generated),
+        "outbound_calls": qr_system.dialer.stats(),
+        "call_admission": qr_system.admission.stats()
     })
 
 # Integration with existing booking system
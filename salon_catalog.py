@@ -0,0 +1,63 @@
+"""
+Salon Catalog for Goodness Glamour Salon
+Single source of salon details, services, pricing and spoken service aliases
+"""
+
+from typing import Dict
+
+# Salon Information
+SALON_INFO = {
+    "name": "Goodness Glamour Salon",
+    "phone": "9036626642",
+    "email": "2akonsultant@gmail.com",
+    "hours": "Monday - Sunday, 9:00 AM - 8:00 PM",
+    "service_type": "Doorstep beauty services"
+}
+
+# Neighbourhoods the doorstep service covers
+SERVICE_AREAS = (
+    "Indiranagar", "Koramangala", "HSR Layout", "BTM Layout", "Jayanagar", "JP Nagar", "Whitefield",
+    "Marathahalli", "Bellandur", "Sarjapur Road", "Electronic City", "Banashankari", "Basavanagudi",
+    "Malleshwaram", "Rajajinagar", "Hebbal", "Yelahanka", "MG Road", "Ulsoor", "Domlur", "Frazer Town"
+)
+
+# Days the salon takes bookings (matches SALON_INFO["hours"])
+OPEN_DAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+# Services and Pricing
+SERVICES = {
+    "women": {
+        "haircut": {"name": "Women's Haircut & Styling", "price": "₹400-1,200", "duration": "60 minutes"},
+        "coloring": {"name": "Hair Coloring & Highlights", "price": "₹1,200-3,500", "duration": "120 minutes"},
+        "treatment": {"name": "Hair Treatment & Spa", "price": "₹600-2,000", "duration": "90 minutes"},
+        "bridal": {"name": "Bridal & Party Styling", "price": "₹800-2,500", "duration": "90 minutes"},
+        "blowdry": {"name": "Professional Blowdry", "price": "₹250-600", "duration": "45 minutes"},
+        "hairwash": {"name": "Hair Wash & Styling", "price": "₹200-450", "duration": "30 minutes"},
+        "consultation": {"name": "Hair Consultation", "price": "₹150-300", "duration": "30 minutes"}
+    },
+    "kids": {
+        "haircut": {"name": "Kids Haircuts", "price": "₹150-500", "duration": "30 minutes"},
+        "party": {"name": "Party Styling", "price": "₹200-600", "duration": "45 minutes"},
+        "hairwash": {"name": "Kids Hair Wash", "price": "₹100-300", "duration": "20 minutes"},
+        "braiding": {"name": "Creative Braiding", "price": "₹150-400", "duration": "30 minutes"}
+    }
+}
+
+# Spoken aliases per service, checked in order (first match wins)
+SERVICE_KEYWORDS = {
+    "haircut": ["haircut", "hair cut", "cut", "trim"],
+    "coloring": ["color", "colour", "coloring", "highlight", "dye"],
+    "treatment": ["treatment", "spa", "keratin", "therapy"],
+    "bridal": ["bridal", "wedding", "party", "styling"],
+    "blowdry": ["blowdry", "blow dry", "style"],
+    "hairwash": ["hairwash", "hair wash", "wash", "shampoo", "clean"],
+    "consultation": ["consultation", "advice", "consult"]
+}
+
+
+def get_service_info(service: str) -> Dict:
+    """Get catalog entry for a service key"""
+    for category in SERVICES.values():
+        if service in category:
+            return category[service]
+    return {"name": "Service", "price": "Contact us", "duration": "Varies"}
@@ -0,0 +1,169 @@
+"""
+Catalog FAQ Answerer
+Answers the common caller questions (hours, open days, prices, durations,
+services, doorstep visits, contact details) straight from the salon catalog,
+so they never wait on an LLM and always agree with the catalog. Returns None
+on a low-confidence match so the caller can fall back to the LLM
+"""
+
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from booking_datetime import SALON_CLOSE, SALON_OPEN, format_time
+from salon_catalog import OPEN_DAYS, SALON_INFO, SERVICE_KEYWORDS, SERVICES
+
+# Below this an answer is not trusted and the LLM takes the turn
+MIN_CONFIDENCE = 0.6
+
+_DAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+_KIDS_RE = re.compile(r"\b(?:kids?|child(?:ren)?|daughter|son|boy|girl|baby)\b")
+_SERVICE_RES: List[Tuple[str, "re.Pattern[str]"]] = [
+    (service, re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + r")"))
+    for service, keywords in list(SERVICE_KEYWORDS.items()) + [("braiding", ["braid"])]
+]
+
+# (intent, cue pattern, confidence when the cue matches)
+_INTENT_CUES: List[Tuple[str, "re.Pattern[str]", float]] = [
+    ("price", re.compile(r"\b(?:price|prices|pricing|cost|costs|charge|charges|rate|rates|fee|fees|how much|rupees)\b"), 0.9),
+    ("duration", re.compile(r"\bhow long\b|\b(?:duration|take|takes)\b.*\b(?:long|time|minutes|hours?)\b"), 0.85),
+    ("open_day", re.compile(r"\b(?:open|working|work)\b.*\b(?:" + "|".join(_DAYS) + r"|today|tomorrow|weekends?|holidays?)\b"), 0.9),
+    ("hours", re.compile(r"\b(?:timings?|hours|open|opening|close|closing|shut)\b"), 0.85),
+    ("home_service", re.compile(r"\b(?:come (?:to )?(?:my )?(?:home|house|place)|home (?:service|visits?)|doorstep|"
+                                r"at home|areas?|locations?|where are you|located|shop|salon address|your address)\b"), 0.8),
+    ("contact", re.compile(r"\b(?:phone number|your number|contact|call you|email|whatsapp|reach you)\b"), 0.85),
+    ("services", re.compile(r"\b(?:what|which) services\b|\bservices (?:do you|you) (?:offer|provide|have)\b|"
+                            r"\bdo you (?:do|offer|provide)\b|\bmenu\b"), 0.75),
+]
+
+_QUESTION_RE = re.compile(r"\?|^\s*(?:what|when|where|which|how|do|does|is|are|can|could|tell me)\b")
+
+
+class FaqAnswer:
+    """A catalog answer and how sure the matcher is"""
+    __slots__ = ("intent", "text", "confidence")
+
+    def __init__(self, intent: str, text: str, confidence: float):
+        self.intent = intent
+        self.text = text
+        self.confidence = confidence
+
+    def __repr__(self) -> str:
+        return f"FaqAnswer(intent={self.intent!r}, confidence={self.confidence:.2f})"
+
+
+def _compile_catalog() -> Dict[str, str]:
+    """Pre-render the answers that don't depend on the question"""
+    hours = f"{format_time(SALON_OPEN)} to {format_time(SALON_CLOSE)}"
+    if len(OPEN_DAYS) == 7:
+        days = "every day"
+    else:
+        days = ", ".join(day.capitalize() for day in OPEN_DAYS)
+    women = ", ".join(entry["name"] for entry in SERVICES["women"].values())
+    kids = ", ".join(entry["name"] for entry in SERVICES["kids"].values())
+    price_list = "; ".join(
+        f"{entry['name']} {entry['price']}" for entry in SERVICES["women"].values()
+    )
+    kids_from = min(
+        int(re.sub(r"\D", "", entry["price"].split("-")[0])) for entry in SERVICES["kids"].values()
+    )
+    return {
+        "hours": f"We're open {days}, {hours}.",
+        "price_list": f"Our prices: {price_list}. Kids services start at ₹{kids_from}.",
+        "services": f"For women we offer {women}. For kids: {kids}.",
+        "home_service": f"Yes! {SALON_INFO['name']} is a doorstep service, so our stylist comes to your home. "
+                        f"Just share your address when you book.",
+        "contact": f"You can call us on {SALON_INFO['phone']} or email {SALON_INFO['email']}.",
+        "open_hours": hours
+    }
+
+
+_ANSWERS = _compile_catalog()
+
+
+def _price_reply(entry: Dict[str, str]) -> str:
+    return f"{entry['name']} is {entry['price']} and takes about {entry['duration']}."
+
+
+def _duration_reply(entry: Dict[str, str]) -> str:
+    return f"{entry['name']} takes about {entry['duration']}."
+
+
+def _offer_reply(entry: Dict[str, str]) -> str:
+    return f"Yes, we offer {entry['name']} at {entry['price']}."
+
+
+def catalog_phrases() -> List[str]:
+    """Every answer that depends only on the catalog, e.g. for pre-rendering audio"""
+    phrases = [text for intent, text in _ANSWERS.items() if intent != "open_hours"]
+    for category in SERVICES.values():
+        for entry in category.values():
+            phrases.extend((_price_reply(entry), _duration_reply(entry), _offer_reply(entry)))
+    return phrases
+
+
+def _service_entry(text: str) -> Optional[Dict[str, str]]:
+    category = SERVICES["kids"] if _KIDS_RE.search(text) else SERVICES["women"]
+    for service, pattern in _SERVICE_RES:
+        if pattern.search(text):
+            return category.get(service) or SERVICES["women"].get(service) or SERVICES["kids"].get(service)
+    return None
+
+
+def _open_day_answer(text: str) -> str:
+    asked = [day for day in _DAYS if day in text]
+    if "weekend" in text:
+        asked = ["saturday", "sunday"]
+    closed = [day for day in asked if day not in OPEN_DAYS]
+    if closed:
+        return f"Sorry, we're closed on {closed[0].capitalize()}. " + _ANSWERS["hours"]
+    if "weekend" in text:
+        when = "on weekends"
+    elif len(asked) == 1:
+        when = f"on {asked[0].capitalize()}"
+    else:
+        when = "tomorrow" if "tomorrow" in text else "today" if "today" in text else "every day"
+    return f"Yes, we're open {when}, {_ANSWERS['open_hours']}."
+
+
+def answer_faq(text: str) -> Optional[FaqAnswer]:
+    """Catalog answer for a caller question, or None when not confident"""
+    lowered = text.lower()
+    for intent, cue, confidence in _INTENT_CUES:
+        if not cue.search(lowered):
+            continue
+        if not _QUESTION_RE.search(lowered):
+            confidence -= 0.15
+
+        if intent == "price":
+            entry = _service_entry(lowered)
+            if entry:
+                reply = _price_reply(entry)
+            else:
+                reply, confidence = _ANSWERS["price_list"], confidence - 0.1
+        elif intent == "duration":
+            entry = _service_entry(lowered)
+            if not entry:
+                continue
+            reply = _duration_reply(entry)
+        elif intent == "open_day":
+            reply = _open_day_answer(lowered)
+        elif intent == "services" and _service_entry(lowered):
+            entry = _service_entry(lowered)
+            reply = _offer_reply(entry)
+        else:
+            reply = _ANSWERS[intent]
+
+        if confidence < MIN_CONFIDENCE:
+            return None
+        return FaqAnswer(intent, reply, confidence)
+    return None
+
+
+if __name__ == "__main__":
+    questions = ["how much is a haircut?", "are you open on sunday", "do you come home", "what are your timings"]
+    started = time.perf_counter()
+    for _ in range(2000):
+        for question in questions:
+            answer_faq(question)
+    print(f"{(time.perf_counter() - started) / (2000 * len(questions)) * 1e6:.1f} µs per answer")
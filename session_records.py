@@ -0,0 +1,198 @@
+"""
+Session Records for Voice Bookings
+Compact __slots__ records for per-call session and booking state, a bounded
+transcript ring buffer and a sizeof report, so thousands of live or lingering
+calls stay cheap to hold in memory
+"""
+
+import sys
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+# Turns kept per call; the LLM only ever sees the last few
+TRANSCRIPT_CAPACITY = 12
+
+# Longest caller utterance kept in the transcript
+MAX_USER_TEXT = 240
+
+# Distinct registered prompts that get a shared id
+MAX_INTERNED_PROMPTS = 2048
+
+_ROLES = ("user", "assistant", "system")
+_ROLE_CODES = {role: code for code, role in enumerate(_ROLES)}
+
+_prompt_ids: Dict[str, int] = {}
+_prompts: List[str] = []
+_prompts_lock = threading.Lock()
+
+
+def register_prompts(texts: Iterable[str]):
+    """
+    Give fixed assistant prompts a shared id. Only static wording belongs
+    here: LLM replies and booking read-backs carry the caller's details and
+    stay in their own call's transcript
+    """
+    with _prompts_lock:
+        for text in texts:
+            if text in _prompt_ids or len(_prompts) >= MAX_INTERNED_PROMPTS:
+                continue
+            _prompts.append(text)
+            _prompt_ids[text] = len(_prompts) - 1
+
+
+def intern_prompt(text: str) -> Union[int, str]:
+    """Shared id for a registered prompt, otherwise the text itself"""
+    prompt_id = _prompt_ids.get(text)
+    return text if prompt_id is None else prompt_id
+
+
+def prompt_text(item: Union[int, str]) -> str:
+    return _prompts[item] if isinstance(item, int) else item
+
+
+class TranscriptBuffer:
+    """
+    Fixed-capacity ring of conversation turns.
+
+    Registered assistant prompts are stored as shared ids, other assistant
+    turns as their text and caller turns as trimmed text; the oldest turn is overwritten once the ring is full.
+    Turns come back as {"role", "content"} dicts ready for a chat API.
+    """
+    __slots__ = ("_roles", "_items", "_start", "_size")
+
+    def __init__(self, capacity: int = TRANSCRIPT_CAPACITY):
+        self._roles = bytearray(capacity)
+        self._items: List[Union[int, str, None]] = [None] * capacity
+        self._start = 0
+        self._size = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._items)
+
+    def append(self, role: str, content: str):
+        if role == "assistant":
+            item = intern_prompt(content)
+        else:
+            item = " ".join(content.split())[:MAX_USER_TEXT]
+        capacity = len(self._items)
+        index = (self._start + self._size) % capacity
+        self._roles[index] = _ROLE_CODES[role]
+        self._items[index] = item
+        if self._size < capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % capacity
+
+    def recent(self, count: Optional[int] = None) -> List[Dict[str, str]]:
+        """Last ``count`` turns (all kept turns by default), oldest first"""
+        count = self._size if count is None else min(count, self._size)
+        capacity = len(self._items)
+        first = self._start + self._size - count
+        return [
+            {"role": _ROLES[self._roles[i % capacity]], "content": prompt_text(self._items[i % capacity])}
+            for i in range(first, first + count)
+        ]
+
+    def clear(self):
+        self._items[:] = [None] * len(self._items)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        return iter(self.recent())
+
+    def __repr__(self) -> str:
+        return f"TranscriptBuffer({self._size}/{len(self._items)} turns)"
+
+
+class BookingData:
+    """Booking details collected during a call"""
+    __slots__ = ("customer_name", "phone", "service", "date", "time", "address", "notes")
+
+    def __init__(self, customer_name: str = "", phone: str = "", service: str = "", date: str = "",
+                 time: str = "", address: str = "", notes: str = ""):
+        self.customer_name = customer_name
+        self.phone = phone
+        self.service = service
+        self.date = date
+        self.time = time
+        self.address = address
+        self.notes = notes
+
+    def to_dict(self) -> Dict[str, str]:
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, BookingData):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        filled = ", ".join(f"{k}={v!r}" for k, v in self.to_dict().items() if v)
+        return f"BookingData({filled})"
+
+
+class ConversationState:
+    """Per-call conversation state"""
+    __slots__ = ("session_id", "customer_name", "phone", "current_step", "booking_data", "conversation_history")
+
+    def __init__(self, session_id: str, customer_name: Optional[str] = None, phone: Optional[str] = None,
+                 current_step: str = "greeting", booking_data: Optional[BookingData] = None,
+                 conversation_history: Optional[TranscriptBuffer] = None):
+        self.session_id = session_id
+        self.customer_name = customer_name
+        self.phone = phone
+        self.current_step = current_step
+        self.booking_data = booking_data if booking_data is not None else BookingData()
+        self.conversation_history = conversation_history if conversation_history is not None else TranscriptBuffer()
+
+    def __repr__(self) -> str:
+        return f"ConversationState(session_id={self.session_id!r}, current_step={self.current_step!r})"
+
+
+def sizeof(obj, _seen: Optional[set] = None) -> int:
+    """Deep size in bytes of a record, following slots and containers"""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(sizeof(k, seen) + sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(sizeof(item, seen) for item in obj)
+    elif not isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        for cls in type(obj).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                if hasattr(obj, slot):
+                    size += sizeof(getattr(obj, slot), seen)
+        if hasattr(obj, "__dict__"):
+            size += sizeof(obj.__dict__, seen)
+    return size
+
+
+def sizeof_report(sessions: Dict[str, ConversationState]) -> Dict[str, int]:
+    """Memory held by a session table: count, total and mean bytes per session"""
+    sizes = [sizeof(session) for session in sessions.values()]
+    return {
+        "sessions": len(sizes),
+        "total_bytes": sum(sizes),
+        "mean_bytes": sum(sizes) // len(sizes) if sizes else 0,
+        "max_bytes": max(sizes, default=0),
+        "interned_prompts": len(_prompts)
+    }
+
+
+if __name__ == "__main__":
+    idle = {f"CA{i:032x}": ConversationState(f"CA{i:032x}", phone=f"+9198450{i:05d}") for i in range(1000)}
+    print("idle:", sizeof_report(idle))
+    register_prompts(["Great! What's your name?"])
+    for session in idle.values():
+        session.conversation_history.append("user", "Hi, I'd like to book a haircut tomorrow at 4 pm")
+        session.conversation_history.append("assistant", "Great! What's your name?")
+    print("after one exchange:", sizeof_report(idle))
@@ -0,0 +1,155 @@
+"""
+Single-Flight Request Coalescing
+Concurrent identical requests (same normalized query and context) share one
+in-flight computation and its result instead of each hitting RAG search or
+the LLM. Waiter counts per key show how much traffic coalescing absorbs
+"""
+
+import asyncio
+import hashlib
+import re
+import threading
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+_NON_WORD_RE = re.compile(r"[^\w\s₹]+")
+
+# Keys tracked in the coalescing leaderboard
+MAX_TRACKED_KEYS = 256
+TOP_KEYS = 10
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, punctuation-free, single-spaced form of a caller query"""
+    return " ".join(_NON_WORD_RE.sub(" ", text.lower()).split())
+
+
+def flight_key(query: str, context: str = "") -> str:
+    """Coalescing key: the normalized query plus a hash of the context it is answered with"""
+    digest = hashlib.blake2b(context.encode("utf-8"), digest_size=8).hexdigest()
+    return f"{normalize_query(query)}|{digest}"
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error = None
+        self.waiters = 0
+
+
+class _FlightStats:
+    """Counters shared by the thread and asyncio variants"""
+
+    def __init__(self):
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.by_key: Counter = Counter()
+
+    def joined(self, key: str):
+        self.coalesced += 1
+        if key in self.by_key or len(self.by_key) < MAX_TRACKED_KEYS:
+            self.by_key[key] += 1
+
+    def snapshot(self, in_flight: Dict[str, int]) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": in_flight,
+            "top_coalesced": dict(self.by_key.most_common(TOP_KEYS))
+        }
+
+
+class SingleFlight:
+    """
+    Thread-safe single-flight group.
+
+    The first caller for a key runs ``fn``; callers arriving while it runs
+    wait for and share its result (or exception). Nothing is cached once the
+    flight lands.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._stats = _FlightStats()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """(result, shared) where ``shared`` is True for callers that joined another flight"""
+        with self._lock:
+            self._stats.calls += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self._stats.joined(key)
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self._stats.executions += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+        return flight.result, False
+
+    def waiters(self) -> Dict[str, int]:
+        """Callers currently waiting on each in-flight key"""
+        with self._lock:
+            return {key: flight.waiters for key, flight in self._flights.items()}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._stats.snapshot({key: flight.waiters for key, flight in self._flights.items()})
+
+
+class AsyncSingleFlight:
+    """Event-loop single-flight group; one in-flight task per key"""
+
+    def __init__(self):
+        self._flights: Dict[str, "asyncio.Future"] = {}
+        self._waiters: Dict[str, int] = {}
+        self._stats = _FlightStats()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """(result, shared) where ``shared`` is True for callers that joined another flight"""
+        self._stats.calls += 1
+        flight = self._flights.get(key)
+        if flight is not None:
+            self._waiters[key] += 1
+            self._stats.joined(key)
+            # shield: a cancelled waiter must not cancel the leader's work
+            return await asyncio.shield(flight), True
+
+        flight = asyncio.ensure_future(fn())
+        self._flights[key] = flight
+        self._waiters[key] = 0
+        self._stats.executions += 1
+        try:
+            return await asyncio.shield(flight), False
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+                del self._waiters[key]
+
+    def waiters(self) -> Dict[str, int]:
+        return dict(self._waiters)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._stats.snapshot(dict(self._waiters))
@@ -0,0 +1,186 @@
+"""
+Multi-Slot Extractor for Voice Bookings
+Pulls every booking detail (name, phone, service, date, time, address) out of
+a single utterance so the conversation can skip questions already answered
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from booking_datetime import format_date, format_time, is_within_salon_hours, parse_date, parse_time
+from salon_catalog import SERVICE_KEYWORDS
+
+# Order in which the booking conversation asks for slots
+SLOT_ORDER = ("customer_name", "service", "date", "time", "address")
+
+# Conversation step that asks for each slot
+SLOT_STEPS = {
+    "customer_name": "get_name",
+    "phone": "get_phone",
+    "service": "get_service",
+    "date": "get_date",
+    "time": "get_time",
+    "address": "get_address"
+}
+
+STEP_SLOTS = {step: slot for slot, step in SLOT_STEPS.items()}
+
+# Words that follow "I'm" / "this is" but are not names
+NAME_STOPWORDS = {
+    "a", "an", "the", "not", "just", "here", "fine", "good", "okay", "ok", "ready",
+    "looking", "calling", "interested", "trying", "planning", "going", "wanting",
+    "free", "available", "busy", "from", "at", "in", "on", "sure", "yes", "no",
+    "hi", "hello", "hey", "yeah", "yep", "well", "so", "um", "uh", "my", "name",
+    "i", "i'm", "im", "it's", "its", "this", "is", "want", "would", "like", "need",
+    "book", "booking", "appointment", "today", "tomorrow", "please", "thanks", "thank",
+    # Follow-words of "I'm" / "it's" in answers to later steps: "I'm thinking friday", "it's for my daughter"
+    "for", "sorry", "thinking", "new", "wondering", "asking", "hoping", "afraid", "glad", "happy",
+    "also", "still", "only", "really", "actually", "probably", "already", "back", "done", "with",
+    "to", "about", "there", "great", "home", "away", "late", "early", "running", "waiting",
+    "coming", "getting", "having", "doing", "confused", "unsure", "after", "around", "near"
+}
+
+_NAME_CUE_RE = re.compile(
+    r"\b(?:my name is|my name's|name is|this is|call me|i am|i'm|im|it's)\s+([a-z][a-z'.-]*)",
+    re.IGNORECASE
+)
+
+_PHONE_RE = re.compile(r"(?:\+?91[\s-]?)?([6-9](?:[\s-]?\d){9})\b")
+
+_SERVICE_PATTERNS: List[Tuple[str, "re.Pattern[str]"]] = [
+    (service, re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + r")", re.IGNORECASE))
+    for service, keywords in SERVICE_KEYWORDS.items()
+]
+
+# "at 4, 12 MG Road": the number after "at" is the time when a clock hour is followed by a comma or "and"
+_ADDRESS_RE = re.compile(
+    r"(?<!:)\b(?!(?<=\bat )(?:1[0-2]|0?[1-9])(?::[0-5]\d)?\s*(?:,|and\b))(\d+[a-z]?(?:[/-]\d+[a-z]?)?(?!\s*(?:[ap]\.?m\b|o'?clock)),?\s+[^.?!]*?\b(?:street|st|road|rd|lane|nagar|colony|layout|"
+    r"apartments?|flat|block|sector|cross|main|avenue|phase|society|tower|circle|marg)\b[^.?!]*)",
+    re.IGNORECASE
+)
+
+_BOOKING_WORDS_RE = re.compile(r"\b(?:book|appointment|schedule|service)", re.IGNORECASE)
+
+
+def _clean_name(word: str) -> Optional[str]:
+    word = word.strip(" ,.!?'-")
+    if not word or word.lower() in NAME_STOPWORDS or not word.isalpha():
+        return None
+    return word.capitalize()
+
+
+def extract_name(text: str) -> Optional[str]:
+    """Name introduced with a cue such as "my name is" or "I'm" """
+    for match in _NAME_CUE_RE.finditer(text):
+        name = _clean_name(match.group(1))
+        if name:
+            return name
+    return None
+
+
+def extract_phone(text: str) -> Optional[str]:
+    """Ten-digit Indian mobile number, with or without +91"""
+    match = _PHONE_RE.search(text)
+    if match:
+        return re.sub(r"\D", "", match.group(1))
+    return None
+
+
+def identify_service(text: str) -> Optional[str]:
+    """Catalog service key mentioned in the text"""
+    for service, pattern in _SERVICE_PATTERNS:
+        if pattern.search(text):
+            return service
+    return None
+
+
+def extract_date(text: str, now: Optional[datetime] = None) -> Optional[str]:
+    """Spoken date that can still be booked, formatted like "Monday, October 20" (plus the year if not this year's)"""
+    today = (now or datetime.now()).date()
+    appointment_date = parse_date(text, today)
+    if appointment_date is None or appointment_date < today:
+        return None
+    return format_date(appointment_date, today)
+
+
+def extract_time(text: str, bare_hour: bool = False) -> Optional[str]:
+    """Spoken time inside salon hours, formatted like "4 PM" or "4:30 PM" """
+    appointment_time = parse_time(text, bare_hour=bare_hour)
+    if appointment_time is None or not is_within_salon_hours(appointment_time):
+        return None
+    return format_time(appointment_time)
+
+
+def extract_address(text: str) -> Optional[str]:
+    """Street address starting with a house/door number"""
+    match = _ADDRESS_RE.search(text)
+    if match:
+        return match.group(1).strip(" ,")
+    return None
+
+
+def has_booking_intent(text: str) -> bool:
+    """Whether the caller is asking to book"""
+    return bool(_BOOKING_WORDS_RE.search(text))
+
+
+def extract_slots(text: str, current_step: Optional[str] = None) -> Dict[str, str]:
+    """
+    Extract every slot mentioned in one utterance.
+
+    Slots are only taken from explicit cues, except for the slot the current
+    step asked for, which falls back to the looser per-step interpretation
+    (first word for a name, a bare hour for a time). At the address step the
+    whole answer is the address; the address pattern only picks addresses out
+    of answers to other steps. Dates in the past and times outside salon
+    hours are dropped so the caller is asked again.
+    """
+    text = text.strip()
+    slots: Dict[str, str] = {}
+    if not text:
+        return slots
+
+    extractors = (
+        ("customer_name", extract_name),
+        ("phone", extract_phone),
+        ("service", identify_service),
+        # Flat and door numbers ("12/4") look like dates; an address answer carries no date
+        ("date", extract_date if current_step != "get_address" else lambda value: None),
+        ("time", lambda value: extract_time(value, bare_hour=current_step == "get_time")),
+        ("address", extract_address)
+    )
+    for slot, extractor in extractors:
+        value = extractor(text)
+        if value:
+            slots[slot] = value
+
+    asked_slot = STEP_SLOTS.get(current_step or "")
+    if asked_slot == "address" and len(text) > 10:
+        # The answer to "what's your address" is the address, flat and door numbers included
+        slots["address"] = text
+    elif asked_slot and asked_slot not in slots:
+        fallback = _step_fallback(asked_slot, text, slots)
+        if fallback:
+            slots[asked_slot] = fallback
+    return slots
+
+
+def _step_fallback(slot: str, text: str, found: Dict[str, str]) -> Optional[str]:
+    if slot == "customer_name":
+        # First word that isn't filler or part of another slot ("Priya, tomorrow at 4")
+        taken = " ".join(found.values()).lower()
+        for word in re.split(r"[\s,]+", text):
+            name = _clean_name(word)
+            if name and name.lower() not in taken and not identify_service(word) \
+                    and not parse_date(word) and not parse_time(word):
+                return name
+    return None
+
+
+def next_missing_step(filled: Dict[str, Any], slot_order: Tuple[str, ...] = SLOT_ORDER) -> str:
+    """Step asking for the first empty slot, or confirmation when all are filled"""
+    for slot in slot_order:
+        if not filled.get(slot):
+            return SLOT_STEPS[slot]
+    return "confirm_booking"
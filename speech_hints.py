@@ -0,0 +1,216 @@
+"""
+Speech Recognition Settings per Booking Step
+Vocabulary hints for every <Gather> generated from the salon catalog
+(service names and spoken aliases, open days, time phrases, service areas),
+the recognition language, speech model and end-of-speech timeouts chosen
+for each booking step, TwiML compiled once per step, and per-step re-prompt
+rates so the effect of the hints on recognition can be measured
+"""
+
+import calendar
+import logging
+import os
+import threading
+from datetime import datetime
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from booking_datetime import SALON_CLOSE, SALON_OPEN
+from endpointing import DEFAULT_ENDPOINTING, load_table
+from salon_catalog import OPEN_DAYS, SERVICE_AREAS, SERVICE_KEYWORDS, SERVICES
+from twiml_cache import TwiMLTemplate
+
+logger = logging.getLogger(__name__)
+
+# One language for every Gather (callers are in India; config.VOICE_LANGUAGE agrees)
+SPEECH_LANGUAGE = os.getenv('SPEECH_LANGUAGE', 'en-IN')
+
+# Twilio speech models: phone_call for free-form speech, numbers_and_commands for short answers
+PHONE_CALL = "phone_call"
+NUMBERS_AND_COMMANDS = "numbers_and_commands"
+
+# Twilio accepts up to 500 hints of at most 100 characters each
+MAX_HINTS = 500
+MAX_HINT_CHARS = 100
+
+DEFAULT_STEP = "greeting"
+
+
+def _spoken(text: str) -> str:
+    return " ".join(text.replace("&", "and").split())
+
+
+def service_hints() -> List[str]:
+    """Catalog service names and every spoken alias"""
+    names = [_spoken(service["name"]) for category in SERVICES.values() for service in category.values()]
+    aliases = [alias for keywords in SERVICE_KEYWORDS.values() for alias in keywords]
+    return names + aliases
+
+
+def date_hints() -> List[str]:
+    """Relative days, open weekdays and month names"""
+    days = [day.capitalize() for day in OPEN_DAYS]
+    return (["today", "tomorrow", "day after tomorrow", "this weekend", "next week"]
+            + days + [f"next {day}" for day in days] + list(calendar.month_name[1:]) + ["$DAY", "$MONTH"])
+
+
+def time_hints() -> List[str]:
+    """Bookable hours as callers say them, plus parts of the day"""
+    hours = []
+    for hour in range(SALON_OPEN.hour, SALON_CLOSE.hour + 1):
+        clock = datetime(2000, 1, 1, hour).strftime("%I %p").lstrip("0")
+        hours.extend([clock, f"{clock[:-3]}:30 {clock[-2:]}"] if hour < SALON_CLOSE.hour else [clock])
+    return hours + ["o'clock", "half past", "quarter past", "noon", "morning", "afternoon", "evening", "$TIME"]
+
+
+def address_hints() -> List[str]:
+    """Service areas and the words Indian addresses are made of"""
+    return list(SERVICE_AREAS) + ["Main Road", "Cross", "Layout", "Nagar", "Block", "Phase", "Stage",
+                                  "Apartments", "Flat", "Floor", "near", "opposite", "$ADDRESSNUM"]
+
+
+BOOKING_HINTS = ["book an appointment", "appointment", "booking", "price", "doorstep", "home service"]
+NAME_HINTS = ["my name is", "this is", "I am"]
+CONFIRM_HINTS = ["yes", "no", "yes please", "confirm", "correct", "change", "cancel", "haan", "nahi"]
+
+# step -> (speech model, hint groups)
+STEP_SPEECH: Dict[str, Tuple[str, Tuple[Callable[[], List[str]], ...]]] = {
+    "greeting": (PHONE_CALL, (lambda: BOOKING_HINTS, service_hints)),
+    "get_name": (PHONE_CALL, (lambda: NAME_HINTS,)),
+    "get_phone": (NUMBERS_AND_COMMANDS, (lambda: ["$OOV_CLASS_DIGIT_SEQUENCE", "plus nine one", "double", "triple"],)),
+    "get_service": (PHONE_CALL, (service_hints,)),
+    "get_date": (NUMBERS_AND_COMMANDS, (date_hints,)),
+    "get_time": (NUMBERS_AND_COMMANDS, (time_hints,)),
+    "get_address": (PHONE_CALL, (address_hints,)),
+    "confirm_booking": (NUMBERS_AND_COMMANDS, (lambda: CONFIRM_HINTS,)),
+}
+
+
+def join_hints(hints: Iterable[str]) -> str:
+    """Twilio's comma-separated hints attribute: deduplicated, in order, within its limits"""
+    unique: Dict[str, str] = {}
+    for hint in hints:
+        hint = hint.replace(",", " ").strip()
+        if hint and len(hint) <= MAX_HINT_CHARS:
+            unique.setdefault(hint.lower(), hint)
+    return ", ".join(list(unique.values())[:MAX_HINTS])
+
+
+class GatherProfile:
+    """Recognition settings for one booking step, as keyword arguments for ``response.gather``"""
+
+    __slots__ = ("step", "language", "speech_model", "hints", "timeout", "speech_timeout", "attributes")
+
+    def __init__(self, step: str, language: str, speech_model: str, hints: str,
+                 timeout: int = 5, speech_timeout: object = "auto"):
+        self.step = step
+        self.language = language
+        self.speech_model = speech_model
+        self.hints = hints
+        self.timeout = timeout
+        self.speech_timeout = speech_timeout
+        self.attributes = {"language": language, "speech_model": speech_model, "hints": hints,
+                           "timeout": timeout, "speech_timeout": speech_timeout}
+        if speech_model == PHONE_CALL:
+            # The premium model only exists for phone_call
+            self.attributes["enhanced"] = True
+
+    def __repr__(self) -> str:
+        return f"GatherProfile({self.step!r}, {self.speech_model!r}, {len(self.hints.split(', '))} hints)"
+
+
+def build_profiles(language: str = SPEECH_LANGUAGE,
+                   endpointing: Optional[Dict[str, Tuple[int, object]]] = None) -> Dict[str, GatherProfile]:
+    """Compile every step's settings from the catalog and the (tuned) endpointing table"""
+    endpointing = endpointing if endpointing is not None else load_table()
+    return {
+        step: GatherProfile(step, language, model, join_hints(hint for group in groups for hint in group()),
+                            *endpointing.get(step, DEFAULT_ENDPOINTING["greeting"]))
+        for step, (model, groups) in STEP_SPEECH.items()
+    }
+
+
+GATHER_PROFILES = build_profiles()
+
+
+def gather_profile(step: Optional[str]) -> GatherProfile:
+    """The step's settings; steps without their own (booking complete, unknown) use the greeting's"""
+    return GATHER_PROFILES.get(step or DEFAULT_STEP, GATHER_PROFILES[DEFAULT_STEP])
+
+
+class StepTemplates:
+    """
+    A TwiMLTemplate compiled for each booking step.
+
+    ``build(response, gather, **slots)`` receives the step's
+    ``GatherProfile.attributes`` to pass on to ``response.gather``, so the
+    hints are serialized once per step at startup, not on every turn.
+    """
+
+    def __init__(self, build: Callable[..., None], *slots: str,
+                 profiles: Optional[Dict[str, GatherProfile]] = None):
+        profiles = profiles if profiles is not None else GATHER_PROFILES
+        self._templates = {
+            step: TwiMLTemplate(partial(build, gather=profile.attributes), *slots)
+            for step, profile in profiles.items()
+        }
+
+    def template(self, step: Optional[str]) -> TwiMLTemplate:
+        return self._templates.get(step or DEFAULT_STEP, self._templates[DEFAULT_STEP])
+
+    def render(self, step: Optional[str], **values) -> str:
+        return self.template(step).render(**values)
+
+    def body(self, step: Optional[str], **values) -> str:
+        return self.template(step).body(**values)
+
+
+class RepromptTracker:
+    """Answers heard and re-prompts needed per booking step, with Twilio's speech confidence"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._steps: Dict[str, Dict[str, float]] = {}
+
+    def record(self, step: str, reprompted: bool, confidence: Optional[float] = None):
+        with self._lock:
+            counts = self._steps.setdefault(step, {"answers": 0, "reprompts": 0, "scored": 0, "confidence": 0.0})
+            counts["answers"] += 1
+            counts["reprompts"] += int(reprompted)
+            if confidence is not None:
+                counts["scored"] += 1
+                counts["confidence"] += confidence
+
+    def rate(self, step: str) -> float:
+        with self._lock:
+            counts = self._steps.get(step)
+            return counts["reprompts"] / counts["answers"] if counts else 0.0
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                step: {
+                    "answers": int(counts["answers"]),
+                    "reprompts": int(counts["reprompts"]),
+                    "reprompt_rate": round(counts["reprompts"] / counts["answers"], 3),
+                    "mean_confidence": round(counts["confidence"] / counts["scored"], 3) if counts["scored"] else None,
+                    "speech_model": gather_profile(step).speech_model,
+                    "speech_timeout": gather_profile(step).speech_timeout,
+                }
+                for step, counts in sorted(self._steps.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._steps.clear()
+
+
+def parse_confidence(value: Optional[str]) -> Optional[float]:
+    """Twilio's Confidence form field, if present and numeric"""
+    try:
+        return float(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+default_reprompts = RepromptTracker()
@@ -0,0 +1,153 @@
+"""
+Sentence Streaming for Voice Responses
+Consumes a streaming LLM response in the background and splits it at
+sentence boundaries, so a call can speak the first sentence as soon as it
+is generated and pick up the rest through a fast TwiML redirect
+"""
+
+import logging
+import queue
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fragments shorter than this ("Sure!") are merged into the next sentence
+MIN_SENTENCE_CHARS = 20
+
+# How long a webhook waits for the first / next sentences
+FIRST_SENTENCE_TIMEOUT = 10.0
+NEXT_SENTENCE_TIMEOUT = 8.0
+
+# Finished or abandoned streams are dropped after this many seconds
+STREAM_TTL = 120.0
+
+# End of sentence: terminal punctuation (plus closing quotes/brackets) then
+# whitespace, but not after initials, "a.m.", "Dr." or inside numbers
+_SENTENCE_END_RE = re.compile(
+    r"(?<!\b[A-Za-z])(?<!\bDr)(?<!\bMr)(?<!\bMs)(?<!\bMrs)[.!?]+[\"')\]]*\s+|\n+"
+)
+
+_END = object()
+
+
+def split_sentences(chunks: Iterable[str], min_chars: int = MIN_SENTENCE_CHARS) -> Iterator[str]:
+    """Yield complete sentences from a stream of text chunks as soon as they end"""
+    buffer = ""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer += chunk
+        start = 0
+        for match in _SENTENCE_END_RE.finditer(buffer):
+            sentence = buffer[start:match.end()].strip()
+            if len(sentence) >= min_chars:
+                yield sentence
+                start = match.end()
+        buffer = buffer[start:]
+    tail = buffer.strip()
+    if tail:
+        yield tail
+
+
+class SpeechStream:
+    """Sentences of one streaming response, produced by a background thread"""
+
+    def __init__(self, chunks: Iterable[str], on_complete: Optional[Callable[[str], None]] = None):
+        self._sentences: "queue.Queue" = queue.Queue()
+        self._spoken: List[str] = []
+        self._on_complete = on_complete
+        self._finished = False
+        self.created = time.monotonic()
+        self._thread = threading.Thread(target=self._run, args=(chunks,), daemon=True)
+        self._thread.start()
+
+    def _run(self, chunks: Iterable[str]):
+        sentences: List[str] = []
+        try:
+            for sentence in split_sentences(chunks):
+                sentences.append(sentence)
+                self._sentences.put(sentence)
+        except Exception as e:
+            logger.error(f"Response stream failed: {e}")
+        finally:
+            self._sentences.put(_END)
+            if self._on_complete:
+                try:
+                    self._on_complete(" ".join(sentences))
+                except Exception as e:
+                    logger.error(f"Stream completion callback failed: {e}")
+
+    def next_batch(self, timeout: float = NEXT_SENTENCE_TIMEOUT) -> List[str]:
+        """Wait for at least one sentence, then take every sentence already available"""
+        if self._finished:
+            return []
+        batch: List[str] = []
+        try:
+            item = self._sentences.get(timeout=timeout)
+            while item is not _END:
+                batch.append(item)
+                item = self._sentences.get_nowait()
+            self._finished = True
+        except queue.Empty:
+            pass
+        self._spoken.extend(batch)
+        return batch
+
+    @property
+    def finished(self) -> bool:
+        """Every sentence has been handed out"""
+        if not self._finished and self._sentences.qsize() == 1 and not self._thread.is_alive():
+            # Only the end marker is left
+            self._sentences.get_nowait()
+            self._finished = True
+        return self._finished
+
+
+class SpeechStreamRegistry:
+    """Active response streams keyed by call"""
+
+    def __init__(self, ttl: float = STREAM_TTL):
+        self._streams: Dict[str, SpeechStream] = {}
+        self._lock = threading.Lock()
+        self.ttl = ttl
+
+    def start(self, key: str, chunks: Iterable[str],
+              on_complete: Optional[Callable[[str], None]] = None) -> SpeechStream:
+        stream = SpeechStream(chunks, on_complete)
+        with self._lock:
+            self._expire()
+            self._streams[key] = stream
+        return stream
+
+    def get(self, key: str) -> Optional[SpeechStream]:
+        with self._lock:
+            return self._streams.get(key)
+
+    def discard(self, key: str):
+        with self._lock:
+            self._streams.pop(key, None)
+
+    def next_batch(self, key: str, timeout: float = NEXT_SENTENCE_TIMEOUT) -> Optional[List[str]]:
+        """Next sentences for a call and drop the stream once it is done; None if unknown"""
+        stream = self.get(key)
+        if stream is None:
+            return None
+        batch = stream.next_batch(timeout)
+        if stream.finished:
+            self.discard(key)
+        return batch
+
+    def has_pending(self, key: str) -> bool:
+        stream = self.get(key)
+        return stream is not None and not stream.finished
+
+    def _expire(self):
+        now = time.monotonic()
+        for key in [k for k, s in self._streams.items() if now - s.created > self.ttl]:
+            del self._streams[key]
+
+    def __len__(self) -> int:
+        return len(self._streams)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test suite for the pre-rendered audio prompt cache: rendering, <Play> vs <Say>, serving
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from twilio.twiml.voice_response import VoiceResponse
+
+from audio_prompts import AUDIO_CACHE_CONTROL, AudioPromptCache, collect_prompts, prompt_sentences
+from twiml_cache import TwiMLTemplate
+
+BASE_URL = "https://example.com/audio/prompts"
+
+SAY = TwiMLTemplate(lambda response, text: response.say(text, voice='Polly.Joanna', language='en-US'), "text")
+
+
+class FakeRenderer:
+    """Writes the text itself as the 'audio', so equal sentences make equal files"""
+
+    def __init__(self, profile: str = "fake:1", fail_on: str = None):
+        self.profile = profile
+        self.fail_on = fail_on
+        self.rendered = []
+
+    def render(self, text: str, path: str):
+        if text == self.fail_on:
+            raise RuntimeError("engine crashed")
+        self.rendered.append(text)
+        with open(path, "wb") as handle:
+            handle.write(f"{self.profile}|{text}".encode("utf-8"))
+
+
+def built(build) -> str:
+    response = VoiceResponse()
+    build(response)
+    return str(response)
+
+
+class TestAudioPromptCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = AudioPromptCache(self.directory, base_url=BASE_URL)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_prompts_split_into_distinct_sentences(self):
+        self.assertEqual(prompt_sentences("Perfect!  What's your\nname?"), ["Perfect!", "What's your name?"])
+        prompts = collect_prompts(["Perfect! What's your name?"])
+        self.assertEqual(len(prompts), len(set(prompts)))
+        self.assertIn("What's your name?", prompts)
+        self.assertIn("One moment please.", prompts)
+        self.assertTrue(any("₹" in prompt for prompt in prompts))
+
+    def test_render_is_content_addressed_and_incremental(self):
+        renderer = FakeRenderer()
+        result = self.cache.render(["Perfect! Great!", "Great!"], renderer)
+        self.assertEqual(result["rendered"], 2)
+        self.assertEqual(renderer.rendered, ["Perfect!", "Great!"])
+
+        name = self.cache.filename("Perfect!")
+        with open(os.path.join(self.directory, name), "rb") as handle:
+            self.assertEqual(handle.read(), b"fake:1|Perfect!")
+        self.assertTrue(self.cache.has_file(name))
+        self.assertFalse(self.cache.has_file("manifest.json"))
+
+        # A second run only renders what is new; a reload sees the same manifest
+        result = self.cache.render(["Perfect!", "Thank you!"], renderer)
+        self.assertEqual((result["rendered"], result["skipped"]), (1, 1))
+        reloaded = AudioPromptCache(self.directory)
+        self.assertEqual(reloaded.filename("Great!"), self.cache.filename("Great!"))
+        self.assertEqual(len(reloaded), 3)
+
+    def test_new_voice_rerenders_and_prunes_old_files(self):
+        self.cache.render(["Perfect!"], FakeRenderer("fake:1"))
+        old_name = self.cache.filename("Perfect!")
+        self.cache.render(["Perfect!"], FakeRenderer("fake:2"))
+        self.assertNotEqual(self.cache.filename("Perfect!"), old_name)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, old_name)))
+        with open(os.path.join(self.directory, "manifest.json")) as handle:
+            self.assertEqual(json.load(handle)["profile"], "fake:2")
+
+    def test_failed_sentence_is_left_uncached(self):
+        result = self.cache.render(["Perfect! Great!"], FakeRenderer(fail_on="Great!"))
+        self.assertEqual((result["rendered"], result["failed"]), (1, 1))
+        self.assertIsNone(self.cache.play_urls("Perfect! Great!"))
+
+    def test_fully_cached_text_is_played(self):
+        self.cache.render(["Perfect! What's your name?"], FakeRenderer())
+        urls = self.cache.play_urls("Perfect!   What's your name?")
+        names = [self.cache.filename("Perfect!"), self.cache.filename("What's your name?")]
+        self.assertEqual(urls, [f"{BASE_URL}/{name}" for name in names])
+
+        def played(response):
+            for url in urls:
+                response.play(url)
+
+        self.assertEqual(self.cache.spoken("Perfect! What's your name?", SAY),
+                         TwiMLTemplate(played).body())
+
+    def test_partly_cached_text_is_said_in_one_voice(self):
+        self.cache.render(["Perfect!"], FakeRenderer())
+        text = "Perfect! Nice to meet you, Asha & co!"
+        self.assertEqual(self.cache.spoken(text, SAY), SAY.body(text=text))
+        self.assertEqual(self.cache.stats()["spoken"], 1)
+
+        def legacy(response):
+            response.say(text, voice='Polly.Joanna', language='en-US')
+
+        response = VoiceResponse()
+        self.cache.speak(response, text, voice='Polly.Joanna', language='en-US')
+        self.assertEqual(str(response), built(legacy))
+
+
+class TestWebhookAudio(unittest.TestCase):
+    """The simple assistant plays cached prompts and serves their files"""
+
+    @classmethod
+    def setUpClass(cls):
+        import voice_booking_simple
+        cls.module = voice_booking_simple
+        cls.client = voice_booking_simple.app.test_client()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.original = self.module.audio
+        self.module.audio = AudioPromptCache(self.directory, base_url=BASE_URL)
+
+    def tearDown(self):
+        self.module.audio = self.original
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_cached_retry_prompt_is_played(self):
+        reply = self.client.post('/voice/process_speech/CAaudio1', data={})
+        self.assertIn(b"<Say>I didn't hear anything.", reply.data)
+
+        self.module.audio.render(["I didn't hear anything. Please speak clearly."], FakeRenderer())
+        reply = self.client.post('/voice/process_speech/CAaudio1', data={})
+        self.assertNotIn(b"<Say>", reply.data)
+        self.assertEqual(reply.data.count(b"<Play>"), 2)
+        self.assertIn(b"/voice/process_speech/CAaudio1</Redirect>", reply.data)
+
+    def test_audio_route_serves_immutable_files(self):
+        self.module.audio.render(["Great!"], FakeRenderer())
+        name = self.module.audio.filename("Great!")
+        reply = self.client.get(f'/audio/prompts/{name}')
+        self.assertEqual(reply.status_code, 200)
+        self.assertEqual(reply.data, b"fake:1|Great!")
+        self.assertEqual(reply.headers["Cache-Control"], AUDIO_CACHE_CONTROL)
+        self.assertEqual(reply.mimetype, "audio/wav")
+        reply.close()
+
+        self.assertEqual(self.client.get('/audio/prompts/manifest.json').status_code, 404)
+        self.assertEqual(self.client.get('/audio/prompts/missing.wav').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
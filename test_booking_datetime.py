@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test suite for the booking date/time parser
+"""
+
+import os
+import sys
+import unittest
+from datetime import date, datetime, time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from booking_datetime import (
+    format_date, format_time, is_within_salon_hours, parse_date, parse_time, resolve_appointment
+)
+from slot_extractor import extract_date, extract_slots, extract_time
+
+# Monday
+TODAY = date(2026, 10, 19)
+NOW = datetime(2026, 10, 19, 11, 0)
+
+
+class TestParseDate(unittest.TestCase):
+    """Spoken dates resolved against a fixed Monday"""
+
+    def test_relative_dates(self):
+        test_cases = [
+            ("today", date(2026, 10, 19)),
+            ("tomorrow please", date(2026, 10, 20)),
+            ("day after tomorrow", date(2026, 10, 21)),
+            ("kal", date(2026, 10, 20)),
+            ("in 3 days", date(2026, 10, 22)),
+        ]
+        for text, expected in test_cases:
+            with self.subTest(text=text):
+                self.assertEqual(parse_date(text, TODAY), expected)
+
+    def test_weekdays(self):
+        test_cases = [
+            ("this friday", date(2026, 10, 23)),
+            ("on Wednesday", date(2026, 10, 21)),
+            ("next Monday", date(2026, 10, 26)),
+            ("this weekend", date(2026, 10, 24)),
+        ]
+        for text, expected in test_cases:
+            with self.subTest(text=text):
+                self.assertEqual(parse_date(text, TODAY), expected)
+
+    def test_calendar_dates(self):
+        test_cases = [
+            ("the 25th of October", date(2026, 10, 25)),
+            ("October twenty first", date(2026, 10, 21)),
+            ("25/10", date(2026, 10, 25)),
+            ("2026-11-02", date(2026, 11, 2)),
+            ("march 3", date(2027, 3, 3)),
+            ("Monday, October 20", date(2026, 10, 20)),
+        ]
+        for text, expected in test_cases:
+            with self.subTest(text=text):
+                self.assertEqual(parse_date(text, TODAY), expected)
+
+    def test_unparseable(self):
+        for text in ["whenever works", "12 4th cross road", "30th February"]:
+            with self.subTest(text=text):
+                self.assertIsNone(parse_date(text, TODAY))
+
+
+class TestParseTime(unittest.TestCase):
+    """Spoken times"""
+
+    def test_clock_times(self):
+        test_cases = [
+            ("4 pm", time(16, 0)),
+            ("4:30 p.m.", time(16, 30)),
+            ("half past three", time(15, 30)),
+            ("quarter to 11 in the morning", time(10, 45)),
+            ("five in the evening", time(17, 0)),
+            ("noon", time(12, 0)),
+            ("at 6", time(18, 0)),
+            ("17:15", time(17, 15)),
+        ]
+        for text, expected in test_cases:
+            with self.subTest(text=text):
+                self.assertEqual(parse_time(text), expected)
+
+    def test_part_of_day_defaults(self):
+        self.assertEqual(parse_time("morning"), time(10, 0))
+        self.assertEqual(parse_time("afternoon"), time(14, 0))
+        self.assertEqual(parse_time("evening"), time(18, 0))
+
+    def test_bare_hour_only_when_asked(self):
+        self.assertIsNone(parse_time("4"))
+        self.assertEqual(parse_time("4", bare_hour=True), time(16, 0))
+        self.assertEqual(parse_time("10", bare_hour=True), time(10, 0))
+
+    def test_address_numbers_are_not_times(self):
+        self.assertIsNone(parse_time("I live at 12 MG Road"))
+
+
+class TestFormattingAndHours(unittest.TestCase):
+    """Formatting and salon-hours checks"""
+
+    def test_format(self):
+        self.assertEqual(format_date(date(2026, 10, 5), NOW), "Monday, October 5")
+        # A date that rolled over into next year says so when read back
+        self.assertEqual(format_date(date(2027, 1, 4), NOW), "Monday, January 4, 2027")
+        self.assertEqual(parse_date("Monday, January 4, 2027", NOW), date(2027, 1, 4))
+        self.assertEqual(format_time(time(16, 0)), "4 PM")
+        self.assertEqual(format_time(time(9, 30)), "9:30 AM")
+
+    def test_salon_hours(self):
+        self.assertTrue(is_within_salon_hours(time(9, 0)))
+        self.assertFalse(is_within_salon_hours(time(8, 30)))
+        self.assertTrue(is_within_salon_hours(time(19, 0), duration_minutes=60))
+        self.assertFalse(is_within_salon_hours(time(19, 30), duration_minutes=60))
+
+    def test_resolve_appointment(self):
+        self.assertEqual(resolve_appointment("tomorrow", "4 pm", 60, now=NOW), datetime(2026, 10, 20, 16, 0))
+        # Already past, after closing, or unparseable
+        self.assertIsNone(resolve_appointment("today", "9 am", now=NOW))
+        self.assertIsNone(resolve_appointment("tomorrow", "9 pm", now=NOW))
+        self.assertIsNone(resolve_appointment("someday", "4 pm", now=NOW))
+
+
+class TestSlotIntegration(unittest.TestCase):
+    """Slot extraction reprompts instead of storing raw text"""
+
+    def test_unparseable_answers_are_not_slots(self):
+        self.assertNotIn("date", extract_slots("whenever works", "get_date"))
+        self.assertNotIn("time", extract_slots("sometime", "get_time"))
+
+    def test_flat_numbers_are_not_dates(self):
+        self.assertIsNone(parse_date("flat 12/4 MG road", NOW))
+        self.assertIsNone(parse_date("no. 3/2, 5th cross", NOW))
+        self.assertEqual(parse_date("on 12/4", NOW), date(2027, 4, 12))
+        self.assertNotIn("date", extract_slots("I live at flat 12/4 MG road", "get_address"))
+        self.assertNotIn("date", extract_slots("It's 21/3, Park Street", "get_address"))
+
+    def test_bare_hour_at_time_step(self):
+        self.assertEqual(extract_slots("4", "get_time")["time"], "4 PM")
+        self.assertNotIn("time", extract_slots("4", "get_date"))
+
+    def test_rejects_past_dates_and_closed_hours(self):
+        self.assertIsNone(extract_date("2026-10-01", now=NOW))
+        self.assertEqual(extract_date("October 1", now=NOW), "Friday, October 1, 2027")
+        self.assertIsNone(extract_time("11 pm"))
+        self.assertEqual(extract_time("7 pm"), "7 PM")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
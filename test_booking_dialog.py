@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test suite for the table-driven booking dialog engine
+"""
+
+import os
+import sys
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from booking_dialog import (
+    ASK, CLOSED, COMPLETE, CONFIRM, CONFIRM_AGAIN, GREET, REPROMPT, RESTART, UNKNOWN,
+    DialogEngine, DialogSpec, DialogState, benchmark
+)
+
+# Generous ceiling for one turn including slot extraction; a normal run is ~50 µs
+MAX_MICROSECONDS_PER_TURN = 1000
+
+
+class TestDialogEngine(unittest.TestCase):
+    """Transitions of the default five-slot dialog"""
+
+    def setUp(self):
+        self.engine = DialogEngine()
+        self.state = DialogState()
+
+    def say(self, text):
+        return self.engine.advance(self.state, text)
+
+    def test_full_conversation(self):
+        self.assertEqual(self.say("hello").event, GREET)
+        turn = self.say("I want to book an appointment")
+        self.assertEqual((turn.event, turn.step), (ASK, "get_name"))
+        self.assertEqual(self.say("Priya").step, "get_service")
+        turn = self.say("a haircut tomorrow at 4 pm")
+        self.assertEqual((turn.event, turn.step), (ASK, "get_address"))
+        self.assertEqual(set(turn.slots), {"service", "date", "time"})
+        self.assertEqual(self.say("12 MG Road, Indiranagar").event, CONFIRM)
+        self.assertEqual(self.say("hmm").event, CONFIRM_AGAIN)
+        self.assertEqual(self.say("yes please").event, COMPLETE)
+        self.assertEqual(self.say("thanks").event, CLOSED)
+
+    def test_reprompt_when_slot_missing(self):
+        self.state.step = "get_date"
+        self.state.slots.update(customer_name="Priya", service="haircut")
+        turn = self.say("whenever you like")
+        self.assertEqual((turn.event, turn.step), (REPROMPT, "get_date"))
+
+    def test_deny_restarts_and_clears(self):
+        self.state.step = "confirm_booking"
+        self.state.slots.update(customer_name="Priya", service="haircut")
+        turn = self.say("no, that's wrong")
+        self.assertEqual((turn.event, turn.step), (RESTART, "get_name"))
+        self.assertEqual(self.state.slots, {})
+
+    def test_only_a_clear_yes_completes(self):
+        for text in ["I am not sure", "not sure yet", "yesterday was fine", "don't book it yet", "booking later"]:
+            with self.subTest(text=text):
+                self.assertNotEqual(self.engine.turn("confirm_booking", {}, text).event, COMPLETE)
+        for text in ["yes", "Sure, go ahead", "okay book it", "that's correct", "no problem, go ahead",
+                     "No worries", "not a problem at all"]:
+            with self.subTest(text=text):
+                self.assertEqual(self.engine.turn("confirm_booking", {}, text).event, COMPLETE)
+
+    def test_later_answer_does_not_rename_caller(self):
+        self.state.step = "get_date"
+        self.state.slots.update(customer_name="Priya", service="haircut")
+        turn = self.say("I'm thinking next friday")
+        self.assertEqual(turn.step, "get_time")
+        self.assertEqual(self.state.slots["customer_name"], "Priya")
+        # A correction at the name step still takes
+        self.state.step = "get_name"
+        self.say("sorry, my name is Anita")
+        self.assertEqual(self.state.slots["customer_name"], "Anita")
+
+    def test_agreement_with_no_keeps_booking(self):
+        self.state.step = "confirm_booking"
+        self.state.slots.update(customer_name="Priya", service="haircut")
+        self.assertEqual(self.say("no problem, go ahead").event, COMPLETE)
+        self.assertEqual(self.state.slots["customer_name"], "Priya")
+        self.assertEqual(self.engine.turn("confirm_booking", {}, "no problem, but change the time").event, RESTART)
+
+    def test_turn_does_not_modify_filled(self):
+        filled = {"customer_name": "Priya"}
+        turn = self.engine.turn("get_service", filled, "coloring")
+        self.assertEqual(turn.slots, {"service": "coloring"})
+        self.assertEqual(filled, {"customer_name": "Priya"})
+
+    def test_unknown_step(self):
+        self.assertEqual(self.engine.turn("somewhere", {}, "hi").event, UNKNOWN)
+
+    def test_state_is_slotted(self):
+        self.assertFalse(hasattr(self.state, "__dict__"))
+
+
+class TestDialogSpec(unittest.TestCase):
+    """Per-assistant variations compiled from the spec"""
+
+    def setUp(self):
+        self.engine = DialogEngine(DialogSpec(
+            slot_order=("customer_name", "phone", "service"),
+            validators={"service": lambda text: text.strip() or None},
+            deny_step="greeting",
+            clear_on_deny=False,
+            strict_confirm=True
+        ))
+
+    def test_custom_slot_order(self):
+        self.assertIn("get_phone", self.engine.slot_steps)
+        self.assertNotIn("get_date", self.engine.slot_steps)
+        turn = self.engine.turn("get_name", {}, "I'm Priya, 9845012345")
+        self.assertEqual(turn.step, "get_service")
+
+    def test_validator_accepts_free_text(self):
+        turn = self.engine.turn("get_service", {"customer_name": "P", "phone": "9845012345"}, "creative braiding")
+        self.assertEqual((turn.event, turn.slots), (CONFIRM, {"service": "creative braiding"}))
+
+    def test_strict_confirm(self):
+        state = DialogState("confirm_booking", {"customer_name": "Priya"})
+        turn = self.engine.advance(state, "hmm")
+        self.assertEqual((turn.event, turn.step), (RESTART, "greeting"))
+        self.assertEqual(state.slots, {"customer_name": "Priya"})
+
+
+class TestDialogBenchmark(unittest.TestCase):
+    """Guards per-turn overhead of the engine"""
+
+    def test_per_turn_overhead(self):
+        self.assertLess(benchmark(turns=700), MAX_MICROSECONDS_PER_TURN)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
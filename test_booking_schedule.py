@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test suite for normalized booking schedule columns
+"""
+
+import os
+import sqlite3
+import sys
+import unittest
+from datetime import date, datetime
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from booking_schedule import (
+    appointment_window, backfill_appointment_windows, bookings_between, day_schedule,
+    ensure_schedule_schema, service_duration_minutes
+)
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE voice_bookings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        booking_id TEXT UNIQUE NOT NULL,
+        customer_name TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        service TEXT NOT NULL,
+        date TEXT NOT NULL,
+        time TEXT NOT NULL,
+        address TEXT NOT NULL,
+        status TEXT DEFAULT 'confirmed',
+        source TEXT DEFAULT 'voice_call',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        notes TEXT
+    )
+'''
+
+
+class TestAppointmentWindow(unittest.TestCase):
+    """Start/end computed from parsed date, time and catalog duration"""
+
+    def test_duration_from_catalog(self):
+        self.assertEqual(service_duration_minutes("coloring"), 120)
+        self.assertEqual(service_duration_minutes("kids-haircut"), 30)
+        self.assertEqual(service_duration_minutes("Professional Blowdry"), 45)
+        self.assertEqual(service_duration_minutes("something else"), 60)
+
+    def test_window(self):
+        start, end = appointment_window("Tuesday, October 20", "4 PM", "coloring", datetime(2026, 10, 19, 11))
+        self.assertEqual(start, "2026-10-20T16:00:00")
+        self.assertEqual(end, "2026-10-20T18:00:00")
+
+    def test_unparseable(self):
+        self.assertEqual(appointment_window("whenever", "4 PM", "haircut"), (None, None))
+
+
+class TestScheduleTable(unittest.TestCase):
+    """Migration, batched backfill and index range queries"""
+
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute(LEGACY_SCHEMA)
+        rows = [
+            ("BG1", "tomorrow", "2 PM", "haircut"),
+            ("BG2", "tomorrow", "5:30 PM", "blowdry"),
+            ("BG3", "Friday", "morning", "coloring"),
+            ("BG4", "whenever", "soon", "haircut"),
+        ]
+        self.conn.executemany('''
+            INSERT INTO voice_bookings (booking_id, customer_name, phone, service, date, time, address, created_at)
+            VALUES (?, 'Test', '9999999999', ?, ?, ?, '12 MG Road', '2026-10-19 10:00:00')
+        ''', [(b, s, d, t) for b, d, t, s in rows])
+        self.conn.commit()
+        ensure_schedule_schema(self.conn, "voice_bookings")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_backfill_in_batches(self):
+        self.assertEqual(backfill_appointment_windows(self.conn, "voice_bookings", batch_size=1), 3)
+        # Unparseable row stays NULL and a second run is a no-op
+        self.assertEqual(backfill_appointment_windows(self.conn, "voice_bookings"), 0)
+        missing = self.conn.execute(
+            "SELECT booking_id FROM voice_bookings WHERE appointment_start IS NULL"
+        ).fetchall()
+        self.assertEqual(missing, [("BG4",)])
+
+    def test_day_schedule(self):
+        backfill_appointment_windows(self.conn, "voice_bookings")
+        schedule = day_schedule(self.conn, "voice_bookings", date(2026, 10, 20))
+        self.assertEqual([b["booking_id"] for b in schedule], ["BG1", "BG2"])
+
+        afternoon = bookings_between(self.conn, "voice_bookings",
+                                     datetime(2026, 10, 20, 14), datetime(2026, 10, 20, 18))
+        self.assertEqual(len(afternoon), 2)
+        self.assertEqual(afternoon[1]["appointment_end"], "2026-10-20T18:15:00")
+
+    def test_range_query_uses_index(self):
+        plan = self.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM voice_bookings "
+            "WHERE appointment_start >= ? AND appointment_start < ?", ("a", "b")
+        ).fetchall()
+        self.assertIn("idx_voice_bookings_appointment_start", " ".join(str(row) for row in plan))
+
+    def test_unknown_table_rejected(self):
+        with self.assertRaises(ValueError):
+            ensure_schedule_schema(self.conn, "customers; DROP TABLE voice_bookings")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Test suite for call request admission: phone normalization, repeat-tap deduplication and per-phone/per-IP limits
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from call_admission import ADMIT, DUPLICATE, LIMITED, AdmissionControl, client_ip, normalize_phone
+
+# Generous ceiling for one admission check; a normal run is a few µs
+MAX_MICROSECONDS_PER_CHECK = 100
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestRequestIdentity(unittest.TestCase):
+
+    def test_phone_spellings_normalize_alike(self):
+        for text in ["9876543210", "098765 43210", "+91 98765-43210", "(+91) 98765 43210", "919876543210"]:
+            with self.subTest(text=text):
+                self.assertEqual(normalize_phone(text), "+919876543210")
+        self.assertEqual(normalize_phone("+1 (415) 555-0100"), "+14155550100")
+        for text in ["", None, "12345", "+91", "call me"]:
+            with self.subTest(text=text):
+                self.assertIsNone(normalize_phone(text))
+
+    def test_client_ip_trusts_only_the_proxy_hop(self):
+        self.assertEqual(client_ip("10.0.0.1"), "10.0.0.1")
+        # The first entry is whatever the client claimed; the last was added by our proxy
+        self.assertEqual(client_ip("10.0.0.1", "1.2.3.4, 203.0.113.7", trusted_hops=1), "203.0.113.7")
+        self.assertEqual(client_ip("10.0.0.1", "1.2.3.4, 203.0.113.7", trusted_hops=0), "10.0.0.1")
+        self.assertEqual(client_ip(None), "unknown")
+
+
+class TestAdmissionControl(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.admission = AdmissionControl(phone_limit=(2, 3600), ip_limit=(3, 600), dedup_seconds=120,
+                                          clock=self.clock)
+
+    def test_repeat_tap_gets_existing_call(self):
+        phone = "+919000000001"
+        self.assertEqual(self.admission.admit(phone, "1.1.1.1").decision, ADMIT)
+        # A second tap before the first request has been queued
+        pending = self.admission.admit(phone, "1.1.1.1")
+        self.assertEqual((pending.decision, pending.existing), (DUPLICATE, None))
+
+        self.admission.attach(phone, {"request_id": "req-1", "call_sid": "CA1"})
+        self.clock.now = 119
+        repeat = self.admission.admit(phone, "2.2.2.2")
+        self.assertEqual((repeat.decision, repeat.existing["call_sid"]), (DUPLICATE, "CA1"))
+
+        self.clock.now = 121
+        self.assertEqual(self.admission.admit(phone, "1.1.1.1").decision, ADMIT)
+        stats = self.admission.stats()
+        self.assertEqual((stats["admitted"], stats["duplicates"]), (2, 2))
+
+    def test_release_lets_caller_retry_at_once(self):
+        phone = "+919000000002"
+        self.admission.admit(phone, "1.1.1.1")
+        self.admission.release(phone)
+        self.assertEqual(self.admission.admit(phone, "1.1.1.1").decision, ADMIT)
+
+    def test_phone_limit_slides(self):
+        phone = "+919000000003"
+        for at in (0, 200):
+            self.clock.now = at
+            self.assertEqual(self.admission.admit(phone, "1.1.1.1").decision, ADMIT)
+        self.clock.now = 400
+        limited = self.admission.admit(phone, "9.9.9.9")
+        self.assertEqual((limited.decision, limited.reason), (LIMITED, "Too many call requests for this number"))
+        self.assertAlmostEqual(limited.retry_after, 3200)
+
+        # Halfway into the next hour the previous one counts for half: 1 of 2 used
+        self.clock.now = 3600 + 1800
+        self.assertEqual(self.admission.admit(phone, "9.9.9.9").decision, ADMIT)
+        self.clock.now = 3600 + 1800 + 121
+        self.assertEqual(self.admission.admit(phone, "9.9.9.9").decision, LIMITED)
+        self.assertEqual(self.admission.stats()["limited_phone"], 2)
+
+    def test_ip_limit_spans_phone_numbers(self):
+        for index in range(3):
+            self.assertEqual(self.admission.admit(f"+91900000001{index}", "6.6.6.6").decision, ADMIT)
+        limited = self.admission.admit("+919000000019", "6.6.6.6")
+        self.assertEqual(limited.decision, LIMITED)
+        self.assertGreater(limited.retry_after, 0)
+        # A limited request is not counted, and other networks are unaffected
+        self.assertEqual(self.admission.admit("+919000000019", "7.7.7.7").decision, ADMIT)
+        self.assertEqual(self.admission.stats()["limited_ip"], 1)
+
+    def test_idle_entries_expire(self):
+        admission = AdmissionControl(phone_limit=(2, 10), ip_limit=(2, 10), dedup_seconds=5, max_keys=4,
+                                     clock=self.clock)
+        for index in range(3):
+            admission.admit(f"+91900000002{index}", f"3.3.3.{index}")
+        self.clock.now = 25
+        admission.admit("+919000000029", "3.3.3.9")
+        stats = admission.stats()
+        self.assertEqual((stats["phones_tracked"], stats["ips_tracked"], stats["pending_or_recent"]), (1, 1, 1))
+
+    def test_check_speed(self):
+        admission = AdmissionControl(phone_limit=(5, 3600), ip_limit=(10 ** 6, 600), dedup_seconds=0)
+        started = time.perf_counter()
+        for index in range(2000):
+            admission.admit(f"+9190000{index % 500:05d}", f"10.0.{index % 7}.1")
+        per_check = (time.perf_counter() - started) / 2000 * 1e6
+        self.assertLess(per_check, MAX_MICROSECONDS_PER_CHECK)
+
+
+class TestTriggerEndpoint(unittest.TestCase):
+    """Repeat "Call Me Now" taps must not place a second paid call"""
+
+    @classmethod
+    def setUpClass(cls):
+        import voice_booking_simple
+        cls.module = voice_booking_simple
+
+    def setUp(self):
+        from outbound_dialer import CallQueue, OutboundDialer
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.dialer = OutboundDialer(self.module.dialer.carrier, CallQueue(os.path.join(directory, "calls.db")))
+        self.addCleanup(self.dialer.stop)
+        self.admission = AdmissionControl(phone_limit=(2, 3600), ip_limit=(10, 600), dedup_seconds=120)
+        for target, value in [('dialer', self.dialer), ('default_admission', self.admission),
+                              ('SIMULATION_MODE', False)]:
+            patcher = patch.object(self.module, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.twilio = Mock()
+        self.twilio.calls.create.return_value = Mock(sid="CAadmitted")
+        patcher = patch.object(self.module, 'client', self.twilio)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = self.module.app.test_client()
+
+    def tap(self, phone_number, ip="198.51.100.1"):
+        return self.client.post('/trigger-voice-call', json={'phone_number': phone_number},
+                                environ_base={'REMOTE_ADDR': ip})
+
+    def test_repeat_tap_returns_existing_call(self):
+        first = self.tap("98765 43210")
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(first.get_json()["phone_number"], "+919876543210")
+        self.dialer.pump()
+
+        repeat = self.tap("+91 98765-43210")
+        self.assertEqual(repeat.status_code, 202)
+        body = repeat.get_json()
+        self.assertTrue(body["duplicate"])
+        self.assertEqual(body["request_id"], first.get_json()["request_id"])
+        self.assertEqual(body["call_sid"], "CAadmitted")
+        self.dialer.pump()
+        self.twilio.calls.create.assert_called_once()
+
+    def test_flood_gets_429_with_retry_after(self):
+        self.admission.dedup_seconds = 0
+        for _ in range(2):
+            self.assertEqual(self.tap("9876543211").status_code, 202)
+        limited = self.tap("9876543211")
+        self.assertEqual(limited.status_code, 429)
+        self.assertGreater(int(limited.headers["Retry-After"]), 0)
+        self.assertEqual(self.tap("12345").status_code, 400)
+        self.assertEqual(self.admission.stats()["limited_phone"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
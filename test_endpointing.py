@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Test suite for per-step end-of-speech timeouts: utterance logging, tuning and the Gather settings they feed
+"""
+
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from array import array
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from endpointing import (DEFAULT_ENDPOINTING, MAX_SPEECH_TIMEOUT, MIN_SAMPLES, AnswerTimer, UtteranceLog,
+                         load_table, save_table, tune)
+from speech_hints import build_profiles
+from voice_activity import SAMPLE_RATE, SPEECH_END, EnergyVAD
+
+FRAME_BYTES = SAMPLE_RATE // 50 * 2
+
+
+def tone(ms: int, amplitude: int = 8000) -> bytes:
+    count = SAMPLE_RATE * ms // 1000
+    return array("h", (int(amplitude * math.sin(2 * math.pi * 300 * i / SAMPLE_RATE))
+                       for i in range(count))).tobytes()
+
+
+def silence(ms: int) -> bytes:
+    return b"\x00\x00" * (SAMPLE_RATE * ms // 1000)
+
+
+class TestTuning(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.log = UtteranceLog(os.path.join(self.directory, "logs", "utterances.jsonl"))
+
+    def test_short_and_long_answers_get_their_own_timeouts(self):
+        for _ in range(MIN_SAMPLES):
+            self.log.record("confirm_booking", 600)
+            self.log.record("get_address", 6500, 900)
+            self.log.record("get_time", 1800, 2500)
+        self.log.record("get_name", 9000, 3000)
+
+        table = tune(self.log.records())
+        self.assertEqual(table["confirm_booking"]["speech_timeout"], 1)
+        self.assertEqual(table["get_address"]["speech_timeout"], 3)
+        # A long pause mid-answer needs more silence than the answer's length alone
+        self.assertEqual(table["get_time"]["speech_timeout"], 3)
+        self.assertLessEqual(max(entry["speech_timeout"] for entry in table.values()
+                                 if entry["samples"] >= MIN_SAMPLES), MAX_SPEECH_TIMEOUT)
+        # Too few answers to learn from: the default stays
+        self.assertEqual(table["get_name"]["samples"], 1)
+        self.assertEqual(table["get_name"]["speech_timeout"], DEFAULT_ENDPOINTING["get_name"][1])
+        self.assertEqual(table["greeting"]["speech_timeout"], "auto")
+
+    def test_tuned_table_round_trip(self):
+        for _ in range(MIN_SAMPLES):
+            self.log.record("get_date", 5000)
+        path = os.path.join(self.directory, "endpointing.json")
+        save_table(tune(self.log.records()), path)
+
+        table = load_table(path)
+        self.assertEqual(table["get_date"], (DEFAULT_ENDPOINTING["get_date"][0], 3))
+        self.assertEqual(table["greeting"], DEFAULT_ENDPOINTING["greeting"])
+        self.assertEqual(build_profiles(endpointing=table)["get_date"].attributes["speech_timeout"], 3)
+
+        with open(path, "w") as handle:
+            handle.write("{not json")
+        self.assertEqual(load_table(path), DEFAULT_ENDPOINTING)
+        self.assertEqual(load_table(os.path.join(self.directory, "missing.json")), DEFAULT_ENDPOINTING)
+
+    def test_log_skips_damaged_lines(self):
+        self.log.record("get_phone", 3000, 400)
+        with open(self.log.path, "a") as handle:
+            handle.write("{truncated\n")
+        self.log.record("get_phone", 3200)
+        self.assertEqual([json.dumps(record, sort_keys=True) for record in self.log.records()], [
+            '{"duration_ms": 3000, "pause_ms": 400, "step": "get_phone"}',
+            '{"duration_ms": 3200, "pause_ms": 0, "step": "get_phone"}',
+        ])
+
+
+class TestPauses(unittest.TestCase):
+
+    def test_vad_reports_longest_pause_inside_an_utterance(self):
+        vad = EnergyVAD()
+        audio = silence(400) + tone(400) + silence(300) + tone(400) + silence(100) + tone(200) + silence(800)
+        ends = [event.utterance for start in range(0, len(audio), FRAME_BYTES)
+                for event in vad.process(audio[start:start + FRAME_BYTES]) if event.kind == SPEECH_END]
+        self.assertEqual(len(ends), 1)
+        self.assertEqual(ends[0].longest_pause_ms, 300)
+        self.assertEqual(ends[0].duration_ms, 1400)
+
+
+class TestAnswerTimer(unittest.TestCase):
+    """The stream VAD splits answers at short pauses; they are logged whole"""
+
+    def setUp(self):
+        self.records = []
+        self.timer = AnswerTimer(lambda *record: self.records.append(record))
+
+    def utterances(self, audio: bytes):
+        vad = EnergyVAD()
+        return [event.utterance for start in range(0, len(audio), FRAME_BYTES)
+                for event in vad.process(audio[start:start + FRAME_BYTES]) if event.kind == SPEECH_END]
+
+    def test_address_with_a_pause_is_one_answer(self):
+        first, second = self.utterances(silence(400) + tone(1000) + silence(900) + tone(1500) + silence(800))
+        self.assertEqual([(u.duration_ms, u.longest_pause_ms) for u in (first, second)], [(1000, 0), (1500, 0)])
+
+        self.timer.heard("CA1", "get_address", first)
+        # The first part already moved the dialog on
+        self.timer.heard("CA1", "confirm_booking", second)
+        self.timer.finish("CA1")
+        self.assertEqual(self.records, [("get_address", 3400, 900)])
+
+        table = tune({"step": step, "duration_ms": duration, "pause_ms": pause}
+                     for step, duration, pause in self.records * MIN_SAMPLES)
+        self.assertGreaterEqual(table["get_address"]["speech_timeout"], 2)
+
+    def test_answer_after_a_reply_is_a_new_answer(self):
+        first, second = self.utterances(silence(400) + tone(600) + silence(2000) + tone(800) + silence(800))
+        self.timer.heard("CA1", "get_name", first)
+        # The reply finished playing before the caller spoke again
+        self.timer.reply_played("CA1", second.started_ms - 300)
+        self.timer.heard("CA1", "get_service", second)
+        self.timer.finish("CA1")
+        self.assertEqual(self.records, [("get_name", 600, 0), ("get_service", 800, 0)])
+
+    def test_long_silence_ends_the_answer(self):
+        first, second = self.utterances(silence(400) + tone(600) + silence(MAX_SPEECH_TIMEOUT * 1000 + 500)
+                                        + tone(600) + silence(800))
+        self.timer.heard("CA1", "get_phone", first)
+        self.timer.heard("CA1", "get_phone", second)
+        self.assertEqual(self.records, [("get_phone", 600, 0)])
+        self.timer.finish("CA1")
+        self.timer.finish("CA1")
+        self.assertEqual(len(self.records), 2)
+
+
+class TestGatherTimeouts(unittest.TestCase):
+
+    def test_each_step_gets_its_timeouts(self):
+        profiles = build_profiles(endpointing=DEFAULT_ENDPOINTING)
+        self.assertEqual(profiles["confirm_booking"].attributes["speech_timeout"], 1)
+        self.assertEqual(profiles["get_address"].attributes["speech_timeout"], 3)
+        self.assertEqual(profiles["get_address"].attributes["timeout"], 7)
+        self.assertEqual(profiles["greeting"].attributes["speech_timeout"], "auto")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
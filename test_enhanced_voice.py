@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test suite for the Enhanced Voice Assistant: catalog questions answered without derailing the booking dialog
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import Mock, patch
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import enhanced_voice_assistant
+from enhanced_voice_assistant import EnhancedVoiceAssistant
+
+
+class TestFaqDuringBooking(unittest.TestCase):
+    """Booking answers that mention a service, a price or a day still move the booking on"""
+
+    def setUp(self):
+        self.assistant = EnhancedVoiceAssistant()
+        self.assistant.llm_gateway.providers = []
+        self.session = self.assistant.start_session("CAfaq", "+919876543210")
+        self.addCleanup(self.assistant.end_session, "CAfaq")
+        patcher = patch.object(enhanced_voice_assistant, 'client', Mock())
+        self.twilio = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def say(self, text: str) -> str:
+        return self.assistant.get_conversation_response(text, "CAfaq")
+
+    def test_booking_with_service_and_price_words(self):
+        script = [
+            ("I'd like to book an appointment", "get_name"),
+            ("I'm Priya", "get_service"),
+            ("a haircut please, whatever the price", "get_date"),
+            ("tomorrow, if the haircut price is the same", "get_time"),
+            ("4 pm works", "get_address"),
+            ("12 MG Road, Indiranagar", "confirm_booking"),
+            ("yes the rate is fine, book it", "booking_complete")
+        ]
+        for text, step in script:
+            with self.subTest(text=text):
+                self.say(text)
+                self.assertEqual(self.session.current_step, step)
+        self.assertEqual(self.session.booking_data.service, "haircut")
+        self.twilio.messages.create.assert_called_once()
+
+    def test_question_that_fills_nothing_gets_faq(self):
+        self.session.customer_name = "Priya"
+        self.session.booking_data.service = "haircut"
+        self.session.current_step = "get_date"
+        reply = self.say("how much is a haircut?")
+        self.assertIn("₹", reply)
+        self.assertEqual(self.session.current_step, "get_date")
+
+    def test_question_at_greeting_gets_faq(self):
+        reply = self.say("what are your prices?")
+        self.assertIn("₹", reply)
+        self.assertEqual(self.session.current_step, "greeting")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test suite for the step-aware intent router
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from intent_router import (
+    EXAMPLES_PATH, MODEL_PATH, ROUTE_FAQ, ROUTE_FSM, ROUTE_LLM,
+    IntentRouter, load_examples, load_router, save_model, train
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Generous ceiling for one routing decision; a normal run is ~25 µs
+MAX_MICROSECONDS_PER_ROUTE = 500
+
+
+class TestIntentRouter(unittest.TestCase):
+    """Routing decisions of the shipped model"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.router = load_router(os.path.join(HERE, MODEL_PATH), os.path.join(HERE, EXAMPLES_PATH))
+
+    def assertRoutes(self, cases):
+        for step, text, expected in cases:
+            with self.subTest(step=step, text=text):
+                self.assertEqual(self.router.route(text, step)[0], expected)
+
+    def test_questions_mid_booking_go_to_faq(self):
+        self.assertRoutes([
+            ("greeting", "What time do you open?", ROUTE_FAQ),
+            ("get_time", "What time do you open?", ROUTE_FAQ),
+            ("get_service", "how much is a haircut", ROUTE_FAQ),
+            ("greeting", "do you do home visits in Koramangala", ROUTE_FAQ),
+        ])
+
+    def test_slot_answers_go_to_fsm(self):
+        self.assertRoutes([
+            ("get_name", "Sarah", ROUTE_FSM),
+            ("get_name", "Arjun", ROUTE_FSM),
+            ("get_time", "at 5", ROUTE_FSM),
+            ("get_address", "14 Residency Road", ROUTE_FSM),
+            ("confirm_booking", "yes", ROUTE_FSM),
+            ("greeting", "I want to book a haircut tomorrow", ROUTE_FSM),
+        ])
+
+    def test_open_questions_go_to_llm(self):
+        self.assertRoutes([
+            ("greeting", "my hair is frizzy, any tips?", ROUTE_LLM),
+            ("greeting", "which haircut suits a round face", ROUTE_LLM),
+        ])
+
+    def test_step_changes_the_route(self):
+        self.assertEqual(self.router.route("Sarah", "get_name")[0], ROUTE_FSM)
+        self.assertNotEqual(self.router.route("Sarah", "greeting")[0], ROUTE_FSM)
+
+    def test_confidence_is_probability(self):
+        _, confidence = self.router.route("how much is coloring", "greeting")
+        self.assertGreater(confidence, 1 / 3)
+        self.assertLessEqual(confidence, 1.0)
+
+    def test_routing_speed(self):
+        started = time.perf_counter()
+        for _ in range(500):
+            self.router.route("what time do you open tomorrow", "get_time")
+        per_route = (time.perf_counter() - started) / 500 * 1e6
+        self.assertLess(per_route, MAX_MICROSECONDS_PER_ROUTE)
+
+
+class TestTraining(unittest.TestCase):
+    """Training and the model artifact"""
+
+    def test_artifact_round_trip(self):
+        router = train(load_examples(os.path.join(HERE, EXAMPLES_PATH)), epochs=3)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.json")
+            save_model(router, path)
+            loaded = load_router(path)
+        for text, step in [("Sarah", "get_name"), ("what are your hours", "greeting")]:
+            self.assertEqual(loaded.route(text, step)[0], router.route(text, step)[0])
+
+    def test_missing_artifact_trains_from_examples(self):
+        router = load_router("does/not/exist.json", os.path.join(HERE, EXAMPLES_PATH))
+        self.assertIsInstance(router, IntentRouter)
+        self.assertEqual(router.route("book an appointment", "greeting")[0], ROUTE_FSM)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
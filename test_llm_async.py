@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test suite for the async LLM client layer
+"""
+
+import asyncio
+import os
+import sys
+import time
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from llm_async import AsyncLLMGateway, AsyncStubProvider
+from llm_gateway import HALF_OPEN, CircuitBreaker
+
+MESSAGES = [{"role": "user", "content": "What's the bridal package price?"}]
+
+
+def rules(messages):
+    return "Rule-based reply."
+
+
+class TestAsyncLLMGateway(unittest.TestCase):
+
+    def test_reply_from_primary(self):
+        gateway = AsyncLLMGateway([AsyncStubProvider("gemini", "Bridal is ₹15,000.")], rules)
+        result = asyncio.run(gateway.complete(MESSAGES))
+        self.assertEqual((result.text, result.provider), ("Bridal is ₹15,000.", "gemini"))
+
+    def test_slow_call_does_not_stall_others(self):
+        slow = AsyncLLMGateway([AsyncStubProvider("gemini", latency=0.5)], rules)
+        fast = AsyncLLMGateway([AsyncStubProvider("openai", "Fast.", latency=0.01)], rules)
+
+        async def scenario():
+            slow_task = asyncio.ensure_future(slow.complete(MESSAGES))
+            started = time.monotonic()
+            result = await fast.complete(MESSAGES)
+            elapsed = time.monotonic() - started
+            await slow_task
+            return result, elapsed
+
+        result, elapsed = asyncio.run(scenario())
+        self.assertEqual(result.text, "Fast.")
+        self.assertLess(elapsed, 0.2)
+
+    def test_per_provider_timeout(self):
+        provider = AsyncStubProvider("gemini", latency=1.0, timeout=0.05)
+        gateway = AsyncLLMGateway([provider], rules)
+        result = asyncio.run(gateway.complete(MESSAGES))
+        self.assertTrue(result.degraded)
+        self.assertLess(result.latency, 0.5)
+        self.assertEqual(gateway.stats()["gateway"]["timeouts"], 1)
+
+    def test_concurrency_is_bounded(self):
+        provider = AsyncStubProvider("gemini", latency=0.05, max_concurrency=3)
+        gateway = AsyncLLMGateway([provider], rules)
+
+        async def scenario():
+            return await asyncio.gather(*(gateway.complete(MESSAGES) for _ in range(10)))
+
+        results = asyncio.run(scenario())
+        self.assertTrue(all(not result.degraded for result in results))
+        self.assertEqual(provider.peak_active, 3)
+        self.assertEqual(gateway.stats()["providers"]["gemini"]["in_flight"], 0)
+
+    def test_hedge_cancels_loser(self):
+        slow = AsyncStubProvider("gemini", "Slow.", latency=0.5)
+        fast = AsyncStubProvider("openai", "Fast.", latency=0.01)
+        gateway = AsyncLLMGateway([slow, fast], rules, hedge_delay=0.05)
+        result = asyncio.run(gateway.complete(MESSAGES))
+        self.assertEqual((result.provider, result.hedged), ("openai", True))
+        self.assertEqual(slow.active, 0)
+
+    def test_cancelled_probe_frees_slot(self):
+        slow = AsyncStubProvider("gemini", latency=0.5)
+        gateway = AsyncLLMGateway([slow, AsyncStubProvider("openai")], rules, hedge_delay=0.02,
+                                  breaker_factory=lambda: CircuitBreaker(min_calls=1, cooldown=0))
+        breaker = gateway.breakers["gemini"]
+        breaker.record(False, 0.1)
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertEqual(asyncio.run(gateway.complete(MESSAGES)).provider, "openai")
+        self.assertTrue(breaker.available())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
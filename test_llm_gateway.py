@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Test suite for the LLM gateway: breakers, hedging and rule-based degradation
+"""
+
+import os
+import sys
+import time
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from llm_gateway import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, LatencyHistogram, LLMGateway, StubProvider
+)
+
+MESSAGES = [{"role": "user", "content": "Do you do keratin treatments?"}]
+
+
+def rules(messages):
+    return "Rule-based reply."
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_percentiles_report_bucket_bounds(self):
+        histogram = LatencyHistogram()
+        for _ in range(90):
+            histogram.observe(0.2)
+        for _ in range(10):
+            histogram.observe(4.0)
+        self.assertEqual(histogram.percentile(0.5), 0.25)
+        self.assertEqual(histogram.percentile(0.95), 5.0)
+        self.assertIsNone(LatencyHistogram().percentile(0.5))
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(window=10, min_calls=4, error_rate=0.5, max_p95=2.0,
+                                      cooldown=10, clock=self.clock)
+
+    def test_opens_on_error_rate(self):
+        for ok in (True, False, True, False):
+            self.breaker.record(ok, 0.1)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_opens_on_slow_p95(self):
+        for _ in range(4):
+            self.breaker.record(True, 3.0)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_half_open_probe(self):
+        for _ in range(4):
+            self.breaker.record(False, 0.1)
+        self.clock.now = 11
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())  # only one probe at a time
+        self.breaker.record(True, 0.2)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_reopens(self):
+        for _ in range(4):
+            self.breaker.record(False, 0.1)
+        self.clock.now = 11
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.state, OPEN)
+
+
+class TestLLMGateway(unittest.TestCase):
+
+    def make(self, *providers, **options):
+        gateway = LLMGateway(providers, rules, **options)
+        self.addCleanup(gateway.shutdown)
+        return gateway
+
+    def test_primary_answers(self):
+        gateway = self.make(StubProvider("gemini", "From Gemini."), StubProvider("openai", "From OpenAI."))
+        result = gateway.complete(MESSAGES)
+        self.assertEqual((result.text, result.provider, result.hedged), ("From Gemini.", "gemini", False))
+
+    def test_failover_on_error(self):
+        gateway = self.make(StubProvider("gemini", fail=True), StubProvider("openai", "From OpenAI."))
+        result = gateway.complete(MESSAGES)
+        self.assertEqual(result.provider, "openai")
+        self.assertEqual(gateway.stats()["gateway"]["failovers"], 1)
+
+    def test_hedges_slow_primary(self):
+        slow = StubProvider("gemini", "Slow.", latency=0.5)
+        fast = StubProvider("openai", "Fast.", latency=0.01)
+        gateway = self.make(slow, fast, hedge_delay=0.05)
+        started = time.monotonic()
+        result = gateway.complete(MESSAGES)
+        self.assertLess(time.monotonic() - started, 0.3)
+        self.assertEqual((result.provider, result.hedged), ("openai", True))
+        self.assertEqual(gateway.stats()["gateway"]["hedge_wins"], 1)
+
+    def test_no_hedge_when_disabled(self):
+        gateway = self.make(StubProvider("gemini", "Slow.", latency=0.1), StubProvider("openai"),
+                            hedge=False, hedge_delay=0.01)
+        self.assertEqual(gateway.complete(MESSAGES).provider, "gemini")
+
+    def test_degrades_instantly_when_breakers_open(self):
+        failing = StubProvider("gemini", fail=True)
+        gateway = self.make(failing, breaker_factory=lambda: CircuitBreaker(min_calls=2))
+        for _ in range(2):
+            gateway.complete(MESSAGES)
+        calls = failing.calls
+        started = time.monotonic()
+        result = gateway.complete(MESSAGES)
+        self.assertLess(time.monotonic() - started, 0.05)
+        self.assertEqual((result.text, result.degraded), ("Rule-based reply.", True))
+        self.assertEqual(failing.calls, calls)
+        self.assertEqual(gateway.stats()["providers"]["gemini"]["breaker"], OPEN)
+
+    def test_timeout_degrades_to_rules(self):
+        gateway = self.make(StubProvider("gemini", latency=0.5), timeout=0.1)
+        result = gateway.complete(MESSAGES)
+        self.assertTrue(result.degraded)
+        self.assertLess(result.latency, 0.3)
+
+    def test_hung_provider_opens_breaker(self):
+        hung = StubProvider("gemini", latency=1.0)
+        gateway = self.make(hung, timeout=0.05, breaker_factory=lambda: CircuitBreaker(min_calls=2))
+        for _ in range(2):
+            self.assertTrue(gateway.complete(MESSAGES).degraded)
+        self.assertEqual(gateway.stats()["providers"]["gemini"]["breaker"], OPEN)
+        self.assertEqual(gateway.stats()["gateway"]["timeouts"], 2)
+        # The next request degrades at once instead of waiting out the deadline
+        started = time.monotonic()
+        self.assertTrue(gateway.complete(MESSAGES).degraded)
+        self.assertLess(time.monotonic() - started, 0.02)
+        self.assertEqual(hung.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Test suite for LLM usage telemetry: tagging, token accounting, cost and exports
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from llm_gateway import GatewayResult, LLMGateway, OpenAIProvider, StubProvider, Usage
+from llm_telemetry import LLMTelemetry, estimate_cost, tag_call
+
+MESSAGES = [{"role": "user", "content": "Do you do keratin treatments?"}]
+
+DAY = 86400.0
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeOpenAIClient:
+    """Just enough of the OpenAI client for OpenAIProvider"""
+
+    def __init__(self):
+        response = types.SimpleNamespace(
+            choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=" Yes, we do. "))],
+            usage=types.SimpleNamespace(prompt_tokens=120, completion_tokens=8,
+                                        prompt_tokens_details=types.SimpleNamespace(cached_tokens=100))
+        )
+        self.chat = types.SimpleNamespace(
+            completions=types.SimpleNamespace(create=lambda **kwargs: response)
+        )
+
+
+class TestLLMTelemetry(unittest.TestCase):
+
+    def setUp(self):
+        self.rollup_dir = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.telemetry = LLMTelemetry(rollup_dir=self.rollup_dir, clock=self.clock)
+
+    def tearDown(self):
+        shutil.rmtree(self.rollup_dir, ignore_errors=True)
+
+    def test_cost_uses_model_prices_and_cached_discount(self):
+        self.assertAlmostEqual(estimate_cost("gpt-3.5-turbo", 1_000_000, 0), 0.50)
+        self.assertAlmostEqual(estimate_cost("gemini-2.0-flash-exp", 0, 1_000_000), 0.40)
+        self.assertAlmostEqual(estimate_cost("gpt-3.5-turbo", 1_000_000, 0, cached_tokens=1_000_000), 0.25)
+        self.assertEqual(estimate_cost("rules", 500, 500), 0.0)
+
+    def test_records_aggregate_per_step_and_call(self):
+        self.telemetry.record("openai", "gpt-3.5-turbo", 100, 10, 0.4, call_sid="CA1", step="get_name")
+        self.telemetry.record("openai", "gpt-3.5-turbo", 200, 20, 0.6, retries=1, call_sid="CA1", step="get_date")
+        self.telemetry.record("gemini", "gemini-2.0-flash-exp", 50, 5, 0.2, call_sid="CA2", step="get_name")
+
+        snapshot = self.telemetry.snapshot()
+        self.assertEqual(snapshot["by_step"]["get_name"]["calls"], 2)
+        self.assertEqual(snapshot["by_step"]["get_date"]["retries"], 1)
+        self.assertEqual(snapshot["by_provider"]["openai"]["prompt_tokens"], 300)
+        self.assertEqual(snapshot["by_model"]["gemini-2.0-flash-exp"]["completion_tokens"], 5)
+
+        call = self.telemetry.call_summary("CA1")
+        self.assertEqual(call["calls"], 2)
+        self.assertEqual(call["completion_tokens"], 30)
+        self.assertGreater(call["cost_usd"], 0)
+        self.assertIsNone(self.telemetry.call_summary("CA404"))
+
+    def test_tag_call_supplies_call_sid_and_step(self):
+        with tag_call("CA7", "get_service"):
+            record = self.telemetry.record("gemini", "gemini-2.0-flash-exp", 10, 2, 0.1)
+        self.assertEqual((record.call_sid, record.step), ("CA7", "get_service"))
+
+        # Explicit tags win over the context
+        with tag_call("CA7", "get_service"):
+            record = self.telemetry.record("gemini", "gemini-2.0-flash-exp", 10, 2, 0.1, step="get_time")
+        self.assertEqual((record.call_sid, record.step), ("CA7", "get_time"))
+
+        record = self.telemetry.record("gemini", "gemini-2.0-flash-exp", 10, 2, 0.1)
+        self.assertEqual((record.call_sid, record.step), (None, "-"))
+
+    def test_record_result_prefers_reported_usage(self):
+        gateway = LLMGateway([OpenAIProvider(FakeOpenAIClient())], fallback=lambda m: "Rules.", hedge=False)
+        try:
+            result = gateway.complete(MESSAGES)
+        finally:
+            gateway.shutdown()
+        self.assertEqual(result.model, "gpt-3.5-turbo")
+        self.assertEqual(result.text, "Yes, we do.")
+
+        record = self.telemetry.record_result(result, prompt_tokens=999, step="greeting")
+        self.assertEqual((record.prompt_tokens, record.completion_tokens, record.cached_tokens), (120, 8, 100))
+        self.assertFalse(record.estimated)
+
+    def test_record_result_estimates_without_usage(self):
+        result = GatewayResult("We are open nine to eight.", "gemini", 0.3, model="gemini-2.0-flash-exp")
+        record = self.telemetry.record_result(result, prompt_tokens=150)
+        self.assertEqual(record.prompt_tokens, 150)
+        self.assertGreater(record.completion_tokens, 0)
+        self.assertTrue(record.estimated)
+
+    def test_shared_and_degraded_replies_cost_nothing(self):
+        result = GatewayResult("Shared.", "openai", 0.5, model="gpt-3.5-turbo", usage=Usage(100, 10))
+        shared = self.telemetry.record_result(result, prompt_tokens=100, cache_hit=True)
+        self.assertEqual((shared.prompt_tokens, shared.completion_tokens, shared.cost), (0, 0, 0.0))
+
+        degraded = GatewayResult("Rules.", "rules", 8.0, degraded=True, attempts=2)
+        record = self.telemetry.record_result(degraded, prompt_tokens=100)
+        self.assertEqual(record.retries, 1)
+        self.assertFalse(record.ok)
+
+        totals = self.telemetry.daily_rollup()["totals"]
+        self.assertEqual(totals["cache_hits"], 1)
+        self.assertEqual(totals["errors"], 1)
+
+    def test_gateway_counts_failover_as_retry(self):
+        gateway = LLMGateway(
+            [StubProvider("gemini", fail=True), StubProvider("openai", reply="Yes.")],
+            fallback=lambda m: "Rules.", hedge=False
+        )
+        try:
+            result = gateway.complete(MESSAGES)
+        finally:
+            gateway.shutdown()
+        self.assertEqual(result.provider, "openai")
+        self.assertEqual(result.retries, 1)
+
+    def test_prometheus_export(self):
+        self.telemetry.record("openai", "gpt-3.5-turbo", 100, 10, 0.4, step="get_name")
+        self.telemetry.record("openai", "gpt-3.5-turbo", 100, 10, 3.5, step="get_name")
+        text = self.telemetry.prometheus()
+
+        labels = 'provider="openai",model="gpt-3.5-turbo",step="get_name"'
+        self.assertIn("# TYPE llm_latency_seconds histogram", text)
+        self.assertIn(f"llm_calls_total{{{labels}}} 2", text)
+        self.assertIn(f'llm_tokens_total{{{labels},kind="prompt"}} 200', text)
+        self.assertIn(f'llm_latency_seconds_bucket{{{labels},le="0.5"}} 1', text)
+        self.assertIn(f'llm_latency_seconds_bucket{{{labels},le="+Inf"}} 2', text)
+        self.assertIn(f"llm_latency_seconds_count{{{labels}}} 2", text)
+
+    def test_daily_rollup_written_when_day_changes(self):
+        self.telemetry.record("openai", "gpt-3.5-turbo", 100, 10, 0.4, call_sid="CA1", step="get_name")
+        self.telemetry.record("openai", "gpt-3.5-turbo", 100, 10, 0.4, call_sid="CA2", step="get_name")
+        first_day = self.telemetry.daily_rollup()["date"]
+        self.assertEqual(os.listdir(self.rollup_dir), [])
+
+        self.clock.now += DAY
+        self.telemetry.record("openai", "gpt-3.5-turbo", 100, 10, 0.4, call_sid="CA3", step="get_name")
+
+        with open(os.path.join(self.rollup_dir, f"llm_usage_{first_day}.json")) as handle:
+            rollup = json.load(handle)
+        self.assertEqual(rollup["phone_calls"], 2)
+        self.assertEqual(rollup["totals"]["calls"], 2)
+        self.assertEqual(rollup["by_step"]["get_name"]["prompt_tokens"], 200)
+        self.assertAlmostEqual(rollup["cost_per_call_usd"], rollup["totals"]["cost_usd"] / 2, places=6)
+
+        # Today starts afresh; totals since start-up keep everything
+        self.assertEqual(self.telemetry.daily_rollup()["totals"]["calls"], 1)
+        self.assertEqual(self.telemetry.snapshot()["by_step"]["get_name"]["calls"], 3)
+
+        path = self.telemetry.flush()
+        self.assertTrue(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Test suite for local streaming speech recognition: listener calibration, partials and finalization
+"""
+
+import math
+import os
+import sys
+import threading
+import time
+import unittest
+from array import array
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from local_asr import BackgroundListener, StreamingListener, StreamingRecognizer
+from voice_activity import Utterance, frame_rms
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+FRAME_BYTES = SAMPLE_RATE * FRAME_MS // 1000 * 2
+
+
+def tone(ms: int, amplitude: int = 8000) -> bytes:
+    count = SAMPLE_RATE * ms // 1000
+    return array("h", (int(amplitude * math.sin(2 * math.pi * 250 * i / SAMPLE_RATE))
+                       for i in range(count))).tobytes()
+
+
+def silence(ms: int) -> bytes:
+    return bytes(SAMPLE_RATE * ms // 1000 * 2)
+
+
+class FakeSource:
+    """Frames from prepared audio, then silence; counts how much was read"""
+
+    sample_rate = SAMPLE_RATE
+    frame_ms = FRAME_MS
+
+    def __init__(self, audio: bytes):
+        self.audio = audio
+        self.frames_read = 0
+
+    def read(self) -> bytes:
+        offset = self.frames_read * FRAME_BYTES
+        self.frames_read += 1
+        return self.audio[offset:offset + FRAME_BYTES].ljust(FRAME_BYTES, b"\0")
+
+    def append(self, audio: bytes):
+        self.audio = self.audio[:self.frames_read * FRAME_BYTES].ljust(self.frames_read * FRAME_BYTES, b"\0") + audio
+
+
+class PacedSource(FakeSource):
+    """A FakeSource delivering frames at ten times real time, like a device would"""
+
+    def read(self) -> bytes:
+        time.sleep(FRAME_MS / 1000 / 10)
+        return super().read()
+
+
+class WordCounter(StreamingRecognizer):
+    """Hears one word per 100 ms of audio fed, so partials grow as the caller speaks"""
+
+    sample_rate = SAMPLE_RATE
+
+    def __init__(self):
+        self.fed = 0
+        self.starts = 0
+
+    def start(self):
+        self.fed = 0
+        self.starts += 1
+
+    def accept(self, pcm: bytes) -> str:
+        self.fed += len(pcm)
+        return self._text()
+
+    def finish(self) -> str:
+        return self._text()
+
+    def _text(self) -> str:
+        return " ".join(["word"] * (self.fed // (SAMPLE_RATE // 10 * 2)))
+
+
+class VoicedCounter(WordCounter):
+    """Hears one word per 100 ms of voiced audio only, so each utterance's length shows"""
+
+    def accept(self, pcm: bytes) -> str:
+        self.fed += sum(FRAME_BYTES for offset in range(0, len(pcm), FRAME_BYTES)
+                        if frame_rms(pcm[offset:offset + FRAME_BYTES]) > 1000)
+        return self._text()
+
+
+class TestStreamingListener(unittest.TestCase):
+
+    def test_transcribes_while_speaking(self):
+        source = FakeSource(silence(1000) + tone(600) + silence(800))
+        recognizer = WordCounter()
+        listener = StreamingListener(recognizer, source)
+        partials = []
+
+        text = listener.listen(timeout=5, on_partial=partials.append)
+
+        self.assertTrue(text.startswith("word word word word word word"))
+        self.assertEqual(partials, sorted(partials, key=len))
+        self.assertGreaterEqual(len(partials), 4)
+        self.assertEqual(partials[0], "word")
+        self.assertEqual(recognizer.starts, 1)
+        self.assertGreaterEqual(listener.last_finalize_ms, 0.0)
+
+    def test_calibrates_once_and_tracks_noise(self):
+        hum = tone(1000, amplitude=300)
+        source = FakeSource(hum + tone(400) + silence(800))
+        listener = StreamingListener(WordCounter(), source)
+        self.assertTrue(listener.listen(timeout=5))
+        floor = listener.vad.noise_floor
+        self.assertGreater(floor, 150)
+
+        # The next utterance starts straight away: no second one-second calibration
+        read = source.frames_read
+        source.append(silence(400) + tone(400) + silence(800))
+        self.assertTrue(listener.listen(timeout=5))
+        self.assertLess(source.frames_read - read, (400 + 400 + 800) // FRAME_MS + 5)
+        # ...and the quieter line since then has lowered the floor
+        self.assertLess(listener.vad.noise_floor, floor)
+
+    def test_times_out_without_speech(self):
+        source = FakeSource(silence(3000))
+        listener = StreamingListener(WordCounter(), source)
+        self.assertIsNone(listener.listen(timeout=1.0))
+        self.assertEqual(source.frames_read, (1000 + 1000) // FRAME_MS)
+
+    def test_recognizer_transcribes_whole_utterances(self):
+        recognizer = WordCounter()
+        utterance = Utterance(tone(300), SAMPLE_RATE, 0, 300)
+        self.assertEqual(recognizer(utterance), "word word word")
+
+
+class TestBackgroundListener(unittest.TestCase):
+
+    def listener(self, source, **kwargs) -> BackgroundListener:
+        listener = BackgroundListener(VoicedCounter(), source, **kwargs).start()
+        self.addCleanup(listener.stop)
+        return listener
+
+    def test_speech_during_processing_is_not_lost(self):
+        source = PacedSource(silence(1000) + tone(300) + silence(700) + tone(500) + silence(800))
+        listener = self.listener(source)
+
+        self.assertEqual(listener.listen(timeout=5), "word word word")
+        # "Processing" the first turn while the caller already says the next thing
+        time.sleep(0.15)
+        started = time.perf_counter()
+        self.assertEqual(listener.listen(timeout=5), "word word word word word")
+        self.assertLess(time.perf_counter() - started, 0.1)
+        stats = listener.stats()
+        self.assertEqual((stats["utterances"], stats["dropped"]), (2, 0))
+
+    def test_muted_capture_ignores_the_assistant(self):
+        talking = threading.Event()
+        source = PacedSource(silence(1000))
+        listener = self.listener(source, muted=talking.is_set)
+        while not listener.vad.calibrated:
+            time.sleep(0.01)
+
+        # The assistant's own reply reaches the microphone while it talks
+        talking.set()
+        source.append(tone(400) + silence(800))
+        self.assertIsNone(listener.listen(timeout=0.3))
+        self.assertGreater(listener.stats()["muted"], 0)
+
+        talking.clear()
+        source.append(silence(200) + tone(400) + silence(800))
+        self.assertEqual(listener.listen(timeout=5), "word word word word")
+
+    def test_timeout_starts_when_the_reply_ends(self):
+        talking = threading.Event()
+        source = PacedSource(silence(1000))
+        listener = self.listener(source, muted=talking.is_set, hold_timeout=talking.is_set)
+        while not listener.vad.calibrated:
+            time.sleep(0.01)
+
+        # A reply longer than the timeout is queued just before listening starts
+        talking.set()
+        results = []
+        waiting = threading.Thread(target=lambda: results.append(listener.listen(timeout=0.3)))
+        waiting.start()
+        time.sleep(0.6)
+        self.assertEqual(results, [])
+
+        talking.clear()
+        source.append(silence(100) + tone(400) + silence(800))
+        waiting.join(5)
+        self.assertEqual(results, ["word word word word"])
+
+        # With nothing said after the reply, the timeout runs from its end
+        talking.set()
+        threading.Timer(0.4, talking.clear).start()
+        started = time.perf_counter()
+        self.assertIsNone(listener.listen(timeout=0.3))
+        self.assertGreaterEqual(time.perf_counter() - started, 0.65)
+
+    def test_slow_recognition_overflows_ring_not_device(self):
+        class SlowCounter(VoicedCounter):
+            def accept(self, pcm: bytes) -> str:
+                time.sleep(0.02)
+                return super().accept(pcm)
+
+        source = PacedSource(silence(1000) + tone(2000) + silence(800))
+        listener = BackgroundListener(SlowCounter(), source, ring_seconds=0.5).start()
+        self.addCleanup(listener.stop)
+        self.assertIsNotNone(listener.listen(timeout=10))
+        self.assertGreater(listener.stats()["dropped"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
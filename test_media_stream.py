@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Test suite for the media stream pipeline: μ-law codec, VAD, fake-client replays and barge-in
+"""
+
+import asyncio
+import math
+import os
+import sys
+import tempfile
+import unittest
+import wave
+from array import array
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from endpointing import UtteranceLog
+from media_stream import CallerTurn, FakeMediaStreamClient, MediaStreamServer, load_wav
+from voice_activity import SAMPLE_RATE, SPEECH_END, SPEECH_START, EnergyVAD, ulaw_decode, ulaw_encode
+
+FRAME_SAMPLES = SAMPLE_RATE // 50
+
+
+def tone(ms: int, amplitude: int = 8000, frequency: int = 300) -> bytes:
+    """A voiced stretch standing in for speech"""
+    count = SAMPLE_RATE * ms // 1000
+    return array("h", (int(amplitude * math.sin(2 * math.pi * frequency * i / SAMPLE_RATE))
+                       for i in range(count))).tobytes()
+
+
+def silence(ms: int) -> bytes:
+    return bytes(SAMPLE_RATE * ms // 1000 * 2)
+
+
+def frames(pcm: bytes):
+    for offset in range(0, len(pcm), FRAME_SAMPLES * 2):
+        yield pcm[offset:offset + FRAME_SAMPLES * 2]
+
+
+class ScriptedTranscriber:
+    """Hears the next line of the script for each utterance"""
+
+    def __init__(self, lines):
+        self.lines = list(lines)
+        self.heard = []
+
+    def __call__(self, utterance) -> str:
+        self.heard.append(utterance.duration_ms)
+        return self.lines.pop(0) if self.lines else ""
+
+
+class FakeSynthesizer:
+    """10 ms of μ-law silence per character, and a log of what was said"""
+
+    def __init__(self):
+        self.said = []
+
+    def __call__(self, text: str) -> bytes:
+        self.said.append(text)
+        return b"\xff" * (len(text) * 80)
+
+
+class TestVoiceActivity(unittest.TestCase):
+
+    def test_ulaw_round_trip_keeps_level(self):
+        pcm = tone(100)
+        decoded = array("h", ulaw_decode(ulaw_encode(pcm)))
+        original = array("h", pcm)
+        self.assertEqual(len(decoded), len(original))
+        self.assertTrue(all(abs(a - b) <= max(64, abs(a) // 16) for a, b in zip(original, decoded)))
+        self.assertEqual(ulaw_encode(silence(20)), b"\xff" * 160)
+
+    def test_utterances_are_cut_at_silence(self):
+        vad = EnergyVAD(end_silence_ms=300)
+        audio = silence(400) + tone(500) + silence(200) + tone(300) + silence(600) + tone(400) + silence(400)
+        events = []
+        for frame in frames(audio):
+            events.extend(vad.process(frame))
+
+        kinds = [event.kind for event in events]
+        self.assertEqual(kinds, [SPEECH_START, SPEECH_END, SPEECH_START, SPEECH_END])
+        first = events[1].utterance
+        # The short pause stays inside the first utterance
+        self.assertEqual(first.duration_ms, 1000)
+        self.assertEqual(first.started_ms, 400)
+        self.assertGreaterEqual(len(first.audio), (1000 + 300) * SAMPLE_RATE // 1000 * 2)
+
+    def test_noise_floor_tracks_the_line(self):
+        vad = EnergyVAD(min_level=50)
+        hum = tone(1000, amplitude=400)
+        for frame in frames(hum):
+            self.assertEqual(vad.process(frame), [])
+        self.assertGreater(vad.noise_floor, 200)
+        events = []
+        for frame in frames(tone(300, amplitude=6000) + hum):
+            events.extend(vad.process(frame))
+        self.assertEqual([event.kind for event in events], [SPEECH_START, SPEECH_END])
+        self.assertEqual(vad.flush(), [])
+
+
+class TestMediaStream(unittest.TestCase):
+
+    def setUp(self):
+        self.synthesizer = FakeSynthesizer()
+        self.finished = set()
+        self.stopped = []
+
+    def server(self, lines, respond=None):
+        self.transcriber = ScriptedTranscriber(lines)
+        return MediaStreamServer(
+            on_start=lambda call_sid, parameters: f"Hello {parameters.get('From')}! How can I help you today?",
+            respond=respond or (lambda call_sid, text: f"You said {text}."),
+            transcribe=self.transcriber,
+            synthesize=self.synthesizer,
+            is_finished=lambda call_sid: call_sid in self.finished,
+            on_stop=self.stopped.append
+        )
+
+    def replay(self, server, client):
+        asyncio.run(asyncio.wait_for(server.handle(client), 30))
+
+    def test_turns_are_heard_and_answered(self):
+        server = self.server(["book a haircut", "tomorrow"])
+        client = FakeMediaStreamClient([CallerTurn(tone(600)), CallerTurn(tone(400))],
+                                       call_sid="CAms1", parameters={"From": "+919000000001"})
+        self.replay(server, client)
+
+        self.assertEqual(self.synthesizer.said, [
+            "Hello +919000000001!", "How can I help you today?", "You said book a haircut.", "You said tomorrow."
+        ])
+        self.assertEqual(self.transcriber.heard, [600, 400])
+        self.assertEqual([m["event"] for m in client.sent if m["event"] != "media"],
+                         ["mark", "mark", "mark", "mark", "mark", "mark", "mark"])
+        self.assertIn("3:end", client.marks_played)
+        self.assertEqual(len(client.reply_audio), sum(len(text) * 80 for text in self.synthesizer.said))
+        self.assertEqual(self.stopped, ["CAms1"])
+
+        stats = server.stats()
+        self.assertEqual((stats["calls"], stats["utterances"], stats["replies"], stats["barge_ins"]), (1, 2, 3, 0))
+        self.assertGreater(stats["first_audio_ms_max"], 0)
+
+    def test_caller_talking_over_reply_clears_it(self):
+        long_reply = "This is a long answer about every service we offer. " * 4
+        server = self.server(["prices please", "actually just a haircut"],
+                             respond=lambda call_sid, text: long_reply if text == "prices please" else "Sure.")
+        client = FakeMediaStreamClient([CallerTurn(tone(500)), CallerTurn(tone(500), barge_in=True)])
+        self.replay(server, client)
+
+        self.assertEqual(client.cleared, 1)
+        self.assertEqual(server.stats()["barge_ins"], 1)
+        self.assertEqual(self.synthesizer.said[-1], "Sure.")
+        # The interrupted reply never finished; the one after it did
+        self.assertIn("2:end", client.marks_cleared)
+        self.assertNotIn("2:end", client.marks_played)
+        self.assertIn("3:end", client.marks_played)
+
+    def test_finished_call_closes_after_goodbye(self):
+        def respond(call_sid, text):
+            self.finished.add(call_sid)
+            return "Your booking is confirmed. Goodbye!"
+
+        server = self.server(["yes"], respond=respond)
+        client = FakeMediaStreamClient([CallerTurn(tone(400)), CallerTurn(tone(400))], call_sid="CAms3")
+        self.replay(server, client)
+
+        self.assertTrue(client.closed)
+        self.assertIn("2:end", client.marks_played)
+        self.assertEqual(self.transcriber.heard, [400])
+        self.assertEqual(self.stopped, ["CAms3"])
+
+    def test_replays_recorded_wav(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "turn.wav")
+        # 16 kHz stereo recording, downmixed and resampled on load
+        samples = array("h")
+        for sample in array("h", tone(1000, frequency=200)):
+            samples.extend((sample, sample, sample, sample))
+        with wave.open(path, "wb") as handle:
+            handle.setnchannels(2)
+            handle.setsampwidth(2)
+            handle.setframerate(16000)
+            handle.writeframes(samples.tobytes())
+        try:
+            self.assertAlmostEqual(len(load_wav(path)), len(tone(1000)), delta=4)
+            server = self.server(["my name is Asha"])
+            client = FakeMediaStreamClient.from_wav([path])
+            self.replay(server, client)
+        finally:
+            os.remove(path)
+            os.rmdir(directory)
+        self.assertEqual(self.synthesizer.said[-1], "You said my name is Asha.")
+
+
+class TestBookingOverMediaStream(unittest.TestCase):
+    """The simple assistant's booking dialog, driven through a stream"""
+
+    @classmethod
+    def setUpClass(cls):
+        import voice_booking_simple
+        cls.module = voice_booking_simple
+
+    def test_booking_dialog_turns(self):
+        directory = tempfile.mkdtemp()
+        log = UtteranceLog(os.path.join(directory, "utterances.jsonl"))
+        original_log = self.module.default_utterance_log
+        self.module.default_utterance_log = log
+        self.addCleanup(setattr, self.module, "default_utterance_log", original_log)
+        synthesizer = FakeSynthesizer()
+        server = self.module.create_media_stream_server(
+            transcribe=ScriptedTranscriber(["Hi, I want to book", "My name is Priya"]), synthesize=synthesizer
+        )
+        client = FakeMediaStreamClient([CallerTurn(tone(500)), CallerTurn(tone(500))], call_sid="CAms5",
+                                       parameters={"From": "+919000000005"})
+        asyncio.run(asyncio.wait_for(server.handle(client), 30))
+
+        said = " ".join(synthesizer.said)
+        self.assertIn("What's your name?", said)
+        self.assertIn("Nice to meet you, Priya!", said)
+        self.module.voice_assistant.end_session("CAms5")
+
+        # Answer lengths are recorded against the step they answered
+        self.assertEqual([record["step"] for record in log.records()], ["greeting", "get_name"])
+        os.remove(log.path)
+        os.rmdir(directory)
+
+    def test_stream_twiml(self):
+        original = self.module.VOICE_MODE
+        self.module.VOICE_MODE = 'stream'
+        try:
+            client = self.module.app.test_client()
+            reply = client.post('/voice/incoming', data={'CallSid': 'CAms6', 'From': '+919000000006'})
+        finally:
+            self.module.VOICE_MODE = original
+        self.assertIn(b'<Connect><Stream url="wss://', reply.data)
+        self.assertIn(b'<Parameter name="From" value="+919000000006" />', reply.data)
+        self.assertIn(b'/voice/stream_ended/CAms6</Redirect>', reply.data)
+
+        ended = self.module.app.test_client().post('/voice/stream_ended/CAms6')
+        self.assertIn(b'<Gather', ended.data)
+        self.module.voice_assistant.end_session('CAms6')
+        ended = self.module.app.test_client().post('/voice/stream_ended/CAms6')
+        self.assertIn(b'<Hangup />', ended.data)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
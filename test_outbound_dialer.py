@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Test suite for the outbound dialer: CPS pacing, concurrency caps, busy/no-answer retries and the persistent queue
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from outbound_dialer import (COMPLETED, DIALING, FAILED, IN_CALL, QUEUED, RETRYING, STATUS_POLL_SECONDS, CallQueue,
+                             FakeCarrier, OutboundDialer, backoff_seconds)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class DialerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.clock = FakeClock()
+
+    def dialer(self, carrier=None, **kwargs) -> OutboundDialer:
+        self.carrier = carrier or FakeCarrier(clock=self.clock)
+        kwargs.setdefault("backoff", lambda attempt: 30.0)
+        return OutboundDialer(self.carrier, CallQueue(os.path.join(self.directory, "calls.db")),
+                              clock=self.clock, **kwargs)
+
+
+class TestPacing(DialerTestCase):
+
+    def test_burst_is_paced_to_the_carrier_limit(self):
+        dialer = self.dialer(FakeCarrier(cps=2, clock=self.clock), cps=2, burst=1, max_concurrent=50)
+        requests = [dialer.submit(f"+9190000000{index:02d}") for index in range(10)]
+
+        placed = []
+        for _ in range(50):
+            placed.append(dialer.pump())
+            self.clock.now += 0.25
+        self.assertEqual(sum(placed), 10)
+        # Never more than the carrier's limit in any one-second window, so it never pushed back
+        self.assertEqual(self.carrier.rejected, 0)
+        times = [at for at, _, _ in self.carrier.dials]
+        self.assertTrue(all(sum(1 for other in times if 0 <= other - at < 1.0) <= 2 for at in times))
+        self.assertEqual(dialer.status(requests[-1].request_id)["status"], IN_CALL)
+
+    def test_queue_position_is_reported(self):
+        dialer = self.dialer(cps=1, burst=1)
+        first, second, third = (dialer.submit(f"+91900000000{index}") for index in range(3))
+        self.assertEqual(dialer.status(third.request_id)["queue_position"], 2)
+        dialer.pump()
+        self.assertEqual(dialer.status(first.request_id)["status"], IN_CALL)
+        self.assertEqual(dialer.status(third.request_id)["queue_position"], 1)
+        self.assertIsNone(dialer.status("missing"))
+
+    def test_concurrency_cap_holds_calls_until_one_ends(self):
+        dialer = self.dialer(cps=100, burst=100, max_concurrent=2)
+        for index in range(4):
+            dialer.submit(f"+91900000000{index}")
+        self.assertEqual(dialer.pump(), 2)
+        self.assertEqual(dialer.pump(), 0)
+
+        dialer.on_call_status(self.carrier.dials[0][2], "completed")
+        self.assertEqual(dialer.pump(), 1)
+        self.assertEqual(dialer.stats()["queue"], {COMPLETED: 1, IN_CALL: 2, QUEUED: 1})
+
+
+class TestRetries(DialerTestCase):
+
+    def test_busy_line_is_called_back_after_backoff(self):
+        phone = "+919000000001"
+        dialer = self.dialer(FakeCarrier({phone: ["busy", "completed"]}, clock=self.clock))
+        request = dialer.submit(phone)
+        dialer.pump()
+        first_sid = self.carrier.dials[0][2]
+        dialer.on_call_status(first_sid, self.carrier.status(first_sid))
+
+        status = dialer.status(request.request_id)
+        self.assertEqual((status["status"], status["retry_in_seconds"], status["last_error"]),
+                         (RETRYING, 30, "call busy"))
+        self.clock.now += 10
+        self.assertEqual(dialer.pump(), 0)
+        self.clock.now += 21
+        self.assertEqual(dialer.pump(), 1)
+
+        second_sid = self.carrier.dials[1][2]
+        dialer.on_call_status(second_sid, self.carrier.status(second_sid))
+        status = dialer.status(request.request_id)
+        self.assertEqual((status["status"], status["attempts"], status["call_sid"]), (COMPLETED, 2, second_sid))
+
+    def test_gives_up_after_max_attempts(self):
+        phone = "+919000000002"
+        dialer = self.dialer(FakeCarrier({phone: ["no-answer"] * 5}, clock=self.clock), max_attempts=3)
+        request = dialer.submit(phone)
+        for _ in range(3):
+            dialer.pump()
+            call_sid = self.carrier.dials[-1][2]
+            dialer.on_call_status(call_sid, self.carrier.status(call_sid))
+            self.clock.now += 31
+        self.assertEqual(dialer.pump(), 0)
+        status = dialer.status(request.request_id)
+        self.assertEqual((status["status"], status["attempts"]), (FAILED, 3))
+        self.assertEqual(len(self.carrier.dials), 3)
+
+    def test_carrier_errors(self):
+        dialer = self.dialer(FakeCarrier({"+910": ["invalid"]}, cps=1, clock=self.clock), cps=10, burst=10)
+        invalid = dialer.submit("+910")
+        limited = [dialer.submit("+919000000003"), dialer.submit("+919000000004")]
+        dialer.pump()
+
+        # A bad number is not retried; a rate-limit refusal is
+        self.assertEqual(dialer.status(invalid.request_id)["status"], FAILED)
+        self.assertEqual([dialer.status(r.request_id)["status"] for r in limited], [IN_CALL, RETRYING])
+        self.assertEqual(dialer.stats()["carrier_errors"], 2)
+
+    def test_backoff_grows_and_is_jittered(self):
+        self.assertEqual(backoff_seconds(1, base=60, jitter=0.3, rng=lambda: 0.5), 60)
+        self.assertEqual(backoff_seconds(3, base=60, jitter=0.3, rng=lambda: 0.5), 240)
+        self.assertEqual(backoff_seconds(9, base=60, cap=600, jitter=0.3, rng=lambda: 0.5), 600)
+        self.assertAlmostEqual(backoff_seconds(1, base=60, jitter=0.3, rng=lambda: 0.0), 42)
+        self.assertAlmostEqual(backoff_seconds(1, base=60, jitter=0.3, rng=lambda: 1.0), 78)
+
+
+class TestPersistence(DialerTestCase):
+
+    def test_queue_survives_restart(self):
+        dialer = self.dialer(cps=1, burst=1)
+        placed, waiting = dialer.submit("+919000000005"), dialer.submit("+919000000006")
+        dialer.pump()
+        # Crashed after claiming a request but before the carrier answered
+        interrupted = dialer.queue.get(waiting.request_id)
+        interrupted.status = DIALING
+        dialer.queue.save(interrupted)
+
+        restarted = self.dialer(cps=1, burst=1)
+        self.assertEqual(restarted.queue.recover(), 1)
+        self.assertEqual(restarted.status(placed.request_id)["status"], IN_CALL)
+        self.assertEqual(restarted.status(waiting.request_id)["status"], QUEUED)
+        self.assertEqual(restarted.pump(), 1)
+
+    def test_lost_status_callback_is_looked_up(self):
+        phone = "+919000000007"
+        dialer = self.dialer(FakeCarrier({phone: ["no-answer"]}, ring_seconds=30, clock=self.clock))
+        request = dialer.submit(phone)
+        dialer.pump()
+        self.clock.now += STATUS_POLL_SECONDS / 2
+        dialer.pump()
+        self.assertEqual(dialer.status(request.request_id)["status"], IN_CALL)
+
+        self.clock.now += STATUS_POLL_SECONDS
+        dialer.pump()
+        status = dialer.status(request.request_id)
+        self.assertEqual((status["status"], status["call_status"]), (RETRYING, "no-answer"))
+
+
+class TestWorker(unittest.TestCase):
+
+    def test_background_worker_dials_without_blocking_submit(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        dialer = OutboundDialer(FakeCarrier(), CallQueue(os.path.join(directory, "calls.db")),
+                                cps=50, burst=3).start()
+        self.addCleanup(dialer.stop)
+
+        requests = [dialer.submit(f"+91900000001{index}") for index in range(3)]
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and any(dialer.status(r.request_id)["status"] != IN_CALL
+                                                  for r in requests):
+            time.sleep(0.02)
+        self.assertEqual([dialer.status(r.request_id)["status"] for r in requests], [IN_CALL] * 3)
+        self.assertTrue(dialer.stats()["running"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test suite for prompt building and token accounting
+"""
+
+import os
+import sys
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from prompt_builder import PromptBuilder, compact_instruction, count_tokens
+
+INSTRUCTION = """
+You are an AI assistant for Goodness Glamour Salon.
+
+SALON INFORMATION:
+- Contact: 9036626642
+- Service Hours: Monday - Sunday, 9:00 AM - 8:00 PM
+
+Women's Hair Services:
+- Hair Coloring: ₹2,000 - ₹5,000
+- Keratin Treatment: ₹4,000 - ₹8,000
+
+Be friendly and professional.
+"""
+
+CONTEXT = (
+    "Based on our salon information:\n"
+    "- Hair coloring services range from ₹2,000 to ₹5,000 depending on the type and length of hair.\n"
+    "- Our stylists trained in Paris. Keratin treatments cost ₹4,000 to ₹8,000.\n"
+)
+
+
+class TestCompactInstruction(unittest.TestCase):
+
+    def test_bullets_fold_onto_heading(self):
+        compact = compact_instruction(INSTRUCTION)
+        self.assertIn("Women's Hair Services: Hair Coloring: ₹2,000 - ₹5,000; Keratin Treatment: ₹4,000 - ₹8,000",
+                      compact)
+        self.assertNotIn("\n\n", compact)
+        self.assertLess(len(compact), len(INSTRUCTION))
+
+    def test_long_bullets_stay_on_their_own_line(self):
+        text = "RULES:\n- " + "Keep every answer short and friendly, and always confirm details first"
+        self.assertEqual(compact_instruction(text).count("\n"), 1)
+
+
+class TestPromptBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.builder = PromptBuilder(INSTRUCTION)
+
+    def test_restated_prices_are_dropped(self):
+        self.assertTrue(self.builder.is_redundant("Hair coloring costs ₹2,000 to ₹5,000."))
+        self.assertFalse(self.builder.is_redundant("Hair coloring costs ₹2,500 to ₹6,000."))
+        self.assertFalse(self.builder.is_redundant("Our stylists trained in Paris."))
+
+    def test_context_keeps_new_facts_only(self):
+        built = self.builder.build("How much is keratin?", context=CONTEXT)
+        self.assertEqual(built.dropped_context, 2)
+        self.assertEqual(
+            built.prompt,
+            "Based on our salon information:\n- Our stylists trained in Paris.\n\nCustomer Question: How much is keratin?"
+        )
+        self.assertLess(built.tokens["context"], count_tokens(CONTEXT))
+
+    def test_fully_redundant_context_leaves_bare_question(self):
+        context = "Based on our salon information:\n- Keratin treatments cost ₹4,000 to ₹8,000.\n"
+        self.assertEqual(self.builder.build("Keratin price?", context=context).prompt, "Keratin price?")
+
+    def test_messages_and_token_components(self):
+        history = [
+            {"role": "assistant", "content": "Hi! How can I help?"},
+            {"role": "user", "content": "Book a haircut"}
+        ]
+        built = self.builder.build("Book a haircut", history=history, notes=["Current conversation step: get_name"])
+        roles = [message["role"] for message in built.messages]
+        self.assertEqual(roles, ["system", "system", "assistant", "user"])
+        self.assertEqual(built.messages[0]["content"], self.builder.system)
+        self.assertEqual(set(built.tokens), {"system", "context", "history", "user"})
+        self.assertEqual(built.tokens["history"], count_tokens("Hi! How can I help?"))
+
+    def test_system_not_sent_when_configured_on_model(self):
+        builder = PromptBuilder(INSTRUCTION, send_system=False)
+        built = builder.build("Hello")
+        self.assertEqual(built.messages, [{"role": "user", "content": "Hello"}])
+        self.assertEqual(built.tokens["system"], builder.system_tokens)
+
+    def test_dropped_context_stays_in_sent_instruction(self):
+        # Facts removed from the context must still reach a provider that only sees the messages
+        built = self.builder.build("How much is keratin?", context=CONTEXT)
+        self.assertGreater(built.dropped_context, 0)
+        self.assertEqual(built.messages[0], {"role": "system", "content": self.builder.system})
+        self.assertEqual(built.messages[-1]["content"], built.prompt)
+
+    def test_stats(self):
+        built = self.builder.build("How much is keratin?", context=CONTEXT)
+        self.builder.log_call(built, 0.25, "gemini", "CA123")
+        stats = self.builder.stats()
+        self.assertEqual(stats["calls"], 1)
+        self.assertEqual(stats["mean_prompt_tokens"], built.total_tokens)
+        self.assertEqual(stats["mean_latency_ms"], 250.0)
+        self.assertGreater(stats["saved_context_tokens"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
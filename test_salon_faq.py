@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Test suite for the catalog FAQ answerer
+"""
+
+import os
+import sys
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from salon_catalog import SALON_INFO, SERVICES
+from salon_faq import answer_faq
+
+
+class TestSalonFaq(unittest.TestCase):
+    """Answers come straight from the catalog"""
+
+    def test_price_of_service(self):
+        answer = answer_faq("How much is a haircut?")
+        self.assertEqual(answer.intent, "price")
+        self.assertIn(SERVICES["women"]["haircut"]["price"], answer.text)
+
+    def test_kids_price(self):
+        answer = answer_faq("what's the price of a kids haircut")
+        self.assertIn(SERVICES["kids"]["haircut"]["price"], answer.text)
+
+    def test_price_list(self):
+        answer = answer_faq("what are your prices?")
+        for entry in SERVICES["women"].values():
+            self.assertIn(entry["price"], answer.text)
+
+    def test_open_days_and_hours(self):
+        test_cases = [
+            ("are you open on Sunday", "open on Sunday"),
+            ("do you work on weekends?", "open on weekends"),
+            ("what are your timings", "9 AM to 8 PM"),
+            ("what time do you open", "9 AM to 8 PM"),
+        ]
+        for question, expected in test_cases:
+            with self.subTest(question=question):
+                self.assertIn(expected, answer_faq(question).text)
+
+    def test_home_service_and_contact(self):
+        self.assertEqual(answer_faq("do you come home?").intent, "home_service")
+        self.assertIn(SALON_INFO["phone"], answer_faq("what is your phone number").text)
+
+    def test_duration(self):
+        answer = answer_faq("how long does coloring take")
+        self.assertIn(SERVICES["women"]["coloring"]["duration"], answer.text)
+
+    def test_not_a_question(self):
+        for text in ["Sarah", "I want to book a haircut", "my hair is frizzy any tips", "tomorrow at 4 pm"]:
+            with self.subTest(text=text):
+                self.assertIsNone(answer_faq(text))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
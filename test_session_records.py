@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test suite for compact session records and transcript buffers
+"""
+
+import os
+import sys
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from session_records import (
+    BookingData, ConversationState, TranscriptBuffer, intern_prompt, register_prompts, sizeof, sizeof_report
+)
+
+# Target memory for a session that has not said anything yet
+MAX_IDLE_SESSION_BYTES = 1024
+
+
+class TestRecords(unittest.TestCase):
+    """Slotted records behave like the dataclasses they replace"""
+
+    def test_no_instance_dict(self):
+        for record in (BookingData(), ConversationState("CA1"), TranscriptBuffer()):
+            with self.subTest(record=type(record).__name__):
+                self.assertFalse(hasattr(record, "__dict__"))
+                with self.assertRaises(AttributeError):
+                    record.unexpected = 1
+
+    def test_defaults(self):
+        state = ConversationState(session_id="CA1", phone="+919845012345")
+        self.assertEqual(state.current_step, "greeting")
+        self.assertEqual(state.booking_data, BookingData())
+        self.assertEqual(len(state.conversation_history), 0)
+
+    def test_booking_to_dict(self):
+        booking = BookingData(service="haircut", date="Tuesday, October 20")
+        self.assertEqual(booking.to_dict()["service"], "haircut")
+        self.assertEqual(booking.to_dict()["address"], "")
+
+
+class TestTranscriptBuffer(unittest.TestCase):
+    """Fixed-capacity ring of turns"""
+
+    def test_ring_keeps_latest_turns(self):
+        transcript = TranscriptBuffer(capacity=4)
+        for i in range(6):
+            transcript.append("user", f"turn {i}")
+        self.assertEqual(len(transcript), 4)
+        self.assertEqual([t["content"] for t in transcript], ["turn 2", "turn 3", "turn 4", "turn 5"])
+        self.assertEqual([t["content"] for t in transcript.recent(2)], ["turn 4", "turn 5"])
+
+    def test_registered_prompts_are_interned(self):
+        register_prompts(["What's your name?"])
+        transcript = TranscriptBuffer()
+        transcript.append("assistant", "What's your name?")
+        transcript.append("user", "  Priya   here ")
+        self.assertEqual(transcript.recent(), [
+            {"role": "assistant", "content": "What's your name?"},
+            {"role": "user", "content": "Priya here"}
+        ])
+        self.assertIsInstance(intern_prompt("What's your name?"), int)
+
+    def test_dynamic_replies_stay_in_the_call(self):
+        reply = "Priya, I have a haircut at 12 MG Road tomorrow at 4 PM. Shall I book it?"
+        transcript = TranscriptBuffer()
+        transcript.append("assistant", reply)
+        self.assertEqual(intern_prompt(reply), reply)
+        self.assertEqual(transcript.recent(), [{"role": "assistant", "content": reply}])
+
+    def test_clear(self):
+        transcript = TranscriptBuffer()
+        transcript.append("user", "hello")
+        transcript.clear()
+        self.assertEqual(transcript.recent(), [])
+
+
+class TestSizeof(unittest.TestCase):
+    """Memory report"""
+
+    def test_idle_session_under_target(self):
+        state = ConversationState("CA" + "0" * 32, phone="+919845012345")
+        self.assertLess(sizeof(state), MAX_IDLE_SESSION_BYTES)
+
+    def test_report(self):
+        sessions = {sid: ConversationState(sid) for sid in ("CA1", "CA2")}
+        report = sizeof_report(sessions)
+        self.assertEqual(report["sessions"], 2)
+        self.assertEqual(report["total_bytes"], report["mean_bytes"] * 2)
+        self.assertEqual(sizeof_report({})["mean_bytes"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
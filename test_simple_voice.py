@@ -5,7 +5,9 @@ Tests core functionality without heavy dependencies
 """
 
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 from unittest.mock import Mock, patch
 import json
@@ -19,7 +21,9 @@ load_dotenv()
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
+    import voice_booking_simple
     from voice_booking_simple import SimpleVoiceAssistant, BookingData, ConversationState
+    from outbound_dialer import CallQueue, OutboundDialer
 except ImportError as e:
     print(f"❌ Import error: {e}")
     print("💡 Make sure to run: python setup_env.py first")
@@ -136,19 +140,27 @@ class TestSimpleVoiceAssistant(unittest.TestCase):
         self.assertIsNotNone(state.booking_data)
         self.assertIsNotNone(state.conversation_history)
     
+    @patch('voice_booking_simple.SIMULATION_MODE', False)
     @patch('voice_booking_simple.client')
     def test_trigger_voice_call(self, mock_client):
-        """Test voice call triggering"""
+        """Test voice call triggering: queued at once, then placed by the dialer"""
         # Mock Twilio client response
         mock_call = Mock()
         mock_call.sid = "test_call_sid"
         mock_client.calls.create.return_value = mock_call
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        dialer = OutboundDialer(voice_booking_simple.dialer.carrier, CallQueue(os.path.join(directory, "calls.db")))
+        self.addCleanup(dialer.stop)
         
         # Test voice call trigger
-        result = self.assistant.trigger_voice_call("+919876543210", "test")
+        with patch('voice_booking_simple.dialer', dialer):
+            result = self.assistant.trigger_voice_call("+919876543210", "test")
         
         self.assertTrue(result["success"])
-        self.assertEqual(result["call_sid"], "test_call_sid")
+        self.assertEqual(result["status"], "queued")
+        dialer.pump()
+        self.assertEqual(dialer.status(result["request_id"])["call_sid"], "test_call_sid")
         mock_client.calls.create.assert_called_once()
     
     def test_generate_qr_code(self):
@@ -196,6 +208,20 @@ class TestBookingFlow(unittest.TestCase):
         self.assertEqual(final_session.customer_name, "John")
         self.assertEqual(final_session.booking_data.service, "haircut")
         self.assertEqual(final_session.booking_data.address, "123 Main Street, Mumbai")
+    
+    def test_single_utterance_skips_answered_steps(self):
+        """Test that details given up front are not asked for again"""
+        session = self.assistant.start_session(self.session_id, self.phone)
+        
+        response = self.assistant.get_conversation_response(
+            "I'm Priya, I want a haircut tomorrow at 4 pm", self.session_id
+        )
+        
+        self.assertEqual(session.current_step, "get_address")
+        self.assertEqual(session.customer_name, "Priya")
+        self.assertEqual(session.booking_data.service, "haircut")
+        self.assertEqual(session.booking_data.time, "4 PM")
+        self.assertIn("address", response.lower())
 
 def run_basic_tests():
     """Run basic functionality tests"""
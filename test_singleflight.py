@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test suite for single-flight request coalescing
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from singleflight import AsyncSingleFlight, SingleFlight, flight_key, normalize_query
+
+
+class TestKeys(unittest.TestCase):
+
+    def test_normalized_queries_match(self):
+        self.assertEqual(normalize_query("What's the BRIDAL price?"), "what s the bridal price")
+        self.assertEqual(flight_key("What's the bridal price?", "ctx"), flight_key("what's the bridal  price", "ctx"))
+
+    def test_context_changes_key(self):
+        self.assertNotEqual(flight_key("bridal price", "ctx-a"), flight_key("bridal price", "ctx-b"))
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_calls_share_one_execution(self):
+        group = SingleFlight()
+        executions = []
+        release = threading.Event()
+        results = []
+
+        def compute():
+            executions.append(1)
+            release.wait(2)
+            return "Bridal packages start at ₹15,000."
+
+        def caller():
+            results.append(group.do("bridal", compute))
+
+        threads = [threading.Thread(target=caller) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 2
+        while group.waiters().get("bridal", 0) < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(group.waiters(), {"bridal": 4})
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(executions), 1)
+        self.assertEqual({text for text, _ in results}, {"Bridal packages start at ₹15,000."})
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True, True])
+        stats = group.stats()
+        self.assertEqual((stats["calls"], stats["executions"], stats["coalesced"]), (5, 1, 4))
+        self.assertEqual(stats["top_coalesced"], {"bridal": 4})
+        self.assertEqual(stats["in_flight"], {})
+
+    def test_sequential_calls_are_not_cached(self):
+        group = SingleFlight()
+        counter = iter(range(10))
+        self.assertEqual(group.do("k", lambda: next(counter)), (0, False))
+        self.assertEqual(group.do("k", lambda: next(counter)), (1, False))
+
+    def test_errors_reach_every_waiter(self):
+        group = SingleFlight()
+        started = threading.Event()
+        errors = []
+
+        def compute():
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError("LLM down")
+
+        def caller():
+            try:
+                group.do("k", compute)
+            except RuntimeError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=caller)
+        leader.start()
+        started.wait(1)
+        follower = threading.Thread(target=caller)
+        follower.start()
+        leader.join()
+        follower.join()
+        self.assertEqual(len(errors), 2)
+
+
+class TestAsyncSingleFlight(unittest.TestCase):
+
+    def test_concurrent_coroutines_share_one_execution(self):
+        group = AsyncSingleFlight()
+        executions = []
+
+        async def compute():
+            executions.append(1)
+            await asyncio.sleep(0.05)
+            return "We're open every day, 9 AM to 8 PM."
+
+        async def scenario():
+            return await asyncio.gather(*(group.do("hours", compute) for _ in range(6)))
+
+        results = asyncio.run(scenario())
+        self.assertEqual(len(executions), 1)
+        self.assertEqual(sum(shared for _, shared in results), 5)
+        self.assertEqual(group.stats()["coalesced"], 5)
+        self.assertEqual(group.waiters(), {})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test Suite for the Multi-Slot Extractor
+Checks that one utterance can fill several booking slots at once
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+# Add current directory to path for imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from slot_extractor import extract_address, extract_slots, next_missing_step, extract_date
+
+
+class TestSlotExtractor(unittest.TestCase):
+    """Test cases for slot extraction"""
+    
+    def test_single_utterance_fills_many_slots(self):
+        """Test name, service, date and time from one sentence"""
+        slots = extract_slots("I'm Priya, I want a haircut tomorrow at 4 pm", "greeting")
+        
+        self.assertEqual(slots["customer_name"], "Priya")
+        self.assertEqual(slots["service"], "haircut")
+        self.assertEqual(slots["time"], "4 PM")
+        self.assertIn("date", slots)
+    
+    def test_name_cues(self):
+        """Test name extraction with and without cues"""
+        test_cases = [
+            ("My name is John", "get_name", "John"),
+            ("my name is john", "greeting", "John"),
+            ("Sarah", "get_name", "Sarah"),
+            ("I'm looking for a haircut", "greeting", None),
+            ("tomorrow", "get_name", None),
+            ("I'm thinking next friday", "get_date", None),
+            ("It's for my daughter", "greeting", None),
+            ("I'm sorry", "greeting", None),
+            ("I am new here", "greeting", None)
+        ]
+        
+        for text, step, expected in test_cases:
+            with self.subTest(text=text):
+                self.assertEqual(extract_slots(text, step).get("customer_name"), expected)
+    
+    def test_address_not_confused_with_time(self):
+        """Test that times are not read as house numbers"""
+        slots = extract_slots("at 4 pm, 12 MG Road Indiranagar", "get_time")
+        
+        self.assertEqual(slots["time"], "4 PM")
+        self.assertEqual(slots["address"], "12 MG Road Indiranagar")
+    
+    def test_address_after_at(self):
+        """Test "I live at <address>" given early, while "at 4, <address>" keeps 4 as the time"""
+        self.assertEqual(extract_slots("I live at 42 MG Road, Indiranagar", "get_service"),
+                         {"address": "42 MG Road, Indiranagar"})
+        slots = extract_slots("tomorrow at 4:30, 12 MG road", "get_date")
+        self.assertEqual((slots["time"], slots["address"]), ("4:30 PM", "12 MG road"))
+    
+    def test_flat_number_address(self):
+        """Test that "flat N/M" is kept whole, not cut after the "at" in "flat" """
+        self.assertEqual(extract_address("flat 12/4 MG road"), "12/4 MG road")
+        self.assertEqual(extract_slots("I live at flat 12/4 MG road", "get_address")["address"],
+                         "I live at flat 12/4 MG road")
+        self.assertEqual(extract_slots("It's Priya, flat 12/4 MG road", "get_name")["address"], "12/4 MG road")
+    
+    def test_phone_number(self):
+        """Test phone extraction with spacing"""
+        self.assertEqual(extract_slots("my number is 98765 43210")["phone"], "9876543210")
+    
+    def test_weekday_dates(self):
+        """Test weekday and 'next' weekday resolution"""
+        monday = datetime(2026, 10, 19)
+        
+        self.assertEqual(extract_date("friday", monday), "Friday, October 23")
+        self.assertEqual(extract_date("next friday", monday), "Friday, October 30")
+        self.assertEqual(extract_date("day after tomorrow", monday), "Wednesday, October 21")
+    
+    def test_next_missing_step(self):
+        """Test jumping to the first empty slot"""
+        self.assertEqual(next_missing_step({}), "get_name")
+        self.assertEqual(next_missing_step({"customer_name": "Priya", "service": "haircut", "date": "x", "time": "4 PM"}), "get_address")
+        self.assertEqual(next_missing_step({"customer_name": "Priya", "service": "haircut", "date": "x", "time": "4 PM", "address": "y"}), "confirm_booking")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test suite for per-step speech recognition settings: catalog hints, step templates and re-prompt rates
+"""
+
+import os
+import sys
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from twilio.twiml.voice_response import VoiceResponse
+
+from salon_catalog import SERVICE_AREAS
+from speech_hints import (
+    GATHER_PROFILES, MAX_HINTS, NUMBERS_AND_COMMANDS, PHONE_CALL, RepromptTracker, StepTemplates,
+    gather_profile, join_hints, parse_confidence
+)
+
+
+class TestGatherProfiles(unittest.TestCase):
+
+    def test_hints_come_from_the_catalog(self):
+        service = gather_profile("get_service").hints.split(", ")
+        self.assertIn("Hair Coloring and Highlights", service)
+        self.assertIn("blow dry", service)
+        self.assertIn("Koramangala", gather_profile("get_address").hints)
+        self.assertIn("next Saturday", gather_profile("get_date").hints)
+        time_hints = gather_profile("get_time").hints.split(", ")
+        self.assertEqual((time_hints[0], time_hints[22]), ("9 AM", "8 PM"))
+        self.assertNotIn("8:30 PM", time_hints)
+        self.assertTrue(set(SERVICE_AREAS) <= set(gather_profile("get_address").hints.split(", ")))
+
+    def test_model_and_language_per_step(self):
+        self.assertEqual({profile.language for profile in GATHER_PROFILES.values()}, {"en-IN"})
+        self.assertEqual(gather_profile("get_address").speech_model, PHONE_CALL)
+        self.assertTrue(gather_profile("get_address").attributes["enhanced"])
+        self.assertEqual(gather_profile("confirm_booking").speech_model, NUMBERS_AND_COMMANDS)
+        self.assertNotIn("enhanced", gather_profile("get_time").attributes)
+        # Steps without their own settings listen like the greeting
+        self.assertIs(gather_profile("booking_complete"), gather_profile("greeting"))
+        self.assertIs(gather_profile(None), gather_profile("greeting"))
+
+    def test_hints_are_deduplicated_and_bounded(self):
+        self.assertEqual(join_hints(["cut", "Cut", "a, b", "", "x" * 101]), "cut, a  b")
+        self.assertEqual(len(join_hints(str(n) for n in range(MAX_HINTS + 50)).split(", ")), MAX_HINTS)
+
+    def test_step_templates_match_the_builder(self):
+        def listen(response, call_sid, gather):
+            response.gather(input='speech', action=f'https://example.com/voice/{call_sid}', **gather)
+
+        templates = StepTemplates(listen, "call_sid")
+        for step in ("get_date", "get_address", "booking_complete"):
+            expected = VoiceResponse()
+            listen(expected, "CAhint1", gather_profile(step).attributes)
+            self.assertEqual(templates.render(step, call_sid="CAhint1"), str(expected))
+        self.assertIn('speechModel="numbers_and_commands"', templates.render("get_time", call_sid="CA1"))
+
+
+class TestRepromptTracker(unittest.TestCase):
+
+    def test_rates_per_step(self):
+        tracker = RepromptTracker()
+        for reprompted in (False, True, True, False):
+            tracker.record("get_date", reprompted, 0.5)
+        tracker.record("get_name", False)
+        snapshot = tracker.snapshot()
+        self.assertEqual(snapshot["get_date"]["reprompt_rate"], 0.5)
+        self.assertEqual(snapshot["get_date"]["mean_confidence"], 0.5)
+        self.assertEqual(snapshot["get_date"]["speech_model"], NUMBERS_AND_COMMANDS)
+        self.assertIsNone(snapshot["get_name"]["mean_confidence"])
+        self.assertEqual(tracker.rate("get_time"), 0.0)
+        self.assertEqual(parse_confidence("0.91"), 0.91)
+        self.assertIsNone(parse_confidence("n/a"))
+
+    def test_simple_assistant_records_reprompts(self):
+        from speech_hints import default_reprompts
+        from voice_booking_simple import voice_assistant
+
+        default_reprompts.reset()
+        voice_assistant.start_session("CAhint2", "+919000000002")
+        try:
+            voice_assistant.get_conversation_response("I want to book an appointment", "CAhint2")
+            voice_assistant.get_conversation_response("um", "CAhint2", confidence=0.4)
+            voice_assistant.get_conversation_response("My name is Priya", "CAhint2", confidence=0.9)
+        finally:
+            voice_assistant.end_session("CAhint2")
+        snapshot = default_reprompts.snapshot()
+        self.assertEqual(snapshot["get_name"]["answers"], 2)
+        self.assertEqual(snapshot["get_name"]["reprompts"], 1)
+        self.assertEqual(snapshot["get_name"]["mean_confidence"], 0.65)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test suite for sentence streaming of voice responses
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from speech_stream import SpeechStream, SpeechStreamRegistry, split_sentences
+
+
+def slow_chunks(text, delay=0.05):
+    """Token-by-token generator that takes ``delay`` seconds per word"""
+    for word in text.split(" "):
+        time.sleep(delay)
+        yield word + " "
+
+
+class TestSplitSentences(unittest.TestCase):
+    """Sentence boundaries in streamed text"""
+
+    def test_splits_across_chunks(self):
+        chunks = ["We're open every ", "day from 9 AM to 8 PM. Would", " you like to book a visit?"]
+        self.assertEqual(list(split_sentences(chunks)), [
+            "We're open every day from 9 AM to 8 PM.",
+            "Would you like to book a visit?"
+        ])
+
+    def test_short_fragments_are_merged(self):
+        self.assertEqual(list(split_sentences(["Sure! We can come to Indiranagar tomorrow."])),
+                         ["Sure! We can come to Indiranagar tomorrow."])
+
+    def test_abbreviations_and_numbers(self):
+        text = "Dr. Rao's clinic is at 4.30 p.m. today, near the mall. See you then, Priya."
+        self.assertEqual(list(split_sentences([text])), [
+            "Dr. Rao's clinic is at 4.30 p.m. today, near the mall.",
+            "See you then, Priya."
+        ])
+
+    def test_unterminated_tail(self):
+        self.assertEqual(list(split_sentences(["Thanks for calling Goodness Glamour"])),
+                         ["Thanks for calling Goodness Glamour"])
+
+
+class TestSpeechStream(unittest.TestCase):
+    """Background consumption and batching"""
+
+    def test_first_sentence_before_stream_ends(self):
+        text = "Our hair spa leaves hair soft and shiny. " + " ".join(["It uses warm oil and steam."] * 10)
+        stream = SpeechStream(slow_chunks(text))
+        started = time.monotonic()
+        batch = stream.next_batch(timeout=5)
+        elapsed = time.monotonic() - started
+        self.assertEqual(batch, ["Our hair spa leaves hair soft and shiny."])
+        # The whole reply takes ~2.5 s to generate
+        self.assertLess(elapsed, 1.0)
+        self.assertFalse(stream.finished)
+
+    def test_batches_cover_whole_reply(self):
+        completed = []
+        done = threading.Event()
+
+        def on_complete(text):
+            completed.append(text)
+            done.set()
+
+        text = "First we wash your hair gently. Then we trim the ends neatly. Finally we blow dry it."
+        stream = SpeechStream(slow_chunks(text, delay=0.01), on_complete)
+        spoken = []
+        while not stream.finished:
+            spoken.extend(stream.next_batch(timeout=2))
+        self.assertEqual(" ".join(spoken), text)
+        self.assertTrue(done.wait(2))
+        self.assertEqual(completed, [text])
+
+    def test_failing_generator_ends_stream(self):
+        def broken():
+            yield "We can do that tomorrow morning. "
+            raise RuntimeError("connection reset")
+
+        stream = SpeechStream(broken())
+        self.assertEqual(stream.next_batch(timeout=2), ["We can do that tomorrow morning."])
+        self.assertEqual(stream.next_batch(timeout=2), [])
+        self.assertTrue(stream.finished)
+
+
+class TestSpeechStreamRegistry(unittest.TestCase):
+    """Per-call streams"""
+
+    def test_stream_dropped_when_done(self):
+        registry = SpeechStreamRegistry()
+        registry.start("CA1", iter(["Yes, we are open on Sunday from 9 AM."]))
+        self.assertEqual(registry.next_batch("CA1", timeout=2), ["Yes, we are open on Sunday from 9 AM."])
+        registry.next_batch("CA1", timeout=2)
+        self.assertFalse(registry.has_pending("CA1"))
+        self.assertEqual(len(registry), 0)
+
+    def test_unknown_call(self):
+        registry = SpeechStreamRegistry()
+        self.assertIsNone(registry.next_batch("CA404", timeout=0.01))
+        self.assertFalse(registry.has_pending("CA404"))
+
+    def test_expired_streams_are_removed(self):
+        registry = SpeechStreamRegistry(ttl=0)
+        registry.start("CA1", iter(["Hello there, how can I help?"]))
+        registry.start("CA2", iter(["Hello there, how can I help?"]))
+        self.assertIsNone(registry.get("CA1"))
+        self.assertIsNotNone(registry.get("CA2"))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test suite for background text-to-speech playback: queueing, barge-in cancellation and prompt caching
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import wave
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from audio_prompts import AudioPromptCache
+from tts_worker import TTSWorker
+
+SAMPLE_RATE = 8000
+
+
+class FakeSink:
+    """Plays each chunk in real time, keeping what it was given"""
+
+    sample_rate = SAMPLE_RATE
+
+    def __init__(self, realtime: bool = True):
+        self.realtime = realtime
+        self.played = bytearray()
+        self.started = threading.Event()
+
+    def write(self, pcm: bytes):
+        self.started.set()
+        self.played.extend(pcm)
+        if self.realtime:
+            time.sleep(len(pcm) / 2 / SAMPLE_RATE)
+
+
+class FakeSynthesizer:
+    """10 ms of audio per character; records which thread and text it was asked for"""
+
+    def __init__(self):
+        self.said = []
+        self.threads = set()
+
+    def __call__(self, text: str) -> bytes:
+        self.said.append(text)
+        self.threads.add(threading.get_ident())
+        return b"\x01\x00" * (len(text) * SAMPLE_RATE // 100)
+
+
+class TestTTSWorker(unittest.TestCase):
+
+    def setUp(self):
+        self.synthesizer = FakeSynthesizer()
+
+    def worker(self, sink, **kwargs) -> TTSWorker:
+        worker = TTSWorker(lambda: self.synthesizer, sink, **kwargs).start()
+        self.addCleanup(worker.stop)
+        return worker
+
+    def test_say_returns_before_playback(self):
+        sink = FakeSink()
+        worker = self.worker(sink)
+        started = time.perf_counter()
+        handle = worker.say("Hello there. Welcome to the salon.")
+        self.assertLess(time.perf_counter() - started, 0.05)
+        self.assertTrue(worker.speaking)
+
+        self.assertTrue(handle.wait(5))
+        self.assertFalse(handle.cancelled)
+        self.assertFalse(worker.speaking)
+        self.assertEqual(self.synthesizer.said, ["Hello there.", "Welcome to the salon."])
+        self.assertNotIn(threading.get_ident(), self.synthesizer.threads)
+        self.assertEqual(len(sink.played), (12 + 21) * SAMPLE_RATE // 100 * 2)
+
+    def test_cancel_stops_mid_reply_and_drops_queue(self):
+        sink = FakeSink()
+        worker = self.worker(sink)
+        long_reply = worker.say("This is a long answer about every service we offer at the salon.")
+        queued = worker.say("And one more thing.")
+        self.assertTrue(sink.started.wait(2))
+
+        started = time.perf_counter()
+        self.assertTrue(worker.cancel())
+        self.assertTrue(worker.wait(1))
+        # Stopped within about one chunk, not at the end of the sentence
+        self.assertLess(time.perf_counter() - started, 0.2)
+        self.assertTrue(long_reply.cancelled and queued.cancelled)
+        self.assertLess(len(sink.played), 64 * SAMPLE_RATE // 100 * 2 // 2)
+        self.assertNotIn("And one more thing.", self.synthesizer.said)
+        self.assertEqual(worker.stats()["cancelled"], 1)
+        self.assertFalse(worker.cancel())
+
+        # The worker keeps going after a barge-in
+        after = worker.say("Sure.")
+        self.assertTrue(after.wait(2))
+        self.assertFalse(after.cancelled)
+
+    def test_repeated_prompts_are_synthesized_once(self):
+        worker = self.worker(FakeSink(realtime=False))
+        worker.preload(["I'm listening."])
+        worker.say("I'm listening.")
+        worker.say("Sorry? I'm listening.")
+        self.assertTrue(worker.wait(2))
+        self.assertEqual(self.synthesizer.said, ["I'm listening.", "Sorry?"])
+        self.assertEqual(worker.stats()["cache_hits"], 2)
+
+    def test_prerendered_prompts_are_played_from_disk(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source = os.path.join(directory, "source.wav")
+        with wave.open(source, "wb") as handle:
+            handle.setnchannels(1)
+            handle.setsampwidth(2)
+            handle.setframerate(SAMPLE_RATE)
+            handle.writeframes(b"\x02\x00" * 800)
+        prompts = AudioPromptCache(directory)
+        prompts.add("How else can I help you?", source)
+
+        sink = FakeSink(realtime=False)
+        worker = self.worker(sink, prompts=prompts)
+        self.assertTrue(worker.say("How else can I help you?").wait(2))
+        self.assertEqual(self.synthesizer.said, [])
+        self.assertEqual(bytes(sink.played), b"\x02\x00" * 800)
+        self.assertEqual(worker.stats()["prompt_files"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
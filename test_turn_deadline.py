@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test suite for latency-budgeted turn handling
+"""
+
+import os
+import sys
+import time
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from turn_deadline import DONE, EXPIRED, FILLERS, PENDING, UNKNOWN, TurnDeadlineRunner
+
+
+def reply_after(seconds, text="Your booking is confirmed."):
+    time.sleep(seconds)
+    return text
+
+
+def failing_turn():
+    time.sleep(0.1)
+    raise RuntimeError("LLM unavailable")
+
+
+class TestTurnDeadlineRunner(unittest.TestCase):
+    """Deadline, filler and poll behaviour"""
+
+    def setUp(self):
+        self.runner = TurnDeadlineRunner(deadline=0.05, poll_wait=0.5, max_polls=2, workers=2)
+
+    def tearDown(self):
+        self.runner.shutdown()
+
+    def test_fast_turn_answers_inline(self):
+        self.assertEqual(self.runner.run("CA1", reply_after, 0), "Your booking is confirmed.")
+        self.assertFalse(self.runner.is_pending("CA1"))
+        metrics = self.runner.metrics()
+        self.assertEqual((metrics["turns"], metrics["within_deadline"], metrics["fillers"]), (1, 1, 0))
+
+    def test_slow_turn_is_held_then_served_on_poll(self):
+        started = time.monotonic()
+        self.assertIsNone(self.runner.run("CA1", reply_after, 0.2))
+        self.assertLess(time.monotonic() - started, 0.15)
+        self.assertIn(self.runner.filler("CA1"), FILLERS)
+        self.assertEqual(self.runner.poll("CA1"), (DONE, "Your booking is confirmed."))
+        self.assertFalse(self.runner.is_pending("CA1"))
+
+        metrics = self.runner.metrics()
+        self.assertEqual((metrics["deadline_missed"], metrics["completed_late"]), (1, 1))
+        self.assertGreaterEqual(metrics["max_ms"], 200)
+
+    def test_turn_abandoned_after_max_polls(self):
+        runner = TurnDeadlineRunner(deadline=0.01, poll_wait=0.02, max_polls=2, workers=1)
+        self.assertIsNone(runner.run("CA1", reply_after, 0.3))
+        self.assertEqual(runner.poll("CA1"), (PENDING, None))
+        self.assertEqual(runner.poll("CA1"), (EXPIRED, None))
+        self.assertEqual(runner.poll("CA1"), (UNKNOWN, None))
+        metrics = runner.metrics()
+        self.assertEqual((metrics["fillers"], metrics["abandoned"]), (2, 1))
+        runner.shutdown()
+
+    def test_fillers_vary_across_polls(self):
+        runner = TurnDeadlineRunner(deadline=0.01, poll_wait=0.01, max_polls=5, workers=1)
+        runner.run("CA1", reply_after, 0.3)
+        first = runner.filler("CA1")
+        runner.poll("CA1")
+        self.assertNotEqual(runner.filler("CA1"), first)
+        runner.shutdown()
+
+    def test_error_is_raised_on_poll(self):
+        self.assertIsNone(self.runner.run("CA1", failing_turn))
+        with self.assertRaises(RuntimeError):
+            self.runner.poll("CA1")
+        self.assertFalse(self.runner.is_pending("CA1"))
+        time.sleep(0.05)  # done callbacks run just after waiters wake
+        self.assertEqual(self.runner.metrics()["errors"], 1)
+
+    def test_unknown_call(self):
+        self.assertEqual(self.runner.poll("CA404"), (UNKNOWN, None))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
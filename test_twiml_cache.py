@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test suite for precompiled TwiML: byte-identical output to VoiceResponse
+"""
+
+import os
+import sys
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from twilio.twiml.voice_response import VoiceResponse
+
+from speech_hints import gather_profile
+from twiml_cache import EMPTY_RESPONSE, TwiMLTemplate, benchmark, compose
+
+BASE_URL = "https://example.com"
+
+AWKWARD_TEXTS = [
+    "Hello! How can I help you today?",
+    "Haircut & blowdry costs ₹400-1,200 <per visit>.",
+    'She said "yes" and it\'s booked.',
+    "Line one\nline two\ttabbed\r\nend",
+    "__twiml_slot_text__ is not a slot",
+    "   ",
+]
+
+AWKWARD_SIDS = ["CA0123456789abcdef0123456789abcdef", 'CA"&<x>', "CA a\nb"]
+
+
+def build_greeting(response, call_sid):
+    response.say("Hello! Welcome to Goodness Glamour Salon. I'm your AI assistant. How can I help you today?",
+                 voice='Polly.Joanna', language='en-US')
+    response.gather(input='speech', action=f'{BASE_URL}/voice/process_speech/{call_sid}',
+                    speech_timeout='auto', language='en-US', enhanced=True)
+    response.say("I didn't hear anything. Please speak after the tone.")
+    response.redirect(f'{BASE_URL}/voice/process_speech/{call_sid}')
+
+
+def build_reply(response, text):
+    response.say(text, voice='alice', language='en-IN')
+    response.pause(length=1)
+    response.gather(input='speech', action=f'{BASE_URL}/voice/process', speech_timeout='auto', timeout=10)
+    response.say("I didn't hear anything. Please try again.")
+    response.redirect(f'{BASE_URL}/voice/process')
+
+
+def build_hold(response, text, call_sid):
+    response.say(text, voice='Polly.Joanna', language='en-US')
+    response.redirect(f'{BASE_URL}/voice/poll/{call_sid}', method='POST')
+
+
+def built(build, **values) -> str:
+    response = VoiceResponse()
+    build(response, **values)
+    return str(response)
+
+
+class TestTwiMLTemplate(unittest.TestCase):
+
+    def test_static_response_is_precompiled_bytes(self):
+        template = TwiMLTemplate(lambda response: (response.say("Goodbye!"), response.hangup()))
+        expected = built(lambda response: (response.say("Goodbye!"), response.hangup()))
+        self.assertEqual(template.render(), expected)
+        self.assertEqual(template.render_bytes(), expected.encode("utf-8"))
+        self.assertIs(template.render_bytes(), template.render_bytes())
+
+    def test_call_sid_in_attributes_matches_builder(self):
+        template = TwiMLTemplate(build_greeting, "call_sid")
+        for call_sid in AWKWARD_SIDS:
+            with self.subTest(call_sid=call_sid):
+                self.assertEqual(template.render(call_sid=call_sid), built(build_greeting, call_sid=call_sid))
+
+    def test_spoken_text_matches_builder(self):
+        template = TwiMLTemplate(build_reply, "text")
+        for text in AWKWARD_TEXTS + [""]:
+            with self.subTest(text=text):
+                self.assertEqual(template.render(text=text), built(build_reply, text=text))
+                self.assertEqual(template.render_bytes(text=text), built(build_reply, text=text).encode("utf-8"))
+
+    def test_several_slots_match_builder(self):
+        template = TwiMLTemplate(build_hold, "text", "call_sid")
+        for text in AWKWARD_TEXTS:
+            for call_sid in AWKWARD_SIDS:
+                with self.subTest(text=text, call_sid=call_sid):
+                    self.assertEqual(template.render(text=text, call_sid=call_sid),
+                                     built(build_hold, text=text, call_sid=call_sid))
+
+    def test_compose_matches_one_builder(self):
+        say = TwiMLTemplate(lambda response, text: response.say(text, voice='Polly.Joanna', language='en-US'), "text")
+        hangup = TwiMLTemplate(lambda response: response.hangup())
+
+        def both(response, text):
+            response.say(text, voice='Polly.Joanna', language='en-US')
+            response.hangup()
+
+        text = "Your booking is confirmed & paid."
+        self.assertEqual(compose(say.body(text=text), hangup.body()), built(both, text=text))
+        self.assertEqual(compose("", hangup.body()), built(lambda response: response.hangup()))
+        self.assertEqual(compose(), str(VoiceResponse()))
+        self.assertEqual(TwiMLTemplate(lambda response: None).body(), "")
+        self.assertEqual(compose(), EMPTY_RESPONSE)
+
+    def test_template_is_faster_than_builder(self):
+        result = benchmark(TwiMLTemplate(build_greeting, "call_sid"), iterations=2000, call_sid="CA1")
+        self.assertLess(result["template_us"], result["builder_us"])
+
+
+class TestWebhookTwiML(unittest.TestCase):
+    """The simple assistant's webhooks still serve what VoiceResponse built"""
+
+    @classmethod
+    def setUpClass(cls):
+        import voice_booking_simple
+        cls.module = voice_booking_simple
+        cls.client = voice_booking_simple.app.test_client()
+
+    def test_incoming_call(self):
+        base = self.module.WEBHOOK_BASE_URL
+
+        def legacy(response, call_sid):
+            response.say("Hello! Welcome to Goodness Glamour Salon. I'm your AI assistant. How can I help you today?",
+                         voice='Polly.Joanna', language='en-US')
+            response.gather(input='speech', action=f'{base}/voice/process_speech/{call_sid}',
+                            **gather_profile("greeting").attributes)
+            response.say("I didn't hear anything. Please speak after the tone.")
+            response.redirect(f'{base}/voice/process_speech/{call_sid}')
+
+        reply = self.client.post('/voice/incoming', data={'CallSid': 'CAtwiml1', 'From': '+919000000000'})
+        self.assertEqual(reply.data, built(legacy, call_sid='CAtwiml1').encode("utf-8"))
+        self.module.voice_assistant.end_session('CAtwiml1')
+
+    def test_no_speech(self):
+        base = self.module.WEBHOOK_BASE_URL
+
+        def legacy(response):
+            response.say("I didn't hear anything. Please speak clearly.")
+            response.redirect(f'{base}/voice/process_speech/CAtwiml2')
+
+        reply = self.client.post('/voice/process_speech/CAtwiml2', data={})
+        self.assertEqual(reply.data, built(legacy).encode("utf-8"))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test suite for webhook retry deduplication: replayed replies, TTL eviction and retries during a slow turn
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from webhook_idempotency import IDEMPOTENCY_HEADER, SPEECH_FIELDS, IdempotencyCache, form_params, request_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestIdempotencyCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = IdempotencyCache(ttl=60, max_entries=3, clock=self.clock)
+        self.runs = []
+
+    def turn(self, reply: str):
+        def run():
+            self.runs.append(reply)
+            return reply
+        return run
+
+    def test_retry_replays_until_ttl(self):
+        self.assertEqual(self.cache.run("CA1|a", self.turn("first")), ("first", False))
+        self.assertEqual(self.cache.run("CA1|a", self.turn("second")), ("first", True))
+        self.assertEqual(self.cache.run("CA1|b", self.turn("other")), ("other", False))
+
+        self.clock.now = 61
+        self.assertEqual(self.cache.run("CA1|a", self.turn("again")), ("again", False))
+        self.assertEqual(self.runs, ["first", "other", "again"])
+        stats = self.cache.stats()
+        self.assertEqual((stats["executed"], stats["replayed"], stats["evicted"]), (3, 1, 2))
+
+    def test_size_is_bounded(self):
+        for index in range(5):
+            self.cache.run(f"CA1|{index}", self.turn(str(index)))
+        self.assertEqual(self.cache.stats()["cached"], 3)
+        # The oldest went first
+        self.assertEqual(self.cache.run("CA1|0", self.turn("rerun")), ("rerun", False))
+        self.assertEqual(self.cache.run("CA1|4", self.turn("rerun")), ("4", True))
+
+    def test_failures_are_not_kept(self):
+        def broken():
+            raise RuntimeError("LLM down")
+        with self.assertRaises(RuntimeError):
+            self.cache.run("CA1|a", broken)
+        self.assertEqual(self.cache.run("CA1|a", self.turn("recovered")), ("recovered", False))
+
+    def test_unkeyed_requests_always_run(self):
+        self.cache.run(None, self.turn("one"))
+        self.cache.run(None, self.turn("two"))
+        self.assertEqual(self.runs, ["one", "two"])
+        self.assertEqual(self.cache.stats()["requests"], 0)
+
+    def test_retry_during_slow_turn_waits_for_it(self):
+        release = threading.Event()
+        results = []
+
+        def slow():
+            self.runs.append("slow")
+            release.wait(5)
+            return "booked"
+
+        original = threading.Thread(target=lambda: results.append(self.cache.run("CA1|a", slow)))
+        original.start()
+        while not self.runs:
+            time.sleep(0.001)
+        retry = threading.Thread(target=lambda: results.append(self.cache.run("CA1|a", slow)))
+        retry.start()
+        time.sleep(0.05)
+        self.assertEqual(results, [])
+        release.set()
+        original.join(2)
+        retry.join(2)
+
+        self.assertEqual(sorted(results), [("booked", False), ("booked", True)])
+        self.assertEqual(self.runs, ["slow"])
+        self.assertEqual(self.cache.stats()["joined_in_flight"], 1)
+
+
+class TestRequestKey(unittest.TestCase):
+
+    def test_token_wins_over_form(self):
+        self.assertEqual(request_key("CA1", "/voice/poll/CA1", "tok-1", [("a", "1")]), "CA1|tok-1")
+        self.assertIsNone(request_key("CA1", "/voice/poll/CA1"))
+
+    def test_form_hash_ignores_order_but_not_speech(self):
+        form = [("CallSid", "CA1"), ("SpeechResult", "yes"), ("Confidence", "0.91")]
+        key = request_key("CA1", "/voice/process_speech/CA1", params=form)
+        self.assertEqual(key, request_key("CA1", "/voice/process_speech/CA1", params=reversed(form)))
+        self.assertNotEqual(key, request_key("CA1", "/voice/process_speech/CA1",
+                                             params=form[:1] + [("SpeechResult", "no"), form[2]]))
+        self.assertNotEqual(key, request_key("CA2", "/voice/process_speech/CA1", params=form))
+
+    def test_turn_that_heard_nothing_is_not_fingerprinted(self):
+        # Consecutive silent turns post identical forms; only a token can match them
+        silent = {"CallSid": "CA1", "SpeechResult": "", "CallStatus": "in-progress"}
+        self.assertEqual(form_params(silent, SPEECH_FIELDS), [])
+        self.assertIsNone(request_key("CA1", "/voice/process_speech/CA1", params=form_params(silent, SPEECH_FIELDS)))
+
+
+class TestRetriedSpeechWebhook(unittest.TestCase):
+    """A retried <Gather> callback must not advance the booking dialog twice"""
+
+    @classmethod
+    def setUpClass(cls):
+        import voice_booking_simple
+        cls.module = voice_booking_simple
+
+    def setUp(self):
+        self.module.default_idempotency.clear()
+        self.client = self.module.app.test_client()
+        self.client.post('/voice/incoming', data={'CallSid': 'CAretry', 'From': '+919000000010'})
+        self.addCleanup(self.module.voice_assistant.end_session, 'CAretry')
+
+    def test_retry_replays_reply(self):
+        form = {'CallSid': 'CAretry', 'SpeechResult': 'I want to book a haircut', 'Confidence': '0.9'}
+        first = self.client.post('/voice/process_speech/CAretry', data=form)
+        session = self.module.voice_assistant.active_sessions['CAretry']
+        step = session.current_step
+        history = len(session.conversation_history)
+
+        retry = self.client.post('/voice/process_speech/CAretry', data=form)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry.content_type, first.content_type)
+        self.assertEqual(session.current_step, step)
+        self.assertEqual(len(session.conversation_history), history)
+
+        # The caller's next answer is a new request
+        self.client.post('/voice/process_speech/CAretry',
+                         data=dict(form, SpeechResult='My name is Meera', Confidence='0.8'))
+        self.assertNotEqual(session.current_step, step)
+
+    def test_token_identifies_retries(self):
+        headers = {IDEMPOTENCY_HEADER: 'tok-42'}
+        first = self.client.post('/voice/process_speech/CAretry', headers=headers,
+                                 data={'CallSid': 'CAretry', 'SpeechResult': 'book a haircut'})
+        step = self.module.voice_assistant.active_sessions['CAretry'].current_step
+        retry = self.client.post('/voice/process_speech/CAretry', headers=headers,
+                                 data={'CallSid': 'CAretry', 'SpeechResult': 'book a haircut'})
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(self.module.voice_assistant.active_sessions['CAretry'].current_step, step)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
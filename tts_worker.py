@@ -0,0 +1,252 @@
+"""
+Background Text-to-Speech Playback
+A dedicated worker thread owns the TTS engine and the speaker: replies are
+queued and return at once, sentences are synthesized and played in short
+chunks so playback can be cancelled mid-word when the customer barges in,
+and static prompts come from pre-rendered audio or an in-memory cache
+instead of being synthesized again
+"""
+
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+from audio_prompts import AUDIO_EXTENSION, PYTTSX3_AVAILABLE, TTS_RATE, TTS_VOICE_INDEX, Pyttsx3Renderer
+from speech_stream import split_sentences
+from voice_activity import load_wav
+
+# Optional speaker output
+try:
+    import pyaudio
+    PYAUDIO_AVAILABLE = True
+except ImportError:
+    PYAUDIO_AVAILABLE = False
+    pyaudio = None
+
+logger = logging.getLogger(__name__)
+
+PLAYBACK_RATE = 22050
+PLAYBACK_CHUNK_MS = 40
+
+_STOP = object()
+
+
+class SpeechHandle:
+    """One queued reply; ``done`` is set once it has played out or was cancelled"""
+
+    __slots__ = ("text", "done", "cancelled")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.done = threading.Event()
+        self.cancelled = False
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.done.wait(timeout)
+
+
+class SpeakerSink:
+    """The default output device, 16-bit mono PCM"""
+
+    def __init__(self, sample_rate: int = PLAYBACK_RATE):
+        if not PYAUDIO_AVAILABLE:
+            raise RuntimeError("pyaudio is not installed")
+        self.sample_rate = sample_rate
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(format=pyaudio.paInt16, channels=1, rate=sample_rate, output=True)
+
+    def write(self, pcm: bytes):
+        self._stream.write(pcm)
+
+    def close(self):
+        self._stream.stop_stream()
+        self._stream.close()
+        self._audio.terminate()
+
+
+def pyttsx3_synthesizer(voice_index: int = TTS_VOICE_INDEX, rate: int = TTS_RATE,
+                        sample_rate: int = PLAYBACK_RATE) -> Callable[[str], bytes]:
+    """Text to PCM with pyttsx3, rendered to a scratch file; build it on the thread that will use it"""
+    renderer = Pyttsx3Renderer(voice_index, rate)
+    scratch = tempfile.mkdtemp(prefix="tts_")
+
+    def synthesize(text: str) -> bytes:
+        path = os.path.join(scratch, f"utterance{AUDIO_EXTENSION}")
+        renderer.render(text, path)
+        return load_wav(path, sample_rate)
+
+    return synthesize
+
+
+class TTSWorker:
+    """
+    Speaks queued text on its own thread.
+
+    ``synthesizer_factory`` is called on the worker thread (pyttsx3 engines
+    must stay on the thread that made them) and returns ``text -> PCM`` at
+    the sink's rate. Sentences found in ``prompts`` (an AudioPromptCache)
+    play from their pre-rendered files; everything synthesized is kept in
+    a small LRU, so repeated prompts cost nothing after the first time.
+    """
+
+    def __init__(self, synthesizer_factory: Callable[[], Callable[[str], bytes]], sink,
+                 prompts=None, cache_size: int = 128, chunk_ms: int = PLAYBACK_CHUNK_MS):
+        self.synthesizer_factory = synthesizer_factory
+        self.sink = sink
+        self.prompts = prompts
+        self.cache_size = cache_size
+        self.chunk_bytes = sink.sample_rate * chunk_ms // 1000 * 2
+        self._queue: "queue.Queue" = queue.Queue()
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._pending = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._counts = {"utterances": 0, "sentences": 0, "cache_hits": 0, "prompt_files": 0, "cancelled": 0}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "TTSWorker":
+        self._thread = threading.Thread(target=self._run, name="tts-worker", daemon=True)
+        self._thread.start()
+        return self
+
+    def say(self, text: str) -> SpeechHandle:
+        """Queue ``text`` and return immediately"""
+        handle = SpeechHandle(text)
+        with self._lock:
+            self._pending += 1
+            self._idle.clear()
+            self._queue.put((self._generation, handle))
+        return handle
+
+    def preload(self, texts: Iterable[str]):
+        """Synthesize static prompts ahead of time, between replies"""
+        for text in texts:
+            self._queue.put((None, text))
+
+    @property
+    def speaking(self) -> bool:
+        return not self._idle.is_set()
+
+    def cancel(self) -> bool:
+        """Barge-in: stop the reply playing now and drop everything queued; True if anything was cut"""
+        with self._lock:
+            cut = self.speaking
+            self._generation += 1
+            if cut:
+                self._counts["cancelled"] += 1
+        return cut
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued has played (or was cancelled)"""
+        return self._idle.wait(timeout)
+
+    def stop(self):
+        self.cancel()
+        self._queue.put(_STOP)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts, cached=len(self._cache))
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _run(self):
+        try:
+            synthesize = self.synthesizer_factory()
+        except Exception as e:
+            logger.error(f"Text-to-speech setup failed: {e}")
+
+            def synthesize(text: str) -> bytes:
+                raise RuntimeError("text-to-speech is not available")
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            generation, payload = item
+            if generation is None:
+                try:
+                    self._audio(payload, synthesize)
+                except Exception as e:
+                    logger.warning(f"Could not preload {payload!r}: {e}")
+                continue
+            self._speak(generation, payload, synthesize)
+            with self._lock:
+                self._pending -= 1
+                if not self._pending:
+                    self._idle.set()
+
+    def _live(self, generation: int) -> bool:
+        return generation == self._generation
+
+    def _speak(self, generation: int, handle: SpeechHandle, synthesize: Callable[[str], bytes]):
+        self._count("utterances")
+        try:
+            for sentence in split_sentences([handle.text], min_chars=0):
+                if not self._live(generation):
+                    break
+                audio = self._audio(sentence, synthesize)
+                self._count("sentences")
+                for offset in range(0, len(audio), self.chunk_bytes):
+                    if not self._live(generation):
+                        break
+                    self.sink.write(audio[offset:offset + self.chunk_bytes])
+        except Exception as e:
+            logger.error(f"Text-to-speech error: {e}")
+        finally:
+            handle.cancelled = not self._live(generation)
+            handle.done.set()
+
+    def _audio(self, sentence: str, synthesize: Callable[[str], bytes]) -> bytes:
+        with self._lock:
+            audio = self._cache.get(sentence)
+            if audio is not None:
+                self._cache.move_to_end(sentence)
+                self._counts["cache_hits"] += 1
+                return audio
+        audio = self._prompt_file(sentence)
+        if audio is None:
+            started = time.perf_counter()
+            audio = synthesize(sentence)
+            logger.debug(f"Synthesized {sentence!r} in {(time.perf_counter() - started) * 1000:.0f} ms")
+        with self._lock:
+            self._cache[sentence] = audio
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return audio
+
+    def _prompt_file(self, sentence: str) -> Optional[bytes]:
+        if self.prompts is None:
+            return None
+        name = self.prompts.filename(sentence)
+        if name is None:
+            return None
+        try:
+            audio = load_wav(os.path.join(self.prompts.directory, name), self.sink.sample_rate)
+        except Exception as e:
+            logger.warning(f"Could not load pre-rendered prompt {name}: {e}")
+            return None
+        self._count("prompt_files")
+        return audio
+
+
+def create_tts_worker(prompts=None) -> Optional[TTSWorker]:
+    """Background pyttsx3 playback on the default speaker, or None when it cannot run here"""
+    if not PYTTSX3_AVAILABLE or not PYAUDIO_AVAILABLE or AUDIO_EXTENSION != ".wav":
+        # pyttsx3 renders AIFF on macOS, which the wave module cannot read back
+        return None
+    try:
+        return TTSWorker(pyttsx3_synthesizer, SpeakerSink(), prompts=prompts).start()
+    except Exception as e:
+        logger.warning(f"Background text-to-speech unavailable: {e}")
+        return None
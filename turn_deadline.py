@@ -0,0 +1,178 @@
+"""
+Latency-Budgeted Turn Handling
+Runs each caller turn in a background worker under a deadline. A turn that
+misses the deadline is answered with a short filler and a redirect to a
+poll endpoint, which serves the finished reply, so slow LLM calls never hold
+Twilio's webhook open or leave the caller in silence
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Time a webhook waits for the reply before answering with a filler
+TURN_DEADLINE = float(os.getenv('TURN_DEADLINE_SECONDS', '1.5'))
+
+# Time a poll request waits for the reply before sending another filler
+POLL_WAIT = float(os.getenv('TURN_POLL_SECONDS', '4.0'))
+
+# Fillers sent for one turn before it is given up
+MAX_POLLS = 4
+
+TURN_WORKERS = 8
+
+# Completion times kept for the latency percentiles
+LATENCY_WINDOW = 500
+
+FILLERS = (
+    "One moment please.",
+    "Let me check that for you.",
+    "Just a second, nearly there.",
+    "Thanks for waiting, almost done."
+)
+
+# Poll outcomes
+DONE = "done"
+PENDING = "pending"
+EXPIRED = "expired"
+UNKNOWN = "unknown"
+
+
+class PendingTurn:
+    """A turn still computing after its webhook returned"""
+    __slots__ = ("future", "started", "polls")
+
+    def __init__(self, future: Future, started: float):
+        self.future = future
+        self.started = started
+        self.polls = 0
+
+
+class TurnDeadlineRunner:
+    """
+    Background worker pool with a per-turn deadline.
+
+    ``run`` returns the reply when it is ready in time and None otherwise;
+    the pending turn is then served by ``poll`` under the same key (the call
+    SID), which also keeps the deadline, filler and completion-time metrics.
+    """
+
+    def __init__(self, deadline: float = TURN_DEADLINE, poll_wait: float = POLL_WAIT,
+                 max_polls: int = MAX_POLLS, workers: int = TURN_WORKERS):
+        self.deadline = deadline
+        self.poll_wait = poll_wait
+        self.max_polls = max_polls
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="turn")
+        self._pending: Dict[str, PendingTurn] = {}
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._counts = {
+            "turns": 0,
+            "within_deadline": 0,
+            "deadline_missed": 0,
+            "fillers": 0,
+            "polls": 0,
+            "completed_late": 0,
+            "abandoned": 0,
+            "errors": 0
+        }
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counts[name] += amount
+
+    def _finished(self, future: Future, started: float):
+        # Runs when the worker finishes, whether or not anyone is still waiting
+        if future.cancelled():
+            return
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self._latencies.append(elapsed)
+            if future.exception() is not None:
+                self._counts["errors"] += 1
+
+    def run(self, key: str, fn: Callable[..., str], *args, **kwargs) -> Optional[str]:
+        """Reply for this turn if ready within the deadline, else None (and a filler is due)"""
+        started = time.monotonic()
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda f: self._finished(f, started))
+        self._count("turns")
+        try:
+            result = future.result(timeout=self.deadline)
+            self._count("within_deadline")
+            return result
+        except FutureTimeout:
+            pass
+
+        with self._lock:
+            self._pending[key] = PendingTurn(future, started)
+            self._counts["deadline_missed"] += 1
+            self._counts["fillers"] += 1
+        logger.info(f"Turn for {key} missed its {self.deadline:.1f}s deadline; holding the caller")
+        return None
+
+    def poll(self, key: str) -> Tuple[str, Optional[str]]:
+        """(DONE, reply), (PENDING, None) with another filler due, (EXPIRED, None) or (UNKNOWN, None)"""
+        with self._lock:
+            pending = self._pending.get(key)
+        if pending is None:
+            return UNKNOWN, None
+
+        self._count("polls")
+        try:
+            result = pending.future.result(timeout=self.poll_wait)
+        except FutureTimeout:
+            pending.polls += 1
+            if pending.polls >= self.max_polls:
+                self.discard(key)
+                pending.future.cancel()
+                self._count("abandoned")
+                logger.warning(f"Turn for {key} abandoned after {time.monotonic() - pending.started:.1f}s")
+                return EXPIRED, None
+            self._count("fillers")
+            return PENDING, None
+        except Exception:
+            self.discard(key)
+            raise
+
+        self.discard(key)
+        self._count("completed_late")
+        return DONE, result
+
+    def filler(self, key: str) -> str:
+        """Holding phrase for a turn, varied across successive polls"""
+        with self._lock:
+            pending = self._pending.get(key)
+        return FILLERS[(pending.polls if pending else 0) % len(FILLERS)]
+
+    def is_pending(self, key: str) -> bool:
+        with self._lock:
+            return key in self._pending
+
+    def discard(self, key: str):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def metrics(self) -> Dict[str, float]:
+        """Counters plus completion-time percentiles (ms) over recent turns"""
+        with self._lock:
+            metrics = dict(self._counts)
+            latencies = sorted(self._latencies)
+            metrics["pending"] = len(self._pending)
+        metrics["deadline_ms"] = round(self.deadline * 1000)
+        for name, fraction in (("p50_ms", 0.5), ("p95_ms", 0.95), ("max_ms", 1.0)):
+            if latencies:
+                index = min(len(latencies) - 1, int(fraction * len(latencies)))
+                metrics[name] = round(latencies[index] * 1000, 1)
+            else:
+                metrics[name] = 0.0
+        return metrics
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -13,6 +13,10 @@ import json
 import uuid
 from datetime import datetime
 from config import config
+from twiml_cache import TwiMLTemplate, compose
+from functools import partial
+from speech_hints import StepTemplates, default_reprompts, gather_profile
+from webhook_idempotency import SPEECH_FIELDS, default_idempotency, idempotent_webhook
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,6 +37,80 @@ app = Flask(__name__)
 # Global AI system instance
 salon_ai = None
 
+# TwiML compiled at startup; calls splice in the CallSid and spoken text
+def _build_greeting(response: VoiceResponse, call_sid: str, gather: dict):
+    # Welcome message
+    response.say(
+        "Hello! Welcome to Goodness Glamour Salon. "
+        "I'm your AI assistant. How can I help you today?",
+        voice='Polly.Joanna',
+        language='en-US'
+    )
+    
+    # Gather user input, with the greeting's hints
+    response.gather(
+        input='speech',
+        action=f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}',
+        **gather
+    )
+    
+    # Fallback if no speech detected
+    response.say(
+        "I didn't hear anything. Please speak after the tone.",
+        voice='Polly.Joanna'
+    )
+    response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
+
+def _build_goodbye(response: VoiceResponse):
+    response.say(
+        "Thank you for calling Goodness Glamour Salon. Have a wonderful day!",
+        voice='Polly.Joanna'
+    )
+    response.hangup()
+
+def _build_listen(response: VoiceResponse, call_sid: str, gather: dict):
+    response.gather(
+        input='speech',
+        action=f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}',
+        **gather
+    )
+    
+    # Fallback
+    response.say("I'm listening.", voice='Polly.Joanna')
+    response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
+
+def _build_booked(response: VoiceResponse):
+    response.say(
+        "You will receive a confirmation message shortly. Thank you for choosing Goodness Glamour Salon!",
+        voice='Polly.Joanna'
+    )
+    response.hangup()
+
+def _build_no_speech(response: VoiceResponse, call_sid: str):
+    response.say(
+        "I didn't hear anything. Please speak clearly after the tone.",
+        voice='Polly.Joanna'
+    )
+    response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
+
+def _build_error(response: VoiceResponse, text: str):
+    response.say(text, voice='Polly.Joanna')
+    response.hangup()
+
+GREETING_TWIML = TwiMLTemplate(partial(_build_greeting, gather=gather_profile("greeting").attributes), "call_sid")
+SAY_TWIML = TwiMLTemplate(lambda response, text: response.say(text, voice='Polly.Joanna', language='en-US'), "text")
+GOODBYE_TWIML = TwiMLTemplate(_build_goodbye)
+# One per booking step: each <Gather> carries that step's hints, language and speech model
+LISTEN_TWIML = StepTemplates(_build_listen, "call_sid")
+BOOKED_TWIML = TwiMLTemplate(_build_booked)
+NO_SPEECH_TWIML = TwiMLTemplate(_build_no_speech, "call_sid")
+GREETING_ERROR_TWIML = TwiMLTemplate(
+    lambda response: _build_error(response, "I'm sorry, there was a technical issue. Please try again later.")
+)
+ERROR_TWIML = TwiMLTemplate(
+    lambda response: _build_error(response, "I'm sorry, there was a technical issue. Please try calling again later.")
+)
+
 class TwilioVoiceAgent:
     """Handles Twilio voice call interactions"""
     
@@ -57,44 +135,12 @@ class TwilioVoiceAgent:
             
             logger.info(f"New call from {from_number}, Session: {session_id}")
             
-            # Create TwiML response for greeting
-            response = VoiceResponse()
-            
-            # Welcome message
-            response.say(
-                "Hello! Welcome to Goodness Glamour Salon. "
-                "I'm your AI assistant. How can I help you today?",
-                voice='Polly.Joanna',
-                language='en-US'
-            )
-            
-            # Gather user input
-            gather = response.gather(
-                input='speech',
-                action=f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}',
-                speech_timeout='auto',
-                language='en-US',
-                enhanced=True
-            )
-            
-            # Fallback if no speech detected
-            response.say(
-                "I didn't hear anything. Please speak after the tone.",
-                voice='Polly.Joanna'
-            )
-            response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
-            
-            return str(response)
+            # TwiML response for greeting
+            return GREETING_TWIML.render(call_sid=call_sid)
             
         except Exception as e:
             logger.error(f"Error handling incoming call: {e}")
-            response = VoiceResponse()
-            response.say(
-                "I'm sorry, there was a technical issue. Please try again later.",
-                voice='Polly.Joanna'
-            )
-            response.hangup()
-            return str(response)
+            return GREETING_ERROR_TWIML.render()
     
     def process_speech_input(self, call_sid: str, speech_result: str):
         """Process speech input from the call"""
@@ -106,6 +152,8 @@ class TwilioVoiceAgent:
             call_info = self.active_calls[call_sid]
             
             if not speech_result:
+                # Nothing recognized counts as a re-prompt of the step being asked
+                default_reprompts.record(self.salon_ai.conversation_context.current_step, True)
                 return self._create_no_speech_response(call_sid)
             
             logger.info(f"Processing speech for call {call_sid}: {speech_result}")
@@ -130,91 +178,43 @@ class TwilioVoiceAgent:
             logger.error(f"Error processing speech: {e}")
             return self._create_error_response()
     
-    def _continue_conversation(self, call_sid: str, ai_response: str):
+    def _continue_conversation(self, call_sid: str, ai_response: str) -> str:
         """Continue the conversation flow"""
-        response = VoiceResponse()
-        
         # Speak the AI response
-        response.say(
-            ai_response,
-            voice='Polly.Joanna',
-            language='en-US'
-        )
+        said = SAY_TWIML.body(text=ai_response)
         
         # Check if this is the end of conversation
         if any(word in ai_response.lower() for word in ["thank you", "goodbye", "confirmed"]):
-            response.say(
-                "Thank you for calling Goodness Glamour Salon. Have a wonderful day!",
-                voice='Polly.Joanna'
-            )
-            response.hangup()
             # Clean up call session
             if call_sid in self.active_calls:
                 del self.active_calls[call_sid]
-        else:
-            # Gather next input
-            gather = response.gather(
-                input='speech',
-                action=f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}',
-                speech_timeout='auto',
-                language='en-US',
-                enhanced=True
-            )
-            
-            # Fallback
-            response.say("I'm listening.", voice='Polly.Joanna')
-            response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
+            return compose(said, GOODBYE_TWIML.body())
         
-        return response
+        # Gather next input
+        step = self.salon_ai.conversation_context.current_step
+        return compose(said, LISTEN_TWIML.body(step, call_sid=call_sid))
     
-    def _handle_booking_completion(self, call_sid: str, ai_response: str):
+    def _handle_booking_completion(self, call_sid: str, ai_response: str) -> str:
         """Handle booking completion flow"""
-        response = VoiceResponse()
-        
-        # Speak confirmation
-        response.say(
-            ai_response,
-            voice='Polly.Joanna',
-            language='en-US'
-        )
-        
         # Send SMS confirmation (optional)
         call_info = self.active_calls.get(call_sid, {})
         if call_info.get('from_number'):
             self._send_sms_confirmation(call_info['from_number'])
         
-        # End call
-        response.say(
-            "You will receive a confirmation message shortly. Thank you for choosing Goodness Glamour Salon!",
-            voice='Polly.Joanna'
-        )
-        response.hangup()
-        
         # Clean up
         if call_sid in self.active_calls:
             del self.active_calls[call_sid]
         
-        return response
+        # Speak confirmation, then end call
+        return compose(SAY_TWIML.body(text=ai_response), BOOKED_TWIML.body())
     
     def _create_no_speech_response(self, call_sid: str):
         """Handle when no speech is detected"""
-        response = VoiceResponse()
-        response.say(
-            "I didn't hear anything. Please speak clearly after the tone.",
-            voice='Polly.Joanna'
-        )
-        response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
-        return str(response)
+        return NO_SPEECH_TWIML.render(call_sid=call_sid)
     
     def _create_error_response(self):
         """Create error response"""
-        response = VoiceResponse()
-        response.say(
-            "I'm sorry, there was a technical issue. Please try calling again later.",
-            voice='Polly.Joanna'
-        )
-        response.hangup()
-        return str(response)
+        return ERROR_TWIML.render()
     
     def _send_sms_confirmation(self, phone_number: str):
         """Send SMS confirmation to customer"""
@@ -233,6 +233,7 @@ twilio_agent = TwilioVoiceAgent()
 
 # Flask routes
 @app.route('/voice/incoming', methods=['POST'])
+@idempotent_webhook(fields=("From",))
 def handle_incoming_call():
     """Handle incoming Twilio voice call"""
     call_sid = request.form.get('CallSid')
@@ -243,6 +244,7 @@ def handle_incoming_call():
     return twilio_agent.handle_incoming_call(call_sid, from_number)
 
 @app.route('/voice/process_speech/<call_sid>', methods=['POST'])
+@idempotent_webhook(fields=SPEECH_FIELDS)
 def process_speech(call_sid):
     """Process speech input from Twilio"""
     speech_result = request.form.get('SpeechResult', '')
@@ -331,6 +333,8 @@ def health_check():
         json.dumps({
             'status': 'healthy',
             'active_calls': len(twilio_agent.active_calls),
+            'speech_steps': default_reprompts.snapshot(),
+            'webhook_retries': default_idempotency.stats(),
             'timestamp': datetime.now().isoformat()
         }),
         status=200,
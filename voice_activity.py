@@ -0,0 +1,243 @@
+"""
+Voice Activity Detection
+G.711 μ-law codec and WAV loading/resampling for telephone and local
+audio, and an energy-based VAD that tracks the background noise floor and
+cuts a stream of 20 ms frames into utterances, with a short pre-roll so the
+first syllable is not clipped
+"""
+
+import logging
+import math
+import wave
+from array import array
+from collections import deque
+from typing import Deque, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Telephone audio as Twilio media streams carry it
+SAMPLE_RATE = 8000
+FRAME_MS = 20
+
+# Event kinds
+SPEECH_START = "speech_start"
+SPEECH_END = "speech_end"
+
+_ULAW_BIAS = 0x84
+_ULAW_CLIP = 8159
+
+
+def _ulaw_to_linear(byte: int) -> int:
+    byte = ~byte & 0xFF
+    magnitude = (((byte & 0x0F) << 3) + _ULAW_BIAS) << ((byte & 0x70) >> 4)
+    return _ULAW_BIAS - magnitude if byte & 0x80 else magnitude - _ULAW_BIAS
+
+
+def _linear_to_ulaw(sample: int) -> int:
+    # G.711 on the top 14 bits, as audioop.lin2ulaw does
+    sample >>= 2
+    mask = 0x7F if sample < 0 else 0xFF
+    sample = min(abs(sample), _ULAW_CLIP) + (_ULAW_BIAS >> 2)
+    segment = max(sample.bit_length() - 6, 0)
+    if segment > 7:
+        return 0x7F ^ mask
+    return ((segment << 4) | ((sample >> (segment + 1)) & 0x0F)) ^ mask
+
+
+_DECODE = array("h", (_ulaw_to_linear(byte) for byte in range(256)))
+_ENCODE = bytes(_linear_to_ulaw(sample) for sample in range(-32768, 32768))
+
+
+def ulaw_decode(data: bytes) -> bytes:
+    """μ-law bytes to 16-bit little-endian PCM"""
+    return array("h", (_DECODE[byte] for byte in data)).tobytes()
+
+
+def ulaw_encode(pcm: bytes) -> bytes:
+    """16-bit little-endian PCM to μ-law bytes"""
+    return bytes(_ENCODE[sample + 32768] for sample in array("h", pcm))
+
+
+def frame_rms(pcm: bytes) -> float:
+    """Root-mean-square level of a 16-bit PCM frame"""
+    samples = array("h", pcm)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(sample * sample for sample in samples) / len(samples))
+
+
+def resample(pcm: bytes, from_rate: int, to_rate: int = SAMPLE_RATE) -> bytes:
+    """Linear-interpolation resampling of 16-bit mono PCM"""
+    if from_rate == to_rate or not pcm:
+        return pcm
+    samples = array("h", pcm)
+    count = max(1, len(samples) * to_rate // from_rate)
+    step = (len(samples) - 1) / max(count - 1, 1)
+    out = array("h")
+    for index in range(count):
+        position = index * step
+        left = int(position)
+        right = min(left + 1, len(samples) - 1)
+        fraction = position - left
+        out.append(int(samples[left] + (samples[right] - samples[left]) * fraction))
+    return out.tobytes()
+
+
+def load_wav(path: str, rate: int = SAMPLE_RATE) -> bytes:
+    """A WAV file as 16-bit mono PCM at ``rate``"""
+    with wave.open(path, "rb") as handle:
+        channels, width, source_rate = handle.getnchannels(), handle.getsampwidth(), handle.getframerate()
+        frames = handle.readframes(handle.getnframes())
+    if width != 2:
+        raise ValueError(f"{path}: only 16-bit WAV is supported")
+    samples = array("h", frames)
+    if channels > 1:
+        samples = array("h", (sum(samples[i:i + channels]) // channels for i in range(0, len(samples), channels)))
+    return resample(samples.tobytes(), source_rate, rate)
+
+
+class Utterance:
+    """One stretch of speech cut out of the stream"""
+
+    __slots__ = ("audio", "sample_rate", "started_ms", "duration_ms", "longest_pause_ms")
+
+    def __init__(self, audio: bytes, sample_rate: int, started_ms: int, duration_ms: int,
+                 longest_pause_ms: int = 0):
+        self.audio = audio              # 16-bit PCM, pre-roll included
+        self.sample_rate = sample_rate
+        self.started_ms = started_ms    # Stream time the speech started
+        self.duration_ms = duration_ms  # Speech only, without pre-roll or trailing silence
+        self.longest_pause_ms = longest_pause_ms  # Longest silence the speaker left inside the utterance
+
+
+class VADEvent:
+    """Speech start (with the audio so far, for streaming recognizers) or end (with the whole utterance)"""
+
+    __slots__ = ("kind", "at_ms", "utterance")
+
+    def __init__(self, kind: str, at_ms: int, utterance: Optional[Utterance] = None):
+        self.kind = kind
+        self.at_ms = at_ms
+        self.utterance = utterance
+
+
+class EnergyVAD:
+    """
+    Frame-by-frame speech detector for 16-bit PCM.
+
+    A frame is voiced when its level is ``threshold`` times the noise floor
+    (and above ``min_level``). Speech starts after ``start_frames`` voiced
+    frames in a row and ends after ``end_silence_ms`` of unvoiced frames or
+    at ``max_utterance_ms``. The noise floor is calibrated from the first
+    ``calibration_ms`` of audio and then follows unvoiced frames with an
+    exponential moving average as the line gets noisier or quieter.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, frame_ms: int = FRAME_MS,
+                 threshold: float = 3.0, min_level: float = 300.0, start_frames: int = 3,
+                 end_silence_ms: int = 600, pre_roll_ms: int = 200,
+                 max_utterance_ms: int = 15000, calibration_ms: int = 200, noise_alpha: float = 0.05):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.threshold = threshold
+        self.min_level = min_level
+        self.start_frames = start_frames
+        self.end_frames = max(1, end_silence_ms // frame_ms)
+        self.max_frames = max(1, max_utterance_ms // frame_ms)
+        self.calibration_frames = calibration_ms // frame_ms
+        self.noise_alpha = noise_alpha
+        self.noise_floor: Optional[float] = None
+        self._calibrated = 0
+        self.in_speech = False
+        self._pre_roll: Deque[bytes] = deque(maxlen=max(start_frames, pre_roll_ms // frame_ms))
+        self._frames: List[bytes] = []
+        self._voiced_run = 0
+        self._silent_run = 0
+        self._speech_frames = 0
+        self._longest_pause = 0
+        self._started_ms = 0
+        self._now_ms = 0
+
+    @property
+    def now_ms(self) -> int:
+        """Stream time of the last frame fed"""
+        return self._now_ms
+
+    @property
+    def calibrated(self) -> bool:
+        return self._calibrated >= self.calibration_frames
+
+    def is_voiced(self, level: float) -> bool:
+        floor = self.noise_floor if self.noise_floor is not None else 0.0
+        return level >= self.min_level and level >= floor * self.threshold
+
+    def _track_noise(self, level: float):
+        if self._calibrated < self.calibration_frames:
+            # Plain mean over the calibration window
+            self._calibrated += 1
+            self.noise_floor = (self.noise_floor or 0.0) + (level - (self.noise_floor or 0.0)) / self._calibrated
+        elif self.noise_floor is None:
+            self.noise_floor = level
+        else:
+            self.noise_floor += self.noise_alpha * (level - self.noise_floor)
+
+    def process(self, pcm: bytes) -> List[VADEvent]:
+        """Feed one frame; returns the speech start/end events it caused"""
+        self._now_ms += self.frame_ms
+        level = frame_rms(pcm)
+        events = []
+        if not self.calibrated:
+            self._pre_roll.append(pcm)
+            self._track_noise(level)
+            return events
+        voiced = self.is_voiced(level)
+
+        if not self.in_speech:
+            self._pre_roll.append(pcm)
+            if not voiced:
+                self._voiced_run = 0
+                self._track_noise(level)
+                return events
+            self._voiced_run += 1
+            if self._voiced_run < self.start_frames:
+                return events
+            self.in_speech = True
+            self._frames = list(self._pre_roll)
+            self._pre_roll.clear()
+            self._speech_frames = self._voiced_run
+            self._silent_run = 0
+            self._started_ms = self._now_ms - self._voiced_run * self.frame_ms
+            events.append(VADEvent(SPEECH_START, self._started_ms, Utterance(
+                b"".join(self._frames), self.sample_rate, self._started_ms, self._speech_frames * self.frame_ms
+            )))
+            return events
+
+        self._frames.append(pcm)
+        if voiced:
+            self._speech_frames += 1 + self._silent_run
+            self._longest_pause = max(self._longest_pause, self._silent_run)
+            self._silent_run = 0
+        else:
+            self._silent_run += 1
+        if self._silent_run >= self.end_frames or self._speech_frames + self._silent_run >= self.max_frames:
+            events.append(self._end())
+        return events
+
+    def _end(self) -> VADEvent:
+        utterance = Utterance(b"".join(self._frames), self.sample_rate, self._started_ms,
+                              self._speech_frames * self.frame_ms, self._longest_pause * self.frame_ms)
+        self.in_speech = False
+        self._frames = []
+        self._voiced_run = self._silent_run = self._speech_frames = self._longest_pause = 0
+        return VADEvent(SPEECH_END, self._now_ms, utterance)
+
+    def flush(self) -> List[VADEvent]:
+        """End the utterance in progress, e.g. when the stream stops mid-sentence"""
+        return [self._end()] if self.in_speech else []
+
+    def reset(self):
+        """Drop any utterance in progress but keep the learned noise floor"""
+        self.in_speech = False
+        self._frames = []
+        self._pre_roll.clear()
+        self._voiced_run = self._silent_run = self._speech_frames = self._longest_pause = 0
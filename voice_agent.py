@@ -1,12 +1,33 @@
 import google.generativeai as genai
 import json
+import os
+import re
+import time
 import uuid
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional
 from dataclasses import dataclass
 import asyncio
 import logging
 
+from booking_dialog import ASK, COMPLETE, CONFIRM, CONFIRM_AGAIN, GREET, REPROMPT, RESTART, DialogEngine, DialogSpec
+from booking_schedule import appointment_window, backfill_appointment_windows, day_schedule, ensure_schedule_schema
+from intent_router import ROUTE_FAQ, ROUTE_FSM, load_router
+from llm_async import OPENAI_AVAILABLE, AsyncGeminiChatProvider, AsyncLLMGateway, AsyncOpenAIProvider
+from llm_gateway import GeminiChatProvider, LLMGateway, gemini_model_name, gemini_usage
+from llm_telemetry import default_telemetry, tag_call
+from prompt_builder import BuiltPrompt, PromptBuilder, compact_instruction, count_tokens
+from salon_faq import answer_faq
+from session_records import BookingData
+from singleflight import AsyncSingleFlight, SingleFlight, flight_key
+from speech_hints import StepTemplates, default_reprompts
+from speech_stream import FIRST_SENTENCE_TIMEOUT, NEXT_SENTENCE_TIMEOUT, SpeechStreamRegistry
+from twiml_cache import TwiMLTemplate, compose
+from audio_prompts import AUDIO_ROUTE, AudioPromptCache
+from local_asr import create_local_listener
+from outbound_dialer import CallQueue, DialRequest, OutboundDialer, TwilioCarrier
+from tts_worker import create_tts_worker
+
 # Optional imports with fallbacks
 try:
     import speech_recognition as sr
@@ -49,6 +70,17 @@ except ImportError:
     sqlite3 = None
     pd = None
 
+# Speech recognition for the local voice loop: 'local' (offline Vosk model),
+# 'google' (SpeechRecognition's web API) or 'auto' (local when installed)
+ASR_BACKEND = os.getenv('ASR_BACKEND', 'auto').lower()
+
+# Let the customer interrupt the assistant in the local voice loop; needs
+# headphones or echo cancellation, or the assistant hears itself
+LOCAL_BARGE_IN = os.getenv('LOCAL_BARGE_IN', 'false').lower() == 'true'
+
+# Queue of calls placed from the API server (one queue file per dialing process)
+AGENT_OUTBOUND_QUEUE_DB = os.getenv('AGENT_OUTBOUND_QUEUE_DB', 'data/agent_outbound_calls.db')
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -111,6 +143,42 @@ KEY FEATURES:
 Be friendly, professional, and encourage customers to book appointments through our website.
 """
 
+# Gemini chat turns kept between calls (six exchanges, as in the enhanced assistant)
+MAX_CHAT_HISTORY = 12
+
+# Booking flow: slot order and the question asked for each step
+BOOKING_SLOT_ORDER = ("customer_name", "phone", "service", "date", "time", "address")
+
+def _spoken_phone(text: str) -> Optional[str]:
+    """Phone number read out digit by digit, in any format"""
+    digits = re.sub(r"\D", "", text)
+    return digits if len(digits) >= 10 else None
+
+
+def _free_text(text: str) -> Optional[str]:
+    """Accept the answer as said (services outside the keyword list, e.g. kids braiding)"""
+    return text.strip() or None
+
+
+# The agentic flow also asks for a phone number, takes free-text services and
+# treats anything but a clear "yes" at confirmation as wanting changes
+BOOKING_DIALOG = DialogEngine(DialogSpec(
+    slot_order=BOOKING_SLOT_ORDER,
+    validators={"phone": _spoken_phone, "service": _free_text},
+    deny_step="greeting",
+    clear_on_deny=False,
+    strict_confirm=True
+))
+
+BOOKING_QUESTIONS = {
+    "get_name": "May I have your name please?",
+    "get_phone": "Could you please provide your phone number?",
+    "get_service": "Which service would you like to book? We offer haircuts, styling, coloring, spa treatments, bridal services, and kids services.",
+    "get_date": "What date would you prefer? Please mention the date or day.",
+    "get_time": "What time would work best for you? Our service hours are 9 AM to 8 PM.",
+    "get_address": "What's your address for our doorstep service?"
+}
+
 # Data classes for agent communication
 @dataclass
 class BookingRequest:
@@ -130,17 +198,17 @@ class AgentMessage:
     message_type: str  # "voice", "text", "booking", "notification"
     data: Optional[Dict] = None
 
-@dataclass
 class ConversationContext:
-    session_id: str
-    customer_name: Optional[str] = None
-    phone: Optional[str] = None
-    current_step: str = "greeting"
-    booking_data: Dict = None
+    """Per-conversation state of the agentic flow"""
+    __slots__ = ("session_id", "customer_name", "phone", "current_step", "booking_data")
     
-    def __post_init__(self):
-        if self.booking_data is None:
-            self.booking_data = {}
+    def __init__(self, session_id: str, customer_name: Optional[str] = None, phone: Optional[str] = None,
+                 current_step: str = "greeting", booking_data: Optional[BookingData] = None):
+        self.session_id = session_id
+        self.customer_name = customer_name
+        self.phone = phone
+        self.current_step = current_step
+        self.booking_data = booking_data if booking_data is not None else BookingData()
 
 # RAG System with Chroma Vector Database (with fallback)
 class RAGSystem:
@@ -301,7 +369,14 @@ class RAGSystem:
             Return only the key terms separated by spaces, no explanations.
             """
             
+            started = time.monotonic()
             response = model.generate_content(prompt)
+            usage = gemini_usage(response)
+            default_telemetry.record(
+                "gemini", gemini_model_name(model), usage.prompt_tokens if usage else count_tokens(prompt),
+                usage.completion_tokens if usage else count_tokens(response.text), time.monotonic() - started,
+                step="rag_query", estimated=usage is None
+            )
             return response.text.lower()
         except Exception as e:
             logger.warning(f"Failed to enhance query with Gemini: {e}")
@@ -337,7 +412,7 @@ rag_system = RAGSystem()
 # Initialize the Gemini model with salon context
 model = genai.GenerativeModel(
     "gemini-2.0-flash-exp",
-    system_instruction=SALON_CONTEXT
+    system_instruction=compact_instruction(SALON_CONTEXT)
 )
 
 # Individual AI Agents
@@ -347,17 +422,14 @@ class VoiceAgent:
     def __init__(self):
         self.speech_recognition_available = SPEECH_RECOGNITION_AVAILABLE
         self.tts_available = TTS_AVAILABLE
+        self._noise_calibrated = False
+        self._speaking_blocked = False
         
-        if self.speech_recognition_available and sr is not None:
-            try:
-                self.recognizer = sr.Recognizer()
-                self.microphone = sr.Microphone()
-                logger.info("Speech recognition initialized")
-            except Exception as e:
-                logger.warning(f"Speech recognition setup failed: {e}")
-                self.speech_recognition_available = False
-        
-        if self.tts_available and pyttsx3 is not None:
+        # Replies play from a background thread so listening can start while they do
+        self.tts_worker = create_tts_worker(AudioPromptCache()) if self.tts_available else None
+        if self.tts_worker is not None:
+            logger.info("Background text-to-speech initialized")
+        elif self.tts_available and pyttsx3 is not None:
             try:
                 self.tts_engine = pyttsx3.init()
                 self._setup_voice()
@@ -365,6 +437,25 @@ class VoiceAgent:
             except Exception as e:
                 logger.warning(f"Text-to-speech setup failed: {e}")
                 self.tts_available = False
+        
+        # Offline streaming recognizer capturing continuously in the background;
+        # without barge-in it ignores the microphone while the assistant talks,
+        # and its listen timeout only starts once the reply has played out
+        self.listener = create_local_listener(
+            muted=lambda: not LOCAL_BARGE_IN and self.speaking,
+            hold_timeout=lambda: self.speaking
+        ) if ASR_BACKEND in ("auto", "local") else None
+        if self.listener is not None:
+            self.speech_recognition_available = True
+            logger.info("Local speech recognition initialized")
+        elif self.speech_recognition_available and sr is not None:
+            try:
+                self.recognizer = sr.Recognizer()
+                self.microphone = sr.Microphone()
+                logger.info("Speech recognition initialized")
+            except Exception as e:
+                logger.warning(f"Speech recognition setup failed: {e}")
+                self.speech_recognition_available = False
     
     def _setup_voice(self):
         """Configure text-to-speech settings"""
@@ -379,14 +470,20 @@ class VoiceAgent:
         except Exception as e:
             logger.warning(f"Voice setup failed: {e}")
     
-    def listen_to_customer(self) -> str:
-        """Convert speech to text"""
+    def listen_to_customer(self, on_partial: Optional[Callable[[str], None]] = None) -> str:
+        """Convert speech to text; ``on_partial`` sees the local recognizer's running transcript"""
         if not self.speech_recognition_available:
             return "Speech recognition not available. Please type your message."
         
+        if self.listener is not None:
+            return self._listen_locally(on_partial)
+        
         try:
             with self.microphone as source:
-                self.recognizer.adjust_for_ambient_noise(source)
+                if not self._noise_calibrated:
+                    # Once per session; the dynamic energy threshold keeps tracking the room after that
+                    self.recognizer.adjust_for_ambient_noise(source)
+                    self._noise_calibrated = True
                 logger.info("Listening...")
                 audio = self.recognizer.listen(source, timeout=5)
             
@@ -401,27 +498,69 @@ class VoiceAgent:
             logger.error(f"Speech recognition error: {e}")
             return "Error in speech recognition"
     
-    def speak_to_customer(self, text: str):
-        """Convert text to speech"""
+    def _listen_locally(self, on_partial: Optional[Callable[[str], None]]) -> str:
+        try:
+            logger.info("Listening...")
+            text = self.listener.listen(timeout=5, on_partial=on_partial)
+        except Exception as e:
+            logger.error(f"Speech recognition error: {e}")
+            return "Error in speech recognition"
+        if text is None:
+            return "No speech detected"
+        if not text:
+            return "Could not understand audio"
+        logger.info(f"Recognized: {text} (finalized in {self.listener.last_finalize_ms:.0f} ms)")
+        return text
+    
+    def speak_to_customer(self, text: str, wait: bool = False):
+        """Convert text to speech; with the background worker this returns once queued unless ``wait``"""
         if not self.tts_available:
             logger.info(f"TTS not available. Would speak: {text}")
             return
+        
+        if self.tts_worker is not None:
+            handle = self.tts_worker.say(text)
+            logger.info(f"Speaking: {text}")
+            if wait:
+                handle.wait()
+            return
             
         try:
+            self._speaking_blocked = True
             self.tts_engine.say(text)
             self.tts_engine.runAndWait()
             logger.info(f"Spoke: {text}")
         except Exception as e:
             logger.error(f"Text-to-speech error: {e}")
+        finally:
+            self._speaking_blocked = False
+    
+    @property
+    def speaking(self) -> bool:
+        return self._speaking_blocked or (self.tts_worker is not None and self.tts_worker.speaking)
+    
+    def stop_speaking(self) -> bool:
+        """Cut the reply being played short; True if there was one"""
+        return self.tts_worker is not None and self.tts_worker.cancel()
+    
+    def finish_speaking(self):
+        """Wait for queued replies to play out"""
+        if self.tts_worker is not None:
+            self.tts_worker.wait()
 
 class RAGAgent:
     """Handles retrieval of relevant information from knowledge base"""
     
     def __init__(self, rag_system: RAGSystem):
         self.rag_system = rag_system
+        self.flights = SingleFlight()
     
     def get_relevant_context(self, user_query: str) -> str:
-        """Retrieve relevant context for the user query"""
+        """Retrieve relevant context for the user query; identical concurrent queries share one search"""
+        context, _ = self.flights.do(flight_key(user_query), lambda: self._search_context(user_query))
+        return context
+    
+    def _search_context(self, user_query: str) -> str:
         relevant_info = self.rag_system.search_relevant_info(user_query)
         
         if relevant_info:
@@ -439,77 +578,63 @@ class BookingAgent:
     
     def process_booking_request(self, context: ConversationContext, user_input: str) -> Dict:
         """Process booking-related queries and requests"""
-        current_step = context.current_step
-        
-        if current_step == "greeting":
-            if any(word in user_input.lower() for word in ["book", "appointment", "schedule"]):
-                context.current_step = "get_name"
-                return {
-                    "response": "I'd be happy to help you book an appointment! May I have your name please?",
-                    "next_step": "get_name"
-                }
-            else:
-                return {
-                    "response": "How can I assist you today? Would you like to know about our services or book an appointment?",
-                    "next_step": "greeting"
-                }
+        turn = BOOKING_DIALOG.turn(context.current_step, self._filled_slots(context), user_input)
+        default_reprompts.record(turn.previous_step, turn.event in (REPROMPT, CONFIRM_AGAIN))
         
-        elif current_step == "get_name":
-            context.customer_name = user_input
-            context.current_step = "get_phone"
+        if turn.event == GREET:
             return {
-                "response": f"Nice to meet you, {user_input}! Could you please provide your phone number?",
-                "next_step": "get_phone"
+                "response": "How can I assist you today? Would you like to know about our services or book an appointment?",
+                "next_step": "greeting"
             }
         
-        elif current_step == "get_phone":
-            context.phone = user_input
-            context.current_step = "get_service"
-            return {
-                "response": "Thank you! Which service would you like to book? We offer haircuts, styling, coloring, spa treatments, bridal services, and kids services.",
-                "next_step": "get_service"
-            }
-        
-        elif current_step == "get_service":
-            context.booking_data["service"] = user_input
-            context.current_step = "get_date"
-            return {
-                "response": f"Great choice! For {user_input}, what date would you prefer? Please mention the date or day.",
-                "next_step": "get_date"
-            }
+        elif turn.event in (ASK, REPROMPT, CONFIRM):
+            # Take every detail mentioned, then ask for the first one still missing
+            self._apply_slots(context, turn.slots)
+            context.current_step = turn.step
+            if turn.event == CONFIRM:
+                return self._confirm_booking(context)
+            if turn.event == REPROMPT:
+                opener = "Sorry, I didn't catch that."
+            elif turn.previous_step == "greeting":
+                opener = "I'd be happy to help you book an appointment!"
+            else:
+                opener = "Thank you!"
+            return self._ask_next_slot(context, turn.slots, opener)
         
-        elif current_step == "get_date":
-            context.booking_data["date"] = user_input
-            context.current_step = "get_time"
-            return {
-                "response": f"Perfect! For {context.booking_data['date']}, what time would work best for you? Our service hours are 9 AM to 8 PM.",
-                "next_step": "get_time"
-            }
+        elif turn.event == COMPLETE:
+            return self._finalize_booking(context)
         
-        elif current_step == "get_time":
-            context.booking_data["time"] = user_input
-            context.current_step = "get_address"
+        elif turn.event == RESTART:
+            context.current_step = turn.step
             return {
-                "response": f"Excellent! What's your address for our doorstep service?",
-                "next_step": "get_address"
+                "response": "No problem! Let me know if you'd like to make any changes or if I can help with anything else.",
+                "next_step": turn.step
             }
         
-        elif current_step == "get_address":
-            context.booking_data["address"] = user_input
-            context.current_step = "confirm_booking"
-            return self._confirm_booking(context)
-        
-        elif current_step == "confirm_booking":
-            if any(word in user_input.lower() for word in ["yes", "confirm", "book"]):
-                return self._finalize_booking(context)
-            else:
-                context.current_step = "greeting"
-                return {
-                    "response": "No problem! Let me know if you'd like to make any changes or if I can help with anything else.",
-                    "next_step": "greeting"
-                }
-        
-        return {"response": "I'm not sure how to help with that. Could you please rephrase?", "next_step": current_step}
+        return {"response": "I'm not sure how to help with that. Could you please rephrase?", "next_step": context.current_step}
+    
+    def _filled_slots(self, context: ConversationContext) -> Dict[str, str]:
+        """Slots collected so far, keyed like the dialog engine expects"""
+        return dict(context.booking_data.to_dict(), customer_name=context.customer_name, phone=context.phone)
+    
+    def _apply_slots(self, context: ConversationContext, slots: Dict[str, str]):
+        """Store extracted slots on the conversation context"""
+        if "customer_name" in slots:
+            context.customer_name = slots["customer_name"]
+        if "phone" in slots:
+            context.phone = slots["phone"]
+        for slot in ("service", "date", "time", "address"):
+            if slot in slots:
+                setattr(context.booking_data, slot, slots[slot])
+    
+    def _ask_next_slot(self, context: ConversationContext, slots: Dict[str, str], opener: str = "Thank you!") -> Dict:
+        """Ask for the slot the conversation is now on"""
+        if "customer_name" in slots:
+            opener = f"Nice to meet you, {slots['customer_name']}!"
+        return {
+            "response": f"{opener} {BOOKING_QUESTIONS[context.current_step]}",
+            "next_step": context.current_step
+        }
     
     def _confirm_booking(self, context: ConversationContext) -> Dict:
         """Generate booking confirmation message"""
@@ -517,10 +642,10 @@ class BookingAgent:
 Booking Summary:
 - Name: {context.customer_name}
 - Phone: {context.phone}
-- Service: {context.booking_data['service']}
-- Date: {context.booking_data['date']}
-- Time: {context.booking_data['time']}
-- Address: {context.booking_data['address']}
+- Service: {context.booking_data.service}
+- Date: {context.booking_data.date}
+- Time: {context.booking_data.time}
+- Address: {context.booking_data.address}
 
 Does this look correct? Please say 'yes' to confirm or 'no' to make changes.
         """
@@ -537,17 +662,17 @@ Does this look correct? Please say 'yes' to confirm or 'no' to make changes.
             "booking_id": booking_id,
             "customer_name": context.customer_name,
             "phone": context.phone,
-            "service": context.booking_data["service"],
-            "date": context.booking_data["date"],
-            "time": context.booking_data["time"],
-            "address": context.booking_data["address"],
+            "service": context.booking_data.service,
+            "date": context.booking_data.date,
+            "time": context.booking_data.time,
+            "address": context.booking_data.address,
             "status": "confirmed",
             "created_at": datetime.now().isoformat()
         }
         
         # Reset context for new booking
         context.current_step = "greeting"
-        context.booking_data = {}
+        context.booking_data = BookingData()
         
         return {
             "response": f"Perfect! Your booking has been confirmed. Booking ID: {booking_id}. You will receive a confirmation message shortly. Thank you for choosing Goodness Glamour Salon!",
@@ -562,7 +687,6 @@ class TwilioVoiceHandler:
         # Try to import and initialize Twilio directly
         try:
             from twilio.rest import Client
-            from twilio.twiml.voice_response import VoiceResponse
             self.client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
             self.twilio_available = True
             logger.info("Twilio client initialized successfully")
@@ -574,44 +698,62 @@ class TwilioVoiceHandler:
             logger.error(f"Twilio initialization failed: {e}")
             self.twilio_available = False
             self.client = None
+        
+        # Outbound calls are queued and paced to the carrier's limits; the worker starts with the
+        # first call, and without status callbacks the dialer looks call outcomes up itself
+        self.dialer = OutboundDialer(
+            TwilioCarrier(lambda: self.client, TWILIO_PHONE_NUMBER, f"{WEBHOOK_URL}/voice/webhook"),
+            CallQueue(AGENT_OUTBOUND_QUEUE_DB)
+        )
+        
+        # Pre-rendered prompts are played instead of <Say> when every sentence is cached
+        self.audio = AudioPromptCache(base_url=f"{WEBHOOK_URL}{AUDIO_ROUTE}")
+        
+        # Responses are compiled once; each turn only splices in its text
+        self.say_twiml = None
+        if VoiceResponse is not None:
+            self.say_twiml = TwiMLTemplate(lambda response, text: response.say(text, voice='alice', language='en-IN'), "text")
+            # One per booking step: each <Gather> carries that step's hints, language and speech model
+            self.listen_twiml = StepTemplates(self._build_listen)
+            self.continue_twiml = TwiMLTemplate(
+                lambda response, continue_url: response.redirect(continue_url, method='POST'), "continue_url"
+            )
     
-    def make_voice_call(self, customer_phone: str, webhook_url: str) -> bool:
-        """Make a voice call to customer"""
+    def make_voice_call(self, customer_phone: str, webhook_url: str) -> Optional[DialRequest]:
+        """Queue a voice call to customer; the dialer places it as the carrier's rate limit allows"""
         if not self.twilio_available:
             logger.warning("Twilio not available. Cannot make voice call.")
-            return False
+            return None
         
         try:
-            call = self.client.calls.create(
-                to=customer_phone,
-                from_=TWILIO_PHONE_NUMBER,
-                url=webhook_url,
-                method='POST'
-            )
-            logger.info(f"Voice call initiated to {customer_phone}. Call SID: {call.sid}")
-            return True
+            queued = self.dialer.start().submit(customer_phone, "api", url=webhook_url)
+            logger.info(f"Voice call to {customer_phone} queued as {queued.request_id}")
+            return queued
         except Exception as e:
-            logger.error(f"Failed to make voice call: {e}")
-            return False
+            logger.error(f"Failed to queue voice call: {e}")
+            return None
     
-    def generate_twiml_response(self, text: str) -> str:
-        """Generate TwiML response for voice call"""
-        if VoiceResponse is None:
-            return ""
-        
-        response = VoiceResponse()
-        response.say(text, voice='alice', language='en-IN')
+    def _build_listen(self, response, gather: Dict):
         response.pause(length=1)
         response.gather(
             input='speech',
             action=f'{WEBHOOK_URL}/voice/process',
-            speech_timeout='auto',
-            timeout=10
+            **gather
         )
-        response.say("I didn't hear anything. Please try again.")
+        self.audio.speak(response, "I didn't hear anything. Please try again.")
         response.redirect(f'{WEBHOOK_URL}/voice/process')
-        
-        return str(response)
+    
+    def generate_twiml_response(self, text: str, step: Optional[str] = None) -> str:
+        """Generate TwiML response for voice call, listening with the recognition settings of ``step``"""
+        if self.say_twiml is None:
+            return ""
+        return compose(self.audio.spoken(text, self.say_twiml), self.listen_twiml.body(step))
+    
+    def generate_stream_twiml(self, text: str, continue_url: str) -> str:
+        """Speak part of a streamed reply, then come straight back for the rest"""
+        if self.say_twiml is None:
+            return ""
+        return compose(self.audio.spoken(text, self.say_twiml), self.continue_twiml.body(continue_url=continue_url))
     
     def send_sms(self, to_phone: str, message: str) -> bool:
         """Send SMS via Twilio"""
@@ -662,9 +804,13 @@ class DatabaseHandler:
                     address TEXT NOT NULL,
                     status TEXT DEFAULT 'confirmed',
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    notes TEXT
+                    notes TEXT,
+                    appointment_start TEXT,
+                    appointment_end TEXT
                 )
             ''')
+            ensure_schedule_schema(conn, "bookings")
+            backfill_appointment_windows(conn, "bookings")
             
             # Create customers table
             cursor.execute('''
@@ -697,8 +843,9 @@ class DatabaseHandler:
             
             cursor.execute('''
                 INSERT INTO bookings 
-                (booking_id, customer_name, phone, service, date, time, address, status, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                (booking_id, customer_name, phone, service, date, time, address, status, notes,
+                 appointment_start, appointment_end)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 booking_data['booking_id'],
                 booking_data['customer_name'],
@@ -708,7 +855,8 @@ class DatabaseHandler:
                 booking_data['time'],
                 booking_data['address'],
                 booking_data.get('status', 'confirmed'),
-                booking_data.get('notes', '')
+                booking_data.get('notes', ''),
+                *appointment_window(booking_data['date'], booking_data['time'], booking_data['service'])
             ))
             
             # Also save/update customer info
@@ -791,6 +939,20 @@ class DatabaseHandler:
         except Exception as e:
             logger.error(f"Failed to get customer history: {e}")
             return []
+    
+    def get_day_schedule(self, day: date) -> List[Dict]:
+        """Get bookings on one day, ordered by appointment time"""
+        if not self.database_available:
+            return []
+        
+        try:
+            conn = sqlite3.connect(self.db_path)
+            schedule = day_schedule(conn, "bookings", day)
+            conn.close()
+            return schedule
+        except Exception as e:
+            logger.error(f"Failed to get day schedule: {e}")
+            return []
 
 class NotificationAgent:
     """Handles sending notifications via SMS, email, and WhatsApp"""
@@ -850,41 +1012,154 @@ class AgenticSalonAI:
         self.twilio_handler = TwilioVoiceHandler()
         self.database_handler = DatabaseHandler()
         self.conversation_context = ConversationContext(session_id=str(uuid.uuid4()))
+        self.intent_router = load_router()
+        self.speech_streams = SpeechStreamRegistry()
         self.chat = model.start_chat(history=[])
+        self.llm_gateway = LLMGateway([GeminiChatProvider(self.chat)], fallback=lambda messages: self._rule_reply(""))
+        self.async_llm_gateway = AsyncLLMGateway(self._async_llm_providers(), fallback=lambda messages: self._rule_reply(""))
+        self.llm_flights = SingleFlight()
+        # The system message is for OpenAI; the Gemini chat has the instruction built in and is
+        # sent only the caller's turn. Either way the instruction reaches the model, so RAG facts
+        # it already states can be left out of the context
+        self.prompts = PromptBuilder(SALON_CONTEXT)
+        self.async_llm_flights = AsyncSingleFlight()
+        self.telemetry = default_telemetry
+    
+    def _local_response(self, user_input: str) -> Optional[str]:
+        """Reply from the booking FSM or the catalog FAQ, or None when the turn needs the LLM"""
+        # Booking turns go to the FSM, catalog questions to the FAQ answerer, the rest to RAG + Gemini
+        route, confidence = self.intent_router.route(user_input, self.conversation_context.current_step)
+        logger.debug(f"Routed to {route} ({confidence:.2f}) at {self.conversation_context.current_step}")
+        if route == ROUTE_FSM:
+            # Use booking agent
+            booking_response = self.booking_agent.process_booking_request(
+                self.conversation_context, user_input
+            )
+            
+            # If booking is finalized, save to database and send notifications
+            if "booking_data" in booking_response:
+                # Save booking to database
+                self.database_handler.save_booking(booking_response["booking_data"])
+                
+                # Send notifications
+                self.notification_agent.send_booking_confirmation(
+                    booking_response["booking_data"]
+                )
+            
+            return booking_response["response"]
+        
+        faq = answer_faq(user_input) if route == ROUTE_FAQ else None
+        if faq:
+            # Answered straight from the catalog; steer back to the booking if one is under way
+            response = faq.text
+            if self.conversation_context.current_step in BOOKING_QUESTIONS:
+                response = f"{response} {BOOKING_QUESTIONS[self.conversation_context.current_step]}"
+            return response
+        return None
+    
+    def _build_prompt(self, user_input: str, rag_context: Optional[str] = None) -> BuiltPrompt:
+        """Caller question prefixed with the salon knowledge not already in the system instruction"""
+        if rag_context is None:
+            rag_context = self.rag_agent.get_relevant_context(user_input)
+        return self.prompts.build(user_input, context=rag_context, history=self._chat_history())
+    
+    def _chat_history(self) -> List[Dict[str, str]]:
+        """Gemini chat history, trimmed to the last MAX_CHAT_HISTORY turns, as chat messages"""
+        history = getattr(self.chat, "history", None)
+        if not history:
+            return []
+        if len(history) > MAX_CHAT_HISTORY:
+            self.chat.history = history = history[-MAX_CHAT_HISTORY:]
+        return [
+            {
+                "role": "assistant" if content.role == "model" else "user",
+                "content": "".join(getattr(part, "text", "") for part in content.parts)
+            }
+            for content in history
+        ]
+    
+    def _llm_reply(self, user_input: str) -> str:
+        """Gemini reply with RAG context; identical concurrent questions share one request"""
+        rag_context = self.rag_agent.get_relevant_context(user_input)
+        step = self.conversation_context.current_step
+        
+        def complete():
+            built = self._build_prompt(user_input, rag_context)
+            result = self.llm_gateway.complete(built.messages, fallback=lambda _: self._rule_reply(user_input))
+            self.prompts.log_call(built, result.latency, result.provider)
+            return result, built
+        
+        (result, built), shared = self.llm_flights.do(flight_key(user_input, rag_context), complete)
+        self.telemetry.record_result(result, built.total_tokens, cache_hit=shared, step=step)
+        return result.text
+    
+    async def _llm_reply_async(self, user_input: str) -> str:
+        """_llm_reply on the async gateway"""
+        rag_context = await asyncio.to_thread(self.rag_agent.get_relevant_context, user_input)
+        step = self.conversation_context.current_step
+        
+        async def complete():
+            built = self._build_prompt(user_input, rag_context)
+            result = await self.async_llm_gateway.complete(
+                built.messages, fallback=lambda _: self._rule_reply(user_input)
+            )
+            self.prompts.log_call(built, result.latency, result.provider)
+            return result, built
+        
+        (result, built), shared = await self.async_llm_flights.do(flight_key(user_input, rag_context), complete)
+        self.telemetry.record_result(result, built.total_tokens, cache_hit=shared, step=step)
+        return result.text
+    
+    def _async_llm_providers(self) -> List:
+        """Async providers for the API server: the Gemini chat, then OpenAI when a key is set"""
+        providers = [AsyncGeminiChatProvider(self.chat)]
+        openai_api_key = os.getenv('OPENAI_API_KEY')
+        if openai_api_key and OPENAI_AVAILABLE:
+            providers.append(AsyncOpenAIProvider(openai_api_key, max_tokens=150))
+        return providers
+    
+    def _rule_reply(self, user_input: str) -> str:
+        """Catalog answer or the current booking question, used when Gemini is unhealthy"""
+        faq = answer_faq(user_input)
+        if faq:
+            return faq.text
+        return BOOKING_QUESTIONS.get(
+            self.conversation_context.current_step,
+            "I can help you book an appointment or answer questions about our services. What would you like to do?"
+        )
+    
+    def _stream_llm(self, built: BuiltPrompt, call_sid: Optional[str] = None,
+                    step: Optional[str] = None) -> Iterator[str]:
+        """Gemini reply as text chunks, as they are generated"""
+        started = time.monotonic()
+        reply: List[str] = []
+        usage = None
+        ok = False
+        try:
+            for chunk in self.chat.send_message(built.prompt, stream=True):
+                # Each chunk carries the usage so far; the last one has the totals
+                usage = gemini_usage(chunk) or usage
+                text = getattr(chunk, "text", "")
+                if text:
+                    reply.append(text)
+                    yield text
+            ok = True
+        finally:
+            self.telemetry.record(
+                "gemini", gemini_model_name(getattr(self.chat, "model", None)),
+                usage.prompt_tokens if usage else built.total_tokens,
+                usage.completion_tokens if usage else count_tokens("".join(reply)),
+                time.monotonic() - started, cached_tokens=usage.cached_tokens if usage else 0,
+                ok=ok, call_sid=call_sid, step=step, estimated=usage is None
+            )
     
     def process_user_input(self, user_input: str, use_voice: bool = False) -> str:
         """Process user input through the agentic AI system"""
         try:
-            # Check if this is a booking-related query
-            if any(word in user_input.lower() for word in ["book", "appointment", "schedule", "name", "phone", "service", "date", "time", "address"]):
-                # Use booking agent
-                booking_response = self.booking_agent.process_booking_request(
-                    self.conversation_context, user_input
-                )
-                
-                # If booking is finalized, save to database and send notifications
-                if "booking_data" in booking_response:
-                    # Save booking to database
-                    self.database_handler.save_booking(booking_response["booking_data"])
-                    
-                    # Send notifications
-                    self.notification_agent.send_booking_confirmation(
-                        booking_response["booking_data"]
-                    )
-                
-                response = booking_response["response"]
-            else:
-                # Use RAG system to get relevant context
-                rag_context = self.rag_agent.get_relevant_context(user_input)
-                
-                # Prepare enhanced prompt with RAG context
-                enhanced_prompt = user_input
-                if rag_context:
-                    enhanced_prompt = f"{rag_context}\n\nCustomer Question: {user_input}"
-                
-                # Get response from Gemini
-                gemini_response = self.chat.send_message(enhanced_prompt)
-                response = gemini_response.text
+            response = self._local_response(user_input)
+            if response is None:
+                # Get response from Gemini with RAG context, or the rule engine if it is unhealthy
+                response = self._llm_reply(user_input)
             
             # Speak response if voice mode is enabled
             if use_voice:
@@ -901,6 +1176,17 @@ class AgenticSalonAI:
             
             return error_msg
     
+    async def process_user_input_async(self, user_input: str) -> str:
+        """process_user_input for async servers: blocking work runs off the event loop"""
+        try:
+            response = await asyncio.to_thread(self._local_response, user_input)
+            if response is None:
+                response = await self._llm_reply_async(user_input)
+            return response
+        except Exception as e:
+            logger.error(f"Error in process_user_input_async: {e}")
+            return "I apologize, but I'm having trouble processing your request right now. Please try again."
+    
     def start_voice_conversation(self):
         """Start a voice-based conversation"""
         if not self.voice_agent.speech_recognition_available:
@@ -928,13 +1214,24 @@ class AgenticSalonAI:
         print("VOICE CONVERSATION started! Say 'exit' to end.")
         self.voice_agent.speak_to_customer("Hello! Welcome to Goodness Glamour Salon. How can I help you today?")
         
+        def heard(partial: str):
+            # Showing what the local recognizer hears so far; speaking over the reply stops it
+            if LOCAL_BARGE_IN and self.voice_agent.stop_speaking():
+                logger.info("Customer barged in; reply cut short")
+            print(f"\r... {partial}", end="", flush=True)
+        
         while True:
             try:
-                # Listen to customer
-                user_input = self.voice_agent.listen_to_customer()
+                if not LOCAL_BARGE_IN and self.voice_agent.listener is None:
+                    # Without barge-in the microphone would pick up the reply itself; the
+                    # background listener mutes itself instead and holds its timeout until
+                    # the reply has played out
+                    self.voice_agent.finish_speaking()
+                user_input = self.voice_agent.listen_to_customer(on_partial=heard)
                 
                 if user_input.lower() in ["exit", "quit", "stop", "goodbye"]:
-                    self.voice_agent.speak_to_customer("Thank you for calling Goodness Glamour Salon. Have a great day!")
+                    self.voice_agent.speak_to_customer("Thank you for calling Goodness Glamour Salon. Have a great day!",
+                                                       wait=True)
                     break
                 
                 if user_input in ["No speech detected", "Could not understand audio", "Error in speech recognition"]:
@@ -953,17 +1250,21 @@ class AgenticSalonAI:
                 logger.error(f"Error in voice conversation: {e}")
                 self.voice_agent.speak_to_customer("I'm sorry, I encountered an error. Please try again.")
     
-    def trigger_voice_call(self, customer_phone: str, webhook_url: str) -> bool:
-        """Trigger a voice call to customer when QR code is scanned"""
+    def trigger_voice_call(self, customer_phone: str, webhook_url: str) -> Optional[DialRequest]:
+        """Queue a voice call to customer when QR code is scanned; None if it could not be queued"""
         try:
             if self.twilio_handler.twilio_available:
                 return self.twilio_handler.make_voice_call(customer_phone, webhook_url)
             else:
                 logger.warning("Twilio not available. Cannot make voice call.")
-                return False
+                return None
         except Exception as e:
             logger.error(f"Error triggering voice call: {e}")
-            return False
+            return None
+    
+    def _voice_twiml(self, text: str) -> str:
+        """Say ``text`` and listen with the recognition settings of the booking step now asked"""
+        return self.twilio_handler.generate_twiml_response(text, self.conversation_context.current_step)
     
     def process_voice_call(self, speech_input: str) -> str:
         """Process voice call input and return TwiML response"""
@@ -972,12 +1273,57 @@ class AgenticSalonAI:
             response = self.process_user_input(speech_input, use_voice=False)
             
             # Generate TwiML response
-            twiml_response = self.twilio_handler.generate_twiml_response(response)
+            twiml_response = self._voice_twiml(response)
             return twiml_response
         except Exception as e:
             logger.error(f"Error processing voice call: {e}")
             error_response = "I'm sorry, I'm having trouble understanding. Please try again."
-            return self.twilio_handler.generate_twiml_response(error_response)
+            return self._voice_twiml(error_response)
+
+    async def process_voice_call_async(self, speech_input: str, call_sid: Optional[str] = None) -> str:
+        """Async process_voice_call: TwiML for a speech turn without blocking the event loop"""
+        with tag_call(call_sid):
+            response = await self.process_user_input_async(speech_input)
+        return self._voice_twiml(response)
+    
+    def process_voice_call_streaming(self, speech_input: str, call_key: str, continue_url: str) -> str:
+        """
+        Like process_voice_call, but an LLM reply is spoken from its first
+        sentence on while Gemini is still generating; the rest is fetched
+        through continue_voice_stream when Twilio follows the redirect.
+        """
+        try:
+            with tag_call(call_key):
+                if not self.llm_gateway.is_healthy("gemini"):
+                    return self.process_voice_call(speech_input)
+                
+                response = self._local_response(speech_input)
+                if response is not None:
+                    return self._voice_twiml(response)
+                
+                chunks = self._stream_llm(self._build_prompt(speech_input), call_sid=call_key,
+                                          step=self.conversation_context.current_step)
+            self.speech_streams.start(call_key, chunks)
+            return self.continue_voice_stream(call_key, continue_url, FIRST_SENTENCE_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error processing streamed voice call: {e}")
+            error_response = "I'm sorry, I'm having trouble understanding. Please try again."
+            return self._voice_twiml(error_response)
+    
+    def continue_voice_stream(self, call_key: str, continue_url: str,
+                              timeout: float = NEXT_SENTENCE_TIMEOUT) -> str:
+        """TwiML for the next sentences of a streamed reply"""
+        batch = self.speech_streams.next_batch(call_key, timeout)
+        if not batch:
+            # Unknown, expired or stalled stream: hand the turn back to the caller
+            self.speech_streams.discard(call_key)
+            text = "Sorry, could you say that again?" if batch is not None else "How else can I help you?"
+            return self._voice_twiml(text)
+        
+        text = " ".join(batch)
+        if self.speech_streams.has_pending(call_key):
+            return self.twilio_handler.generate_stream_twiml(text, continue_url)
+        return self._voice_twiml(text)
 
 # Test the chatbot
 def send_message(user_message):
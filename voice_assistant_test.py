@@ -5,6 +5,8 @@ Comprehensive testing for all voice booking components
 
 import os
 import json
+import shutil
+import tempfile
 import time
 import unittest
 from unittest.mock import Mock, patch, MagicMock
@@ -18,6 +20,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from ai_voice_booking_assistant import AIVoiceBookingAssistant, VoiceResponse
 from enhanced_voice_assistant import EnhancedVoiceAssistant
 from qr_voice_trigger_system import QRVoiceTriggerSystem
+from outbound_dialer import CallQueue
 from voice_booking_integration import VoiceBookingIntegration
 
 class TestAIVoiceBookingAssistant(unittest.TestCase):
@@ -183,17 +186,23 @@ class TestQRVoiceTriggerSystem(unittest.TestCase):
     
     @patch('qr_voice_trigger_system.client')
     def test_trigger_voice_call(self, mock_client):
-        """Test voice call triggering"""
+        """Test voice call triggering: queued at once, then placed by the dialer"""
         # Mock Twilio client response
         mock_call = Mock()
         mock_call.sid = "test_call_sid"
         mock_client.calls.create.return_value = mock_call
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.qr_system.dialer.queue = CallQueue(os.path.join(directory, "calls.db"))
+        self.addCleanup(self.qr_system.dialer.stop)
         
         # Test voice call trigger
         result = self.qr_system.trigger_voice_call("+919876543210", "test")
         
         self.assertTrue(result["success"])
-        self.assertEqual(result["call_sid"], "test_call_sid")
+        self.assertEqual(result["status"], "queued")
+        self.qr_system.dialer.pump()
+        self.assertEqual(self.qr_system.dialer.status(result["request_id"])["call_sid"], "test_call_sid")
         mock_client.calls.create.assert_called_once()
 
 class TestVoiceBookingIntegration(unittest.TestCase):
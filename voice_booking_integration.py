@@ -8,11 +8,13 @@ import json
 import logging
 import requests
 import pandas as pd
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass, asdict
 import sqlite3
 from flask import Flask, request, Response, jsonify
+from booking_datetime import resolve_appointment
+from booking_schedule import appointment_window, day_schedule, ensure_schedule_schema, migrate_schedule
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -49,6 +51,8 @@ class VoiceBookingIntegration:
     def __init__(self):
         self.voice_bookings = []
         self._ensure_data_directories()
+        if os.path.exists(DATABASE_PATH):
+            migrate_schedule(DATABASE_PATH, "voice_bookings")
     
     def _ensure_data_directories(self):
         """Ensure data directories exist"""
@@ -149,15 +153,19 @@ class VoiceBookingIntegration:
                     status TEXT DEFAULT 'confirmed',
                     source TEXT DEFAULT 'voice_call',
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    notes TEXT
+                    notes TEXT,
+                    appointment_start TEXT,
+                    appointment_end TEXT
                 )
             ''')
+            ensure_schedule_schema(conn, "voice_bookings")
             
             # Insert booking
             cursor.execute('''
                 INSERT OR REPLACE INTO voice_bookings 
-                (booking_id, customer_name, phone, service, date, time, address, status, source, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                (booking_id, customer_name, phone, service, date, time, address, status, source, notes,
+                 appointment_start, appointment_end)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 booking.booking_id,
                 booking.customer_name,
@@ -168,7 +176,8 @@ class VoiceBookingIntegration:
                 booking.address,
                 booking.status,
                 booking.source,
-                booking.notes
+                booking.notes,
+                *appointment_window(booking.date, booking.time, booking.service)
             ))
             
             conn.commit()
@@ -251,39 +260,14 @@ class VoiceBookingIntegration:
     
     def _parse_appointment_datetime(self, date_str: str, time_str: str) -> str:
         """Parse date and time into ISO format"""
-        try:
-            # Simple parsing - can be enhanced
-            if "tomorrow" in date_str.lower():
-                appointment_date = datetime.now() + pd.Timedelta(days=1)
-            elif "today" in date_str.lower():
-                appointment_date = datetime.now()
-            else:
-                # Try to parse specific date
-                appointment_date = datetime.now() + pd.Timedelta(days=1)  # Default to tomorrow
-            
-            # Parse time
-            if "am" in time_str.lower():
-                if "10" in time_str:
-                    appointment_time = appointment_date.replace(hour=10, minute=0, second=0, microsecond=0)
-                else:
-                    appointment_time = appointment_date.replace(hour=9, minute=0, second=0, microsecond=0)
-            elif "pm" in time_str.lower():
-                if "2" in time_str or "14" in time_str:
-                    appointment_time = appointment_date.replace(hour=14, minute=0, second=0, microsecond=0)
-                elif "6" in time_str or "18" in time_str:
-                    appointment_time = appointment_date.replace(hour=18, minute=0, second=0, microsecond=0)
-                else:
-                    appointment_time = appointment_date.replace(hour=14, minute=0, second=0, microsecond=0)
-            else:
-                appointment_time = appointment_date.replace(hour=10, minute=0, second=0, microsecond=0)
-            
-            return appointment_time.isoformat()
-            
-        except Exception as e:
-            logger.error(f"Error parsing datetime: {e}")
-            # Default to tomorrow at 10 AM
-            tomorrow = datetime.now() + pd.Timedelta(days=1)
-            return tomorrow.replace(hour=10, minute=0, second=0, microsecond=0).isoformat()
+        appointment = resolve_appointment(date_str, time_str)
+        if appointment is not None:
+            return appointment.isoformat()
+
+        logger.warning(f"Could not resolve appointment '{date_str} {time_str}', defaulting to tomorrow 10 AM")
+        # Default to tomorrow at 10 AM
+        tomorrow = datetime.now() + timedelta(days=1)
+        return tomorrow.replace(hour=10, minute=0, second=0, microsecond=0).isoformat()
     
     def get_voice_bookings(self, limit: int = 50) -> List[Dict]:
         """Get recent voice bookings"""
@@ -325,6 +309,20 @@ class VoiceBookingIntegration:
             logger.error(f"Error getting voice bookings: {e}")
             return []
     
+    def get_day_schedule(self, day: date, status: Optional[str] = None) -> List[Dict]:
+        """Get voice bookings on one day, ordered by appointment time"""
+        try:
+            if not os.path.exists(DATABASE_PATH):
+                return []
+            conn = sqlite3.connect(DATABASE_PATH)
+            try:
+                return day_schedule(conn, "voice_bookings", day, status)
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.error(f"Error getting schedule: {e}")
+            return []
+    
     def update_booking_status(self, booking_id: str, status: str) -> bool:
         """Update booking status"""
         try:
@@ -415,6 +413,26 @@ def get_voice_bookings():
             "message": "Internal server error"
         }), 500
 
+@app.route('/api/voice-bookings/schedule', methods=['GET'])
+def get_voice_booking_schedule():
+    """Get voice bookings for one day (?date=YYYY-MM-DD, default today)"""
+    try:
+        day_param = request.args.get('date')
+        day = date.fromisoformat(day_param) if day_param else date.today()
+    except ValueError:
+        return jsonify({
+            "success": False,
+            "message": "date must be YYYY-MM-DD"
+        }), 400
+    
+    bookings = booking_integration.get_day_schedule(day, request.args.get('status'))
+    return jsonify({
+        "success": True,
+        "date": day.isoformat(),
+        "bookings": bookings,
+        "count": len(bookings)
+    }), 200
+
 @app.route('/api/voice-bookings/<booking_id>/status', methods=['PUT'])
 def update_voice_booking_status(booking_id):
     """Update voice booking status"""
@@ -7,11 +7,11 @@ import os
 import json
 import uuid
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
+from functools import partial
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
-from flask import Flask, request, Response, jsonify, render_template_string
-from twilio.twiml.voice_response import VoiceResponse
+from flask import Flask, abort, request, Response, jsonify, render_template_string, send_from_directory
+from twilio.twiml.voice_response import Connect, VoiceResponse
 from twilio.rest import Client
 import qrcode
 import base64
@@ -19,6 +19,23 @@ from io import BytesIO
 import openpyxl
 import sqlite3
 from dotenv import load_dotenv
+from salon_catalog import get_service_info
+from booking_dialog import (
+    ASK, CLOSED, COMPLETE, CONFIRM, CONFIRM_AGAIN, GREET, REPROMPT, RESTART, DialogTurn, default_engine
+)
+from booking_schedule import appointment_window, ensure_schedule_schema, migrate_schedule
+from slot_extractor import extract_date, extract_slots, extract_time, identify_service
+from session_records import BookingData, ConversationState, sizeof_report
+from twiml_cache import TwiMLTemplate, compose
+from media_stream import MEDIA_STREAM_PATH, MediaStreamServer, Pyttsx3Synthesizer
+from local_asr import create_recognizer
+from voice_activity import SAMPLE_RATE, Utterance
+from endpointing import AnswerTimer, default_utterance_log
+from speech_hints import StepTemplates, default_reprompts, gather_profile, parse_confidence
+from webhook_idempotency import SPEECH_FIELDS, default_idempotency, idempotent_webhook
+from outbound_dialer import FAILED, OutboundDialer, TwilioCarrier
+from call_admission import DUPLICATE, LIMITED, client_ip, default_admission, normalize_phone
+from audio_prompts import AUDIO_CACHE_CONTROL, AUDIO_ROUTE, AudioPromptCache, audio_mimetype, register_prompts
 
 # Load environment variables from .env file
 load_dotenv()
@@ -38,6 +55,13 @@ WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL', 'https://your-domain.com')
 # Simulation Mode (for testing without actual phone calls)
 SIMULATION_MODE = os.getenv('SIMULATION_MODE', 'true').lower() == 'true'
 
+# 'gather' answers each turn through <Gather> webhooks; 'stream' holds a
+# bidirectional media stream open for the whole call (see media_stream.py)
+VOICE_MODE = os.getenv('VOICE_MODE', 'gather').lower()
+MEDIA_STREAM_URL = os.getenv(
+    'MEDIA_STREAM_URL', WEBHOOK_BASE_URL.replace('https://', 'wss://', 1).replace('http://', 'ws://', 1) + MEDIA_STREAM_PATH
+)
+
 # Initialize Twilio client with enhanced error handling
 try:
     client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
@@ -46,6 +70,12 @@ except Exception as e:
     logger.error(f"❌ Failed to initialize Twilio client: {e}")
     client = None
 
+# Outbound calls are queued and paced to the carrier's limits; the worker starts with the first request
+dialer = OutboundDialer(TwilioCarrier(
+    lambda: client, TWILIO_PHONE_NUMBER, f'{WEBHOOK_BASE_URL}/voice/incoming',
+    status_callback=f'{WEBHOOK_BASE_URL}/voice/status'
+))
+
 def verify_twilio_account():
     """Verify Twilio account credentials and get account info"""
     if not client:
@@ -69,58 +99,26 @@ def verify_twilio_account():
         logger.error(f"❌ Twilio account verification failed: {e}")
         return False
 
-# Salon Information
-SALON_INFO = {
-    "name": "Goodness Glamour Salon",
-    "phone": "9036626642",
-    "email": "2akonsultant@gmail.com",
-    "hours": "Monday - Sunday, 9:00 AM - 8:00 PM",
-    "service_type": "Doorstep beauty services"
+# Questions asked when moving on to a step
+STEP_QUESTIONS = {
+    "get_name": "What's your name?",
+    "get_service": "Which service would you like? We do haircuts, coloring, treatments, and bridal styling.",
+    "get_date": "What date works for you?",
+    "get_time": "What time would work? We're available 9 AM to 8 PM.",
+    "get_address": "What's your address for our doorstep service?"
 }
 
-# Services and Pricing
-SERVICES = {
-    "women": {
-        "haircut": {"name": "Women's Haircut & Styling", "price": "₹400-1,200", "duration": "60 minutes"},
-        "coloring": {"name": "Hair Coloring & Highlights", "price": "₹1,200-3,500", "duration": "120 minutes"},
-        "treatment": {"name": "Hair Treatment & Spa", "price": "₹600-2,000", "duration": "90 minutes"},
-        "bridal": {"name": "Bridal & Party Styling", "price": "₹800-2,500", "duration": "90 minutes"},
-        "blowdry": {"name": "Professional Blowdry", "price": "₹250-600", "duration": "45 minutes"},
-        "hairwash": {"name": "Hair Wash & Styling", "price": "₹200-450", "duration": "30 minutes"},
-        "consultation": {"name": "Hair Consultation", "price": "₹150-300", "duration": "30 minutes"}
-    },
-    "kids": {
-        "haircut": {"name": "Kids Haircuts", "price": "₹150-500", "duration": "30 minutes"},
-        "party": {"name": "Party Styling", "price": "₹200-600", "duration": "45 minutes"},
-        "hairwash": {"name": "Kids Hair Wash", "price": "₹100-300", "duration": "20 minutes"},
-        "braiding": {"name": "Creative Braiding", "price": "₹150-400", "duration": "30 minutes"}
-    }
+# Re-prompts when the caller's answer didn't contain the slot we asked for
+STEP_REPROMPTS = {
+    "get_name": "I didn't catch your name. Could you please tell me your name?",
+    "get_service": "Which service interests you? We do haircuts, coloring, treatments, and bridal styling.",
+    "get_date": "What date would you like? You can say tomorrow, or a specific date.",
+    "get_time": "What time works for you? We're available 9 AM to 8 PM.",
+    "get_address": "Could you please provide your complete address for our doorstep service?"
 }
 
-@dataclass
-class BookingData:
-    customer_name: str = ""
-    phone: str = ""
-    service: str = ""
-    date: str = ""
-    time: str = ""
-    address: str = ""
-    notes: str = ""
-
-@dataclass
-class ConversationState:
-    session_id: str
-    customer_name: Optional[str] = None
-    phone: Optional[str] = None
-    current_step: str = "greeting"
-    booking_data: BookingData = None
-    conversation_history: List[Dict] = None
-    
-    def __post_init__(self):
-        if self.booking_data is None:
-            self.booking_data = BookingData()
-        if self.conversation_history is None:
-            self.conversation_history = []
+register_prompts(*STEP_QUESTIONS.values(), *STEP_REPROMPTS.values())
+
 
 class SimpleVoiceAssistant:
     """
@@ -130,169 +128,114 @@ class SimpleVoiceAssistant:
     def __init__(self):
         self.active_sessions: Dict[str, ConversationState] = {}
         self._ensure_directories()
+        if os.path.exists("data/salon_bookings.db"):
+            migrate_schedule("data/salon_bookings.db", "voice_bookings")
     
     def _ensure_directories(self):
         """Ensure data directories exist"""
         os.makedirs("data", exist_ok=True)
         os.makedirs("logs", exist_ok=True)
     
-    def get_conversation_response(self, user_input: str, session_id: str) -> str:
+    def get_conversation_response(self, user_input: str, session_id: str, confidence: Optional[float] = None) -> str:
         """Generate AI response based on conversation state and user input"""
         session = self.active_sessions.get(session_id)
         if not session:
             return "I'm sorry, I'm having trouble with this call. Please try calling again."
         
-        # Simple rule-based responses for voice calls
-        current_step = session.current_step
-        user_input_lower = user_input.lower().strip()
+        turn = default_engine.turn(session.current_step, self._filled_slots(session), user_input)
+        default_reprompts.record(turn.previous_step, turn.event in (REPROMPT, CONFIRM_AGAIN), confidence)
         
-        if current_step == "greeting":
-            if any(word in user_input_lower for word in ["book", "appointment", "schedule", "service"]):
-                session.current_step = "get_name"
-                return "Great! I'd love to help you book an appointment. What's your name?"
-            else:
-                return "Hello! Welcome to Goodness Glamour Salon. I'm your AI assistant. How can I help you today?"
+        if turn.event == GREET:
+            return "Hello! Welcome to Goodness Glamour Salon. I'm your AI assistant. How can I help you today?"
         
-        elif current_step == "get_name":
-            # Extract name from input
-            name = self._extract_name(user_input)
-            if name:
-                session.customer_name = name
-                session.current_step = "get_service"
-                return f"Nice to meet you, {name}! Which service would you like? We do haircuts, coloring, treatments, and bridal styling."
-            else:
-                return "I didn't catch your name. Could you please tell me your name?"
-        
-        elif current_step == "get_service":
-            service = self._identify_service(user_input)
-            if service:
-                session.booking_data.service = service
-                session.current_step = "get_date"
-                service_info = self._get_service_info(service)
-                return f"Perfect! {service_info['name']} is {service_info['price']}. What date works for you?"
-            else:
-                return "Which service interests you? We do haircuts, coloring, treatments, and bridal styling."
-        
-        elif current_step == "get_date":
-            date = self._parse_date(user_input)
-            if date:
-                session.booking_data.date = date
-                session.current_step = "get_time"
-                return f"Great! For {date}, what time would work? We're available 9 AM to 8 PM."
-            else:
-                return "What date would you like? You can say tomorrow, or a specific date."
+        elif turn.event in (ASK, REPROMPT, CONFIRM):
+            # Fill every slot mentioned, then jump to the first one still missing
+            opener = "Great! I'd love to help you book an appointment." if turn.previous_step == "greeting" else "Perfect!"
+            return self._fill_slots(session, turn, opener)
         
-        elif current_step == "get_time":
-            time = self._parse_time(user_input)
-            if time:
-                session.booking_data.time = time
-                session.current_step = "get_address"
-                return "Perfect! What's your address for our doorstep service?"
-            else:
-                return "What time works for you? We're available 9 AM to 8 PM."
+        elif turn.event == COMPLETE:
+            session.current_step = turn.step
+            return self._complete_booking(session)
         
-        elif current_step == "get_address":
-            address = user_input.strip()
-            if len(address) > 10:  # Basic validation
-                session.booking_data.address = address
-                session.current_step = "confirm_booking"
-                return self._generate_confirmation_message(session)
-            else:
-                return "Could you please provide your complete address for our doorstep service?"
+        elif turn.event == RESTART:
+            session.customer_name = None
+            session.booking_data = BookingData()
+            session.current_step = turn.step  # Restart
+            return "No problem! Let's start over. What's your name?"
         
-        elif current_step == "confirm_booking":
-            if any(word in user_input_lower for word in ["yes", "confirm", "correct", "book"]):
-                session.current_step = "booking_complete"
-                return self._complete_booking(session)
-            elif any(word in user_input_lower for word in ["no", "change", "wrong"]):
-                session.current_step = "get_name"  # Restart
-                return "No problem! Let's start over. What's your name?"
-            else:
-                return "Please say 'yes' to confirm or 'no' to make changes."
+        elif turn.event == CONFIRM_AGAIN:
+            return "Please say 'yes' to confirm or 'no' to make changes."
         
-        elif current_step == "booking_complete":
+        elif turn.event == CLOSED:
             return "Thank you for choosing Goodness Glamour! Have a wonderful day!"
         
         return "I'm not sure how to help with that. Could you please repeat?"
 
-    def _extract_name(self, text: str) -> Optional[str]:
-        """Extract name from user input"""
-        text_lower = text.lower()
+    def _filled_slots(self, session: ConversationState) -> Dict[str, str]:
+        """Slots collected so far, keyed like the dialog engine expects"""
+        booking = session.booking_data
+        return {
+            "customer_name": session.customer_name,
+            "service": booking.service,
+            "date": booking.date,
+            "time": booking.time,
+            "address": booking.address
+        }
+
+    def _fill_slots(self, session: ConversationState, turn: DialogTurn, opener: str = "Perfect!") -> str:
+        """Store the slots from a turn and ask for the first missing one"""
+        slots = turn.slots
+        if "customer_name" in slots:
+            session.customer_name = slots["customer_name"]
+        for slot in ("service", "date", "time", "address"):
+            if slot in slots:
+                setattr(session.booking_data, slot, slots[slot])
         
-        # Common patterns for name extraction
-        if "my name is" in text_lower:
-            # Extract name after "my name is"
-            parts = text.split("my name is", 1)
-            if len(parts) > 1:
-                name = parts[1].strip().split()[0]
-                return name.capitalize()
-        elif "i'm" in text_lower or "i am" in text_lower:
-            # Extract name after "i'm" or "i am"
-            parts = text.split()
-            for i, word in enumerate(parts):
-                if word.lower() in ["i'm", "i"] and i + 1 < len(parts) and parts[i + 1].lower() == "am":
-                    if i + 2 < len(parts):
-                        return parts[i + 2].capitalize()
-                elif word.lower() == "i'm" and i + 1 < len(parts):
-                    return parts[i + 1].capitalize()
+        session.current_step = turn.step
+        if turn.event == CONFIRM:
+            return self._generate_confirmation_message(session)
         
-        # Fallback: take first word
-        words = text.split()
-        if len(words) >= 1:
-            return words[0].capitalize()
-        return None
+        parts = self._acknowledge_slots(slots)
+        if turn.event == REPROMPT:
+            parts.append(STEP_REPROMPTS[turn.step])
+        else:
+            if not parts or "customer_name" not in slots:
+                parts.insert(0, opener)
+            parts.append(STEP_QUESTIONS[turn.step])
+        return " ".join(parts)
+
+    def _acknowledge_slots(self, slots: Dict[str, str]) -> List[str]:
+        """Short acknowledgement of the slots just filled"""
+        parts = []
+        if "customer_name" in slots:
+            parts.append(f"Nice to meet you, {slots['customer_name']}!")
+        if "service" in slots:
+            service_info = self._get_service_info(slots["service"])
+            parts.append(f"{service_info['name']} is {service_info['price']}.")
+        when = " at ".join(slots[slot] for slot in ("date", "time") if slot in slots)
+        if when:
+            parts.append(f"Noted, {when}.")
+        return parts
+
+    def _extract_name(self, text: str) -> Optional[str]:
+        """Extract name from user input"""
+        return extract_slots(text, "get_name").get("customer_name")
 
     def _identify_service(self, text: str) -> Optional[str]:
         """Identify service from user input"""
-        text_lower = text.lower()
-        
-        service_mapping = {
-            "haircut": ["haircut", "cut", "trim"],
-            "coloring": ["color", "coloring", "highlight", "dye"],
-            "treatment": ["treatment", "spa", "keratin", "therapy"],
-            "bridal": ["bridal", "wedding", "party", "styling"],
-            "blowdry": ["blowdry", "blow dry", "style"],
-            "hairwash": ["wash", "shampoo", "clean"],
-            "consultation": ["consultation", "advice", "consult"]
-        }
-        
-        for service, keywords in service_mapping.items():
-            if any(keyword in text_lower for keyword in keywords):
-                return service
-        
-        return None
+        return identify_service(text)
 
     def _get_service_info(self, service: str) -> Dict:
         """Get service information"""
-        for category in SERVICES.values():
-            if service in category:
-                return category[service]
-        return {"name": "Service", "price": "Contact us", "duration": "Varies"}
+        return get_service_info(service)
 
     def _parse_date(self, text: str) -> Optional[str]:
-        """Parse date from user input"""
-        text_lower = text.lower()
-        
-        if "tomorrow" in text_lower:
-            tomorrow = datetime.now() + timedelta(days=1)
-            return tomorrow.strftime("%A, %B %d")
-        elif "today" in text_lower:
-            return datetime.now().strftime("%A, %B %d")
-        else:
-            return text.strip()
+        """Parse date from user input, None if unclear or already past"""
+        return extract_date(text)
 
     def _parse_time(self, text: str) -> Optional[str]:
-        """Parse time from user input"""
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in ["morning", "am"]):
-            return "10 AM"
-        elif any(word in text_lower for word in ["afternoon", "pm"]):
-            return "2 PM"
-        elif any(word in text_lower for word in ["evening"]):
-            return "6 PM"
-        else:
-            return text.strip()
+        """Parse time from user input, None if unclear or outside salon hours"""
+        return extract_time(text, bare_hour=True)
 
     def _generate_confirmation_message(self, session: ConversationState) -> str:
         """Generate booking confirmation message"""
@@ -401,15 +344,19 @@ Thank you for choosing Goodness Glamour Salon!"""
                     status TEXT DEFAULT 'confirmed',
                     source TEXT DEFAULT 'voice_call',
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    notes TEXT
+                    notes TEXT,
+                    appointment_start TEXT,
+                    appointment_end TEXT
                 )
             ''')
+            ensure_schedule_schema(conn, "voice_bookings")
             
             # Insert booking
             cursor.execute('''
                 INSERT OR REPLACE INTO voice_bookings 
-                (booking_id, customer_name, phone, service, date, time, address, status, source, notes)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                (booking_id, customer_name, phone, service, date, time, address, status, source, notes,
+                 appointment_start, appointment_end)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 booking_data['booking_id'],
                 booking_data['customer_name'],
@@ -420,7 +367,8 @@ Thank you for choosing Goodness Glamour Salon!"""
                 booking_data['address'],
                 booking_data['status'],
                 booking_data['source'],
-                booking_data.get('notes', '')
+                booking_data.get('notes', ''),
+                *appointment_window(booking_data['date'], booking_data['time'], booking_data['service'])
             ))
             
             conn.commit()
@@ -559,22 +507,18 @@ Booked at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"""
             return self._simulate_voice_call(phone_number, source)
         
         try:
-            # Make outbound call to customer
-            call = client.calls.create(
-                url=f'{WEBHOOK_BASE_URL}/voice/incoming',
-                to=phone_number,
-                from_=TWILIO_PHONE_NUMBER,
-                method='POST',
-                status_callback=f'{WEBHOOK_BASE_URL}/voice/status',
-                status_callback_method='POST'
-            )
+            # Queue the call; the dialer places it as the carrier's rate limit allows
+            # and calls back busy or unanswered numbers
+            queued = dialer.start().submit(phone_number, source)
             
-            logger.info(f"Voice call triggered to {phone_number} from {source}, SID: {call.sid}")
+            logger.info(f"Voice call to {phone_number} from {source} queued as {queued.request_id}")
             
             return {
                 "success": True,
-                "call_sid": call.sid,
-                "message": "Voice call initiated successfully",
+                "request_id": queued.request_id,
+                "status": queued.status,
+                "status_url": f"/trigger-voice-call/{queued.request_id}",
+                "message": "Voice call queued",
                 "phone_number": phone_number,
                 "source": source
             }
@@ -794,8 +738,11 @@ QR_LANDING_PAGE_TEMPLATE = """
                 if (result.success) {
                     showStatus('Call initiated! We\'ll be calling you shortly...', 'success');
                     callButton.textContent = 'Call Initiated ✓';
+                    if (result.status_url) {
+                        pollCallStatus(result.status_url);
+                    }
                 } else {
-                    showStatus('Failed to initiate call. Please try again.', 'error');
+                    showStatus(result.message || 'Failed to initiate call. Please try again.', 'error');
                     callButton.disabled = false;
                     callButton.textContent = '📞 Call Me Now';
                 }
@@ -806,6 +753,35 @@ QR_LANDING_PAGE_TEMPLATE = """
             }
         });
         
+        const CALL_MESSAGES = {
+            queued: "You're in line - we'll be calling you shortly...",
+            dialing: 'Calling you now...',
+            in_call: 'Calling you now - please pick up!',
+            completed: 'Thank you for talking to us!'
+        };
+        
+        async function pollCallStatus(url) {
+            try {
+                const call = await (await fetch(url)).json();
+                if (call.status === 'retrying') {
+                    showStatus("We couldn't reach you. We'll try again in " + call.retry_in_seconds + " seconds.", 'success');
+                } else if (call.status === 'failed') {
+                    showStatus("We couldn't reach you. Please try again.", 'error');
+                    const callButton = document.getElementById('callButton');
+                    callButton.disabled = false;
+                    callButton.textContent = '📞 Call Me Now';
+                    return;
+                } else if (CALL_MESSAGES[call.status]) {
+                    showStatus(CALL_MESSAGES[call.status], 'success');
+                }
+                if (call.status !== 'completed') {
+                    setTimeout(() => pollCallStatus(url), 3000);
+                }
+            } catch (error) {
+                setTimeout(() => pollCallStatus(url), 3000);
+            }
+        }
+        
         function showStatus(message, type) {
             const status = document.getElementById('status');
             status.textContent = message;
@@ -817,7 +793,80 @@ QR_LANDING_PAGE_TEMPLATE = """
 </html>
 """
 
+# Pre-rendered prompt audio, played instead of <Say> when every sentence is cached
+audio = AudioPromptCache(base_url=f'{WEBHOOK_BASE_URL}{AUDIO_ROUTE}')
+
+# TwiML compiled at startup; webhooks splice in the CallSid and spoken text
+def _build_incoming(response: VoiceResponse, call_sid: str, gather: Dict):
+    # Welcome message
+    audio.speak(
+        response,
+        "Hello! Welcome to Goodness Glamour Salon. I'm your AI assistant. How can I help you today?",
+        voice='Polly.Joanna',
+        language='en-US'
+    )
+    
+    # Gather user input, with the greeting's hints
+    response.gather(
+        input='speech',
+        action=f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}',
+        **gather
+    )
+    
+    # Fallback
+    audio.speak(response, "I didn't hear anything. Please speak after the tone.")
+    response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
+
+def _build_incoming_error(response: VoiceResponse):
+    audio.speak(response, "I'm sorry, there was a technical issue. Please try again later.")
+    response.hangup()
+
+def _build_listen(response: VoiceResponse, call_sid: str, gather: Dict):
+    response.gather(
+        input='speech',
+        action=f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}',
+        **gather
+    )
+    
+    audio.speak(response, "I'm listening.")
+    response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
+
+INCOMING_TWIML = TwiMLTemplate(partial(_build_incoming, gather=gather_profile("greeting").attributes), "call_sid")
+INCOMING_ERROR_TWIML = TwiMLTemplate(_build_incoming_error)
+PLAIN_SAY_TWIML = TwiMLTemplate(lambda response, text: response.say(text), "text")
+REDIRECT_TWIML = TwiMLTemplate(
+    lambda response, call_sid: response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}'), "call_sid"
+)
+SAY_TWIML = TwiMLTemplate(lambda response, text: response.say(text, voice='Polly.Joanna', language='en-US'), "text")
+HANGUP_TWIML = TwiMLTemplate(lambda response: response.hangup())
+# One per booking step: each <Gather> carries that step's hints, language and speech model
+LISTEN_TWIML = StepTemplates(_build_listen, "call_sid")
+
+def _build_stream(response: VoiceResponse, call_sid: str, from_number: str):
+    # Hand the call to the media stream server; when it closes the stream, Twilio carries on below
+    connect = Connect()
+    stream = connect.stream(url=MEDIA_STREAM_URL)
+    stream.parameter(name='From', value=from_number)
+    response.append(connect)
+    response.redirect(f'{WEBHOOK_BASE_URL}/voice/stream_ended/{call_sid}')
+
+STREAM_TWIML = TwiMLTemplate(_build_stream, "call_sid", "from_number")
+
+def _retry(text: str, call_sid: str) -> str:
+    """Say ``text`` and send the caller back to the speech webhook"""
+    return compose(audio.spoken(text, PLAIN_SAY_TWIML), REDIRECT_TWIML.body(call_sid=call_sid))
+
+@app.route(f'{AUDIO_ROUTE}/<name>', methods=['GET'])
+def audio_prompt(name):
+    """Serve a pre-rendered prompt; names are content hashes, so caches may keep them forever"""
+    if not audio.has_file(name):
+        abort(404)
+    reply = send_from_directory(os.path.abspath(audio.directory), name, mimetype=audio_mimetype(name))
+    reply.headers['Cache-Control'] = AUDIO_CACHE_CONTROL
+    return reply
+
 @app.route('/voice/incoming', methods=['POST'])
+@idempotent_webhook(fields=("From",))
 def handle_incoming_call():
     """Handle incoming voice call from QR code scan"""
     try:
@@ -829,85 +878,90 @@ def handle_incoming_call():
         # Start new session
         session = voice_assistant.start_session(call_sid, from_number)
         
-        # Create TwiML response
-        response = VoiceResponse()
+        if VOICE_MODE == 'stream':
+            return STREAM_TWIML.render(call_sid=call_sid, from_number=from_number or "")
         
-        # Welcome message
-        response.say(
-            "Hello! Welcome to Goodness Glamour Salon. I'm your AI assistant. How can I help you today?",
-            voice='Polly.Joanna',
-            language='en-US'
-        )
-        
-        # Gather user input
-        gather = response.gather(
-            input='speech',
-            action=f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}',
-            speech_timeout='auto',
-            language='en-US',
-            enhanced=True
-        )
-        
-        # Fallback
-        response.say("I didn't hear anything. Please speak after the tone.")
-        response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
-        
-        return str(response)
+        # Welcome message, then gather user input
+        return INCOMING_TWIML.render(call_sid=call_sid)
         
     except Exception as e:
         logger.error(f"Error handling incoming call: {e}")
-        response = VoiceResponse()
-        response.say("I'm sorry, there was a technical issue. Please try again later.")
-        response.hangup()
-        return str(response)
+        return INCOMING_ERROR_TWIML.render_bytes()
 
 @app.route('/voice/process_speech/<call_sid>', methods=['POST'])
+@idempotent_webhook(fields=SPEECH_FIELDS)
 def process_speech(call_sid):
     """Process speech input from Twilio"""
     try:
         speech_result = request.form.get('SpeechResult', '')
         
         if not speech_result:
-            response = VoiceResponse()
-            response.say("I didn't hear anything. Please speak clearly.")
-            response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
-            return str(response)
+            # Nothing recognized counts as a re-prompt of the step being asked
+            session = voice_assistant.active_sessions.get(call_sid)
+            if session:
+                default_reprompts.record(session.current_step, True)
+            return _retry("I didn't hear anything. Please speak clearly.", call_sid)
         
         logger.info(f"Processing speech for call {call_sid}: {speech_result}")
         
         # Get AI response
-        ai_response = voice_assistant.get_conversation_response(speech_result, call_sid)
-        
-        # Create TwiML response
-        response = VoiceResponse()
-        response.say(ai_response, voice='Polly.Joanna', language='en-US')
+        ai_response = voice_assistant.get_conversation_response(
+            speech_result, call_sid, parse_confidence(request.form.get('Confidence'))
+        )
         
         # Check if conversation is complete
         session = voice_assistant.active_sessions.get(call_sid)
         if session and session.current_step == "booking_complete":
-            response.hangup()
             voice_assistant.end_session(call_sid)
-        else:
-            # Continue conversation
-            gather = response.gather(
-                input='speech',
-                action=f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}',
-                speech_timeout='auto',
-                language='en-US',
-                enhanced=True
-            )
-            
-            response.say("I'm listening.")
-            response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
-        
-        return str(response)
+            return compose(audio.spoken(ai_response, SAY_TWIML), HANGUP_TWIML.body())
+        # Continue conversation
+        return compose(audio.spoken(ai_response, SAY_TWIML),
+                       LISTEN_TWIML.body(session.current_step if session else None, call_sid=call_sid))
         
     except Exception as e:
         logger.error(f"Error processing speech: {e}")
-        response = VoiceResponse()
-        response.say("I'm sorry, I'm having trouble understanding. Please try again.")
-        response.redirect(f'{WEBHOOK_BASE_URL}/voice/process_speech/{call_sid}')
-        return str(response)
+        return _retry("I'm sorry, I'm having trouble understanding. Please try again.", call_sid)
+
+@app.route('/voice/stream_ended/<call_sid>', methods=['POST'])
+def stream_ended(call_sid):
+    """The media stream closed: hang up after a booking, otherwise carry on with <Gather> turns"""
+    session = voice_assistant.active_sessions.get(call_sid)
+    if session is None or session.current_step == "booking_complete":
+        voice_assistant.end_session(call_sid)
+        return HANGUP_TWIML.render_bytes()
+    return LISTEN_TWIML.render(session.current_step, call_sid=call_sid)
+
+# Media stream mode: the same assistant, driven by utterances cut from the call audio
+def _stream_started(call_sid: str, parameters: Dict[str, str]) -> str:
+    if call_sid not in voice_assistant.active_sessions:
+        voice_assistant.start_session(call_sid, parameters.get('From'))
+    return "Hello! Welcome to Goodness Glamour Salon. I'm your AI assistant. How can I help you today?"
+
+# Answer lengths and pauses per step, for tuning the <Gather> end-of-speech timeouts; the stream
+# VAD's utterances are merged back into whole answers first
+answer_timer = AnswerTimer(lambda step, duration_ms, pause_ms: default_utterance_log.record(step, duration_ms, pause_ms))
+
+def _stream_utterance(call_sid: str, utterance: Utterance):
+    session = voice_assistant.active_sessions.get(call_sid)
+    if session is not None:
+        answer_timer.heard(call_sid, session.current_step, utterance)
+
+def _stream_finished(call_sid: str) -> bool:
+    session = voice_assistant.active_sessions.get(call_sid)
+    return session is not None and session.current_step == "booking_complete"
+
+def create_media_stream_server(transcribe=None, synthesize=None) -> MediaStreamServer:
+    """Media stream server wired to this assistant; ASR defaults to the local model (else Google), TTS to pyttsx3"""
+    return MediaStreamServer(
+        on_start=_stream_started,
+        respond=lambda call_sid, text: voice_assistant.get_conversation_response(text, call_sid),
+        transcribe=transcribe or create_recognizer(SAMPLE_RATE),
+        synthesize=synthesize or Pyttsx3Synthesizer(),
+        is_finished=_stream_finished,
+        on_stop=answer_timer.finish,
+        on_utterance=_stream_utterance,
+        on_reply_played=answer_timer.reply_played
+    )
 
 @app.route('/voice/status/<call_sid>', methods=['POST'])
 def call_status(call_sid):
@@ -918,9 +972,16 @@ def call_status(call_sid):
     # Clean up if call ended
     if call_status in ['completed', 'busy', 'no-answer', 'failed', 'canceled']:
         voice_assistant.end_session(call_sid)
+    # Frees the dialer's slot, and schedules a call back if the line was busy or not answered
+    dialer.on_call_status(call_sid, call_status)
     
     return Response(status=200)
 
+# Status callback of dialer-placed calls (Twilio posts CallSid in form payload)
+@app.route('/voice/status', methods=['POST'])
+def call_status_generic():
+    return call_status(request.form.get('CallSid'))
+
 @app.route('/qr/voice-booking', methods=['GET'])
 def qr_landing_page():
     """Landing page for QR code scans"""
@@ -940,12 +1001,37 @@ def trigger_voice_call():
                 "message": "Phone number is required"
             }), 400
         
+        phone_number = normalize_phone(phone_number)
+        if not phone_number:
+            return jsonify({
+                "success": False,
+                "message": "Please enter a valid phone number"
+            }), 400
+        
+        # Repeat taps get the call already requested; floods get a 429
+        ip = client_ip(request.remote_addr, request.headers.get('X-Forwarded-For'))
+        admission = default_admission.admit(phone_number, ip)
+        if admission.decision == DUPLICATE and _call_failed(admission.existing):
+            # The earlier call gave up, so the caller may ask again
+            default_admission.release(phone_number)
+            admission = default_admission.admit(phone_number, ip)
+        if admission.decision == LIMITED:
+            retry_after = max(1, int(admission.retry_after + 0.999))
+            reply = jsonify({"success": False, "message": admission.reason, "retry_after": retry_after})
+            reply.headers['Retry-After'] = str(retry_after)
+            return reply, 429
+        if admission.decision == DUPLICATE:
+            return jsonify(_existing_call(admission.existing)), 202
+        
         # Trigger voice call
         result = voice_assistant.trigger_voice_call(phone_number, source)
         
         if result["success"]:
-            return jsonify(result), 200
+            default_admission.attach(phone_number, result)
+            # Queued calls are accepted, not yet placed; the page polls status_url
+            return jsonify(result), 202 if "request_id" in result else 200
         else:
+            default_admission.release(phone_number)
             return jsonify(result), 500
             
     except Exception as e:
@@ -955,6 +1041,29 @@ def trigger_voice_call():
             "message": "Internal server error"
         }), 500
 
+def _call_failed(existing: Optional[dict]) -> bool:
+    status = dialer.status(existing["request_id"]) if existing and "request_id" in existing else None
+    return bool(status) and status["status"] == FAILED
+
+def _existing_call(existing: Optional[dict]) -> dict:
+    """Reply for a repeat request: the earlier call, with where it has got to since"""
+    if existing is None:
+        # The first request is still being placed
+        return {"success": True, "duplicate": True, "message": "Call already requested"}
+    reply = dict(existing, duplicate=True, message="Call already requested")
+    status = dialer.status(existing["request_id"]) if "request_id" in existing else None
+    if status:
+        reply.update(status=status["status"], call_sid=status.get("call_sid"))
+    return reply
+
+@app.route('/trigger-voice-call/<request_id>', methods=['GET'])
+def voice_call_status(request_id):
+    """Where a queued call has got to, for the landing page to poll"""
+    status = dialer.status(request_id)
+    if status is None:
+        return jsonify({"success": False, "message": "Unknown call request"}), 404
+    return jsonify(dict(status, success=True)), 200
+
 @app.route('/api/qr/generate', methods=['GET'])
 def generate_qr_code():
     """Generate QR code for voice booking"""
@@ -985,6 +1094,11 @@ def health_check():
         "service": "Simple Voice Booking Assistant",
         "timestamp": datetime.now().isoformat(),
         "active_sessions": len(voice_assistant.active_sessions),
+        "session_memory": sizeof_report(voice_assistant.active_sessions),
+        "speech_steps": default_reprompts.snapshot(),
+        "webhook_retries": default_idempotency.stats(),
+        "outbound_calls": dialer.stats(),
+        "call_admission": default_admission.stats(),
         "twilio_status": "unknown"
     }
     
@@ -1047,5 +1161,8 @@ def verify_twilio():
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 7001))
+    if VOICE_MODE == 'stream' and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Only in the reloader's child process, which serves the sessions
+        create_media_stream_server().start_in_thread()
     logger.info(f"Starting Simple AI Voice Booking Assistant on port {port}")
     app.run(host='0.0.0.0', port=port, debug=True)
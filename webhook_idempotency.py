@@ -0,0 +1,174 @@
+"""
+Webhook Retry Deduplication
+Twilio retries a webhook that times out, and the retry carries the same
+speech as the original, so re-running it would apply the caller's answer
+twice (double bookings, duplicate SMS, a second LLM call). Replies are kept
+per CallSid and request for a few minutes and a retry gets the original's
+TwiML replayed; a retry that arrives while the original is still running
+waits for it instead of running alongside it
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Twilio sends this header on every webhook request; retries repeat the original's value
+IDEMPOTENCY_HEADER = "I-Twilio-Idempotency-Token"
+
+# How long a reply is kept for replay; Twilio retries within seconds of its 15 s timeout
+REPLAY_TTL = float(os.getenv('WEBHOOK_REPLAY_TTL', '120'))
+MAX_ENTRIES = 4096
+
+# Form fields that tell one speech turn from the next when there is no token
+SPEECH_FIELDS = ("SpeechResult", "Confidence")
+
+
+def request_key(call_sid: Optional[str], path: str, token: Optional[str] = None,
+                params: Optional[Iterable[Tuple[str, str]]] = None) -> Optional[str]:
+    """
+    CallSid plus Twilio's idempotency token, or failing that a hash of the
+    path and form parameters; None when the request cannot be told apart
+    from the next one (no token and no parameters to hash).
+    """
+    if token:
+        return f"{call_sid or '-'}|{token}"
+    params = list(params or ())
+    if not params:
+        return None
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update(path.encode("utf-8"))
+    for name, value in sorted(params):
+        digest.update(f"\0{name}={value}".encode("utf-8"))
+    return f"{call_sid or '-'}|{digest.hexdigest()}"
+
+
+class _Entry:
+    __slots__ = ("done", "result", "error", "expires")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.expires = 0.0
+
+
+class IdempotencyCache:
+    """
+    Thread-safe replay cache with TTL eviction.
+
+    The first request for a key runs ``fn`` and its result is kept for
+    ``ttl`` seconds; repeats within that window (or while it is still
+    running) get the same result without running ``fn`` again. A failed run
+    is not kept, so the next retry executes.
+    """
+
+    def __init__(self, ttl: float = REPLAY_TTL, max_entries: int = MAX_ENTRIES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "executed": 0, "replayed": 0, "joined_in_flight": 0, "evicted": 0}
+
+    def _evict(self, now: float):
+        # Entries move to the end as they finish, so the oldest expire first; leave room for one more
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if not entry.done.is_set() or (entry.expires > now and len(self._entries) < self.max_entries):
+                break
+            del self._entries[key]
+            self._stats["evicted"] += 1
+
+    def run(self, key: Optional[str], fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """(result, replayed) where ``replayed`` is True when an earlier request's result was reused"""
+        if key is None:
+            return fn(), False
+        with self._lock:
+            self._stats["requests"] += 1
+            self._evict(self._clock())
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+                self._stats["executed"] += 1
+                leader = True
+            else:
+                self._stats["replayed" if entry.done.is_set() else "joined_in_flight"] += 1
+                leader = False
+
+        if not leader:
+            entry.done.wait()
+            if entry.error is not None:
+                raise entry.error
+            logger.info(f"Replaying reply for retried webhook {key}")
+            return entry.result, True
+
+        try:
+            entry.result = fn()
+        except BaseException as e:
+            entry.error = e
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            raise
+        finally:
+            with self._lock:
+                entry.expires = self._clock() + self.ttl
+                if self._entries.get(key) is entry:
+                    self._entries.move_to_end(key)
+            entry.done.set()
+        return entry.result, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, cached=len(self._entries))
+
+
+def form_params(form: Mapping[str, str], fields: Iterable[str]) -> List[Tuple[str, str]]:
+    """The non-empty ``fields`` of a webhook form, for ``request_key``"""
+    return [(name, form.get(name)) for name in fields if form.get(name)]
+
+
+def idempotent_webhook(cache: Optional[IdempotencyCache] = None, fields: Iterable[str] = ()):
+    """
+    Flask view decorator: a retried Twilio request gets the original's reply.
+
+    Requests are matched on Twilio's idempotency token; without one they
+    fall back to a hash of ``fields`` from the form, when any are present.
+    Requests without them (polls, reply continuations, a Gather that heard
+    nothing) look alike by design and are only deduplicated by token.
+    """
+    fields = tuple(fields)
+
+    from flask import Response, make_response, request
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            replays = cache if cache is not None else default_idempotency
+            call_sid = kwargs.get("call_sid") or request.form.get("CallSid")
+            key = request_key(call_sid, request.path, request.headers.get(IDEMPOTENCY_HEADER),
+                              form_params(request.form, fields))
+
+            def respond():
+                reply = make_response(view(*args, **kwargs))
+                return reply.get_data(), reply.status_code, reply.headers.get("Content-Type")
+
+            (body, status, content_type), _ = replays.run(key, respond)
+            return Response(body, status=status, content_type=content_type)
+        return wrapper
+    return decorator
+
+
+default_idempotency = IdempotencyCache()